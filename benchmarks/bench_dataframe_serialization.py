@@ -0,0 +1,46 @@
+"""
+Compare payload size, encode and decode time of DataFrame Variable transport formats
+(JSON vs. zstd-compressed Arrow IPC and Parquet) on a 1M-row frame.
+
+Run from the repository root: python -m benchmarks.bench_dataframe_serialization
+"""
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from forloop_modules.utils.various import parse_dataframe_from_api, serialize_dataframe_to_api
+
+
+def make_df(n_rows: int = 1_000_000) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        "id": np.arange(n_rows),
+        "price": rng.normal(100, 20, n_rows).round(2),
+        "quantity": rng.integers(0, 1000, n_rows),
+        "category": rng.choice(["shoes", "shirts", "trousers", "hats"], n_rows),
+        "title": [f"product {i}" for i in range(n_rows)],
+    })
+    df.loc[df.sample(frac=0.05, random_state=42).index, "price"] = np.nan
+    return df
+
+
+def run(n_rows: int = 1_000_000):
+    df = make_df(n_rows)
+    print(f"{'format':<10} {'payload MB':>11} {'encode s':>9} {'decode s':>9}")
+
+    for transport_format in ["json", "arrow_ipc", "parquet"]:
+        start = time.perf_counter()
+        body = json.dumps(serialize_dataframe_to_api(df, transport_format=transport_format))
+        encode_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parse_dataframe_from_api(json.loads(body))
+        decode_time = time.perf_counter() - start
+
+        print(f"{transport_format:<10} {len(body) / 1e6:>11.2f} {encode_time:>9.2f} {decode_time:>9.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,77 @@
+"""
+Throughput of inserting a DataFrame into a local SQLite file - row at a time with a statement of literal
+values committed per row (as dbhydra's insert_from_df with autocommit does), parameterized rows in one
+transaction and batched executemany() committed per batch of increasing size. SQLite runs in-process,
+so the gains of batching over a network round trip per statement (MySQL, PostgreSQL) are even larger.
+
+Run from the repository root: python -m benchmarks.bench_db_insert
+"""
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from forloop_modules.utils.db_batch_insert import insert_df_in_batches, iter_df_row_batches
+from forloop_modules.utils.db_table_copy import CopyDialect
+
+N_ROWS = 100_000
+
+
+def create_connection(path: Path) -> sqlite3.Connection:
+    path.unlink(missing_ok=True)
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE scraped (id INTEGER PRIMARY KEY, url TEXT, title TEXT, price REAL)")
+    return connection
+
+
+def create_df() -> pd.DataFrame:
+    return pd.DataFrame({
+        "url": [f"https://example.com/item/{i}" for i in range(N_ROWS)],
+        "title": [f"Item {i}" for i in range(N_ROWS)],
+        "price": [i * 0.1 for i in range(N_ROWS)],
+    })
+
+
+def insert_row_at_a_time(connection, df):
+    cursor = connection.cursor()
+    for url, title, price in df.itertuples(index=False, name=None):
+        cursor.execute(f"INSERT INTO scraped (url, title, price) VALUES ('{url}', '{title}', {price})")
+        connection.commit()
+
+
+def insert_single_transaction(connection, df):
+    cursor = connection.cursor()
+    for rows in iter_df_row_batches(df, len(df)):
+        for row in rows:
+            cursor.execute("INSERT INTO scraped (url, title, price) VALUES (?, ?, ?)", row)
+    connection.commit()
+
+
+def measure(name, insert, db_path):
+    df = create_df()
+    connection = create_connection(db_path)
+    start = time.perf_counter()
+    insert(connection, df)
+    elapsed = time.perf_counter() - start
+    n_rows = connection.execute("SELECT COUNT(*) FROM scraped").fetchone()[0]
+    connection.close()
+    print(f"{name:<22} {n_rows / elapsed:12,.0f} rows/s")
+
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir, "bench.sqlite")
+        measure("row at a time", insert_row_at_a_time, db_path)
+        measure("single transaction", insert_single_transaction, db_path)
+        for batch_size in (100, 1_000, 10_000):
+            measure(
+                f"batched ({batch_size})",
+                lambda connection, df: insert_df_in_batches(connection, CopyDialect(), "scraped", df, batch_size),
+                db_path,
+            )
+
+
+if __name__ == "__main__":
+    run()
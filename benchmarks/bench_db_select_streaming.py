@@ -0,0 +1,75 @@
+"""
+Peak memory and duration of selecting a large table into a DataFrame - fetchall() into a list of rows
+(the former DB Select), chunked fetchmany() and chunked streaming into a Parquet file. SQLite stands in
+for the server-side cursors of MySQL/PostgreSQL, peak memory is measured by tracemalloc.
+
+Run from the repository root: python -m benchmarks.bench_db_select_streaming
+"""
+import importlib.util
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from forloop_modules.utils.db_select_streaming import concat_chunks, iter_cursor_chunks, write_chunks_to_parquet
+
+N_ROWS = 500_000
+CHUNK_SIZE = 50_000
+
+
+def create_db(path: Path) -> None:
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE orders (id INTEGER, customer TEXT, price REAL, note TEXT)")
+    connection.executemany(
+        "INSERT INTO orders VALUES (?, ?, ?, ?)",
+        ((i, f"customer_{i % 1000}", i * 0.5, "x" * 40) for i in range(N_ROWS)),
+    )
+    connection.commit()
+    connection.close()
+
+
+def select_fetchall(cursor, query):
+    cursor.execute(query)
+    rows = cursor.fetchall()
+    return pd.DataFrame(rows, columns=[description[0] for description in cursor.description])
+
+
+def select_chunked(cursor, query):
+    return concat_chunks(iter_cursor_chunks(cursor, query, CHUNK_SIZE))
+
+
+def select_to_parquet(cursor, query):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        return write_chunks_to_parquet(iter_cursor_chunks(cursor, query, CHUNK_SIZE), Path(tmp_dir, "orders.parquet"))
+
+
+def measure(name, select, db_path):
+    connection = sqlite3.connect(db_path)
+    tracemalloc.start()
+    start = time.perf_counter()
+    select(connection.cursor(), "SELECT * FROM orders")
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    connection.close()
+    print(f"{name:<10} peak {peak / 2**20:8.1f} MiB {elapsed:8.2f} s")
+
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir, "bench.sqlite")
+        create_db(db_path)
+
+        measure("fetchall", select_fetchall, db_path)
+        measure("chunked", select_chunked, db_path)
+        if importlib.util.find_spec("pyarrow") is None:
+            print("pyarrow is not installed, Parquet spill benchmark skipped")
+            return
+        measure("parquet", select_to_parquet, db_path)
+
+
+if __name__ == "__main__":
+    run()
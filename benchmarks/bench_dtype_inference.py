@@ -0,0 +1,85 @@
+"""
+Data type validation of a loaded DataFrame (500k rows, columns of integers with nulls, floats, numeric
+strings, texts, dates and an already typed datetime column) - the previous validate_input_data_types
+(whole-frame replace, to_numeric and regex passes over every column, kept here as the baseline)
+compared with the sampling inference engine, with numpy nullable and Arrow-backed dtypes.
+
+The baseline needs pandas 2.x (errors="ignore" of pd.to_numeric was removed in pandas 3).
+
+Run from the repository root: python -m benchmarks.bench_dtype_inference
+"""
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from forloop_modules.function_handlers.auxilliary.data_types_validation import infer_and_convert_dtypes
+
+N_ROWS = 500_000
+N_RUNS = 3
+
+
+def validate_input_data_types_baseline(df):
+    df = df.replace({np.nan: pd.NA, "None": pd.NA})
+    df = df.apply(pd.to_numeric, errors='ignore').convert_dtypes(convert_string=False, convert_boolean=False)
+
+    object_columns = df.select_dtypes(include=object).columns
+    for object_column in object_columns:
+        if df[object_column].astype(str).str.match(r"^ *[-]?[0-9][0-9 ]*([,.][0-9]+)*$").sum() == (~df[object_column].isna()).sum():
+            df[object_column] = df[object_column].replace({" ": ""}, regex=True)
+
+    df[object_columns] = df[object_columns].apply(pd.to_numeric, errors='ignore').convert_dtypes(convert_string=False, convert_boolean=False)
+
+    columns_containing_date = df.columns[df.columns.str.contains("date")]
+    df[columns_containing_date] = df[columns_containing_date].apply(lambda x: pd.to_datetime(x, errors='ignore'))
+    for col in columns_containing_date:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+
+    empty_columns = df.columns[df.isna().mean() == 1.]
+    df[empty_columns] = df[empty_columns].astype(object)
+    return df
+
+
+def make_df(n_rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    integers_with_nulls = rng.integers(0, 1000, n_rows).astype(float)
+    integers_with_nulls[::10] = np.nan
+    return pd.DataFrame({
+        "id": np.arange(n_rows),
+        "quantity": integers_with_nulls,
+        "price": rng.random(n_rows) * 100,
+        "amount_text": [f"{i % 1000} {i % 1000:03d}" for i in range(n_rows)],
+        "name": np.array(["alpha", "beta", "gamma", "None"], dtype=object)[rng.integers(0, 4, n_rows)],
+        "created_date": pd.date_range("2020-01-01", periods=n_rows, freq="min").strftime("%Y-%m-%d %H:%M").astype(object),
+        "loaded_at": pd.date_range("2020-01-01", periods=n_rows, freq="s"),
+    })
+
+
+def measure(function, df) -> float:
+    times = []
+    for _ in range(N_RUNS):
+        start = time.perf_counter()
+        function(df)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    df = make_df(N_ROWS)
+    warnings.simplefilter("ignore")
+
+    results = {
+        "baseline": measure(validate_input_data_types_baseline, df),
+        "inference (numpy_nullable)": measure(lambda df: infer_and_convert_dtypes(df), df),
+        "inference (pyarrow)": measure(lambda df: infer_and_convert_dtypes(df, dtype_backend="pyarrow"), df),
+    }
+    _, kinds = infer_and_convert_dtypes(df)
+    print(f"{N_ROWS} rows, column kinds: {kinds}")
+    for name, duration in results.items():
+        print(f"{name:>28}: {duration * 1000:8.1f} ms ({results['baseline'] / duration:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
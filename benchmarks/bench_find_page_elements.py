@@ -0,0 +1,91 @@
+"""
+Find Page Elements on a large e-commerce listing page - 3 searches (titles, prices, links) per page as
+done by 3 FindPageElements nodes. Compares the original BeautifulSoup html.parser parse per search with
+the parser backends with and without the parsed-document cache.
+
+Run from the repository root: python -m benchmarks.bench_find_page_elements
+"""
+import random
+import time
+
+from bs4 import BeautifulSoup
+
+from forloop_modules.utils.html_parsing import document_cache, find_page_elements_data
+
+N_PRODUCTS = 2_000
+N_REPEATS = 3
+
+SEARCHES = [
+    ("h2", {"class": "product-title"}, "text"),
+    ("span", {"class": "price"}, "text"),
+    ("a", {"class": "product-link"}, "href"),
+]
+
+
+def create_listing_page(n_products: int) -> str:
+    random.seed(0)
+    products = []
+    for i in range(n_products):
+        badges = "".join(f'<li class="badge badge-{j}">Badge {j}</li>' for j in range(random.randint(0, 4)))
+        products.append(f"""
+        <article class="product-card grid-item" data-product-id="{i}" data-category="cat-{i % 40}">
+          <div class="product-image"><img src="/img/{i}.jpg" alt="Product {i}" loading="lazy"></div>
+          <div class="product-body">
+            <h2 class="product-title">Product {i} with a longer descriptive name</h2>
+            <div class="rating" data-score="{random.random() * 5:.1f}"><span class="stars"></span></div>
+            <span class="price">{random.randint(5, 999)}.99 EUR</span>
+            <span class="price-old">{random.randint(1000, 1500)}.99 EUR</span>
+            <ul class="badges">{badges}</ul>
+            <a class="product-link" href="/products/{i}">Detail</a>
+            <button class="add-to-cart" data-sku="SKU-{i}">Add to cart</button>
+          </div>
+        </article>""")
+    return f"""<!DOCTYPE html><html><head><title>Listing</title></head><body>
+      <nav>{"".join(f'<a href="/cat/{i}">Category {i}</a>' for i in range(200))}</nav>
+      <main class="listing">{"".join(products)}</main>
+      <footer>{"<p>Footer text</p>" * 100}</footer></body></html>"""
+
+
+def find_with_bs4_per_search(page_source: str) -> list:
+    results = []
+    for tag, attributes, get in SEARCHES:
+        soup = BeautifulSoup(page_source, "html.parser")
+        elements = soup.find_all(tag, attrs=attributes)
+        results.append([x.text if get == "text" else x.get(get) for x in elements])
+    return results
+
+
+def find_with_backend(page_source: str, backend: str, use_cache: bool) -> list:
+    return [find_page_elements_data(page_source, tag, attributes, get, backend=backend, use_cache=use_cache)
+            for tag, attributes, get in SEARCHES]
+
+
+def measure(name: str, function, baseline: float = None) -> float:
+    timings = []
+    for _ in range(N_REPEATS):
+        document_cache.clear()
+        start = time.perf_counter()
+        results = function()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    speedup = f"{baseline / best:6.1f}x" if baseline else "      -"
+    print(f"{name:<40} {best * 1000:9.1f} ms {speedup}   ({sum(len(r) for r in results)} values)")
+    return best
+
+
+def main():
+    page_source = create_listing_page(N_PRODUCTS)
+    print(f"Listing page with {N_PRODUCTS} products, {len(page_source) / 1024 / 1024:.1f} MiB, "
+          f"{len(SEARCHES)} searches, best of {N_REPEATS}\n")
+
+    baseline = measure("bs4 html.parser, parse per search", lambda: find_with_bs4_per_search(page_source))
+    for backend in ["html.parser", "lxml", "selectolax"]:
+        try:
+            measure(f"{backend}, parse per search", lambda: find_with_backend(page_source, backend, False), baseline)
+            measure(f"{backend}, cached document", lambda: find_with_backend(page_source, backend, True), baseline)
+        except ImportError as e:
+            print(f"{backend}: skipped ({e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Micro-benchmark of per-call flog overhead for disabled and enabled log levels.
+
+Run from the repository root: python -m benchmarks.bench_flog
+"""
+import io
+import timeit
+
+import forloop_modules.flog as flog
+
+
+class BenchHandler:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def debug_eager(self):
+        flog.debug(f"DF = {self.payload}")
+
+    def debug_lazy(self):
+        flog.debug(lambda: f"DF = {self.payload}")
+
+    def debug_args(self):
+        flog.debug("DF = %s", args=(self.payload,))
+
+    def debug_guarded(self):
+        if flog.is_enabled_for(flog.FlogLevel.DEBUG, self):
+            flog.debug(f"DF = {self.payload}")
+
+
+def run(number: int = 100_000):
+    # A payload with an expensive __str__, similar to rendering a large DataFrame
+    payload = list(range(1_000))
+    handler = BenchHandler(payload)
+    flog.OUTPUT = io.StringIO()
+
+    for enabled in (False, True):
+        flog.FLOG_CONFIG["BenchHandler"] = flog.FlogLevel.DEBUG if enabled else flog.FlogLevel.WARNING
+        n = number if not enabled else number // 10
+        print(f"--- debug level {'enabled' if enabled else 'disabled'} ({n} calls) ---")
+        for name in ["debug_eager", "debug_lazy", "debug_args", "debug_guarded"]:
+            elapsed = timeit.timeit(getattr(handler, name), number=n)
+            print(f"{name:<15} {elapsed / n * 1e6:8.2f} us/call")
+        flog.OUTPUT.seek(0)
+        flog.OUTPUT.truncate()
+
+
+if __name__ == "__main__":
+    run()
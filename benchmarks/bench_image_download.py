@@ -0,0 +1,78 @@
+"""
+Download of 200 images (100 KiB each, 20 % of them repeated) from a local HTTP server which answers
+every request after 30 ms (simulated network latency) - one request after another with requests (as
+docrawl downloads them) compared with ImageDownloader at increasing concurrency.
+
+Run from the repository root: python -m benchmarks.bench_image_download
+"""
+import http.server
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from forloop_modules.utils.image_downloader import ImageDownloader
+
+N_IMAGES = 200
+N_UNIQUE_IMAGES = 160
+IMAGE_SIZE = 100 * 1024
+LATENCY = 0.03  # seconds
+
+
+class ImageRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        image_id = int(self.path.strip("/").split(".")[0])
+        content = bytes([image_id % 256]) * IMAGE_SIZE
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def download_sequentially(urls: list[str], directory: Path) -> None:
+    for i, url in enumerate(urls):
+        response = requests.get(url)
+        with open(directory / f"img_{i}.jpg", "wb") as outfile:
+            outfile.write(response.content)
+
+
+def main():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ImageRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    urls = [f"{base_url}/{i % N_UNIQUE_IMAGES}.jpg" for i in range(N_IMAGES)]
+    print(f"{N_IMAGES} images ({N_UNIQUE_IMAGES} unique) of {IMAGE_SIZE // 1024} KiB, {LATENCY * 1000:.0f} ms latency\n")
+
+    directory = Path(tempfile.mkdtemp())
+    try:
+        start = time.perf_counter()
+        download_sequentially(urls, directory)
+        baseline = time.perf_counter() - start
+        print(f"{'sequential requests.get':<28} {baseline:6.2f} s   {N_IMAGES / baseline:7.1f} images/s")
+
+        for max_concurrency in [1, 8, 32]:
+            shutil.rmtree(directory)
+            directory.mkdir()
+            downloader = ImageDownloader(max_concurrency=max_concurrency)
+            stats = downloader.download([(url, directory / f"img_{i}") for i, url in enumerate(urls)]).to_dict()
+            print(f"{f'ImageDownloader x{max_concurrency}':<28} {stats['elapsed']:6.2f} s   "
+                  f"{stats['images_per_second']:7.1f} images/s   {baseline / stats['elapsed']:5.1f}x   "
+                  f"{stats['bytes_per_second'] / 1024 / 1024:6.1f} MiB/s   "
+                  f"{stats['bytes_written'] / 1024 / 1024:.1f} MiB written, {stats['duplicates']} duplicates")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Preparing dependencies of a script whose imports are missing in the current interpreter - a pip install
+before every run (as RunPythonScriptHandler did, followed by an uninstall; here into a fresh --target
+directory, so the interpreter isn't modified) compared with the environment cache: a cold build, warm
+reuse, and a rebuild of an evicted environment from the shared pip cache.
+
+Needs network access for the first download of the packages.
+
+Run from the repository root: python -m benchmarks.bench_script_environments
+"""
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from forloop_modules.utils.script_environments import ScriptEnvironmentCache, is_module_installed
+
+MODULES = ["tabulate", "tomlkit", "humanize"]  # Small pure Python packages
+N_RUNS = 3
+
+
+def install_per_run(modules: list[str], target_path: Path) -> None:
+    shutil.rmtree(target_path, ignore_errors=True)
+    for module in modules:  # One pip call per missing module
+        subprocess.run(
+            [sys.executable, "-m", "pip", "install", "--disable-pip-version-check", "--target", str(target_path), module],
+            check=True, capture_output=True,
+        )
+
+
+def measure(name: str, function, n_runs: int = 1) -> None:
+    times = []
+    for _ in range(n_runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    print(f"{name:>30}: {min(times) * 1000:9.1f} ms")
+
+
+def main():
+    modules = [module for module in MODULES if not is_module_installed(module)]
+    if not modules:
+        print(f"All of {MODULES} are installed, nothing to benchmark")
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        measure("pip install per run", lambda: install_per_run(modules, temp_path / "per_run"), N_RUNS)
+
+        cache = ScriptEnvironmentCache(temp_path / "environments")
+        measure("environment cache, cold", lambda: cache.get_environment(modules))
+        measure("environment cache, warm", lambda: cache.get_environment(modules), N_RUNS)
+
+        cache.clear()  # Keeps the pip cache
+        measure("rebuild from pip cache", lambda: cache.get_environment(modules))
+        print(f"modules: {modules}, stats: {cache.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
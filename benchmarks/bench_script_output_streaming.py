@@ -0,0 +1,93 @@
+"""
+Streaming output of a script printing many lines into result variables - per line read-modify-write of
+the result variable (as RunPythonScriptHandler did: get the variable, concatenate the line, store it
+back) compared with OutputStreamer (concurrent pipe readers, flushes of buffered output every 0.5 s).
+
+Result variables are kept in a dict with ROUND_TRIP_LATENCY per variable request, standing in for the
+API calls. The per line baseline runs only BASELINE_LINES lines, its time grows quadratically.
+
+Run from the repository root: python -m benchmarks.bench_script_output_streaming
+"""
+import subprocess
+import sys
+import time
+
+from forloop_modules.utils.script_output_streaming import OutputStreamer
+
+ROUND_TRIP_LATENCY = 0.0002  # seconds
+BASELINE_LINES = 10_000
+LINE_COUNTS = [10_000, 100_000]
+
+SCRIPT = """
+import sys
+for i in range({n_lines}):
+    print(f"processed record {{i}} of {n_lines}")
+    if i % 100 == 0:
+        print(f"warning at record {{i}}", file=sys.stderr)
+"""
+
+
+class VariableStore:
+    def __init__(self):
+        self.variables = {}
+        self.requests_count = 0
+
+    def get(self, name):
+        time.sleep(ROUND_TRIP_LATENCY)
+        self.requests_count += 1
+        return self.variables.get(name, "")
+
+    def set(self, name, value):
+        time.sleep(ROUND_TRIP_LATENCY)
+        self.requests_count += 1
+        self.variables[name] = value
+
+
+def start_script(n_lines: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-u", "-c", SCRIPT.format(n_lines=n_lines)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1,
+    )
+
+
+def run_per_line(n_lines: int) -> VariableStore:
+    store = VariableStore()
+
+    def save_line(output_mode, line):
+        var_name = f"script_{output_mode}"
+        store.set(var_name, store.get(var_name) + line.replace("'", '"'))
+
+    process = start_script(n_lines)
+    for stdout_line in iter(process.stdout.readline, ""):
+        save_line("stdout", stdout_line)
+    for stderr_line in iter(process.stderr.readline, ""):
+        save_line("stderr", stderr_line)
+    process.wait()
+    return store
+
+
+def run_streamer(n_lines: int) -> VariableStore:
+    store = VariableStore()
+    process = start_script(n_lines)
+    with OutputStreamer(lambda output_mode, output: store.set(f"script_{output_mode}", output.replace("'", '"'))) as streamer:
+        streamer.read_process_output(process)
+    process.wait()
+    return store
+
+
+def measure(run, n_lines: int) -> None:
+    start = time.perf_counter()
+    store = run(n_lines)
+    duration = time.perf_counter() - start
+    assert store.variables["script_stdout"].count("\n") == n_lines
+    print(f"{run.__name__:>13} {n_lines:>7} lines: {duration:7.2f} s, {store.requests_count:>6} variable requests")
+
+
+def main():
+    measure(run_per_line, BASELINE_LINES)
+    for n_lines in LINE_COUNTS:
+        measure(run_streamer, n_lines)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Latency of running a short script using pandas and numpy - a new interpreter per run (python -c, as
+RunPythonScriptHandler does) compared with a warm worker of the script worker pool, which has the
+libraries imported before the script is submitted. Pool start-up (preloading) is measured separately,
+it's paid once, ahead of the first script.
+
+Run from the repository root: python -m benchmarks.bench_script_worker_pool
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+from forloop_modules.utils.script_worker_pool import ScriptWorkerPool
+
+SCRIPT = """
+import numpy as np
+import pandas as pd
+
+df = pd.DataFrame({"value": np.arange(1000)})
+print(df["value"].sum())
+"""
+N_RUNS = 10
+
+
+def run_cold() -> str:
+    return subprocess.run([sys.executable, "-u", "-c", SCRIPT], capture_output=True, text=True, check=True).stdout
+
+
+def run_warm(pool: ScriptWorkerPool) -> str:
+    output = []
+    pool.run(SCRIPT, on_output=lambda stream, line: output.append(line))
+    return "".join(output)
+
+
+def measure(name: str, function) -> None:
+    times = []
+    for _ in range(N_RUNS):
+        start = time.perf_counter()
+        output = function()
+        times.append(time.perf_counter() - start)
+        assert output == "499500\n", output
+    print(f"{name:>20}: median {statistics.median(times) * 1000:8.1f} ms, min {min(times) * 1000:8.1f} ms")
+
+
+def main():
+    measure("new interpreter", run_cold)
+
+    start = time.perf_counter()
+    with ScriptWorkerPool(size=1) as pool:
+        print(f"{'pool start-up':>20}: {(time.perf_counter() - start) * 1000:8.1f} ms (once)")
+        measure("warm worker", lambda: run_warm(pool))
+        print(pool.get_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Throughput of SSE decoding and of end-to-end streaming from a local high-rate event generator,
+directly and with read-ahead into a bounded queue (with a consumer slowed down by periodic pauses).
+
+Run from the repository root: python -m benchmarks.bench_sse
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+N_EVENTS = 50_000
+EVENT_PAYLOAD = json.dumps({"node_uid": "0" * 32, "status": "finished", "message": "x" * 100})
+
+
+def generate_event_lines(n_events: int):
+    for i in range(n_events):
+        yield f"id: {i}"
+        yield "event: node_status"
+        yield f"data: {EVENT_PAYLOAD}"
+        yield ""
+
+
+class EventGeneratorHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        chunk = []
+        for line in generate_event_lines(N_EVENTS):
+            chunk.append(line)
+            if len(chunk) == 400:
+                self.wfile.write(("\n".join(chunk) + "\n").encode())
+                chunk = []
+        self.wfile.write(("\n".join(chunk) + "\n").encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def bench_decoder():
+    from forloop_modules.utils.sse_parser import SSEDecoder
+
+    lines = list(generate_event_lines(N_EVENTS))
+    for as_dict in (False, True):
+        start = time.perf_counter()
+        n_messages = sum(1 for _ in SSEDecoder(as_dict=as_dict).decode(lines))
+        elapsed = time.perf_counter() - start
+        print(f"decoder as_dict={as_dict!s:<5} {n_messages / elapsed:12,.0f} events/s")
+
+
+def bench_stream():
+    try:
+        import httpx
+    except ImportError:
+        print("httpx is not installed, end-to-end streaming benchmark skipped")
+        return
+
+    from forloop_modules.utils.sse_parser import SSEParser
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EventGeneratorHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/stream"
+
+    try:
+        with httpx.Client(timeout=30) as client:
+            for max_queue_size in (0, 1024):
+                parser = SSEParser(client, max_queue_size=max_queue_size)
+                start = time.perf_counter()
+                n_messages = 0
+                for _ in parser.stream("GET", url):
+                    n_messages += 1
+                    if n_messages % 1000 == 0:  # Slow consumer - processing bursts
+                        time.sleep(0.005)
+                elapsed = time.perf_counter() - start
+                print(f"stream max_queue_size={max_queue_size:<5} {n_messages / elapsed:12,.0f} events/s")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run():
+    bench_decoder()
+    bench_stream()
+
+
+if __name__ == "__main__":
+    run()
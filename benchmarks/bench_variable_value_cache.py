@@ -0,0 +1,70 @@
+"""
+Repeated reads of a Redis-stored DataFrame variable (200k rows) - deserialized by keepvariable on every
+read (as LocalVariableHandler did) compared with the version-checked value cache, which fetches only
+the version counter of the value. Serialized values are kept in a dict in place of a Redis server, so
+a real server adds the network transfer of the whole frame to every uncached read.
+
+Run from the repository root: python -m benchmarks.bench_variable_value_cache
+"""
+import time
+
+import keepvariable.keepvariable_core as kv
+import numpy as np
+import pandas as pd
+
+from forloop_modules.utils.variable_value_cache import VariableValueCache, bump_value_version, get_value_version
+
+N_ROWS = 200_000
+N_READS = 10
+
+REDIS_NAME = "pipeline_job:bench:variable:df"
+VERSION_REDIS_NAME = f"{REDIS_NAME}:version"
+
+
+class InMemoryKvRedis:
+    """keepvariable's (de)serialization of values stored in a dict"""
+
+    def __init__(self):
+        self.storage = {}
+        self.codec = kv.KeepVariableDummyRedisServer()
+
+    def set(self, key, value, additional_params=None):
+        self.storage[key] = self.codec.parse_saved_value(value, additional_params)
+
+    def get(self, key):
+        value = self.storage.get(key)
+        return self.codec.decode_loaded_value(value) if value is not None else None
+
+
+def main():
+    kv_redis = InMemoryKvRedis()
+    df = pd.DataFrame({
+        "id": np.arange(N_ROWS),
+        "price": np.random.default_rng(0).random(N_ROWS) * 100,
+        "title": [f"Product {i}" for i in range(N_ROWS)],
+    })
+
+    cache = VariableValueCache()
+    kv_redis.set(REDIS_NAME, df)
+    cache.put(REDIS_NAME, df, bump_value_version(kv_redis, VERSION_REDIS_NAME))
+
+    start = time.perf_counter()
+    for _ in range(N_READS):
+        kv_redis.get(REDIS_NAME)
+    uncached = (time.perf_counter() - start) / N_READS
+
+    start = time.perf_counter()
+    for _ in range(N_READS):
+        version = get_value_version(kv_redis, VERSION_REDIS_NAME)
+        cache.get_or_load(REDIS_NAME, version, lambda: kv_redis.get(REDIS_NAME))
+    cached = (time.perf_counter() - start) / N_READS
+
+    stats = cache.get_stats()
+    print(f"{N_READS} reads of a DataFrame with {N_ROWS} rows ({stats['size'] / 1024 / 1024:.1f} MiB in memory)\n")
+    print(f"{'kv_redis.get per read':<28} {uncached * 1000:10.3f} ms/read")
+    print(f"{'version check + cache':<28} {cached * 1000:10.3f} ms/read   {uncached / cached:,.0f}x")
+    print(f"\nhits {stats['hits']}, misses {stats['misses']}, {stats['bytes_saved'] / 1024 / 1024:.1f} MiB saved")
+
+
+if __name__ == "__main__":
+    main()
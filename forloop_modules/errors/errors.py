@@ -45,3 +45,17 @@ class InitializationError(Exception):
 
 class CreditsOverspentError(Exception):
     """Exception raised when a billable node is executed with insufficient credits."""
+
+
+class CircuitBreakerOpenError(Exception):
+    """
+    Exception raised when a request is not sent because the circuit breaker of the target host is open,
+    i.e. the host failed repeatedly and is given time to recover.
+    """
+
+
+class ScriptWorkerError(Exception):
+    """
+    Exception raised when a worker process of the script worker pool fails (exits, breaks the protocol)
+    while running a script, as opposed to an error of the script itself.
+    """
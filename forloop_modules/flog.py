@@ -1,5 +1,8 @@
 import sys
 import os
+import atexit
+import queue
+import threading
 import traceback
 
 from datetime import datetime
@@ -18,6 +21,98 @@ if DEVELOPER_MODE:
 #from src.function_handlers.abstract_function_handler import AbstractFunctionHandler #NO! Antipattern! Circular import!
 
 
+class AsyncOutputSink:
+    """
+    File-like wrapper of an output stream, which only enqueues written messages - the actual (blocking)
+    writes are done in batches by a background writer thread, so logging never waits for terminal/file I/O.
+
+    When the bounded queue is full, messages are either dropped (overflow_policy="drop") or the caller
+    waits for a free slot (overflow_policy="block"). Remaining messages are flushed on interpreter exit.
+    """
+
+    def __init__(self, stream, max_queue_size: int = 10000, overflow_policy: str = "block", batch_size: int = 256):
+        if overflow_policy not in ["block", "drop"]:
+            raise ValueError(f"Overflow policy '{overflow_policy}' is not supported, use 'block' or 'drop'")
+
+        self.stream = stream
+        self.overflow_policy = overflow_policy
+        self.batch_size = batch_size
+        self.dropped_messages = 0
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._is_closed = False
+        self._writer_thread = threading.Thread(target=self._write_loop, name="flog-writer", daemon=True)
+        self._writer_thread.start()
+        atexit.register(self.close)
+
+    def write(self, message: str) -> int:
+        if self._is_closed:
+            return self.stream.write(message)
+
+        if self.overflow_policy == "drop":
+            try:
+                self._queue.put_nowait(message)
+            except queue.Full:
+                self.dropped_messages += 1
+        else:
+            self._queue.put(message)
+
+        return len(message)
+
+    def flush(self):
+        """Block until all enqueued messages are written to the underlying stream."""
+        if not self._is_closed:
+            self._queue.join()
+        self.stream.flush()
+
+    def close(self):
+        if self._is_closed:
+            return
+
+        self._is_closed = True  # Any further writes go directly to the stream
+        self._queue.put(None)  # Sentinel stopping the writer thread
+        self._writer_thread.join(timeout=5)
+
+        if self.dropped_messages:
+            self.stream.write(f"forloop_modules.flog: {self.dropped_messages} messages were dropped (output queue full)\n")
+        self.stream.flush()
+
+    def _write_loop(self):
+        is_running = True
+        while is_running:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            messages = [message for message in batch if message is not None]
+            is_running = len(messages) == len(batch)
+
+            try:
+                self.stream.write("".join(messages))
+                self.stream.flush()
+            except Exception as e:
+                print("forloop_modules.flog: Warning: Writing to output stream failed - ignoring ", e, file=sys.stderr)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+def enable_async_output(max_queue_size: int = 10000, overflow_policy: str = "block") -> AsyncOutputSink:
+    """Route all flog output through an AsyncOutputSink wrapping the current output stream."""
+    global OUTPUT
+
+    if not isinstance(OUTPUT, AsyncOutputSink):
+        OUTPUT = AsyncOutputSink(OUTPUT, max_queue_size=max_queue_size, overflow_policy=overflow_policy)
+    return OUTPUT
+
+
+def is_output_stdout() -> bool:
+    return getattr(OUTPUT, "stream", OUTPUT) == sys.stdout
+
+
 if DEVELOPER_MODE:
     # instantiate
     config = ConfigParser()
@@ -39,6 +134,20 @@ if DEVELOPER_MODE:
     except Exception as e:
         print("forloop_modules.flog: Warning: Output stream couldn't be defined - ignoring ",e)
         OUTPUT = sys.stdout
+
+    # Optional asynchronous output, e.g.:
+    # [LOGGER]
+    # Async output = True
+    # Async queue size = 10000
+    # Async overflow policy = drop
+    try:
+        if config.getboolean("LOGGER", "Async output", fallback=False):
+            enable_async_output(
+                max_queue_size=config.getint("LOGGER", "Async queue size", fallback=10000),
+                overflow_policy=config.get("LOGGER", "Async overflow policy", fallback="block"),
+            )
+    except Exception as e:
+        print("forloop_modules.flog: Warning: Async output couldn't be enabled - ignoring ",e)
 else:
     OUTPUT = sys.stdout
 
@@ -68,15 +177,54 @@ class FlogLevel(Enum):
     NOTSET = 0
 
 
+class FlogConfig(dict):
+    """
+    Dictionary of class name -> FlogLevel pairs, which drops the cached per-class log levels
+    whenever it is modified, so that changes made at runtime are picked up immediately
+    """
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        clear_loglevel_cache()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        clear_loglevel_cache()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        clear_loglevel_cache()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        clear_loglevel_cache()
+        return value
+
+    def clear(self):
+        super().clear()
+        clear_loglevel_cache()
+
+
+# Resolved (class name, min log level) for each class that has called the logger so far
+_CLS_LOGLEVEL_CACHE = {}
+# Lowest log level present in FLOG_CONFIG - messages below it are rejected without any lookups
+_MIN_LOGLEVEL = []
+
+
+def clear_loglevel_cache():
+    _CLS_LOGLEVEL_CACHE.clear()
+    _MIN_LOGLEVEL.clear()
+
+
 # Logging levels for specific classes, logs with values higher than config are printed
 # If class name is not found, parent class may be used, otherwise DEFAULT config is sed
-FLOG_CONFIG = {
+FLOG_CONFIG = FlogConfig({
     "DEFAULT": FlogLevel.WARNING,
     "Wizard": FlogLevel.INFO,
     "Scanner": FlogLevel.INFO,
     "CleaningUtility": FlogLevel.INFO,
     "DfToListHandler": FlogLevel.DEBUG
-}
+})
 
 if DEVELOPER_MODE:
     # update FLOG_CONFIG with config.ini settings
@@ -99,9 +247,12 @@ class EmptyClass:
         self.__class__.__name__ = ""
 
 
+EMPTY_CLASS_INSTANCE = EmptyClass()
+
+
 def augment_message(message: str, color: LogColor, header: str = "") -> str:
     message = f"{header}{message}"
-    if OUTPUT == sys.stdout:
+    if is_output_stdout():
         message = f'{color.value}{message}{LogColor.COLOROFF.value}'
     return message
 
@@ -115,13 +266,17 @@ def get_class_name_config_key_pair(class_instance: object) -> Tuple[str, str]:
     :return: class name and corresponding key in flog config dictionary
     :rtype: str, str
     """
-    cls_name = type(class_instance).__name__
+    return _get_class_name_config_key_pair(type(class_instance))
+
+
+def _get_class_name_config_key_pair(cls: type) -> Tuple[str, str]:
+    cls_name = cls.__name__
     flog_config_key = "DEFAULT"
     if cls_name in FLOG_CONFIG:
         flog_config_key = cls_name
 
-    if flog_config_key == "DEFAULT":
-        ancestor_cls_name = type(class_instance.__class__.__bases__[0]).__name__
+    if flog_config_key == "DEFAULT" and cls.__bases__:
+        ancestor_cls_name = cls.__bases__[0].__name__
         if ancestor_cls_name in FLOG_CONFIG:
             flog_config_key = ancestor_cls_name
 
@@ -142,25 +297,67 @@ def get_cls_loglevel(class_name: str) -> int:
     return log_level
 
 
-def get_callers_class_instance():
+def get_cached_class_name_and_loglevel(cls: type) -> Tuple[str, int]:
+    """
+    Cached variant of get_class_name_config_key_pair + get_cls_loglevel, resolved once per class
+
+    :param cls: class from which logger was called
+    :return: class name and its minimum log level
+    :rtype: str, int
+    """
+    try:
+        return _CLS_LOGLEVEL_CACHE[cls]
+    except KeyError:
+        class_name, flog_config_key = _get_class_name_config_key_pair(cls)
+        _CLS_LOGLEVEL_CACHE[cls] = (class_name, get_cls_loglevel(flog_config_key))
+        return _CLS_LOGLEVEL_CACHE[cls]
+
+
+def get_min_loglevel() -> int:
+    """Get the lowest log level configured for any class in FLOG_CONFIG"""
+    if not _MIN_LOGLEVEL:
+        _MIN_LOGLEVEL.append(min(level.value for level in FLOG_CONFIG.values()))
+    return _MIN_LOGLEVEL[0]
+
+
+def get_callers_class_instance(depth: int = 2):
     # return instance of a class that flog has been called from
     # sys._getframe(2) returns fourth frame from stack (get_callers_class_instance - error - {caller}
+    frame = sys._getframe(depth)
+    code = frame.f_code
+
+    # Reading f_locals materializes all locals of the frame, skip it for calls outside of methods
+    if "self" not in code.co_varnames and "self" not in code.co_freevars:
+        return EMPTY_CLASS_INSTANCE
+
     try:
-        class_instance = sys._getframe(2).f_locals["self"]
+        class_instance = frame.f_locals["self"]
     except KeyError:
-        class_instance = EmptyClass()
+        class_instance = EMPTY_CLASS_INSTANCE
 
     return class_instance
 
 
-def wrap_add_class_name(func):
-    # automatically add class instance to flogger method call
-    def add_class_name(message: str, class_instance=None, message_category = "*"):
-        if class_instance is None:
-            class_instance = get_callers_class_instance()
+def is_enabled_for(level: FlogLevel, class_instance: object = None) -> bool:
+    """
+    Fast check whether a message of given level would be printed for given class instance (or the
+    caller's class instance if not provided). Use it to guard expensive message preparation.
+
+    :param level: level of the message
+    :type level: FlogLevel
+    :param class_instance: class instance (or class) from which logger is called
+    :return: True if message of given level would be printed
+    :rtype: bool
+    """
+    if level.value < get_min_loglevel():
+        return False
 
-        return func(message, class_instance, message_category = message_category)
-    return add_class_name
+    if class_instance is None:
+        class_instance = get_callers_class_instance(depth=2)
+    cls = class_instance if isinstance(class_instance, type) else type(class_instance)
+
+    _, cls_min_log_level = get_cached_class_name_and_loglevel(cls)
+    return cls_min_log_level <= level.value
 
 
 def is_error_raised():
@@ -172,39 +369,34 @@ def print_exception_if_raised():
         traceback.print_exc()
 
 
-@wrap_add_class_name
-def critical(message="", class_instance: object = EmptyClass(), message_category="*"):
+def render_message(message, args: tuple = ()) -> str:
     """
-    print red colored critical message
+    Build the final message string - messages passed as callables are called first, '%'-style
+    args are interpolated afterwards. Called only once the message is known to be printed.
     """
+    if callable(message):
+        message = message()
 
     message = str(message)
+    if args:
+        message = message % args
 
-    class_name, class_flog_config_key = get_class_name_config_key_pair(class_instance)
-    cls_min_log_level = get_cls_loglevel(class_flog_config_key)
-
-    if cls_min_log_level <= FlogLevel.CRITICAL.value:
-        if is_error_raised():
-            traceback.print_exc()
-        flog(message, class_name, color=LogColor.ERROR, message_category=message_category)
-
-
-@wrap_add_class_name
-def error(message="", class_instance: object = EmptyClass(), message_category="*"):
-    """
-    print red colored error message
-    """
+    return message
 
-    message = str(message)
 
-    class_name, class_flog_config_key = get_class_name_config_key_pair(class_instance)
-    cls_min_log_level = get_cls_loglevel(class_flog_config_key)
+def _log(level: FlogLevel, message, class_instance, message_category: str, args: tuple,
+         color: LogColor = LogColor.COLOROFF):
+    # Frames: get_callers_class_instance - _log - {level function} - {caller}
+    if level.value < get_min_loglevel():
+        return
 
-    if cls_min_log_level <= FlogLevel.ERROR.value:
+    if class_instance is None:
+        class_instance = get_callers_class_instance(depth=3)
 
-        #print_exception_if_raised()
+    class_name, cls_min_log_level = get_cached_class_name_and_loglevel(type(class_instance))
 
-        if is_error_raised():
+    if cls_min_log_level <= level.value:
+        if level.value >= FlogLevel.ERROR.value and is_error_raised():
             traceback.print_exc()
 
         # For better debugging in handlers (will show handler's params)
@@ -212,67 +404,55 @@ def error(message="", class_instance: object = EmptyClass(), message_category="*
         #if isinstance(class_instance, AbstractFunctionHandler):
         #    message += f"\nNode's form_dict_list: {class_instance.make_form_dict_list()}"
 
-        flog(message, class_name, color=LogColor.ERROR, message_category=message_category)
+        flog(render_message(message, args), class_name, color=color, message_category=message_category)
+
+
+# All level functions accept the message either as a string, or as a callable returning the message
+# (optionally with '%'-style args) - the message is then rendered only when it is going to be printed:
+#   flog.debug(lambda: f"DF = {df}")
+#   flog.debug("DF = %s", args=(df,))
 
 
-@wrap_add_class_name
-def warning(message="", class_instance: object = EmptyClass(), message_category="*"):
+def critical(message="", class_instance: object = None, message_category="*", args: tuple = ()):
     """
-    print yellow colored warning message
+    print red colored critical message
     """
+    _log(FlogLevel.CRITICAL, message, class_instance, message_category, args, color=LogColor.ERROR)
 
-    message = str(message)
-
-    class_name, class_flog_config_key = get_class_name_config_key_pair(class_instance)
-    cls_min_log_level = get_cls_loglevel(class_flog_config_key)
 
-    if cls_min_log_level <= FlogLevel.WARNING.value:
-        flog(message, class_name, color=LogColor.WARNING, message_category=message_category)
+def error(message="", class_instance: object = None, message_category="*", args: tuple = ()):
+    """
+    print red colored error message
+    """
+    _log(FlogLevel.ERROR, message, class_instance, message_category, args, color=LogColor.ERROR)
 
 
-@wrap_add_class_name
-def info(message="", class_instance: object = EmptyClass(), message_category="*"):
+def warning(message="", class_instance: object = None, message_category="*", args: tuple = ()):
     """
-    print info message
+    print yellow colored warning message
     """
+    _log(FlogLevel.WARNING, message, class_instance, message_category, args, color=LogColor.WARNING)
 
-    message = str(message)
-
-    class_name, class_flog_config_key = get_class_name_config_key_pair(class_instance)
-    cls_min_log_level = get_cls_loglevel(class_flog_config_key)
 
-    if cls_min_log_level <= FlogLevel.INFO.value:
-        flog(message, class_name, message_category=message_category)
+def info(message="", class_instance: object = None, message_category="*", args: tuple = ()):
+    """
+    print info message
+    """
+    _log(FlogLevel.INFO, message, class_instance, message_category, args)
 
 
-@wrap_add_class_name
-def minor_info(message="", class_instance: object = EmptyClass(), message_category="*"):
+def minor_info(message="", class_instance: object = None, message_category="*", args: tuple = ()):
     """
     print minor_info message
     """
+    _log(FlogLevel.MINORINFO, message, class_instance, message_category, args)
 
-    message = str(message)
-
-    class_name, class_flog_config_key = get_class_name_config_key_pair(class_instance)
-    cls_min_log_level = get_cls_loglevel(class_flog_config_key)
-
-    if cls_min_log_level <= FlogLevel.MINORINFO.value:
-        flog(message, class_name, message_category=message_category)
 
-
-@wrap_add_class_name
-def debug(message="", class_instance: object = EmptyClass(), message_category="*"):
+def debug(message="", class_instance: object = None, message_category="*", args: tuple = ()):
     """
     print debug message
     """
-
-    message = str(message)
-
-    class_name, class_flog_config_key = get_class_name_config_key_pair(class_instance)
-    cls_min_log_level = get_cls_loglevel(class_flog_config_key)
-
-    if cls_min_log_level <= FlogLevel.DEBUG.value:
-        flog(message, class_name, message_category=message_category)
+    _log(FlogLevel.DEBUG, message, class_instance, message_category, args)
 
 
 def flog(message: str, class_name: str, color: LogColor = LogColor.COLOROFF, message_category="*"):
@@ -289,7 +469,7 @@ def flog(message: str, class_name: str, color: LogColor = LogColor.COLOROFF, mes
             
         colored_message = augment_message(message, color, header)
         if message_category in MESSAGE_CATEGORIES:
-            print(colored_message, file=OUTPUT)
+            OUTPUT.write(colored_message + "\n")
 
 
 if __name__ == '__main__':
@@ -1,46 +1,257 @@
-import pandas as pd
+"""
+Inference of column data types of input DataFrames (loaded files, database selects).
+
+Every column is decided on a sample of its non-null values (evenly spaced, at most sample_size values)
+and only columns whose sample looks convertible are converted as a whole - with one vectorized pass
+(pd.to_numeric / pd.to_datetime), accepted only when it doesn't turn any value into a null. Columns
+which already have a suitable dtype (e.g. floats or datetimes) are not touched apart from the casts
+below, so wide frames of already typed data are cheap to validate.
+
+Kinds of columns:
+    - "integer" - numbers (or numeric strings, possibly with spaces as thousands separators) without
+      a fractional part, nullable Int64 (integers with nulls would be floats in numpy dtypes)
+    - "float" - other numbers, nullable Float64
+    - "datetime" - columns with "date" in their name holding dates, formatted as '%Y-%m-%d' strings
+    - "categorical" - text with few unique values (only when categorical_max_unique_ratio is given)
+    - "text" - other values, "None" strings are replaced by nulls
+    - "empty" - columns with no values, object dtype
+    - "unchanged" - booleans, datetimes and other columns left as they are
+
+With dtype_backend="pyarrow" integers, floats and texts get Arrow-backed dtypes. Numeric strings are
+matched and parsed with pyarrow compute functions in either case.
+"""
+
+import warnings
+from collections.abc import Hashable
+from typing import Literal, Optional
+
 import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
 import forloop_modules.flog as flog
 
+ColumnKind = Literal["integer", "float", "datetime", "categorical", "text", "empty", "unchanged"]
+DtypeBackend = Literal["numpy_nullable", "pyarrow"]
+
+DEFAULT_SAMPLE_SIZE = 10_000
+
+NUMBER_WITH_SPACES_PATTERN = r"^ *[-]?[0-9][0-9 ]*([,.][0-9]+)*$"
+NULL_STRINGS = ["None"]
+
+_INT64_LIMIT = 2 ** 63
+
+
+def _get_dtype(kind: ColumnKind, dtype_backend: DtypeBackend):
+    if dtype_backend == "pyarrow":
+        arrow_types = {"integer": pa.int64(), "float": pa.float64(), "text": pa.string(), "datetime": pa.string()}
+        return pd.ArrowDtype(arrow_types[kind])
+    elif dtype_backend == "numpy_nullable":
+        return {"integer": "Int64", "float": "Float64", "text": object, "datetime": object}[kind]
+    raise ValueError(f"Unknown dtype backend '{dtype_backend}', choose from 'numpy_nullable', 'pyarrow'")
+
+
+def sample_values(series: pd.Series, sample_size: int = DEFAULT_SAMPLE_SIZE) -> pd.Series:
+    """At most sample_size values of the series, evenly spaced so that sorted or grouped data is covered."""
+    if len(series) <= sample_size:
+        return series
+    positions = np.linspace(0, len(series) - 1, num=sample_size, dtype=np.int64)
+    return series.iloc[positions]
+
+
+def _is_text_column(series: pd.Series) -> bool:
+    # object columns, and str columns of pandas 3 (and StringDtype columns)
+    return series.dtype == object or pd.api.types.is_string_dtype(series.dtype)
+
+
+def _parse_numeric_strings(texts: pd.Series) -> Optional[pd.Series]:
+    """Numbers of the strings (possibly with spaces as thousands separators), None if any isn't a number."""
+    array = pa.array(texts.to_numpy(dtype=object), type=pa.string())
+    if pc.all(pc.match_substring_regex(array, NUMBER_WITH_SPACES_PATTERN)).as_py():
+        array = pc.replace_substring(array, " ", "")
+        for arrow_type in (pa.int64(), pa.float64()):
+            try:
+                return pd.Series(pc.cast(array, arrow_type).to_numpy(), index=texts.index)
+            except pa.ArrowInvalid:  # e.g. "1,5", or out of the range of int64
+                continue
+        return None
+
+    # Other formats of pd.to_numeric (e.g. "1e5", "+3"), the first value rejects most text columns cheaply
+    try:
+        float(texts.iloc[0])
+    except ValueError:
+        return None
+    numbers = pd.to_numeric(texts, errors="coerce")
+    return None if numbers.isna().any() else numbers
+
+
+def _to_numeric(values: pd.Series) -> Optional[pd.Series]:
+    """Numeric values of a column without nulls, None if any value isn't a number."""
+    inferred_type = pd.api.types.infer_dtype(values, skipna=True)
+    if inferred_type == "string":
+        return _parse_numeric_strings(values)
+    elif inferred_type in ("integer", "floating", "mixed-integer-float", "decimal"):
+        return pd.to_numeric(values)
+    elif inferred_type not in ("mixed", "mixed-integer"):  # Booleans, bytes, dates, ...
+        return None
+
+    is_string = values.map(lambda value: isinstance(value, str))
+    if values[~is_string].map(type).eq(bool).any():  # to_numeric would turn booleans to 0/1
+        return None
+    try:
+        numbers = pd.to_numeric(values[~is_string], errors="coerce").astype(np.float64)
+    except TypeError:  # Lists, dicts, ...
+        return None
+    if is_string.any():
+        string_numbers = _parse_numeric_strings(values[is_string])
+        if string_numbers is None:
+            return None
+        numbers = pd.concat([numbers, string_numbers.astype(np.float64)]).reindex(values.index)
+    return None if numbers.isna().any() else numbers
+
+
+def _is_integral(numbers: pd.Series) -> bool:
+    if numbers.dtype.kind in "iu":
+        return True
+    values = numbers.to_numpy(dtype=np.float64, na_value=np.nan)
+    values = values[~np.isnan(values)]
+    return bool(np.all(np.isfinite(values)) and np.all(values == np.trunc(values)) and np.all(np.abs(values) < _INT64_LIMIT))
+
+
+def _to_datetime(values: pd.Series) -> Optional[pd.Series]:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # Format inference falling back to dateutil
+        datetimes = pd.to_datetime(values, errors="coerce")
+    return None if datetimes.isna().any() else datetimes
+
+
+def _format_dates(datetimes: pd.Series, dtype_backend: DtypeBackend) -> pd.Series:
+    """Dates as '%Y-%m-%d' strings, each distinct date is formatted once."""
+    codes, dates = pd.factorize(datetimes.dt.normalize())
+    # NaT has code -1, which selects the appended null
+    formatted_dates = np.append(dates.strftime("%Y-%m-%d").to_numpy(dtype=object), np.nan)[codes]
+    return pd.Series(formatted_dates, index=datetimes.index, name=datetimes.name).astype(_get_dtype("datetime", dtype_backend))
+
+
+def _to_kind(values: pd.Series, length: int, kind: ColumnKind, dtype_backend: DtypeBackend) -> pd.Series:
+    """Series of the length (with a RangeIndex) with the values converted to the kind's dtype, other rows null."""
+    return values.astype(_get_dtype(kind, dtype_backend)).reindex(pd.RangeIndex(length))
+
+
+def infer_column(
+    series: pd.Series,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    dtype_backend: DtypeBackend = "numpy_nullable",
+    categorical_max_unique_ratio: Optional[float] = None,
+) -> tuple[ColumnKind, Optional[pd.Series]]:
+    """
+    Infer the kind of the column (see module docstring) and convert it.
+
+    :param sample_size: Maximum number of values the kind is decided on before converting the whole column
+    :type sample_size: int
+    :param dtype_backend: "numpy_nullable" (Int64, Float64, object) or "pyarrow" (Arrow-backed dtypes)
+    :type dtype_backend: str
+    :param categorical_max_unique_ratio: Text columns with at most this ratio of unique values to values
+        become categorical, None to keep texts as they are
+    :type categorical_max_unique_ratio: Optional[float]
+    :return: Kind of the column and the converted column, None if the column was left as it is
+    :rtype: tuple[ColumnKind, Optional[pd.Series]]
+    """
+    is_date_column = "date" in str(series.name)
+    is_text = _is_text_column(series)
+
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return "unchanged", None
+    elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+        if not is_date_column:
+            return "unchanged", None
+        return "datetime", _format_dates(series, dtype_backend)
+    elif pd.api.types.is_numeric_dtype(series.dtype):
+        if series.isna().all():
+            return "empty", series.astype(object)
+        kind = "integer" if _is_integral(series) else "float"
+        dtype = _get_dtype(kind, dtype_backend)
+        return kind, series.astype(dtype) if series.dtype != dtype else None
+    elif not is_text:
+        return "unchanged", None
+
+    # Converted values are aligned by positions, the index may have duplicates
+    index = series.index
+    series = series.reset_index(drop=True)
+    null_string_mask = series.isin(NULL_STRINGS)
+    null_mask = series.isna() | null_string_mask
+    values = series[~null_mask]
+    if values.empty:
+        return "empty", pd.Series(None, index=index, dtype=object)
+
+    sample = sample_values(values, sample_size)
+    if _to_numeric(sample) is not None:
+        numbers = _to_numeric(values)
+        if numbers is not None:
+            kind = "integer" if _is_integral(numbers) else "float"
+            return kind, _to_kind(numbers, len(series), kind, dtype_backend).set_axis(index)
+
+    if is_date_column and _to_datetime(sample) is not None:
+        datetimes = _to_datetime(values)
+        if datetimes is not None:
+            return "datetime", _format_dates(datetimes.reindex(series.index), dtype_backend).set_axis(index)
+
+    if categorical_max_unique_ratio is not None:
+        max_unique_ratio = categorical_max_unique_ratio
+        if sample.nunique() <= max_unique_ratio * len(sample) and values.nunique() <= max_unique_ratio * len(values):
+            return "categorical", series.mask(null_mask).astype("category").set_axis(index)
+
+    if dtype_backend == "pyarrow" and pd.api.types.infer_dtype(values, skipna=True) == "string":
+        return "text", _to_kind(values.astype(str), len(series), "text", dtype_backend).set_axis(index)
+    elif null_string_mask.any() or (series.dtype == object and null_mask.any()):
+        return "text", series.mask(null_mask, pd.NA).set_axis(index)
+    return "text", None
+
+
+def infer_and_convert_dtypes(
+    df: pd.DataFrame,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    dtype_backend: DtypeBackend = "numpy_nullable",
+    categorical_max_unique_ratio: Optional[float] = None,
+) -> tuple[pd.DataFrame, dict[Hashable, ColumnKind]]:
+    """
+    Infer and convert dtypes of all columns (see infer_column for the parameters), the input DataFrame
+    is not modified. Columns failing the conversion are left as they are.
+
+    :return: DataFrame with converted columns, kinds of the columns
+    :rtype: tuple[pd.DataFrame, dict[Hashable, ColumnKind]]
+    """
+    converted_columns, column_kinds = {}, {}
+    for position, (column_name, series) in enumerate(df.items()):
+        try:
+            kind, converted_series = infer_column(series, sample_size, dtype_backend, categorical_max_unique_ratio)
+        except Exception as e:
+            flog.warning(f"Data type inference of column {column_name} failed: {e}")
+            kind, converted_series = "unchanged", None
+
+        column_kinds[column_name] = kind
+        if converted_series is not None:
+            converted_columns[position] = converted_series
+
+    flog.debug(lambda: f"Inferred column kinds: {column_kinds}")
+    if not converted_columns:
+        return df, column_kinds
+
+    df = df.copy(deep=False)
+    for position, converted_series in converted_columns.items():
+        df.isetitem(position, converted_series)
+    return df, column_kinds
 
 
 def validate_input_data_types(df):
     """
-    Validate numerical dataframe columns
-    If any column has zero decimal number sum it can be retyped to integer columns
-    (By default pandas treats integers with Nones as floats
+    Validate data types of dataframe columns - numeric columns (and numeric strings) are retyped to nullable
+    integers if they have no decimal part (by default pandas treats integers with Nones as floats), date
+    columns are formatted as '%Y-%m-%d' strings and empty columns cast to object (see infer_and_convert_dtypes)
     """
     try:
-        df = df.replace({np.nan: pd.NA, "None": pd.NA})
-
-        # this has to be done twice as replacing nans casts columns to objects and integers than fail on .str accessor
-        df = df.apply(pd.to_numeric, errors='ignore').convert_dtypes(convert_string=False,
-                                                                     convert_boolean=False)
-
-        # remove spaces from cells with numbers and spaces only
-        object_columns = df.select_dtypes(include=object).columns
-        for object_column in object_columns:
-            # without astype(str) condition ignores cells which are of integer type
-            if df[object_column].astype(str).str.match(r"^ *[-]?[0-9][0-9 ]*([,.][0-9]+)*$").sum() == (~df[object_column].isna()).sum():
-                df[object_column] = df[object_column].replace({" ": ""}, regex=True)
-
-        df[object_columns] = df[object_columns].apply(pd.to_numeric, errors='ignore').convert_dtypes(convert_string=False,
-                                                                     convert_boolean=False)
-
-        # may be redundant with the next rows
-        columns_containing_date = df.columns[df.columns.str.contains("date")]
-        ## VVVV Messed up date format in dataframe explorer on desktop app VVVV
-        df[columns_containing_date] = df[columns_containing_date].apply(lambda x: pd.to_datetime(x, errors='ignore', infer_datetime_format=True))
-
-        # After conversion attempt, format each date column individually to ISO string
-        for col in columns_containing_date:
-            if pd.api.types.is_datetime64_any_dtype(df[col]):
-                df[col] = df[col].dt.strftime('%Y-%m-%d')
-        ## ^^^^ Messed up date format in dataframe explorer on desktop app ^^^^
-
-        # cast empty columns to object
-        empty_columns = df.columns[df.isna().mean() == 1.]
-        df[empty_columns] = df[empty_columns].astype(object)
+        df, _ = infer_and_convert_dtypes(df)
     except Exception as e:
         flog.error(message=f"input dtype validation crashed with {e}")
 
@@ -218,7 +218,7 @@ class DropColumnHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, column_name: List[str], new_var_name: str):
         flog.debug("APPLY DROP COLUMN")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMNS = {column_name}")
         flog.debug(f"NEW VAR = {new_var_name}")
 
@@ -322,7 +322,7 @@ class SelectColumnsHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, column_names: list, new_var_name: str):
         flog.debug("APPLY SELECT COLUMNS")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMNS = {column_names}")
         flog.debug(f"NEW VAR = {new_var_name}")
 
@@ -432,7 +432,7 @@ class ConstantColumnHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, value, new_colname: str, new_var_name: str):
         flog.debug("APPLY ADD CONSTANT COLUMN")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"VALUE = {value}")
         flog.debug(f"COLUMN = {new_colname}")
         flog.debug(f"NEW VAR = {new_var_name}")
@@ -557,7 +557,7 @@ class RenameColumnHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, old_col_name: List[str], new_col_name: str, new_var_name: str):
         flog.debug("APPLY RENAME COLUMN")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"OLD COLUMN = {old_col_name}")
         flog.debug(f"NEW COLUMN = {new_col_name}")
         flog.debug(f"NEW VAR = {new_var_name}")
@@ -700,7 +700,7 @@ class CastColumnTypeHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, col_name: List[str], new_col_type: str, new_var_name: str):
         flog.debug("APPLY CAST COLUMN TYPE")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMN = {col_name}")
         flog.debug(f"NEW COLUMN TYPE = {new_col_type}")
         flog.debug(f"NEW VAR = {new_var_name}")
@@ -950,7 +950,7 @@ class RemoveEmptyRowsHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, mode: str, id_columns: List[str], new_var_name: str):
         flog.debug("APPLY REMOVE EMPTY ROWS")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"MODE = {mode}")
         flog.debug(f"ID COLUMNS = {id_columns}")
         flog.debug(f"NEW VAR = {new_var_name}")
@@ -1078,7 +1078,7 @@ class RemoveDuplicatesHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry, subset: List[str], keep, new_var_name):
         flog.debug("APPLY REMOVE DUPLICATES")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"MODE = {subset}")
         flog.debug(f"ID COLUMNS = {keep}")
         flog.debug(f"NEW VAR = {new_var_name}")
@@ -1283,7 +1283,7 @@ class ReplaceHandler(AbstractFunctionHandler):
     def debug(self, df_entry: pd.DataFrame, search_cols, match: str, replace_substring, pattern: str, replacement: str,
               new_var_name: str):
         flog.debug("APPLY REPLACE")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"SEARCH COLUMNS = {search_cols}")
         flog.debug(f"MATCH = {match}")
         flog.debug(f"REPLACE SUBSTRING = {replace_substring}")
@@ -1332,7 +1332,7 @@ class StripColumnHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, column_name: List[str], strip_mode: str, specific_characters: str, new_var_name: str):
         flog.debug("APPLY DROP COLUMN")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMNS = {column_name}")
         flog.debug(f"STRIP MODE = {strip_mode}")
         flog.debug(f"SPECIFIC CHARACTERS = {specific_characters}")
@@ -1469,7 +1469,7 @@ class SearchHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, search_cols, match: str, pattern: str, new_var_name: str):
         flog.debug("APPLY Search")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"SEARCH COLUMNS = {search_cols}")
         flog.debug(f"MATCH = {match}")
         flog.debug(f"PATTERN = {pattern}")
@@ -1609,7 +1609,7 @@ class SortHandler(AbstractFunctionHandler):
     def debug(self, df_entry: pd.DataFrame, col_name1: List[str], ascending1: str,
               col_name2: List[str], ascending2: str, new_var_name: str):
         flog.debug("APPLY SORT")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMNS NAME 1 = {col_name1}")
         flog.debug(f"ASCENDING 1 = {ascending1}")
         flog.debug(f"COLUMNS NAME 2 = {col_name2}")
@@ -1745,7 +1745,7 @@ class ColumnWiseShiftHandler(AbstractFunctionHandler):
     def debug(self, df_entry: pd.DataFrame, complete_col: str, incomplete_col: str, mode: str,
               new_var_name: str):
         flog.debug("APPLY COLUMN WISE SHIFT")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COMPLETE COLUMN NAME = {complete_col}")
         flog.debug(f"INCOMPLETE COLUMN NAME = {incomplete_col}")
         flog.debug(f"MODE = {mode}")
@@ -1844,8 +1844,8 @@ class DifferenceDataHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, right_df: pd.DataFrame, new_var_name: str):
         flog.debug("Find Difference in Data")
-        flog.debug(f"DF = {df_entry.head()}")
-        flog.debug(f"RIGHT DF NAME = {right_df.head()}")
+        flog.debug(lambda: f"DF = {df_entry.head()}")
+        flog.debug(lambda: f"RIGHT DF NAME = {right_df.head()}")
         flog.debug(f"NEW VAR = {new_var_name}")
 
     def direct_execute(self, df_entry: pd.DataFrame, df_entry2: pd.DataFrame, new_var_name: str):
@@ -1973,7 +1973,7 @@ class OutliersHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, mode: str, columns, top_n, ratio, new_var_name: str):
         flog.debug("APPLY OUTLIERS")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"MODE = {mode}")
         flog.debug(f"COLUMNS = {columns}")
         flog.debug(f"TOP_N = {top_n}")
@@ -2035,7 +2035,7 @@ class OutliersHandler(AbstractFunctionHandler):
         data = KNNImputation().fit_transform(inp("df_entry"), inp("columns"), return_valid_only=True)
 
         flog.debug(f"outliers")
-        flog.debug(f"filled df: {data}")
+        flog.debug(lambda: f"filled df: {data}")
 
         outliers = detect_numeric_outliers(data, cols=inp("columns"), top_n=inp("top_n"), top_n_percent=inp("ratio"),
                                            tree_size=min(128, int(inp("df_entry").shape[0] / 5)))
@@ -2146,7 +2146,7 @@ class FilterHandler(AbstractFunctionHandler):
     def debug(self, df_entry: pd.DataFrame, column_name: List[str], filtered_str: str, matched_or_others: str,
               new_var_name: str):
         flog.debug("APPLY FILTER")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMN NAME = {column_name}")
         flog.debug(f"FILTERED STR = {filtered_str}")
         flog.debug(f"MATCHED OR OTHERS = {matched_or_others}")
@@ -2281,7 +2281,7 @@ class ConcatHandler(AbstractFunctionHandler):
     def debug(self, df_entry, df_entry2, axis: int, join: str, new_var_name: str):
         flog.debug("APPLY CONCAT")
         for i, df_entry in enumerate([df_entry, df_entry2]):
-            flog.debug(f"DF{i} = {df_entry}")
+            flog.debug(lambda: f"DF{i} = {df_entry}")
         flog.debug(f"AXIS = {axis}")
         flog.debug(f"JOIN = {join}")
         flog.debug(f"NEW VAR = {new_var_name}")
@@ -2395,8 +2395,8 @@ class JoinHandler(AbstractFunctionHandler):
     def debug(self, df_entry1: Union[str, pd.DataFrame], df_entry2: Union[str, pd.DataFrame],
               on: Optional[str], how: str, new_var_name: str):
         flog.debug("APPLY DF JOIN")
-        flog.debug(f"DF1 = {df_entry1}")
-        flog.debug(f"DF2 = {df_entry2}")
+        flog.debug(lambda: f"DF1 = {df_entry1}")
+        flog.debug(lambda: f"DF2 = {df_entry2}")
         flog.debug(f"ON = {on}")
         flog.debug(f"HOW = {how}")
         flog.debug(f"NEW VAR = {new_var_name}")
@@ -2613,7 +2613,7 @@ class SplitColumnHandler(AbstractFunctionHandler):
     def debug(self, df_entry: Union[str, pd.DataFrame], column: str, split_on, select_index, keep_old: bool,
               new_col_name: str, new_var_name: str):
         flog.debug("APPLY DF JOIN")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMN = {column}")
         flog.debug(f"SPLIT ON = {split_on}")
         flog.debug(f"SELECT INDEX = {select_index}")
@@ -2762,7 +2762,7 @@ class ExtractStringHandler(AbstractFunctionHandler):
     def debug(self, df_entry: Union[str, pd.DataFrame], column: str, extract_pattern, keep_old: bool,
               concat_groups: bool, new_col_name: str, new_var_name: str):
         flog.debug("APPLY Extract String")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMN = {column}")
         flog.debug(f"extract_pattern = {extract_pattern}")
         flog.debug(f"KEEP OLD = {keep_old}")
@@ -2904,7 +2904,7 @@ class KNNImputationHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, columns: List[str], new_var_name: str):
         flog.debug("APPLY KNN IMPUTATION")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMNS = {columns}")
         flog.debug(f"NEW VAR = {new_var_name}")
 
@@ -3026,7 +3026,7 @@ class ImputationHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, columns: List[str], imputation: List[str], new_var_name: str):
         flog.debug("APPLY IMPUTATION")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMNS = {columns}")
         flog.debug(f"IMPUTATION CHOICE = {imputation}")
         flog.debug(f"NEW VAR = {new_var_name}")
@@ -3197,7 +3197,7 @@ class AggregateDataHandler(AbstractFunctionHandler):
     def debug(self, df_entry, groupby_columns, aggregate_columns, numerical_aggregations, categorical_aggregations,
               new_var_name):
         flog.debug("Aggregate Grouped DATA")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"GROUPBY COLUMNS = {groupby_columns}")
         flog.debug(f"AGGREGATE COLUMNS = {aggregate_columns}")
         flog.debug(f"NUM AGGREGATIONS = {numerical_aggregations}")
@@ -3399,7 +3399,7 @@ class MathOperationHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry, mode, first_column, second_column: List[str], new_var_name):
         flog.debug('Math Operation')
-        flog.debug(f"DF1 = {df_entry}")
+        flog.debug(lambda: f"DF1 = {df_entry}")
         flog.debug(f"MODE = {mode}")
         flog.debug(f"FIRST COLUMN = {first_column}")
         flog.debug(f"OTHER COLUMNS = {second_column}")
@@ -3528,8 +3528,8 @@ class FindJoinColumnHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry, df_entry2, new_var_name):
         flog.debug('Find Join Column')
-        flog.debug(f"DF1 = {df_entry.head()}")
-        flog.debug(f"DF2 = {df_entry2.head()}")
+        flog.debug(lambda: f"DF1 = {df_entry.head()}")
+        flog.debug(lambda: f"DF2 = {df_entry2.head()}")
         flog.debug(f"NEW VAR = {new_var_name}")
 
     def get_category_columns(self, df_column_categories, data_type):
@@ -3685,10 +3685,10 @@ class RoundToHigherFrequencyHandler(AbstractFunctionHandler):
     def debug(self, df_entry, round_column, lower_freq_col, df_entry2, higher_freq_col: List[str], round_type, new_colname,
               new_var_name):
         flog.debug("APPLY FREQUENCY ROUND")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMN = {round_column}")
         flog.debug(f"INIT FREQ = {lower_freq_col}")
-        flog.debug(f"DF2 = {df_entry2}")
+        flog.debug(lambda: f"DF2 = {df_entry2}")
         flog.debug(f"FINAL FREQ = {higher_freq_col}")
         flog.debug(f"ROUND TYPE = {round_type}")
         flog.debug(f"NEW COL = {new_colname}")
@@ -3792,7 +3792,7 @@ class CategorizeColumnHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, column_name: List[str], separator: List[str], new_var_name: str):
         flog.debug("APPLY categorize COLUMN")
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMNS = {column_name}")
         flog.debug(f"separator = {separator}")
         flog.debug(f"NEW VAR = {new_var_name}")
@@ -4102,7 +4102,7 @@ class CleanDataHandler(AbstractFunctionHandler):
 
     def debug(self, df_entry: pd.DataFrame, new_var_name: str):
         flog.debug("APPLY CLEAN DATA")
-        flog.debug(f"DF = {df_entry.head()}")
+        flog.debug(lambda: f"DF = {df_entry.head()}")
         flog.debug(f"NEW VAR = {new_var_name}")
 
     def get_redundant_words(self, data, column):
@@ -488,7 +488,7 @@ class DfToListHandler(AbstractFunctionHandler):
 
         new_var_name = self.update_node_fields_with_shown_dataframe(node_detail_form, new_var_name)
 
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         flog.debug(f"COLUMNS = {column_names}")
 
         self.direct_execute(df_entry, column_names, new_var_name)
@@ -497,7 +497,7 @@ class DfToListHandler(AbstractFunctionHandler):
         df_entry = params["df_entry"]
         column_names = params["column_name"]
         new_var_name = params["new_var_name"]
-        flog.debug(f"DF = {df_entry}")
+        flog.debug(lambda: f"DF = {df_entry}")
         self.direct_execute(df_entry, column_names, new_var_name)
 
     def direct_execute(self, df_entry, column_name, new_var_name):
@@ -1,8 +1,10 @@
 import ast
 import json
+import re
 import pandas as pd
 import dbhydra.dbhydra_core as dh
 
+from contextlib import contextmanager
 from deepdiff import DeepDiff
 from fastapi import HTTPException
 from typing import Literal, Union, Optional
@@ -11,6 +13,7 @@ from tkinter.filedialog import askopenfile
 import forloop_modules.flog as flog
 import forloop_modules.queries.node_context_requests_backend as ncrb
 import forloop_modules.globals.db_connection as dbc
+from forloop_modules.globals.db_session_manager import DbSession, db_session_manager
 
 from forloop_modules.function_handlers.auxilliary.node_type_categories_manager import ntcm
 from forloop_modules.function_handlers.auxilliary.form_dict_list import FormDictList
@@ -22,6 +25,17 @@ from forloop_modules.function_handlers.auxilliary.docs import Docs
 from forloop_modules.function_handlers.auxilliary.abstract_function_handler import AbstractFunctionHandler
 from forloop_modules.function_handlers.auxilliary.data_types_validation import validate_input_data_types
 from forloop_modules.function_handlers.auxilliary.auxiliary_functions import parse_comboentry_input
+from forloop_modules.utils.db_table_copy import (
+    DEFAULT_COPY_CHUNK_SIZE,
+    DEFAULT_COPY_WORKERS,
+    BulkLoadMethod,
+    TableCopier,
+    TableCopyCheckpoints,
+    get_copy_dialect,
+    get_database_identity,
+)
+from forloop_modules.utils.db_batch_insert import DEFAULT_INSERT_BATCH_SIZE, BatchInsertSummary, insert_df_in_batches
+from forloop_modules.utils.db_select_streaming import DEFAULT_CHUNK_SIZE, select_to_df, select_to_parquet
 from forloop_modules.utils.encryption import decrypt_text, convert_base64_private_key_to_rsa_private_key
 from forloop_modules.redis.redis_connection import kv_redis, create_redis_key_for_project_db_private_key
 from forloop_modules.errors.errors import CriticalPipelineError
@@ -53,8 +67,11 @@ DbOperation = Literal["INSERT", "UPDATE", "DELETE"]
 DBInstance = Union[dh.MysqlDb, dh.SqlServerDb, dh.PostgresDb, dh.XlsxDB, dh.MongoDb, dh.BigQueryDb]
 DbTable = Union[dh.MysqlTable, dh.SqlServerTable, dh.PostgresTable, dh.XlsxTable, dh.MongoTable, dh.BigQueryTable]
 
-def connect_to_db_and_run_operation(operation: DbOperation, db_instance: DBInstance, dbtable: DbTable, **kwargs):
-    with db_instance.connect_to_db():
+def connect_to_db_and_run_operation(
+    operation: DbOperation, db_instance: DBInstance, dbtable: DbTable, db_session: Optional[DbSession] = None, **kwargs
+):
+    """Run the operation over the open connection of db_session if given, otherwise connect to db_instance."""
+    with (db_session or db_instance).connect_to_db():
         try:
             if type(db_instance) is dh.MongoDb:
                 dbtable.update_collection()
@@ -85,6 +102,26 @@ def get_connected_db_tables(db_name: str = None):
         dict: A dictionary where keys are database names and values are dictionaries
         containing valid tables within the respective databases.
     """
+    valid_tables = {}
+    for db in get_connected_dbs(db_name):
+        valid_tables.update(db.table_dict)
+
+    return valid_tables
+
+# Statements after which the cached schema of the database has to be invalidated
+SCHEMA_CHANGING_QUERY_PATTERN = re.compile(r"\b(CREATE|ALTER|DROP|RENAME)\b", re.IGNORECASE)
+
+def is_schema_changing_query(query: str) -> bool:
+    return SCHEMA_CHANGING_QUERY_PATTERN.search(query) is not None
+
+def invalidate_schema_of_db_instance(db_instance) -> None:
+    """Invalidate the cached schema of the connected database the dbhydra instance belongs to."""
+    for db_connection in duh.db_connections:
+        if getattr(db_connection, "db_instance", None) is db_instance:
+            db_connection.invalidate_schema()
+
+def get_connected_dbs(db_name: Optional[str] = None) -> list[dbc.DbConnection]:
+    """Connections (of the database if db_name given) with loaded tables, stale tables are reloaded."""
     if db_name: #this if was not existing in tobias3 branch - There was merge conflict. Tobias, please erase this comment if this is correctly merged
         connected_dbs = []
         for db_connection in duh.db_connections:
@@ -93,16 +130,21 @@ def get_connected_db_tables(db_name: str = None):
     else:
         connected_dbs = [db_connection for db_connection in duh.db_connections if hasattr(db_connection, "table_dict")]
 
-    valid_tables = {}
     for db in connected_dbs:
-        # Safeguard against uninitialized or failed connections
-        if db.table_dict is not None:
-            valid_tables.update(db.table_dict)
+        if db.is_schema_stale():
+            db.get_table_dict_and_fk()
 
-    return valid_tables
+    # Safeguard against uninitialized or failed connections
+    return [db for db in connected_dbs if db.table_dict is not None]
 
 def get_name_matching_db_tables(dbtable_name: str, db_name: Optional[str] = None):
-    matching_dbtables = [db_table for name, db_table in get_connected_db_tables(db_name).items() if name == dbtable_name]
+    # Direct lookups in table dicts - same named tables of later connections shadow the earlier ones
+    # as in get_connected_db_tables
+    matching_dbtables = []
+    for db in get_connected_dbs(db_name):
+        db_table = db.get_db_table(dbtable_name)
+        if db_table is not None:
+            matching_dbtables = [db_table]
 
     return matching_dbtables
 
@@ -319,6 +361,8 @@ class DBQueryHandler(AbstractFunctionHandler):
                         dbtable.db1.execute(query)
                     except Exception as e:
                         flog.error(f"DBTABLE EXECUTE ERROR {e}")
+                    if is_schema_changing_query(query):
+                        invalidate_schema_of_db_instance(db_instance)
                         
 class MySQLQueryHandler(AbstractFunctionHandler):
     def __init__(self):
@@ -386,6 +430,8 @@ class MySQLQueryHandler(AbstractFunctionHandler):
             if is_connected:
                 with db_connection.db_instance.connect_to_db():
                     db_connection.db_instance.execute(query=query)
+                if is_schema_changing_query(query):
+                    db_connection.invalidate_schema()
 
 class DBSelectHandler(AbstractFunctionHandler):
     """
@@ -523,7 +569,15 @@ class DBSelectHandler(AbstractFunctionHandler):
         # else:
         #     raise HTTPException(status_code=response.status_code, detail="Error requesting new node from api")
         
-    def direct_execute(self, db_name, db_table_name, select, where_column_name, where_operator, where_value, limit, new_var_name):  
+    def direct_execute(self, db_name, db_table_name, select, where_column_name, where_operator, where_value, limit, new_var_name,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE, spill_to_file: Optional[str] = None):
+        """
+        :param chunk_size: Number of rows fetched from the database at once
+        :type chunk_size: int
+        :param spill_to_file: Path of a Parquet file the result is streamed into instead of a DataFrame in memory,
+            the new variable then contains the path
+        :type spill_to_file: Optional[str]
+        """
         # Parse all combo-entry inputs to handle values from pipeline runs
         db_name = parse_comboentry_input(db_name)
         db_table_name = parse_comboentry_input(db_table_name)
@@ -548,56 +602,37 @@ class DBSelectHandler(AbstractFunctionHandler):
             # User selects from stored DBs so this shouldn't happen. If this is raised, these is an issue in code probably.
             raise Exception(f'{self.icon_type}: No DB named {db_name} found in project DBs.')
         
-        redis_key = create_redis_key_for_project_db_private_key(project_uid=aet.project_uid)
-        private_key_base64 = kv_redis.get(redis_key)
-        
-        if private_key_base64 is not None:
-            private_key = convert_base64_private_key_to_rsa_private_key(private_key_base64=private_key_base64)
-            
-            encrypted_password = db_dict["password"]
-            decrypted_password = decrypt_text(text=encrypted_password, private_key=private_key)
-            
-            db_dict["password"] = decrypted_password
-            
-            db_details = dbc.create_db_details_from_database_dict(db_dict=db_dict)
-            db_connection = dbc.DbConnection(db_details=db_details)
-            # Safeguard against uninitialized or failed connections
-            try:
-                is_connected = db_connection.test_database_connection()
-            except Exception as e:
-                flog.error(f"{self.icon_type}: DB connection failed – {e.__class__.__name__}: {e}")
-                ncrb.new_popup([500, 400], "RaiseNotConnectedPopup")
-                return
-            if not is_connected:
-                ncrb.new_popup([500, 400], "RaiseNotConnectedPopup")
+        try:
+            db_session = db_session_manager.acquire(db_dict)
+        except Exception as e:
+            flog.error(f"{self.icon_type}: DB connection failed – {e.__class__.__name__}: {e}")
+            ncrb.new_popup([500, 400], "RaiseNotConnectedPopup")
+            return
+
+        try:
+            db_table = db_session.get_db_table(db_table_name)
+            if db_table is None:
                 return
-        
-            if is_connected:
-                db_table = db_connection.get_db_table(db_table_name)
-                if db_table is None:
-                    return
-                
-                df_new = self._get_df(select, db_table_name, db_connection.db_instance, db_table, where_column_name, where_operator,
-                                        where_value, limit)
-                df_new = validate_input_data_types(df_new)
-                variable_handler.new_variable(new_var_name, df_new)
 
-    def select(self, db_instance, dbtable, query, cols_to_be_selected):
-        if type(db_instance) is dh.MongoDb:
-            dbtable.update_collection()
-            resp = dbtable.select(query, cols_to_be_selected)
-            resp_df = pd.DataFrame(list(resp))
-            resp_df_without_id_column = resp_df.drop(columns=['_id'])
-            return resp_df_without_id_column
-        elif type(db_instance) is dh.BigQueryDb:
-            rows = dbtable.select(query)
-            df_new = rows.to_dataframe()
-            return df_new
-        else:
-            # TODO: PROBABLY RETURNS ID COLUMNS AS WELL
-            rows = dbtable.select(query)
-            df_new = pd.DataFrame(rows, columns=dbtable.columns)
-            return df_new
+            if spill_to_file:
+                self._spill_to_file(select, db_table_name, db_session, db_table, where_column_name, where_operator,
+                                    where_value, limit, spill_to_file, chunk_size)
+            else:
+                df_new = self._get_df(select, db_table_name, db_session, db_table, where_column_name, where_operator,
+                                      where_value, limit, chunk_size)
+        finally:
+            db_session_manager.release(db_session)
+
+        if spill_to_file:
+            variable_handler.new_variable(new_var_name, spill_to_file)
+            return
+
+        df_new = validate_input_data_types(df_new)
+        variable_handler.new_variable(new_var_name, df_new)
+
+    def select(self, db_instance, dbtable, query, cols_to_be_selected, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        # TODO: PROBABLY RETURNS ID COLUMNS AS WELL
+        return select_to_df(db_instance, dbtable, query, chunk_size=chunk_size, columns=cols_to_be_selected)
 
     def _get_query(self, db_instance, dbtable_name, cols_to_be_selected, column_name, value, operator, limit):
         value = parse_float_db(db_instance, value)
@@ -611,7 +646,7 @@ class DBSelectHandler(AbstractFunctionHandler):
 
         return query
 
-    def _get_df(self, select, from_table, db, db_table, where_column_name, where_operator, where_value, limit):
+    def _build_query(self, select, from_table, where_column_name, where_operator, where_value, limit):
         query = f"SELECT {select} FROM {from_table}"
 
         if where_column_name and where_operator and where_value:
@@ -619,15 +654,28 @@ class DBSelectHandler(AbstractFunctionHandler):
         
         if limit:
             query += f" LIMIT {limit}"
-            
+
+        return query
+
+    def _get_df(self, select, from_table, db, db_table, where_column_name, where_operator, where_value, limit,
+                chunk_size: int = DEFAULT_CHUNK_SIZE):
+        query = self._build_query(select, from_table, where_column_name, where_operator, where_value, limit)
+
         with db.connect_to_db():
-            rows = db_table.select(query)
-            ## Prevents reordering of columns in the dataframe viewer in the gui
-            columns = [desc[0] for desc in db_table.db1.cursor.description]
-            df_new = pd.DataFrame(rows, columns=columns)
+            # Rows are fetched in chunks by a server-side cursor, columns keep the order of the query
+            df_new = select_to_df(db_table.db1, db_table, query, chunk_size=chunk_size)
 
         return df_new
 
+    def _spill_to_file(self, select, from_table, db, db_table, where_column_name, where_operator, where_value, limit,
+                       path, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        query = self._build_query(select, from_table, where_column_name, where_operator, where_value, limit)
+
+        with db.connect_to_db():
+            stats = select_to_parquet(db_table.db1, db_table, query, path, chunk_size=chunk_size)
+
+        return stats
+
     # def _get_mongo_df(self, db_instance, dbtable, column_name, operator, value, limit):
     #
     #     condition = get_condition_mongo(column_name, value, operator)
@@ -726,7 +774,16 @@ class DBInsertHandler(AbstractFunctionHandler):
 
         self.direct_execute(db_name, db_table_name, inserted_dataframe)
         
-    def direct_execute(self, db_name, db_table_name, inserted_dataframe):
+    def direct_execute(self, db_name, db_table_name, inserted_dataframe, batch_size: int = DEFAULT_INSERT_BATCH_SIZE,
+                       upsert_columns: Optional[list[str]] = None) -> Optional[BatchInsertSummary]:
+        """
+        :param batch_size: Number of rows inserted (and committed) at once into SQL databases
+        :type batch_size: int
+        :param upsert_columns: Unique key columns of the table, rows with an existing key are updated instead
+        :type upsert_columns: Optional[list[str]]
+        :return: Summary of written and failed rows of SQL databases
+        :rtype: Optional[BatchInsertSummary]
+        """
         project_databases = ncrb.get_all_databases_by_project_uid()
         db_dict = filter_database_by_name_from_all_project_databases(project_databases=project_databases, db_name=db_name)
         
@@ -734,45 +791,48 @@ class DBInsertHandler(AbstractFunctionHandler):
             # User selects from stored DBs so this shouldn't happen. If this is raised, these is an issue in code probably.
             raise Exception(f'{self.icon_type}: No DB named {db_name} found in project DBs.')
         
-        redis_key = create_redis_key_for_project_db_private_key(project_uid=aet.project_uid)
-        private_key_base64 = kv_redis.get(redis_key)
-        
-        if private_key_base64 is not None:
-            private_key = convert_base64_private_key_to_rsa_private_key(private_key_base64=private_key_base64)
-            
-            encrypted_password = db_dict["password"]
-            decrypted_password = decrypt_text(text=encrypted_password, private_key=private_key)
-            
-            db_dict["password"] = decrypted_password
-            
-            db_details = dbc.create_db_details_from_database_dict(db_dict=db_dict)
-            db_connection = dbc.DbConnection(db_details=db_details)
-            # Safeguard against uninitialized or failed connections
-            try:
-                is_connected = db_connection.test_database_connection()
-            except Exception as e:
-                flog.error(f"{self.icon_type}: DB connection failed – {e.__class__.__name__}: {e}")
-                ncrb.new_popup([500, 400], "RaiseNotConnectedPopup")
-                return
-            if not is_connected:
-                ncrb.new_popup([500, 400], "RaiseNotConnectedPopup")
+        try:
+            db_session = db_session_manager.acquire(db_dict)
+        except Exception as e:
+            flog.error(f"{self.icon_type}: DB connection failed – {e.__class__.__name__}: {e}")
+            ncrb.new_popup([500, 400], "RaiseNotConnectedPopup")
+            return
+
+        try:
+            db_table = db_session.get_db_table(db_table_name)
+            if db_table is None:
                 return
-        
-            if is_connected:
-                db_instance = db_connection.db_instance
-                db_table = db_connection.get_db_table(db_table_name)
-                if db_table is None:
-                    return
-                
-                columns = None if isinstance(db_table, dh.MongoTable) else db_table.columns
 
-                try:
-                    inserted_dataframe = self._convert_data_variable_to_df(inserted_dataframe, columns)
-                except ValueError:
-                    flog.error('Wrong number of columns', self)
-                    return
+            columns = None if isinstance(db_table, dh.MongoTable) else db_table.columns
 
-                connect_to_db_and_run_operation("INSERT", db_instance, db_table, inserted_dataframe=inserted_dataframe)
+            try:
+                inserted_dataframe = self._convert_data_variable_to_df(inserted_dataframe, columns)
+            except ValueError:
+                flog.error('Wrong number of columns', self)
+                return
+
+            if isinstance(db_session.db_instance, (dh.MongoDb, dh.BigQueryDb, dh.XlsxDb)):
+                connect_to_db_and_run_operation(
+                    "INSERT", db_session.db_instance, db_table, db_session=db_session, inserted_dataframe=inserted_dataframe
+                )
+                return None
+
+            unknown_columns = set(inserted_dataframe.columns) - set(db_table.columns)
+            if unknown_columns:
+                flog.error(f"Columns {', '.join(map(str, unknown_columns))} not found in table {db_table_name}", self)
+                return None
+
+            with db_session.connect_to_db():
+                summary = insert_df_in_batches(
+                    db_session.db_instance.connection, get_copy_dialect(db_session.dialect), db_table.name,
+                    inserted_dataframe, batch_size=batch_size, conflict_columns=upsert_columns
+                )
+        finally:
+            db_session_manager.release(db_session)
+
+        if summary.rows_failed:
+            flog.error(f"{self.icon_type}: {summary.rows_failed} rows not inserted - {'; '.join(summary.errors)}", self)
+        return summary
 
             # TEMPORARY DISABLED
             # var_name = f"{dbtable.db_connection.database}.{dbtable.name}"
@@ -1257,6 +1317,7 @@ class CreateDbTableHandler(AbstractFunctionHandler):
                     
                 with db_connection.db_instance.connect_to_db():
                     table.create()
+                db_connection.invalidate_schema()
 
 class AnalyzeDbTableHandler(AbstractFunctionHandler):
     def __init__(self):
@@ -1428,6 +1489,7 @@ class RunMigrationFileHandler(AbstractFunctionHandler):
             db_instance.migrator.migrate_from_json(migration_list)
 
         db_instance.close_connection()
+        db_connection.invalidate_schema()
 
 class CopyDbStructureHandler(AbstractFunctionHandler):
     def __init__(self):
@@ -1547,8 +1609,19 @@ class CopyDbDataHandler(AbstractFunctionHandler):
 
         self.direct_execute(db_name_origin, db_name_destination, migration_name, save_to_file)
 
-    def direct_execute(self, db_name_origin, db_name_destination, migration_name="migration-1", save_to_file=False):
-
+    def direct_execute(self, db_name_origin, db_name_destination, migration_name="migration-1", save_to_file=False,
+                       chunk_size: int = DEFAULT_COPY_CHUNK_SIZE, max_workers: int = DEFAULT_COPY_WORKERS,
+                       bulk_load: BulkLoadMethod = "auto"):
+        """
+        :param migration_name: Name of the copy's checkpoints, a failed copy is resumed by running it again with the same name and databases
+        :type migration_name: str
+        :param chunk_size: Number of rows read and written at once
+        :type chunk_size: int
+        :param max_workers: Number of tables copied in parallel
+        :type max_workers: int
+        :param bulk_load: Write path of the destination database, see TableCopier
+        :type bulk_load: BulkLoadMethod
+        """
         db_connection_origin = duh.get_selected_db_connection(db_name_origin)
         db_connection_origin.test_database_connection()
 
@@ -1559,15 +1632,27 @@ class CopyDbDataHandler(AbstractFunctionHandler):
             flog.error("Db connection not found",self)
             return
 
-        with db_connection_origin.db_instance.connect_to_db():
-            with db_connection_destination.db_instance.connect_to_db():
-
-                if isinstance(db_connection_destination.db_instance, dh.MongoDb) or isinstance(db_connection_origin.db_instance, dh.MongoDb):
+        if isinstance(db_connection_destination.db_instance, dh.MongoDb) or isinstance(db_connection_origin.db_instance, dh.MongoDb):
+            with db_connection_origin.db_instance.connect_to_db():
+                with db_connection_destination.db_instance.connect_to_db():
                     self._copy_mongo_data(db_connection_origin, db_connection_destination)
-                else:
-                    self._copy_sql_data(db_connection_origin, db_connection_destination)
+        else:
+            # Every table is copied on its own connections, opened by the TableCopier's workers
+            self._copy_sql_data(db_connection_origin, db_connection_destination, migration_name, chunk_size,
+                                max_workers, bulk_load)
+
+    def _create_connection_factory(self, db_connection):
+        @contextmanager
+        def connect():
+            db_instance = type(db_connection.db_instance)(db_details=db_connection.db_details)
+            with db_instance.connect_to_db():
+                yield db_instance.connection
 
-    def _copy_sql_data(self, db_connection_origin, db_connection_destination):
+        return connect
+
+    def _copy_sql_data(self, db_connection_origin, db_connection_destination, migration_name="migration-1",
+                       chunk_size: int = DEFAULT_COPY_CHUNK_SIZE, max_workers: int = DEFAULT_COPY_WORKERS,
+                       bulk_load: BulkLoadMethod = "auto"):
         origin_tables = set(db_connection_origin.table_dict.keys())
         destination_tables = set(db_connection_destination.table_dict.keys())
 
@@ -1576,6 +1661,7 @@ class CopyDbDataHandler(AbstractFunctionHandler):
             
             return
 
+        tables_to_copy = {}
         for table_name in origin_tables:
             origin_table = db_connection_origin.table_dict[table_name]
             origin_table_structure = dict(zip(origin_table.columns, origin_table.types))
@@ -1588,12 +1674,23 @@ class CopyDbDataHandler(AbstractFunctionHandler):
                 
                 continue
 
-            df_to_copy = origin_table.select_to_df()
-            destination_table.delete()
-
-            #TODO: discuss what to do with duplicate ids (maybe on DUPLICATE KEY UPDATE? )
-
-            destination_table.insert_from_df(df_to_copy, insert_id=True)
+            tables_to_copy[table_name] = list(origin_table.columns)
+
+        #TODO: discuss what to do with duplicate ids (maybe on DUPLICATE KEY UPDATE? )
+        table_copier = TableCopier(
+            self._create_connection_factory(db_connection_origin),
+            self._create_connection_factory(db_connection_destination),
+            get_copy_dialect(db_connection_origin.db_details["DIALECT"]),
+            get_copy_dialect(db_connection_destination.db_details["DIALECT"]),
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            bulk_load=bulk_load,
+            checkpoints=TableCopyCheckpoints(
+                migration_name, storage=kv_redis, origin=get_database_identity(db_connection_origin.db_details),
+                destination=get_database_identity(db_connection_destination.db_details),
+            ),
+        )
+        return table_copier.copy_tables(tables_to_copy)
 
     def _copy_mongo_data(self, db_connection_origin, db_connection_destination):
 
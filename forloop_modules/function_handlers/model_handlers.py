@@ -23,6 +23,9 @@ from forloop_modules.globals.active_entity_tracker import aet
 from forloop_modules.globals.docs_categories import DocsCategories
 from forloop_modules.globals.variable_handler import variable_handler
 from forloop_modules.utils import synchronization_flags as sf
+from forloop_modules.utils.script_environments import ScriptEnvironment, script_environment_cache
+from forloop_modules.utils.script_output_streaming import OutputStreamer
+from forloop_modules.utils.script_worker_pool import get_script_worker_pool, is_worker_pool_supported
 
 
 class LoadPythonScriptHandler(AbstractFunctionHandler):
@@ -125,6 +128,9 @@ class RunPythonScriptHandler(AbstractFunctionHandler):
     """
     DANGER ZONE: This handler is allowed for local use only for now! Don't allow it in production!
     """
+
+    # Lines printed by the input() wrapper of the script, handled instead of being saved to stdout
+    OUTPUT_MARKERS = ("FORLOOP_INPUT_PROMPT:", "FORLOOP_WAITING_FOR_INPUT:")
     
     def __init__(self):
         self.icon_type = "RunPythonScript"
@@ -196,16 +202,6 @@ class RunPythonScriptHandler(AbstractFunctionHandler):
             ## pipeline is finished
             # self._execute_python_script(script_text=script_text)
 
-    def _install_package(self, package_name: str):
-        """Install a package using pip and the current python executable."""
-        subprocess.check_call([sys.executable, "-m", "pip", "install", package_name])
-
-    def _uninstall_package(self, package_name: str):
-        """Uninstall a package using pip and the current python executable."""
-        subprocess.check_call(
-            [sys.executable, "-m", "pip", "uninstall", "-y", package_name]
-        )
-
     def _get_imports_from_script(self, script_text: str):
         """
         Parse the script to extract imported modules.
@@ -247,32 +243,21 @@ class RunPythonScriptHandler(AbstractFunctionHandler):
             }
             return module_name in builtin_modules
 
-    def _is_module_installed(self, module_name: str):
-        """
-        Check if a module is installed by attempting to find its spec.
+    def _handle_output_marker(self, output_mode: Literal["stdout", "stderr"], line: str):
         """
-        try:
-            return importlib.util.find_spec(module_name) is not None
-        except (ValueError, AttributeError):
-            # Handle special cases like __main__ where __spec__ might be None
-            return False
-
-    def _save_output_line_to_result(self, output_mode: Literal["stdout", "stderr"], line: str):
-        """
-        Adds a current stdout/stderr line to script_stdout/script_stderr result variable.
+        Handles an input marker line printed by the input() wrapper of the script (see
+        _execute_python_script_with_input_handling), marker lines aren't saved to stdout.
 
         Args:
-            output_mode (Literal["stdout", "stderr"]): Specifies the type of output to save.
-            line (str): A single line of stdout/stderr output obtained from script execution stream.
+            output_mode (Literal["stdout", "stderr"]): Stream the line was printed to.
+            line (str): Marker line, starting with one of OUTPUT_MARKERS.
         """
-        # Check for input prompt markers
-        if output_mode == "stdout" and line.startswith("FORLOOP_INPUT_PROMPT:"):
+        if line.startswith("FORLOOP_INPUT_PROMPT:"):
             # Extract the prompt and save it as a special variable
             prompt = line[21:]  # Remove "FORLOOP_INPUT_PROMPT:" prefix
             variable_handler.new_variable("script_input_prompt", prompt, is_result=True)
-            return  # Don't save this marker line to stdout
-            
-        if output_mode == "stdout" and line.startswith("FORLOOP_WAITING_FOR_INPUT:"):
+
+        elif line.startswith("FORLOOP_WAITING_FOR_INPUT:"):
             # Signal that the job is waiting for input
             variable_handler.new_variable("script_waiting_for_input", "1", is_result=True)
             
@@ -291,22 +276,41 @@ class RunPythonScriptHandler(AbstractFunctionHandler):
             except Exception as e:
                 # If we can't update the job status, log it but don't fail
                 flog.warning(f"Could not update job status to WAITING_FOR_INPUT: {e}")
-            
-            return  # Don't save this marker line to stdout
-        
-        line = line.replace("'", '"')
-        var_name = f"script_{output_mode}"
-        curr_var = variable_handler.get_variable_by_name(var_name).get("value", "")
-        curr_var += line
 
-        variable_handler.new_variable(var_name, curr_var, is_result=True)
+    def _save_output_to_result(self, output_mode: Literal["stdout", "stderr"], output: str, initial_output: str = ""):
+        """
+        Appends the whole stdout/stderr output streamed so far to the value script_stdout/script_stderr
+        result variable had before the script execution.
+
+        Args:
+            output_mode (Literal["stdout", "stderr"]): Specifies the type of output to save.
+            output (str): Accumulated stdout/stderr output of the script execution.
+            initial_output (str): Value of the result variable before the script execution.
+        """
+        output = (initial_output + output).replace("'", '"')
+        variable_handler.new_variable(f"script_{output_mode}", output, is_result=True)
+
+    def _create_output_streamer(self) -> OutputStreamer:
+        """Streamer of stdout/stderr lines appended to script_stdout/script_stderr result variables."""
+        # Fetched once, each flush stores the initial value with the whole output streamed so far
+        initial_outputs = {
+            output_mode: variable_handler.get_variable_by_name(f"script_{output_mode}").get("value") or ""
+            for output_mode in ("stdout", "stderr")
+        }
+        return OutputStreamer(
+            on_flush=lambda output_mode, output: self._save_output_to_result(
+                output_mode, output, initial_outputs[output_mode]
+            ),
+            on_special_line=self._handle_output_marker,
+            special_line_prefixes=self.OUTPUT_MARKERS,
+        )
 
     def _execute_python_script(self, script_text: str):
         """
         Executes Python script (obtained from FL Script object) text via subprocess.Popen method.
 
-        Missing libraries, if present in the script, are installed via pip and uninstalled after the
-        execution.
+        Missing libraries, if present in the script, are installed via pip into a cached environment
+        reused by later executions (see script_environments).
 
         Args:
             script_text (str): Contents of .py script to be executed.
@@ -315,23 +319,21 @@ class RunPythonScriptHandler(AbstractFunctionHandler):
             SoftPipelineError: Raised in case of an Exception during script execution.
         """
 
-        missing_libs = []
+        process = None
 
         try:
             # Get list of imports from the script
             imports = self._get_imports_from_script(script_text)
 
-            # Check if each module is installed and install the missing ones
-            for _import in imports:
-                if not self._is_module_installed(_import):
-                    self._install_package(_import)
-                    missing_libs.append(_import)
+            # Missing modules are installed into a cached environment of the script's process
+            environment = script_environment_cache.get_environment(imports)
 
             process = subprocess.Popen(
                 [sys.executable, "-u", "-c", script_text],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
+                env=environment.get_process_env(),
             )
             stdout, stderr = process.communicate()
 
@@ -344,19 +346,17 @@ class RunPythonScriptHandler(AbstractFunctionHandler):
             raise SoftPipelineError(f"Error while executing the script: {e}")
 
         finally:
-            process.wait()
-
-            # Uninstall the installed packages after use
-            for lib in missing_libs:
-                self._uninstall_package(lib)
+            if process is not None:
+                process.wait()
 
     def _execute_python_script_with_streaming(self, script_text: str):
         """
         Executes Python script (obtained from FL Script object) text via subprocess.Popen method
         with continuous streaming of stdout and stderr.
 
-        Missing libraries, if present in the script, are installed via pip and uninstalled after the
-        execution.
+        Missing libraries, if present in the script, are installed via pip into a cached environment
+        reused by later executions (see script_environments). If sf.USE_SCRIPT_WORKER_POOL is set,
+        the script runs in a warm worker process instead of a new interpreter.
 
         Args:
             script_text (str): Contents of .py script to be executed.
@@ -365,33 +365,18 @@ class RunPythonScriptHandler(AbstractFunctionHandler):
             SoftPipelineError: Raised in case of an Exception during script execution.
         """
 
-        def _stream_output(process: subprocess.Popen):
-            """
-            Streams stdout and stderr line by line in real-time and saves them into result vars.
-
-            Args:
-                process (subprocess.Popen): Popen process execution a python script.
-            """
-
-            for stdout_line in iter(process.stdout.readline, ""):
-                if stdout_line:
-                    self._save_output_line_to_result(output_mode="stdout", line=stdout_line)
-            for stderr_line in iter(process.stderr.readline, ""):
-                if stderr_line:
-                    self._save_output_line_to_result(output_mode="stderr", line=stderr_line)
-        
-        missing_libs = []
         process = None
 
         try:
             # Get list of imports from the script
             imports = self._get_imports_from_script(script_text)
 
-            # Check if each module is installed and install the missing ones
-            for _import in imports:
-                if not self._is_module_installed(_import):
-                    self._install_package(_import)
-                    missing_libs.append(_import)
+            # Missing modules are installed into a cached environment of the script's process
+            environment = script_environment_cache.get_environment(imports)
+
+            if sf.USE_SCRIPT_WORKER_POOL and is_worker_pool_supported():
+                self._execute_python_script_in_worker_pool(script_text, environment)
+                return
 
             # Execute the script in a subprocess
             process = subprocess.Popen(
@@ -400,10 +385,13 @@ class RunPythonScriptHandler(AbstractFunctionHandler):
                 stderr=subprocess.PIPE,
                 text=True,
                 bufsize=1,
+                env=environment.get_process_env(),
             )
 
-            # Stream stdout and stderr of the script in real-time into result vars
-            _stream_output(process)
+            # Stream stdout and stderr of the script in real-time into result vars, both pipes are
+            # read concurrently
+            with self._create_output_streamer() as output_streamer:
+                output_streamer.read_process_output(process)
 
         except Exception as e:
             raise SoftPipelineError(f"Error while executing the script: {e}")
@@ -414,9 +402,21 @@ class RunPythonScriptHandler(AbstractFunctionHandler):
                 process.stderr.close()
                 process.wait()
 
-            # Uninstall the installed packages after use
-            for lib in missing_libs:
-                self._uninstall_package(lib)
+    def _execute_python_script_in_worker_pool(self, script_text: str, environment: ScriptEnvironment):
+        """
+        Executes Python script in a warm worker of the shared script worker pool (libraries like
+        pandas and numpy are imported by the worker in advance) with continuous streaming of stdout
+        and stderr.
+
+        Args:
+            script_text (str): Contents of .py script to be executed.
+            environment (ScriptEnvironment): Environment with packages missing in the current interpreter.
+        """
+        with self._create_output_streamer() as output_streamer:
+            result = get_script_worker_pool().run(
+                script_text, on_output=output_streamer.feed, sys_path=environment.sys_path
+            )
+        flog.debug(lambda: f"Script finished in worker {result.worker_pid}: {result}")
 
     def _execute_python_script_with_e2b(self, script_text: str):
         """
@@ -444,24 +444,19 @@ class RunPythonScriptHandler(AbstractFunctionHandler):
             #     _import for _import in imports if _import not in sys.stdlib_module_names
             # ]
 
-            with CodeInterpreter(api_key=sf.E2B_API_KEY) as sandbox:
+            with CodeInterpreter(api_key=sf.E2B_API_KEY) as sandbox, \
+                    self._create_output_streamer() as output_streamer:
                 for _import in imports:
                     sandbox.notebook.exec_cell(f"!pip install {_import}")
 
                 exec = sandbox.notebook.exec_cell(
                     script_text,
-                    on_stderr=lambda stderr: self._save_output_line_to_result(
-                        output_mode="stderr", line=str(stderr)
-                    ),
-                    on_stdout=lambda stdout: self._save_output_line_to_result(
-                        output_mode="stdout", line=str(stdout)
-                    ),
+                    on_stderr=lambda stderr: output_streamer.feed("stderr", str(stderr)),
+                    on_stdout=lambda stdout: output_streamer.feed("stdout", str(stdout)),
                 )
 
                 if exec.error:
-                    self._save_output_line_to_result(
-                        output_mode="stderr", line=exec.error.traceback
-                    )
+                    output_streamer.feed("stderr", exec.error.traceback)
 
         except Exception as e:
             raise SoftPipelineError(f"Error while executing the script via E2B: {e}")
@@ -176,7 +176,7 @@ class KNNImputation:
             resulting_df.loc[clean_data.index, imputation_columns] = sklearn_knn[:, imputation_column_indices]
 
         flog.debug("dataframe after imputer")
-        flog.debug(resulting_df)
+        flog.debug(lambda: resulting_df)
 
         return resulting_df
 
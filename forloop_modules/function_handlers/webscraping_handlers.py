@@ -9,10 +9,11 @@ if "linux" not in sys.platform:
 
 import pandas as pd
 from pathlib import Path
-from bs4 import BeautifulSoup
 from keepvariable.keepvariable_core import Var, save_variables, kept_variables
 import forloop_modules.flog as flog
 from forloop_modules.utils.various import is_list_of_strings
+from forloop_modules.utils.image_downloader import DEFAULT_MAX_CONCURRENCY, ImageDownloader
+from forloop_modules.utils.html_parsing import DEFAULT_PARSER_BACKEND, PARSER_BACKENDS, find_page_elements_data, is_xpath
 
 from forloop_modules.function_handlers.auxilliary.node_type_categories_manager import ntcm
 from forloop_modules.function_handlers.auxilliary.form_dict_list import FormDictList
@@ -1929,21 +1930,14 @@ class DownloadImageHandler(AbstractFunctionHandler):
         self.direct_execute(image_url, output)
 
     def direct_execute(self, image_url, output):
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:50.0) Gecko/20100101 Firefox/50.0'}
-
         # If entered filename contains extension -> drop extension
         if '.' in output:
             output = output.split('.')[0]
 
-        image_extension = image_url.split('.')[-1]
-        filename = f'{output}.{image_extension}'
-
-        r = requests.get(image_url, headers=headers)
-        with Path(aet.home_folder, filename).open(mode='wb') as outfile:
-            outfile.write(r.content)
-        # urllib.request.urlretrieve(image_url, f'{filename}.{image_extension}')
-
-        # suh.webscraping_client.download_image(image_url, filename)
+        # Streamed to disk with retries, an interrupted download is resumed
+        report = ImageDownloader().download([(image_url, Path(aet.home_folder or '', output))])
+        if report.to_dict()["failed"]:
+            raise SoftPipelineError(f"Image {image_url} couldn't be downloaded: {report.results[0].error}")
 
     def export_code(self, node_detail_form):
         """TODO"""
@@ -2000,7 +1994,7 @@ class DownloadImagesXPathHandler(AbstractFunctionHandler):
         super().__init__()
 
     def _init_docs(self):
-        parameters_description = "DownloadImagesXPath Node takes 2 parameters"
+        parameters_description = "DownloadImagesXPath Node takes 4 parameters"
         self.docs = Docs(description=self.__doc__, parameters_description=parameters_description)
 
         self.docs.add_parameter_table_row(
@@ -2019,6 +2013,22 @@ class DownloadImagesXPathHandler(AbstractFunctionHandler):
             example=['logo.png', 'product_main_photo.jpg']
         )
 
+        self.docs.add_parameter_table_row(
+            title="Max concurrent downloads",
+            name="max_concurrency",
+            description="Maximum number of images downloaded at once",
+            typ="integer",
+            example=[DEFAULT_MAX_CONCURRENCY]
+        )
+
+        self.docs.add_parameter_table_row(
+            title="Requests per second per host",
+            name="requests_per_second",
+            description="Limit of requests sent to each host per second (no limit if empty)",
+            typ="float",
+            example=[2, 0.5]
+        )
+
     def make_form_dict_list(self, *args, node_detail_form=None):
         fdl = FormDictList(docs=self.docs)
 
@@ -2028,24 +2038,61 @@ class DownloadImagesXPathHandler(AbstractFunctionHandler):
         fdl.label("Output filename")
         fdl.entry(name="output", text="", input_types=["str"], required=True, row=2)
         fdl.label("Multiple images can be downloaded", row=3)
+        fdl.label("Max concurrent downloads")
+        fdl.entry(name="max_concurrency", text=str(DEFAULT_MAX_CONCURRENCY), input_types=["int"], is_advanced=True, row=4)
+        fdl.label("Requests per second per host")
+        fdl.entry(name="requests_per_second", text="", input_types=["int", "float"], is_advanced=True, row=5)
 
         return fdl
 
     def execute(self, node_detail_form):
         image_xpath = node_detail_form.get_chosen_value_by_name("image_xpath", variable_handler)
         output = node_detail_form.get_chosen_value_by_name("output", variable_handler)
+        max_concurrency = node_detail_form.get_chosen_value_by_name("max_concurrency", variable_handler)
+        requests_per_second = node_detail_form.get_chosen_value_by_name("requests_per_second", variable_handler)
 
-        self.direct_execute(image_xpath, output)
+        self.direct_execute(image_xpath, output, max_concurrency, requests_per_second)
 
     def execute_with_params(self, params):
         image_xpath = params["image_xpath"]
         output = params["output"]
+        max_concurrency = params.get("max_concurrency")
+        requests_per_second = params.get("requests_per_second")
 
-        self.direct_execute(image_xpath, output)
+        self.direct_execute(image_xpath, output, max_concurrency, requests_per_second)
 
-    def direct_execute(self, image_xpath, output):
+    def direct_execute(self, image_xpath, output, max_concurrency=DEFAULT_MAX_CONCURRENCY, requests_per_second=None):
         image_xpath = suh.check_xpath_apostrophes(image_xpath)
-        suh.webscraping_client.download_images(image_xpath, output)
+
+        # Image URLs are resolved from one page snapshot, docrawl downloads the images when it can't be obtained
+        image_urls = suh.get_image_urls(image_xpath)
+        if image_urls is None:
+            suh.webscraping_client.download_images(image_xpath, output)
+            return
+
+        # If entered filename contains extension -> drop extension
+        if '.' in output:
+            output = output.split('.')[0]
+
+        # A single image is saved as filename.extension, multiple ones as filename/filename_i.extension
+        output_path = Path(aet.home_folder or '', output)
+        if len(image_urls) == 1:
+            images = [(image_urls[0], output_path)]
+        else:
+            images = [(image_url, output_path / f'{output}_{i}') for i, image_url in enumerate(image_urls)]
+
+        downloader = ImageDownloader(
+            max_concurrency=int(max_concurrency or DEFAULT_MAX_CONCURRENCY),
+            requests_per_second_per_host=float(requests_per_second) if requests_per_second else None,
+        )
+        report = downloader.download(images)
+        report_dict = report.to_dict()
+        flog.info(f"Images of {image_xpath} downloaded: {report_dict}", self)
+        if report_dict["failed"]:
+            raise SoftPipelineError(
+                f"{report_dict['failed']} of {len(images)} images of {image_xpath} couldn't be downloaded: "
+                f"{report_dict['errors']}"
+            )
 
     def export_code(self, node_detail_form):
         image_xpath = node_detail_form.get_chosen_value_by_name("image_xpath", variable_handler)
@@ -2436,7 +2483,7 @@ class FindPageElementsHandler(AbstractFunctionHandler):
         super().__init__()
 
     def _init_docs(self):
-        parameters_description = "FindPageElements Node takes 7 parameters"
+        parameters_description = "FindPageElements Node takes 9 parameters"
         self.docs = Docs(description=self.__doc__, parameters_description=parameters_description)
 
         self.docs.add_parameter_table_row(
@@ -2483,6 +2530,22 @@ class FindPageElementsHandler(AbstractFunctionHandler):
             typ="boolean",
         )
 
+        self.docs.add_parameter_table_row(
+            title="Selector",
+            name="selector",
+            description="XPath or CSS selector of element(s) to search for instead of tag, class and attributes",
+            typ="string",
+        )
+
+        self.docs.add_parameter_table_row(
+            title="Parser",
+            name="parser",
+            description="Parser of the page source - 'html.parser' (BeautifulSoup, default), 'lxml' (fast) or 'selectolax' "
+                        "(fastest, CSS selectors only). Elements stored with Get '-' are BeautifulSoup elements "
+                        "for 'html.parser', HTML of the elements otherwise",
+            typ="string",
+        )
+
         self.docs.add_parameter_table_row(
             title="Output variable",
             name="output_variable",
@@ -2505,9 +2568,13 @@ class FindPageElementsHandler(AbstractFunctionHandler):
         fdl.comboentry(name="get", text="text", options=['text', 'href', '-'], row=5)
         fdl.label("Find all")
         fdl.checkbox(name="find_all", bool_value=False, row=6)
+        fdl.label("Selector")
+        fdl.entry(name="selector", text="", required=False, input_types=["str"], is_advanced=True, row=7)
+        fdl.label("Parser")
+        fdl.combobox(name="parser", options=list(PARSER_BACKENDS), default=DEFAULT_PARSER_BACKEND, is_advanced=True, row=8)
         fdl.label("Output variable")
-        fdl.entry(name="output_variable", text="", required=True, input_types=["str"], row=7)
-        fdl.button(function=self.execute, function_args=node_detail_form, text="Execute", focused=True, row=8)
+        fdl.entry(name="output_variable", text="", required=True, input_types=["str"], row=9)
+        fdl.button(function=self.execute, function_args=node_detail_form, text="Execute", focused=True, row=10)
 
         return fdl
 
@@ -2518,9 +2585,11 @@ class FindPageElementsHandler(AbstractFunctionHandler):
         attributes = node_detail_form.get_chosen_value_by_name("attributes", variable_handler)
         get = node_detail_form.get_chosen_value_by_name("get", variable_handler)
         find_all = node_detail_form.get_chosen_value_by_name("find_all", variable_handler)
+        selector = node_detail_form.get_chosen_value_by_name("selector", variable_handler)
+        parser = node_detail_form.get_chosen_value_by_name("parser", variable_handler)
         output_variable = node_detail_form.get_chosen_value_by_name("output_variable", variable_handler)
 
-        self.direct_execute(page_source, tag, class_, attributes, get, find_all, output_variable)
+        self.direct_execute(page_source, tag, class_, attributes, get, find_all, output_variable, selector, parser)
 
     def execute_with_params(self, params):
         page_source = params["page_source"]
@@ -2530,39 +2599,35 @@ class FindPageElementsHandler(AbstractFunctionHandler):
         get = params["get"]
         find_all = params["find_all"]
         output_variable = params["output_variable"]
+        selector = params.get("selector")
+        parser = params.get("parser")
 
-        self.direct_execute(page_source, tag, class_, attributes, get, find_all, output_variable)
+        self.direct_execute(page_source, tag, class_, attributes, get, find_all, output_variable, selector, parser)
 
-    def direct_execute(self, page_source, tag, class_, attributes, get, find_all, output_variable):
+    def direct_execute(self, page_source, tag, class_, attributes, get, find_all, output_variable, selector=None,
+                       parser=DEFAULT_PARSER_BACKEND):
         # '-' means not to extract any attribute from element and store element itself instead
         get = get[0] if get else '-'
+        parser = parser or DEFAULT_PARSER_BACKEND
 
         if not attributes:
             attributes = dict()
-        else:
+        elif isinstance(attributes, str):
             # FIXME: why 'attributes' param (defined with type dict in FDL) is stored as string?
-            attributes = eval(attributes)
+            try:
+                attributes = ast.literal_eval(attributes)
+            except (ValueError, SyntaxError) as e:
+                raise SoftPipelineError(f"Attributes must be a dictionary, e.g. {{'id': 'main'}}: {e}")
+        else:
+            attributes = dict(attributes)
 
         if class_:
             attributes['class'] = class_
 
-        soup = BeautifulSoup(page_source, 'html.parser')
-
-        # TODO: handle not found elements
-        if find_all:
-            elements = soup.find_all(tag, attrs=attributes)
-        else:
-            elements = [soup.find(tag, attrs=attributes)]
-
-        if get == 'text':
-            elements_data = [x.text for x in elements]
-        elif get == '-':
-            elements_data = elements
-        else:
-            elements_data = [x.get(get) for x in elements]
-
-        if not find_all:
-            elements_data = elements_data[0]
+        try:
+            elements_data = find_page_elements_data(page_source, tag, attributes, get, find_all, selector, parser)
+        except Exception as e:  # Invalid selector, missing optional parser package
+            raise SoftPipelineError(f"Error while searching for page elements: {e}")
 
         variable_handler.new_variable(output_variable, elements_data)
 
@@ -2573,30 +2638,50 @@ class FindPageElementsHandler(AbstractFunctionHandler):
         attributes = node_detail_form.get_chosen_value_by_name("attributes", variable_handler)
         get = node_detail_form.get_chosen_value_by_name("get", variable_handler)
         find_all = node_detail_form.get_chosen_value_by_name("find_all", variable_handler)
+        selector = node_detail_form.get_chosen_value_by_name("selector", variable_handler)
+        parser = node_detail_form.get_chosen_value_by_name("parser", variable_handler) or DEFAULT_PARSER_BACKEND
         output_variable = node_detail_form.get_chosen_value_by_name("output_variable", variable_handler)
 
+        if selector and is_xpath(selector):
+            code_res = f"res = tree.xpath({selector!r})" if find_all else f"res = next(iter(tree.xpath({selector!r})), None)"
+            code = f"""
+        # Prepare parser object
+        tree = lxml.html.fromstring(r.text)
+
+        {code_res}
+        """
+            return code
+
         if not attributes:
             attributes = dict()
 
         if class_:
             attributes['class'] = class_
 
-        if find_all:
+        if selector:
+            code_res = f"res = soup.select({selector!r})" if find_all else f"res = soup.select_one({selector!r})"
+        elif find_all:
             code_res = f"res = soup.find_all('{tag}', attrs={attributes})"
         else:
             code_res = f"res = soup.find('{tag}', attrs={attributes})"
 
+        # BeautifulSoup can't use selectolax, the lxml parser finds the same elements by CSS selectors
+        soup_parser = "html.parser" if parser == "html.parser" else "lxml"
         code = f"""
         # Prepare parser object
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = BeautifulSoup(r.text, '{soup_parser}')
 
         {code_res}
         """
 
         return code
 
-    def export_imports(self, *args):
-        imports = ["from bs4 import BeautifulSoup"]
+    def export_imports(self, node_detail_form=None):
+        selector = node_detail_form.get_chosen_value_by_name("selector", variable_handler) if node_detail_form else None
+        if selector and is_xpath(selector):
+            imports = ["import lxml.html"]
+        else:
+            imports = ["from bs4 import BeautifulSoup"]
 
         return imports
 
@@ -2712,24 +2797,18 @@ class ExtractXPathsToDfHandler(AbstractFunctionHandler):
         if columns_no != xpaths_no:
             raise CriticalPipelineError("The same number of XPaths and Columns must be specified")
 
-        filename = f'{new_var_name}.txt'
+        columns = [columns] if type(columns) == str else columns
+        xpaths = [xpaths] if type(xpaths) == str else xpaths
+
+        # All XPaths are evaluated against one snapshot of the page
+        extracted_data = suh.extract_data_from_xpaths_batch(xpaths)
+        if extracted_data is None:
+            # Page source unavailable - extract XPath by XPath through docrawl
+            filename = f'{new_var_name}.txt'
+            extracted_data = [self._extract_with_docrawl(xpath, filename) for xpath in xpaths]
+
         data_dict = {}
-        
-        if type(xpaths) == list:
-            columns = [columns] if type(columns) == str else columns
-            
-            for xpath, column in zip(xpaths, columns):
-                if type(xpath) == list:
-                    # Group of selected elements
-                    data = suh.extract_data_from_list_of_xpaths(xpaths=xpath, filename=filename)
-                    data = "\n".join(data) if type(data) == list else data
-                else:
-                    # Single selected element
-                    data = suh.extract_data_from_xpath(xpath, filename)
-                data_dict[column] = data if type(data) == list else [data]
-        elif type(xpaths) == str:
-            column = columns[0] if type(columns) == list else columns
-            data = suh.extract_data_from_xpath(xpaths, filename)
+        for data, column in zip(extracted_data, columns):
             data_dict[column] = data if type(data) == list else [data]
 
         if write_mode == "Write":
@@ -2746,6 +2825,15 @@ class ExtractXPathsToDfHandler(AbstractFunctionHandler):
         else:
             variable_handler.create_variable(new_var_name, new_df)
 
+    def _extract_with_docrawl(self, xpath, filename):
+        if type(xpath) == list:
+            # Group of selected elements
+            data = suh.extract_data_from_list_of_xpaths(xpaths=xpath, filename=filename)
+            return "\n".join(data) if type(data) == list else data
+
+        # Single selected element
+        return suh.extract_data_from_xpath(xpath, filename)
+
     def export_imports(self, *args):
         imports = ["from selenium import webdriver", "from selenium.webdriver.common.by import By"]
 
@@ -5,6 +5,7 @@ from pydantic import BaseModel
 
 import dbhydra.dbhydra_core as dh
 import forloop_modules.flog as flog
+from forloop_modules.globals.schema_catalog import schema_catalog
 from forloop_modules.redis.redis_connection import (
     create_redis_key_for_project_db_private_key,
     kv_redis,
@@ -47,6 +48,7 @@ class DbConnection:
         self.is_connected: bool = False
         self.table_dict: Optional[dict] = None
         self.foreign_keys: Optional[list] = None
+        self.schema_version: Optional[int] = None  # Version of the schema catalog entry of table_dict
 
         # TODO: This should not be here. Examine the code and delete it everywhere.
         self.images = []  # icons covering this DbConnection
@@ -120,22 +122,58 @@ class DbConnection:
 
         return is_connected
 
-    def get_table_dict_and_fk(self):
-        with self.db_instance.connect_to_db():
-            self.table_dict = self.db_instance.generate_table_dict()
-            if self.db_details["DIALECT"] == "SQL Server":
-                self.foreign_keys = self.db_instance.get_foreign_keys_columns()
-            else:
-                self.foreign_keys = []
+    def get_table_dict_and_fk(self, use_catalog: bool = True):
+        """
+        Get tables and foreign keys of the database - from the schema catalog if cached there, otherwise
+        by introspecting the database.
+        """
+        schema = schema_catalog.get(self.db_details) if use_catalog else None
+
+        if schema is None:
+            schema_version = schema_catalog.get_version(self.db_details)
+            with self.db_instance.connect_to_db():
+                table_dict = self.db_instance.generate_table_dict()
+                if self.db_details["DIALECT"] == "SQL Server":
+                    foreign_keys = self.db_instance.get_foreign_keys_columns()
+                else:
+                    foreign_keys = []
+            schema = schema_catalog.put(self.db_details, table_dict, foreign_keys, version=schema_version)
+        else:
+            table_dict = self._build_table_dict(schema["tables"])
+            foreign_keys = schema["foreign_keys"]
+
+        self.table_dict = table_dict
+        self.foreign_keys = foreign_keys
+        self.schema_version = schema["version"]
         return (self.table_dict, self.foreign_keys)
 
+    def _build_table_dict(self, tables: dict) -> dict:
+        """Create dbhydra tables of the catalog schema without querying the database."""
+        def build_tables():
+            table_class = self.db_instance.matching_table_class
+            return {
+                table_name: table_class(self.db_instance, table_name, table["columns"], table["types"])
+                for table_name, table in tables.items()
+            }
+
+        if self.db_details["DIALECT"] == "MongoDB":  # MongoTable binds its collection when created
+            with self.db_instance.connect_to_db():
+                return build_tables()
+        return build_tables()
+
+    def is_schema_stale(self) -> bool:
+        """Check whether the schema changed since table_dict was loaded."""
+        return self.table_dict is not None and self.schema_version != schema_catalog.get_version(self.db_details)
+
+    def invalidate_schema(self) -> None:
+        """Drop the cached schema of the database, must be called after every schema change."""
+        schema_catalog.invalidate(self.db_details)
+
     def get_db_table(self, db_table_name: str):
         if self.table_dict is None:
             return
 
-        for table_name, table in self.table_dict.items():
-            if table_name == db_table_name:
-                return table
+        return self.table_dict.get(db_table_name)
 
 
 def create_db_details_from_database_dict(db_dict: dict):
@@ -0,0 +1,302 @@
+"""
+Process-wide pool of warm database sessions keyed by database uid.
+
+Creating a session fetches the RSA private key from Redis, decrypts the password, connects and
+introspects the tables (DbConnection.test_database_connection) - all of it happens only once per
+pooled session, subsequent DB nodes reuse its open connection and table dictionary.
+
+Usage:
+    with db_session_manager.session(db_dict) as db_session:
+        db_table = db_session.get_db_table(table_name)
+        with db_session.connect_to_db():
+            rows = db_table.select(query)
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import forloop_modules.flog as flog
+import forloop_modules.globals.db_connection as dbc
+
+# Maximum number of concurrently used sessions of one database
+DIALECT_POOL_SIZES = {
+    "MySQL": 4,
+    "PostgreSQL": 4,
+    "SQL Server": 4,
+    "MongoDB": 2,  # MongoClient pools connections on its own
+    "BigQuery": 2,  # HTTP client, no persistent connection
+    "Xlsx structure": 1,
+}
+DEFAULT_POOL_SIZE = 2
+
+MAX_IDLE_TIME = 300.0  # Sessions unused for longer are closed (seconds)
+HEALTH_CHECK_INTERVAL = 30.0  # Sessions unused for longer are pinged before reuse (seconds)
+ACQUIRE_TIMEOUT = 60.0  # Maximum wait for a free session of an exhausted pool (seconds)
+
+# Fields of a database dict which require a new session when changed
+_DATABASE_FINGERPRINT_FIELDS = ("server", "port", "database", "username", "password", "dialect")
+
+
+class DbSession:
+    """
+    Database connection with introspected tables, kept open between DB node executions. Its
+    connect_to_db() is a drop-in replacement of dbhydra's connect_to_db() which does not close
+    the connection on exit.
+    """
+
+    def __init__(self, db_connection: dbc.DbConnection, pool: Optional["DbSessionPool"] = None):
+        self.db_connection = db_connection
+        self.pool = pool
+        self.dialect = db_connection.db_details["DIALECT"]
+        self.last_used_at = time.monotonic()
+
+        self._connection_context = None
+        self._is_health_check_needed = False
+        self._lock = threading.RLock()
+
+    @property
+    def db_instance(self) -> dbc.DBInstance:
+        return self.db_connection.db_instance
+
+    @property
+    def is_open(self) -> bool:
+        return self._connection_context is not None
+
+    def get_db_table(self, db_table_name: str):
+        with self._lock:
+            if self.db_connection.is_schema_stale():
+                # Reloading the tables connects (and disconnects) on its own, reopen the connection afterwards
+                self.close()
+                self.db_connection.get_table_dict_and_fk()
+            return self.db_connection.get_db_table(db_table_name)
+
+    def open(self) -> None:
+        with self._lock:
+            if self.is_open:
+                return
+            connection_context = self.db_instance.connect_to_db()
+            connection_context.__enter__()
+            self._connection_context = connection_context
+            self._is_health_check_needed = False
+
+    def close(self) -> None:
+        with self._lock:
+            if not self.is_open:
+                return
+            connection_context, self._connection_context = self._connection_context, None
+            try:
+                connection_context.__exit__(None, None, None)
+            except Exception as e:
+                flog.warning(f"Closing DB session of {self.db_connection.database} failed: {e}", self)
+
+    def is_healthy(self) -> bool:
+        """Ping the database over the open connection."""
+        try:
+            if self.dialect == "MongoDB":
+                self.db_instance.connection.admin.command("ping")
+            elif self.dialect in ("MySQL", "PostgreSQL", "SQL Server"):
+                self.db_instance.cursor.execute("SELECT 1")
+                self.db_instance.cursor.fetchall()
+            return True
+        except Exception as e:
+            flog.warning(f"DB session of {self.db_connection.database} is not healthy: {e}", self)
+            return False
+
+    def end_transaction(self) -> None:
+        """
+        Roll back the transaction left open by the last use - drivers with autocommit off (pymysql) start one
+        with the first SELECT, and its snapshot would hide rows committed by other connections from later
+        uses of the pooled session. Writes of DB nodes are committed by dbhydra, nothing else is discarded.
+        """
+        with self._lock:
+            if not self.is_open or self.dialect not in ("MySQL", "PostgreSQL", "SQL Server"):
+                return
+            try:
+                self.db_instance.connection.rollback()
+            except Exception as e:
+                flog.warning(f"Rollback of DB session of {self.db_connection.database} failed: {e}", self)
+                self.close()
+
+    def ensure_open(self) -> None:
+        """Open the connection, reconnecting if it was idle for too long and does not respond."""
+        with self._lock:
+            if self.is_open:
+                is_idle = time.monotonic() - self.last_used_at > HEALTH_CHECK_INTERVAL
+                if (is_idle or self._is_health_check_needed) and not self.is_healthy():
+                    self.close()
+            self.open()
+
+    @contextmanager
+    def connect_to_db(self):
+        with self._lock:
+            self.ensure_open()
+            try:
+                yield None
+            except Exception:
+                # The error might have been caused by a broken connection - check it before next use
+                self._is_health_check_needed = True
+                raise
+            finally:
+                self.last_used_at = time.monotonic()
+
+
+class DbSessionPool:
+    def __init__(self, db_dict: dict, size: int):
+        self.db_dict = db_dict
+        self.fingerprint = get_database_fingerprint(db_dict)
+        self.size = size
+
+        self.idle_sessions: list[DbSession] = []
+        self.n_sessions = 0
+        self.is_closed = False
+        self.condition = threading.Condition()
+
+    def _create_session(self) -> DbSession:
+        db_details = dbc.decrypt_db_details(dict(self.db_dict))
+        db_connection = dbc.DbConnection(db_details=db_details)
+        if not db_connection.test_database_connection():
+            raise ConnectionError(f"Connection to database {self.db_dict.get('database_name')} failed")
+
+        db_session = DbSession(db_connection, pool=self)
+        db_session.open()
+        return db_session
+
+    def acquire(self) -> DbSession:
+        with self.condition:
+            if not self.condition.wait_for(
+                lambda: self.idle_sessions or self.n_sessions < self.size, timeout=ACQUIRE_TIMEOUT
+            ):
+                raise TimeoutError(f"No free DB session of {self.db_dict.get('database_name')} available")
+
+            if self.idle_sessions:
+                return self.idle_sessions.pop()
+            self.n_sessions += 1
+
+        try:
+            return self._create_session()
+        except Exception:
+            with self.condition:
+                self.n_sessions -= 1
+                self.condition.notify()
+            raise
+
+    def release(self, db_session: DbSession) -> None:
+        db_session.end_transaction()
+        with self.condition:
+            if self.is_closed:
+                self.n_sessions -= 1
+            else:
+                self.idle_sessions.append(db_session)
+                self.condition.notify()
+
+        if self.is_closed:
+            db_session.close()
+
+    def close(self) -> None:
+        """Close idle sessions now and the used ones when they are released."""
+        with self.condition:
+            self.is_closed = True
+        self.close_idle_sessions()
+
+    def close_idle_sessions(self, max_idle_time: float = 0.0) -> None:
+        now = time.monotonic()
+        with self.condition:
+            expired_sessions = [s for s in self.idle_sessions if now - s.last_used_at >= max_idle_time]
+            self.idle_sessions = [s for s in self.idle_sessions if s not in expired_sessions]
+            self.n_sessions -= len(expired_sessions)
+            self.condition.notify_all()
+
+        for db_session in expired_sessions:
+            db_session.close()
+
+
+class DbSessionManager:
+    """
+    Singleton class keeping pools of DbSessions per database uid.
+    """
+    _instance = None
+
+    def __init__(self):
+        self.pools: dict[str, DbSessionPool] = {}
+        self.max_idle_time = MAX_IDLE_TIME
+        self._lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        """Ensure it is a singleton"""
+        if not isinstance(cls._instance, cls):
+            cls._instance = object.__new__(cls)
+        return cls._instance
+
+    def _get_pool(self, db_dict: dict) -> DbSessionPool:
+        database_uid = get_database_uid(db_dict)
+        fingerprint = get_database_fingerprint(db_dict)
+
+        with self._lock:
+            pool = self.pools.get(database_uid)
+            if pool is not None and pool.fingerprint != fingerprint:
+                flog.info(f"Database {db_dict.get('database_name')} details changed, DB sessions reset", self)
+                pool.close()
+                pool = None
+            if pool is None:
+                size = DIALECT_POOL_SIZES.get(db_dict.get("dialect"), DEFAULT_POOL_SIZE)
+                pool = DbSessionPool(db_dict, size)
+                self.pools[database_uid] = pool
+
+            other_pools = [other for other in self.pools.values() if other is not pool]
+
+        for other_pool in other_pools:
+            other_pool.close_idle_sessions(self.max_idle_time)
+
+        return pool
+
+    def acquire(self, db_dict: dict) -> DbSession:
+        """
+        Borrow a warm session of the database, it has to be given back by release().
+
+        :param db_dict: Database (with encrypted password) as returned by ncrb.get_all_databases_by_project_uid
+        :type db_dict: dict
+        :raises ValueError: private key of the project's DB passwords is not stored in Redis
+        :raises ConnectionError: connection to the database failed
+        :raises TimeoutError: all sessions of the database are in use for too long
+        """
+        pool = self._get_pool(db_dict)
+        pool.close_idle_sessions(self.max_idle_time)
+        return pool.acquire()
+
+    def release(self, db_session: DbSession) -> None:
+        db_session.pool.release(db_session)
+
+    @contextmanager
+    def session(self, db_dict: dict):
+        """Borrow a warm session of the database for the duration of the with block, see acquire()."""
+        db_session = self.acquire(db_dict)
+        try:
+            yield db_session
+        finally:
+            self.release(db_session)
+
+    def invalidate(self, db_dict: dict) -> None:
+        """Close idle sessions of the database, e.g. after its schema changed."""
+        with self._lock:
+            pool = self.pools.pop(get_database_uid(db_dict), None)
+        if pool is not None:
+            pool.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            pools, self.pools = list(self.pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+
+def get_database_uid(db_dict: dict) -> str:
+    return db_dict.get("uid") or f"{db_dict.get('project_uid')}:{db_dict.get('database_name')}"
+
+
+def get_database_fingerprint(db_dict: dict) -> tuple:
+    return tuple(db_dict.get(field) for field in _DATABASE_FINGERPRINT_FIELDS)
+
+
+db_session_manager = DbSessionManager()
@@ -1,7 +1,12 @@
 import ast
+import atexit
 import json
-from dataclasses import dataclass, field
-from typing import Any, Dict, Literal, Optional, Set, Union
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Literal, Optional, Set, Union
 
 import numpy as np
 import pandas as pd
@@ -17,6 +22,7 @@ from forloop_modules.globals.active_entity_tracker import aet
 from forloop_modules.redis.redis_connection import (
     get_initial_variable_redis_name,
     get_variable_redis_name,
+    get_variable_version_redis_name,
     kv_redis,
 )
 from forloop_modules.utils.definitions import (
@@ -26,6 +32,11 @@ from forloop_modules.utils.definitions import (
 from forloop_modules.utils.pickle_serializer import (
     save_data_dict_to_pickle_folder,
 )
+from forloop_modules.utils.variable_value_cache import (
+    VariableValueCache,
+    bump_value_version,
+    get_value_version,
+)
 from forloop_modules.utils.various import (
     is_value_redis_compatible,
     is_value_serializable,
@@ -57,7 +68,56 @@ class DataFrameWizardScanAnalysis:
     result: Dict = field(default_factory=dict)
 
 
+@dataclass
+class PendingVariableOperation:
+    """
+    Variable API request deferred until the end of a LocalVariableHandler.batch() block, or until
+    the next write-behind flush.
+    """
+    operation: Literal["create", "update", "delete"]
+    name: str
+    uid: Optional[str] = None
+    request_kwargs: dict = field(default_factory=dict)
+    # Write-behind operations store the value (to Redis/pickle folder) only when being flushed
+    is_prepared: bool = True
+    additional_params: dict = field(default_factory=dict)
+    failed_attempts: int = 0  # Failed write-behind flushes of the operation
+    # Handler mode and entities active when the operation was queued (the current ones if None)
+    handler_mode: Optional[str] = None
+    project_uid: Optional[str] = None
+    pipeline_uid: Optional[str] = None
+    pipeline_job_uid: Optional[str] = None
+
+
+@dataclass
+class WriteBehindStats:
+    """Statistics of the LocalVariableHandler write-behind cache."""
+    writes: int = 0
+    collapsed_writes: int = 0  # Writes superseded by a later write of the same variable before a flush
+    read_hits: int = 0  # Reads of not yet flushed variables served from memory
+    flushes: int = 0
+    flushed_operations: int = 0
+    failed_operations: int = 0
+    dropped_operations: int = 0  # Operations given up after WRITE_BEHIND_MAX_ATTEMPTS failed flushes
+    last_flush_latency: float = 0.0
+    max_flush_latency: float = 0.0
+    total_flush_latency: float = 0.0
+
+    @property
+    def mean_flush_latency(self) -> float:
+        return self.total_flush_latency / self.flushes if self.flushes else 0.0
+
+    @property
+    def write_hit_ratio(self) -> float:
+        return self.collapsed_writes / self.writes if self.writes else 0.0
+
+
 class LocalVariableHandler:
+    # Maximum number of concurrent API requests when flushing a batch
+    BATCH_MAX_WORKERS = 8
+    # Number of failed write-behind flushes of an operation after which it's dropped
+    WRITE_BEHIND_MAX_ATTEMPTS = 3
+
     def __init__(self):
         self.is_refresh_needed = False  # When VariableHandler gets set with a button, this is toggled to True - Frontend then can react to state changes
         self.last_dataframe = None  # stores DF, not variable name, this is temporary - should be replaced with self.last_active_df_variable but carefully - the latter one stores variable not DF
@@ -67,9 +127,23 @@ class LocalVariableHandler:
         self.dataframe_column_category_predictions: Dict[str, Any] = dict() #Dict[str, DataFrameColumnCategoryAnalysis]
         self.variables_to_be_created_in_subpipeline = []
         self.variables={}
+        self._variables_lock = threading.RLock()  # Local variables are updated also by the write-behind thread
         self.variable_uid_variable_dict={} #ANALOGY of dicts in GLC, new implementation - contains nodes in API -> reflecting status of server nodes via API
 
         self._handler_mode: Literal["initial_variable", "variable"] = "initial_variable"
+        self._pending_operations: Optional[Dict[str, PendingVariableOperation]] = None
+
+        self._dirty_operations: Dict[str, PendingVariableOperation] = {}
+        self._is_write_behind_enabled = False
+        self._write_behind_lock = threading.Lock()
+        self._write_behind_flush_lock = threading.Lock()
+        self._write_behind_stop_event = threading.Event()
+        self._write_behind_thread: Optional[threading.Thread] = None
+        self._is_write_behind_atexit_registered = False
+        self.write_behind_stats = WriteBehindStats()
+
+        # Deserialized values of Redis-stored variables, validated by their version counters in Redis
+        self.value_cache = VariableValueCache()
 
     @property
     def is_empty(self):
@@ -94,18 +168,25 @@ class LocalVariableHandler:
     def last_active_dataframe_node_uid(self, node_uid:int):
         self._last_active_dataframe_node_uid = node_uid
 
-    def get_variable_redis_name(self, name: str) -> str:
-        if self.handler_mode == "initial_variable":
-            return get_initial_variable_redis_name(name, aet.active_pipeline_uid)
-        elif self.handler_mode == "variable":
-            return get_variable_redis_name(name, aet.active_pipeline_job_uid)
+    def get_variable_redis_name(
+        self, name: str, handler_mode: Optional[str] = None, pipeline_uid: Optional[str] = None,
+        pipeline_job_uid: Optional[str] = None
+    ) -> str:
+        """Redis name of the variable's value, of the current handler mode and active entities by default."""
+        handler_mode = handler_mode or self.handler_mode
+        if handler_mode == "initial_variable":
+            return get_initial_variable_redis_name(name, pipeline_uid or aet.active_pipeline_uid)
+        elif handler_mode == "variable":
+            return get_variable_redis_name(name, pipeline_job_uid or aet.active_pipeline_job_uid)
         else:
-            raise ValueError(f"Variable mode {self.handler_mode} is not supported.")
+            raise ValueError(f"Variable mode {handler_mode} is not supported.")
 
     def change_variable_mode(self, mode: Literal["initial_variable", "variable"]) -> None:
         """Change state specifying on which type of variable is the handler currently operating."""
         if mode not in ["variable", "initial_variable"]:
             raise ValueError(f"Variable mode `{mode}` is not supported.")
+        # Pending writes belong to the previous mode
+        self.flush_write_behind()
         self._handler_mode = mode
         self.variables.clear()
 
@@ -136,19 +217,43 @@ class LocalVariableHandler:
             flog.warning(f"A variable '{name}' was not found in LocalVariableHandler.")
             return
 
+        if self._is_variable_dirty(name):
+            # Not flushed to Redis yet, the local value is the latest one
+            self.write_behind_stats.read_hits += 1
+            return local_variable
+
         # serialization for objects
         if local_variable.typ in REDIS_STORED_TYPES_AS_STRINGS:
-            value = kv_redis.get(self.get_variable_redis_name(name))
-            value.attrs["name"] = local_variable.name
+            value = self._get_redis_stored_value(name)
+            if isinstance(value, pd.DataFrame):
+                value.attrs["name"] = local_variable.name
 
-            variable = self.get_variable_by_name(name)
+            variable = self._get_indexed_variable(name)
             local_variable = LocalVariable(
-                variable["uid"], variable["name"], value, variable["is_result"]
+                variable["uid"], name, value, variable["is_result"]
             )
             return local_variable
         else:
             return local_variable
 
+    def _get_redis_stored_value(self, name: str) -> Any:
+        """
+        Value of a Redis-stored variable - a copy of the cached one while its version in Redis is unchanged,
+        otherwise loaded from Redis.
+        """
+        redis_name = self.get_variable_redis_name(name)
+        version = get_value_version(kv_redis, get_variable_version_redis_name(redis_name))
+        return self.value_cache.get_or_load(redis_name, version, lambda: kv_redis.get(redis_name))
+
+    def _set_redis_stored_value(
+        self, name: str, value: Any, additional_params: dict, redis_name: Optional[str] = None
+    ) -> None:
+        """Store the value to Redis, increment its version and cache it (write-through)."""
+        redis_name = redis_name or self.get_variable_redis_name(name)
+        kv_redis.set(redis_name, value, additional_params)
+        version = bump_value_version(kv_redis, get_variable_version_redis_name(redis_name))
+        self.value_cache.put(redis_name, value, version)
+
     def get_int_to_str_col_name_mapping(self, df: pd.DataFrame) -> dict[int, str]:
         """
         find columns whose name type is int and create mapping between their int name and its string form
@@ -270,39 +375,18 @@ class LocalVariableHandler:
         if size is None:
             size = self._determine_value_size(value=value)
 
-        if self.handler_mode == "initial_variable":
-            ncrb_fn = ncrb.new_initial_variable
-        elif self.handler_mode == "variable":
-            ncrb_fn = ncrb.new_variable
-
-        optional_args = {"is_result": is_result} if is_result is not None else {}
-        # serialization for objects
-        # TODO: FFS FIXME:
-        if is_value_serializable(value):
-            response = ncrb_fn(name=name, value=value, size=size, **optional_args)
-        else:
-            if is_value_redis_compatible(value):
-                kv_redis.set(
-                    self.get_variable_redis_name(name), value, additional_params
-                )
-            else:
-                data_dict = {}
-                data_dict[name] = value
-                folder = ".//file_transfer"
-                save_data_dict_to_pickle_folder(
-                    data_dict, folder, clean_existing_folder=False
-                )
-            # TODO: FILE TRANSFER MISSING
+        operation = self._make_variable_write_operation(
+            "create", name, value, size, is_result, additional_params
+        )
 
-            response = ncrb_fn(
-                name=name,
-                value="",
-                type=type(value).__name__,
-                size=size,
-                **optional_args,
-            )
+        if self.is_write_behind_enabled or self.is_batching:
+            self._defer_variable_operation(operation)
+            variable = LocalVariable(None, name, value, bool(is_result))
+            with self._variables_lock:
+                self.variables[name] = variable
+            return self._make_pending_variable_result(variable)
 
-        result = response.json()
+        result = self._send_variable_operation(operation)
         self.create_local_variable(
             result["uid"],
             result["name"],
@@ -327,49 +411,27 @@ class LocalVariableHandler:
         if size is None:
             size = self._determine_value_size(value=value)
 
-        if self.handler_mode == "initial_variable":
-            ncrb_update_by_uid_fn = ncrb.update_initial_variable_by_uid
-        elif self.handler_mode == "variable":
-            ncrb_update_by_uid_fn = ncrb.update_variable_by_uid
-
         variable = None
         try:  # Function to run even if no variable is found
-            variable = self.get_variable_by_name(name)
+            variable = self._get_indexed_variable(name)
         except Exception:
             flog.warning(f"Variable '{name}' was not found in LocalVariableHandler.")
 
         if variable is not None:
-            size = size if size is not None else variable["size"]
             is_result = is_result if is_result is not None else variable["is_result"]
-            ncrb_fn_kwargs = {
-                "variable_uid": variable["uid"],
-                "name": name,
-                "value": value,
-                "size": size,
-                "is_result": is_result,
-            }
-
-            if is_value_serializable(value):
-                response = ncrb_update_by_uid_fn(**ncrb_fn_kwargs)
-            else:
-                ncrb_fn_kwargs.update(value="")
+            operation = self._make_variable_write_operation(
+                "update", name, value, size, is_result, additional_params, uid=variable["uid"]
+            )
 
-                if is_value_redis_compatible(value):
-                    kv_redis.set(
-                        self.get_variable_redis_name(name), value, additional_params
-                    )
-                else:
-                    data_dict = {}
-                    data_dict[name] = value
-                    folder = ".//file_transfer"
-                    save_data_dict_to_pickle_folder(
-                        data_dict, folder, clean_existing_folder=False
-                    )
-                response = ncrb_update_by_uid_fn(
-                    type=type(value).__name__, **ncrb_fn_kwargs
-                )
+            if self.is_write_behind_enabled or self.is_batching:
+                self._defer_variable_operation(operation)
+                with self._variables_lock:
+                    local_variable = self.variables[name]
+                    local_variable.value = value
+                    local_variable.is_result = is_result
+                return self._make_pending_variable_result(local_variable)
 
-            result = response.json()
+            result = self._send_variable_operation(operation)
             self.update_local_variable(
                 result["name"], result["value"], result["is_result"], result["type"]
             )
@@ -379,14 +441,388 @@ class LocalVariableHandler:
         if self.last_active_df_variable is not None and var_name == self.last_active_df_variable.name:
             self.last_active_df_variable = None
 
-        if self.handler_mode == "initial_variable":
-            ncrb_delete_by_uid = ncrb.delete_initial_variable_by_uid
-        elif self.handler_mode == "variable":
-            ncrb_delete_by_uid = ncrb.delete_variable_by_uid
+        variable = self._get_indexed_variable(var_name)
+        operation = PendingVariableOperation("delete", var_name, uid=variable["uid"])
 
-        variable = self.get_variable_by_name(var_name)
-        ncrb_delete_by_uid(variable["uid"])
+        if self.is_write_behind_enabled or self.is_batching:
+            self._defer_variable_operation(operation)
+        else:
+            self._send_variable_operation(operation)
         self.delete_local_variable(var_name)
+        redis_name = self.get_variable_redis_name(var_name)
+        kv_redis.delete(redis_name, get_variable_version_redis_name(redis_name))
+        self.value_cache.invalidate(redis_name)
+
+    def _get_indexed_variable(self, name: str) -> dict:
+        """
+        Get uid and is_result of a Variable/InitialVariable - local variables serve as a name -> uid
+        index, the API is queried only for variables not created/loaded by this handler.
+        """
+        local_variable = self.variables.get(name)
+        is_deferring = self.is_batching or self.is_write_behind_enabled
+        if local_variable is not None and (local_variable.uid is not None or is_deferring):
+            return {"uid": local_variable.uid, "is_result": local_variable.is_result}
+
+        return self.get_variable_by_name(name)
+
+    def _make_variable_write_operation(
+        self, operation: Literal["create", "update"], name: str, value: Any, size: Union[int, tuple],
+        is_result: Optional[bool], additional_params: dict, uid: Optional[str] = None
+    ) -> PendingVariableOperation:
+        """
+        Create an operation writing the variable - the value is stored right away, unless the
+        write-behind cache is enabled.
+        """
+        if self.is_write_behind_enabled:
+            request_kwargs = {"name": name, "value": value, "size": size, "is_result": is_result}
+            return PendingVariableOperation(
+                operation, name, uid=uid, request_kwargs=request_kwargs, is_prepared=False,
+                additional_params=additional_params
+            )
+
+        request_kwargs = self._prepare_variable_request_kwargs(
+            name, value, size, is_result, additional_params
+        )
+        return PendingVariableOperation(operation, name, uid=uid, request_kwargs=request_kwargs)
+
+    def _prepare_variable_request_kwargs(
+        self, name: str, value: Any, size: Union[int, tuple], is_result: Optional[bool],
+        additional_params: dict, redis_name: Optional[str] = None
+    ) -> dict:
+        """
+        Store non-serializable values (to Redis - under redis_name if given - or pickle folder) and
+        return kwargs of the corresponding API request.
+        """
+        request_kwargs = {"name": name, "value": value, "size": size}
+        if is_result is not None:
+            request_kwargs["is_result"] = is_result
+
+        # serialization for objects
+        # TODO: FFS FIXME:
+        if not is_value_serializable(value):
+            if is_value_redis_compatible(value):
+                self._set_redis_stored_value(name, value, additional_params, redis_name)
+            else:
+                data_dict = {}
+                data_dict[name] = value
+                folder = ".//file_transfer"
+                save_data_dict_to_pickle_folder(
+                    data_dict, folder, clean_existing_folder=False
+                )
+            # TODO: FILE TRANSFER MISSING
+
+            request_kwargs.update(value="", type=type(value).__name__)
+
+        return request_kwargs
+
+    def _send_variable_operation(self, operation: PendingVariableOperation) -> Optional[dict]:
+        handler_mode = operation.handler_mode or self.handler_mode
+        # Entities of a deferred operation are the ones active when it was queued, None means the active ones
+        entity_kwargs = {"project_uid": operation.project_uid, "pipeline_uid": operation.pipeline_uid}
+        if handler_mode == "initial_variable":
+            ncrb_new_fn = ncrb.new_initial_variable
+            ncrb_update_by_uid_fn = ncrb.update_initial_variable_by_uid
+            ncrb_delete_by_uid_fn = ncrb.delete_initial_variable_by_uid
+        elif handler_mode == "variable":
+            ncrb_new_fn = ncrb.new_variable
+            ncrb_update_by_uid_fn = ncrb.update_variable_by_uid
+            ncrb_delete_by_uid_fn = ncrb.delete_variable_by_uid
+            entity_kwargs["pipeline_job_uid"] = operation.pipeline_job_uid
+
+        request_kwargs = operation.request_kwargs
+        if not operation.is_prepared and operation.operation != "delete":
+            redis_name = self.get_variable_redis_name(
+                operation.name, handler_mode, operation.pipeline_uid, operation.pipeline_job_uid
+            )
+            request_kwargs = self._prepare_variable_request_kwargs(
+                additional_params=operation.additional_params, redis_name=redis_name, **request_kwargs
+            )
+
+        if operation.operation == "create":
+            response = ncrb_new_fn(**request_kwargs, **entity_kwargs)
+        elif operation.operation == "update":
+            with self._variables_lock:
+                uid = operation.uid or self.variables[operation.name].uid
+            request_kwargs = {"is_result": None, **request_kwargs}
+            response = ncrb_update_by_uid_fn(variable_uid=uid, **request_kwargs, **entity_kwargs)
+        else:
+            # Uid of a variable deleted before its deferred create was sent is filled in when the create
+            # succeeds (see _update_local_variable_uid), otherwise it's looked up
+            uid = operation.uid or self.get_variable_by_name(operation.name)["uid"]
+            ncrb_delete_by_uid_fn(uid)
+            return None
+
+        return response.json()
+
+    @property
+    def is_batching(self) -> bool:
+        return self._pending_operations is not None
+
+    @contextmanager
+    def batch(self):
+        """
+        Defer all Variable API requests made inside the block (e.g. a node execution) until its end.
+        Repeated writes of the same variable are coalesced into a single request and the remaining
+        requests are sent concurrently. Local variables are updated immediately. Nested blocks are
+        flushed by the outermost one. When the block raises, the pending requests are still sent, but
+        a failure of the flush is only logged so that the original exception propagates.
+
+        Usage:
+            with variable_handler.batch():
+                variable_handler.new_variable("df", df)
+        """
+        if self.is_batching:
+            yield self
+            return
+
+        self._pending_operations = {}
+        try:
+            yield self
+        except BaseException:
+            try:
+                self.flush_batch()
+            except Exception as e:
+                flog.error(f"Variable operations of the failed batch couldn't be flushed: {e}", self)
+            raise
+        else:
+            self.flush_batch()
+        finally:
+            self._pending_operations = None
+
+    def flush_batch(self) -> list[Optional[dict]]:
+        """
+        Send all pending Variable API requests (e.g. at a node boundary), return their results.
+
+        Uids of successfully written variables are stored even when other requests fail, the first
+        failure is raised afterwards.
+        """
+        if not self.is_batching:
+            return []
+
+        pending_operations, self._pending_operations = self._pending_operations, {}
+        if not pending_operations:
+            return []
+
+        operations = list(pending_operations.values())
+        outcomes = self._run_concurrently(
+            [lambda operation=operation: self._try_send_variable_operation(operation) for operation in operations]
+        )
+
+        results, errors = [], []
+        for operation, (is_sent, result) in zip(operations, outcomes):
+            if is_sent:
+                self._update_local_variable_uid(operation, result)
+                results.append(result)
+            else:
+                errors.append(result)
+
+        flog.debug(lambda: f"Flushed {len(operations) - len(errors)}/{len(operations)} variable operations")
+        if errors:
+            raise errors[0]
+        return results
+
+    def _defer_variable_operation(self, operation: PendingVariableOperation) -> None:
+        # Bound to the entities active now, the active pipeline/job may change before the flush
+        operation.handler_mode = self.handler_mode
+        operation.project_uid = aet.project_uid
+        operation.pipeline_uid = aet.active_pipeline_uid
+        operation.pipeline_job_uid = aet.active_pipeline_job_uid
+
+        if self.is_write_behind_enabled:
+            with self._write_behind_lock:
+                self.write_behind_stats.writes += 1
+                if self._coalesce_variable_operation(self._dirty_operations, operation):
+                    self.write_behind_stats.collapsed_writes += 1
+        else:
+            self._coalesce_variable_operation(self._pending_operations, operation)
+
+    def _coalesce_variable_operation(
+        self, pending_operations: Dict[str, PendingVariableOperation], operation: PendingVariableOperation
+    ) -> bool:
+        """
+        Coalesce an operation with a pending operation on the same variable, return True if a
+        pending write was superseded.
+        """
+        previous = pending_operations.pop(operation.name, None)
+        if previous is None:
+            pending_operations[operation.name] = operation
+            return False
+
+        if previous.operation == "create":
+            if operation.operation == "delete":
+                return True  # The variable has never reached the server
+            operation = replace(operation, operation="create", uid=None)
+        elif previous.operation == "delete" and operation.operation == "create":
+            # The variable still exists on the server, rewrite it instead
+            operation = replace(operation, operation="update", uid=previous.uid)
+        elif operation.uid is None:
+            operation.uid = previous.uid
+
+        pending_operations[operation.name] = operation
+        return previous.operation != "delete"
+
+    def _update_local_variable_uid(self, operation: PendingVariableOperation, result: Optional[dict]) -> None:
+        """
+        Store uid of a variable written by a deferred operation to the local name -> uid index, and to
+        operations queued while its create was being sent (e.g. a delete of the variable).
+        """
+        if operation.operation == "delete":
+            return
+
+        with self._variables_lock:
+            if operation.name in self.variables:
+                self.variables[operation.name].uid = result["uid"]
+
+        with self._write_behind_lock:
+            queued_operation = self._dirty_operations.get(operation.name)
+            if queued_operation is not None and queued_operation.uid is None and queued_operation.operation != "create":
+                queued_operation.uid = result["uid"]
+
+    def _make_pending_variable_result(self, variable: "LocalVariable") -> dict:
+        """Variable dict returned instead of an API response while batching."""
+        return {
+            "uid": variable.uid,
+            "name": variable.name,
+            "value": variable.value,
+            "is_result": variable.is_result,
+            "type": variable.typ,
+            "size": variable.size,
+        }
+
+    def _run_concurrently(self, calls: list[Callable]) -> list:
+        if len(calls) <= 1:
+            return [call() for call in calls]
+
+        futures = []
+        with ThreadPoolExecutor(max_workers=min(self.BATCH_MAX_WORKERS, len(calls))) as executor:
+            try:
+                for call in calls:
+                    futures.append(executor.submit(call))
+            except RuntimeError:  # New threads can't be started at interpreter shutdown
+                flog.warning("Variable operations sent sequentially, threads can't be started", self)
+        return [future.result() for future in futures] + [call() for call in calls[len(futures):]]
+
+    @property
+    def is_write_behind_enabled(self) -> bool:
+        return self._is_write_behind_enabled
+
+    def enable_write_behind(self, flush_interval: Optional[float] = 1.0) -> None:
+        """
+        Keep written variables only in memory (marked as dirty) and store them to Redis/server later -
+        repeated writes of the same variable between flushes result in a single store.
+
+        Dirty variables are flushed by a background thread every `flush_interval` seconds (if not None),
+        and always on flush_write_behind()/disable_write_behind() calls, which should be done at the end
+        of the pipeline, and before switching the active pipeline/job.
+        """
+        self._is_write_behind_enabled = True
+
+        if not self._is_write_behind_atexit_registered:
+            atexit.register(self._flush_write_behind_at_exit)
+            self._is_write_behind_atexit_registered = True
+
+        if flush_interval is not None and self._write_behind_thread is None:
+            self._write_behind_stop_event.clear()
+            self._write_behind_thread = threading.Thread(
+                target=self._write_behind_flush_loop, args=(flush_interval,),
+                name="variable-write-behind", daemon=True
+            )
+            self._write_behind_thread.start()
+
+    def disable_write_behind(self) -> None:
+        """Stop the background flushing and flush all dirty variables."""
+        if self._write_behind_thread is not None:
+            self._write_behind_stop_event.set()
+            self._write_behind_thread.join()
+            self._write_behind_thread = None
+
+        self.flush_write_behind()
+        self._is_write_behind_enabled = False
+
+    def flush_write_behind(self, is_concurrent: bool = True) -> int:
+        """
+        Store all dirty variables to Redis/server, return the number of flushed operations.
+
+        Operations failing WRITE_BEHIND_MAX_ATTEMPTS times are dropped (and logged), the other failed
+        ones are retried on the next flush.
+
+        :param is_concurrent: Send the requests concurrently, sequentially if False (e.g. at interpreter exit)
+        :type is_concurrent: bool
+        """
+        with self._write_behind_flush_lock:
+            with self._write_behind_lock:
+                dirty_operations, self._dirty_operations = self._dirty_operations, {}
+            if not dirty_operations:
+                return 0
+
+            operations = list(dirty_operations.values())
+            start = time.perf_counter()
+            calls = [lambda operation=operation: self._try_send_variable_operation(operation) for operation in operations]
+            try:
+                results = self._run_concurrently(calls) if is_concurrent else [call() for call in calls]
+            except BaseException:
+                self._requeue_dirty_operations(operations)  # Not lost, sent by a later flush
+                raise
+            latency = time.perf_counter() - start
+
+            failed_operations, dropped_operations = [], []
+            for operation, (is_sent, result) in zip(operations, results):
+                if is_sent:
+                    self._update_local_variable_uid(operation, result)
+                    continue
+
+                operation.failed_attempts += 1
+                if operation.failed_attempts >= self.WRITE_BEHIND_MAX_ATTEMPTS:
+                    dropped_operations.append(operation)
+                    flog.error(
+                        f"Write-behind {operation.operation} of variable '{operation.name}' dropped after "
+                        f"{operation.failed_attempts} failed attempts", self
+                    )
+                else:
+                    failed_operations.append(operation)
+
+            self._requeue_dirty_operations(failed_operations)  # Retried on the next flush
+            with self._write_behind_lock:
+                stats = self.write_behind_stats
+                stats.flushes += 1
+                stats.flushed_operations += len(operations) - len(failed_operations) - len(dropped_operations)
+                stats.failed_operations += len(failed_operations) + len(dropped_operations)
+                stats.dropped_operations += len(dropped_operations)
+                stats.last_flush_latency = latency
+                stats.max_flush_latency = max(stats.max_flush_latency, latency)
+                stats.total_flush_latency += latency
+
+            return len(operations) - len(failed_operations) - len(dropped_operations)
+
+    def _requeue_dirty_operations(self, operations: list[PendingVariableOperation]) -> None:
+        """Mark not sent operations dirty again, coalesced with newer writes of the same variables."""
+        with self._write_behind_lock:
+            for operation in operations:
+                newer_operation = self._dirty_operations.pop(operation.name, None)
+                self._dirty_operations[operation.name] = operation
+                if newer_operation is not None:
+                    self._coalesce_variable_operation(self._dirty_operations, newer_operation)
+
+    def _flush_write_behind_at_exit(self) -> None:
+        # New threads (and executor futures) can't be started during the interpreter shutdown
+        self.flush_write_behind(is_concurrent=False)
+
+    def _try_send_variable_operation(
+        self, operation: PendingVariableOperation
+    ) -> tuple[bool, Union[Optional[dict], Exception]]:
+        """Send the operation, return (True, result) or (False, raised exception)."""
+        try:
+            return True, self._send_variable_operation(operation)
+        except Exception as e:
+            flog.error(f"Deferred {operation.operation} of variable '{operation.name}' failed: {e}", self)
+            return False, e
+
+    def _write_behind_flush_loop(self, flush_interval: float) -> None:
+        while not self._write_behind_stop_event.wait(flush_interval):
+            self.flush_write_behind()
+
+    def _is_variable_dirty(self, name: str) -> bool:
+        return self.is_write_behind_enabled and name in self._dirty_operations
 
     def create_local_variable(
         self,
@@ -399,24 +835,26 @@ class LocalVariableHandler:
         if type in JSON_SERIALIZABLE_TYPES_AS_STRINGS and type != "str":
             value = ast.literal_eval(str(value))
         elif type in REDIS_STORED_TYPES_AS_STRINGS:
-            value = kv_redis.get(self.get_variable_redis_name(name))
+            value = self._get_redis_stored_value(name)
 
             if isinstance(value, pd.DataFrame):
                 value = self.process_dataframe_variable_on_initialization(name, value)
 
         variable = LocalVariable(uid, name, value, is_result)
-        self.variables[name] = variable
+        with self._variables_lock:
+            self.variables[name] = variable
         return variable
 
     def update_local_variable(self, name, value, is_result: bool, type=None):
         if type in JSON_SERIALIZABLE_TYPES_AS_STRINGS and type != "str":
             value = ast.literal_eval(str(value))
         elif type in REDIS_STORED_TYPES_AS_STRINGS:
-            value = kv_redis.get(self.get_variable_redis_name(name))
+            value = self._get_redis_stored_value(name)
 
-        variable = self.variables[name]
-        self.variables[name].value = value  # Update
-        self.variables[name].is_result = is_result
+        with self._variables_lock:
+            variable = self.variables[name]
+            self.variables[name].value = value  # Update
+            self.variables[name].is_result = is_result
 
         return variable
 
@@ -427,30 +865,38 @@ class LocalVariableHandler:
                 "LocalVariableHandler must be in 'variable' mode to resave results."
             )
 
+        calls = []
         for variable in self.variables.values():
             if is_value_serializable(variable.value):
-                ncrb.new_initial_variable(name=variable.name, value=variable.value)
+                request_kwargs = {"name": variable.name, "value": variable.value}
             else:
-                value = kv_redis.get(self.get_variable_redis_name(variable.name))
+                value = self._get_redis_stored_value(variable.name)
                 if is_value_redis_compatible(variable.value):
                     kv_redis.set(f'stored_initial_variable_{variable.name}', value)
                 else:
                     data_dict = {}
                     data_dict[variable.name] = variable.value
                     folder = ".//file_transfer"
-                    save_data_dict_to_pickle_folder(data_dict, folder, clean_existing_folder=False)
+                    save_data_dict_to_pickle_folder(
+                        data_dict, folder, clean_existing_folder=False
+                    )
                 #TODO: FILE TRANSFER MISSING
 
                 optional_args = (
                     {"is_result": variable.is_result} if variable.is_result is not None else {}
                 )
-                ncrb.new_initial_variable(
-                    name=variable.name, value="", type=type(variable.value).__name__,
+                request_kwargs = {
+                    "name": variable.name, "value": "", "type": type(variable.value).__name__,
                     **optional_args
-                )
+                }
+            calls.append(lambda request_kwargs=request_kwargs: ncrb.new_initial_variable(**request_kwargs))
+
+        # Requests are independent of each other, send them concurrently
+        self._run_concurrently(calls)
 
     def delete_local_variable(self, var_name:str):
-        self.variables.pop(var_name)
+        with self._variables_lock:
+            self.variables.pop(var_name)
 
     def get_variable_by_name(self, name: str) -> dict:
         """Get Variable/InitialVariable uid based on its name and the pipeline it's assigned to."""
@@ -0,0 +1,159 @@
+"""
+Catalog of database schemas (table columns and types, foreign keys) shared by all DbConnections.
+
+Introspecting a large database means one query per table, the catalog lets connections to the same
+database reuse its result. Schemas are held in memory and persisted in Redis (kv_redis, i.e. a local
+JSON file when Redis is not configured) as plain data, from which the dbhydra tables are rebuilt
+without querying the database. Entries expire after SCHEMA_CATALOG_TTL and must be invalidated by
+every operation changing the schema - each invalidation increments the version counter of the database's
+schema in Redis (as variable values do, see variable_value_cache), so holders of older table dictionaries
+know they are stale. Entries are stamped with the version they were introspected at and served from
+memory only while it's the current one, so invalidations are seen by all processes right away.
+"""
+
+import json
+import threading
+import time
+from typing import Optional
+
+import forloop_modules.flog as flog
+from forloop_modules.redis.redis_connection import kv_redis
+from forloop_modules.utils.variable_value_cache import bump_value_version, get_value_version
+
+SCHEMA_CATALOG_FORMAT_VERSION = 1
+SCHEMA_CATALOG_TTL = 3600.0  # seconds
+SCHEMA_CATALOG_REDIS_KEY_PREFIX = "schema_catalog"
+SCHEMA_CATALOG_VERSION_REDIS_KEY_PREFIX = "schema_catalog_version"
+
+
+def create_schema_catalog_key(db_details: dict) -> str:
+    """Identify the database and the user connecting to it (visible tables depend on the user's grants)."""
+    return ":".join(
+        str(db_details[key]) for key in ("DIALECT", "DB_SERVER", "DB_PORT", "DB_DATABASE", "DB_USERNAME")
+    )
+
+
+class SchemaCatalog:
+    def __init__(self, ttl: float = SCHEMA_CATALOG_TTL, is_persistent: bool = True):
+        self.ttl = ttl
+        self.is_persistent = is_persistent
+
+        self._schemas: dict[str, dict] = {}
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _get_redis_key(self, key: str) -> str:
+        return f"{SCHEMA_CATALOG_REDIS_KEY_PREFIX}:{key}"
+
+    def _get_version_redis_key(self, key: str) -> str:
+        return f"{SCHEMA_CATALOG_VERSION_REDIS_KEY_PREFIX}:{key}"
+
+    def _is_valid(self, schema: Optional[dict], version: int) -> bool:
+        return (
+            isinstance(schema, dict)
+            and schema.get("format_version") == SCHEMA_CATALOG_FORMAT_VERSION
+            and schema.get("version") == version
+            and time.time() - schema.get("cached_at", 0) < self.ttl
+        )
+
+    def _get_version(self, key: str) -> int:
+        if self.is_persistent:
+            try:
+                version = get_value_version(kv_redis, self._get_version_redis_key(key)) or 0
+                with self._lock:
+                    self._versions[key] = version
+                return version
+            except Exception as e:
+                flog.warning(f"Schema catalog version of {key} couldn't be loaded from Redis: {e}", self)
+
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def get_version(self, db_details: dict) -> int:
+        """Current version of the database's schema, incremented by every invalidation."""
+        return self._get_version(create_schema_catalog_key(db_details))
+
+    def get(self, db_details: dict) -> Optional[dict]:
+        """
+        Cached schema of the database or None if it is not cached or has expired.
+
+        :return: {"version": int, "tables": {table_name: {"columns": list, "types": list}}, "foreign_keys": list}
+        :rtype: Optional[dict]
+        """
+        key = create_schema_catalog_key(db_details)
+        version = self._get_version(key)
+        with self._lock:
+            schema = self._schemas.get(key)
+            if self._is_valid(schema, version):
+                return schema
+            self._schemas.pop(key, None)
+
+        if not self.is_persistent:
+            return None
+
+        try:
+            schema = kv_redis.get(self._get_redis_key(key))
+        except Exception as e:
+            flog.warning(f"Schema catalog of {key} couldn't be loaded from Redis: {e}", self)
+            return None
+
+        with self._lock:
+            if not self._is_valid(schema, version):
+                return None
+            self._schemas[key] = schema
+            return schema
+
+    def put(self, db_details: dict, table_dict: dict, foreign_keys: list, version: Optional[int] = None) -> dict:
+        """
+        Store a schema introspected from dbhydra tables, return the catalog entry.
+
+        :param version: Schema version read before the introspection (the current one if None) - an entry
+            introspected before a concurrent invalidation is then never served
+        :type version: Optional[int]
+        """
+        key = create_schema_catalog_key(db_details)
+        if version is None:
+            version = self._get_version(key)
+        tables = {
+            table_name: {"columns": list(table.columns or []), "types": list(table.types or [])}
+            for table_name, table in table_dict.items()
+        }
+        with self._lock:
+            schema = {
+                "format_version": SCHEMA_CATALOG_FORMAT_VERSION,
+                "version": version,
+                "cached_at": time.time(),
+                "tables": tables,
+                "foreign_keys": foreign_keys,
+            }
+            self._schemas[key] = schema
+
+        if self.is_persistent:
+            try:
+                json.dumps(schema)  # Only JSON serializable schemas can be persisted
+                kv_redis.set(self._get_redis_key(key), schema)
+            except Exception as e:
+                flog.warning(f"Schema catalog of {key} couldn't be stored in Redis: {e}", self)
+
+        return schema
+
+    def invalidate(self, db_details: dict) -> None:
+        """Drop the cached schema of the database, call after every schema change (DDL, migration)."""
+        key = create_schema_catalog_key(db_details)
+        with self._lock:
+            self._schemas.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+        if self.is_persistent:
+            try:
+                version = bump_value_version(kv_redis, self._get_version_redis_key(key))
+                with self._lock:
+                    self._versions[key] = version
+                kv_redis.delete(self._get_redis_key(key))
+            except Exception as e:
+                flog.warning(f"Schema catalog of {key} couldn't be invalidated in Redis: {e}", self)
+
+        flog.info(f"Schema catalog of {key} invalidated", self)
+
+
+schema_catalog = SchemaCatalog()
@@ -20,11 +20,20 @@ import forloop_modules.queries.node_context_requests_backend as ncrb #questionab
 from pathlib import Path
 from docrawl.docrawl_client import DocrawlClient
 from docrawl.elements import ElementType
+import lxml.etree
 
 from forloop_modules.globals.active_entity_tracker import aet
 from forloop_modules.redis.redis_connection import kv_redis
 
 from forloop_modules.utils import synchronization_flags
+from forloop_modules.utils.completion_wait import wait_for_file, wait_for_redis_key, wait_metrics
+from forloop_modules.utils.xpath_extraction import (
+    XPathItem,
+    count_xpath_matches,
+    extract_image_urls,
+    extract_xpaths,
+    parse_page_source,
+)
 #WARNING!
 #It is forbidden to add imports to popup handlers, pipeline function handlers, or any gui components
 
@@ -376,17 +385,17 @@ class ScrapingUtilitiesHandler:
             self.webscraping_client.take_png_screenshot(str(Path(output_folder, 'website.png')))
 
     def wait_until_data_is_extracted_redis(self, redis_key: str, timeout: int = 10, xpath_func=False):
-        is_data_extracted = False
-        data = None
-        timeout_start = time.time()
-
-        while not is_data_extracted and time.time() < timeout_start + timeout:
-            data = kv_redis.get(redis_key)
+        """
+        Waits until data extracted by docrawl is stored in Redis. Woken by keyspace notifications of the key
+        (if enabled on the server), polls with exponential backoff otherwise.
 
-            if data:
-                is_data_extracted = True
+        :param redis_key: key in which docrawl stores the data
+        :param timeout: default timeout (in seconds), after which waiting is ended
+        :param xpath_func: does function contains XPath argument
+        """
+        data = wait_for_redis_key(kv_redis, redis_key, timeout)
 
-        if is_data_extracted:
+        if data:
             if len(data) == 1:
                 data = data[0].strip()
 
@@ -399,25 +408,15 @@ class ScrapingUtilitiesHandler:
 
     def wait_until_data_is_extracted(self, filename: str, timeout: int = 10, xpath_func=False):  # -> str | list | None
         """
-        Waits until icon where data is being saved to file is finished.
+        Waits until icon where data is being saved to file is finished. Woken by inotify events of the file's
+        directory (Linux), polls with exponential backoff otherwise.
 
         :param filename: name of file that should be created
         :param timeout: default timeout (in seconds), after which loop is ended
         :param xpath_func: does function contains XPath argument
         """
     
-        is_file_created = False
-        timeout_start = time.time()
-    
-        while not is_file_created and time.time() < timeout_start + timeout:
-            try:
-                with Path(filename).open(mode='r', encoding="utf-8") as _:
-                    pass
-                is_file_created = True
-    
-            except FileNotFoundError:
-                flog.info("File not found, waiting 1 s...")
-                time.sleep(1)
+        is_file_created = wait_for_file(filename, timeout)
     
         # In case file was successfully created
         if is_file_created:
@@ -436,6 +435,10 @@ class ScrapingUtilitiesHandler:
     
         return data
 
+    def get_wait_metrics(self) -> dict:
+        """Wait times of docrawl results (per "redis" and "file" waits) since the start or the last reset."""
+        return wait_metrics.get_metrics()
+
     def detect_cookies_xpath_preparation(self):
     
         #if glc.browser_view1.img is None:
@@ -538,6 +541,10 @@ class ScrapingUtilitiesHandler:
         the same elements on page, e.g. real estate listings on one page, product items in eshop etc.).
     
         Returns all generalized XPaths along with optimal XPath index.
+
+        Match counts of all candidates are evaluated at once on a snapshot of the page source, only the optimal
+        XPath is scanned in the browser. If the page source couldn't be obtained or no candidate matches in it,
+        candidates are scanned in the browser one by one.
         """
     
         flog.warning(f'Original XPath: {xpath}')
@@ -570,26 +577,71 @@ class ScrapingUtilitiesHandler:
     
         flog.warning('\n'.join(generalised_xpaths))
     
+        match_counts = self._count_xpath_matches_on_page(generalised_xpaths)
+        # No matches at all - the browser's DOM differs from the parsed page source (e.g. inserted <tbody>)
+        if match_counts is None or not any(match_counts):
+            return self._get_optimal_xpath_by_scanning(generalised_xpaths)
+
+        optimal_xpath_index = None
         results = []
+        for i, (generalised_xpath, num_of_elements) in enumerate(zip(generalised_xpaths, match_counts)):
+            distance_from_optimal = self._get_distance_from_optimal_num_of_elements(num_of_elements)
+            flog.warning(f'XPath {generalised_xpath} matches {num_of_elements} elements, distance from optimal: {distance_from_optimal}')
+            results.append(distance_from_optimal)
+
+            # The first XPath very close to optimum wins, as in sequential scanning
+            if distance_from_optimal <= 0.3:
+                optimal_xpath_index = i
+                break
+
+        if optimal_xpath_index is None:
+            optimal_xpath_index = results.index(min(results))
+
+        webpage_elements = self._scan_web_page_by_xpath(generalised_xpaths[optimal_xpath_index])
+        flog.warning(f'Optimal XPath {generalised_xpaths[optimal_xpath_index]} yields {len(webpage_elements)} elements')
+        self._set_scanned_webpage_elements(webpage_elements)
+
+        return generalised_xpaths, optimal_xpath_index
+
+    def _count_xpath_matches_on_page(self, xpaths: list[str]) -> Optional[list[int]]:
+        page_source = self.get_page_source()
+        if page_source is None:
+            return None
+        return count_xpath_matches(parse_page_source(page_source), xpaths)
+
+    def _get_distance_from_optimal_num_of_elements(self, num_of_elements: int) -> float:
+        # How far is point from expected optimal (20 elements) on log scale
         expected_optimal = np.log(20)
+        if num_of_elements == 0:
+            return np.inf
+        return abs(expected_optimal - np.log(num_of_elements))
+
+    def _scan_web_page_by_xpath(self, xpath: str) -> list:
+        if aet.home_folder is None:
+            aet.set_home_folder()
 
+        return self.scan_web_page(incl_tables=False, incl_bullets=False, incl_texts=False,
+                                  incl_headlines=False, incl_links=False, incl_images=False,
+                                  incl_buttons=False, by_xpath=xpath, refresh_bv_elements=False)
+
+    def _set_scanned_webpage_elements(self, webpage_elements: list) -> None:
+        self.webscraping_client.set_browser_scanned_elements(webpage_elements)
+        self.webpage_elements = webpage_elements
+        self.are_elements_updated = True
+
+    def _get_optimal_xpath_by_scanning(self, generalised_xpaths: list[str]):
+        results = []
         webpage_elements_history = []
     
         for i, generalised_xpath in enumerate(generalised_xpaths):
-            if aet.home_folder is None:
-                aet.set_home_folder()
-            
-            webpage_elements = self.scan_web_page(incl_tables=False, incl_bullets=False, incl_texts=False,
-                                                  incl_headlines=False, incl_links=False, incl_images=False,
-                                                  incl_buttons=False, by_xpath=generalised_xpath, refresh_bv_elements=False)
+            webpage_elements = self._scan_web_page_by_xpath(generalised_xpath)
 
             num_of_elements = len(webpage_elements)
 
             flog.warning(f'Using XPath: {generalised_xpath}')
             flog.warning(f'Num of elements found: {num_of_elements}')
     
-            # How far is point from expected optimal
-            distance_from_optimal = abs(expected_optimal - np.log(num_of_elements))
+            distance_from_optimal = self._get_distance_from_optimal_num_of_elements(num_of_elements)
             flog.warning(f'Distance from optimal: {distance_from_optimal}')
             results.append(distance_from_optimal)
             webpage_elements_history.append(webpage_elements)
@@ -604,10 +656,7 @@ class ScrapingUtilitiesHandler:
         webpage_elements = webpage_elements_history[optimal_xpath_index]
 
         flog.warning(f'Optimal XPath {generalised_xpaths[optimal_xpath_index]} yields {len(webpage_elements)} elements')
-
-        self.webscraping_client.set_browser_scanned_elements(webpage_elements)
-        self.webpage_elements = webpage_elements
-        self.are_elements_updated = True
+        self._set_scanned_webpage_elements(webpage_elements)
     
         return generalised_xpaths, optimal_xpath_index
 
@@ -716,6 +765,65 @@ class ScrapingUtilitiesHandler:
         
         return data
     
+    def get_page_source(self, timeout: int = 3) -> Optional[str]:
+        """Snapshot of the source of the current page (one docrawl round trip), None if it couldn't be obtained."""
+        filename = f'page_source_{uuid.uuid4().hex[:8]}.txt'
+        self.webscraping_client.extract_page_source(filename)
+
+        if not wait_for_file(filename, timeout):
+            flog.warning('Page source was not extracted', self)
+            return None
+        try:
+            return Path(filename).read_text(encoding="utf-8")
+        finally:
+            with suppress(OSError):
+                os.remove(filename)
+
+    def get_current_page_url(self) -> Optional[str]:
+        with suppress(Exception):
+            return self.webscraping_client.get_browser_meta_data()['request']['url']
+        return None
+
+    def extract_data_from_xpaths_batch(self, xpaths: list[XPathItem], timeout: int = 3) -> Optional[list]:
+        """
+        Evaluate all XPaths (or groups of XPaths) against one snapshot of the page in a single call.
+
+        :param xpaths: XPaths, a list of XPaths stands for a group of elements whose data are joined by newlines
+        :param timeout: timeout (in seconds) of obtaining the page source
+        :return: data aligned with xpaths (string, list of strings or None for an invalid XPath), None if the
+            page source couldn't be obtained
+        """
+        page_source = self.get_page_source(timeout=timeout)
+        if page_source is None:
+            return None
+
+        tree = parse_page_source(page_source)
+        xpaths = [
+            [self.check_xpath_apostrophes(x) for x in xpath] if isinstance(xpath, list) else self.check_xpath_apostrophes(xpath)
+            for xpath in xpaths
+        ]
+        data = extract_xpaths(tree, xpaths, base_url=self.get_current_page_url())
+
+        if any(column_data is None for column_data in data):
+            ncrb.new_popup([500, 400], "InvalidXPathPopup")
+
+        return data
+
+    def get_image_urls(self, image_xpath: str, timeout: int = 3) -> Optional[list[str]]:
+        """
+        Absolute URLs of images matched by the XPath on one snapshot of the page, None if the page source
+        couldn't be obtained or the XPath is invalid.
+        """
+        page_source = self.get_page_source(timeout=timeout)
+        if page_source is None:
+            return None
+
+        try:
+            return extract_image_urls(parse_page_source(page_source), image_xpath, self.get_current_page_url())
+        except lxml.etree.XPathError as e:
+            flog.warning(f"Invalid XPath {image_xpath}: {e}", self)
+            return None
+
     def find_content_on_page(self):
         self.are_all_elements_selected = True
         self.scan_web_page(by_xpath='//div[count(p) > 4]/*//text()')
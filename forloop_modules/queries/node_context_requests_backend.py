@@ -1,11 +1,12 @@
 #### GLC, GOM dependencies forbidden !!!
 """In this file all functions should have response-like return value"""
 
+import functools
 import json
 import sys
-from inspect import Parameter, Signature
+from inspect import Parameter, Signature, iscoroutinefunction
 from pathlib import Path
-from typing import Any, Generator, Optional, Union
+from typing import Any, Callable, Generator, Optional, Union
 
 from httpx import Response
 
@@ -26,6 +27,7 @@ from forloop_modules.queries.db_model_templates import (
     APIVariable,
 )
 from forloop_modules.utils.http_client import HttpClient
+from forloop_modules.utils.response_cache import ResponseCache
 import httpx
 if sys.platform == "darwin":  # MAC OS
     config_path = 'config/server_config_remote.ini'
@@ -43,6 +45,14 @@ timeout = httpx.Timeout(connect=10.0, read=30.0, write=10.0, pool=5.0)
 http_client = HttpClient(timeout=timeout)
 #http_client = HttpClient()
 
+
+def get_http_client() -> HttpClient:
+    """The shared client, looked up on every request so that it can be replaced (e.g. in tests)."""
+    return http_client
+
+# Opt-in cache of frequently repeated GET requests, see enable_response_cache()
+response_cache = ResponseCache()
+
 RESOURCES = {
     "databases": ["get_all", "get", "new", "delete", "update"],
     "dbtables": ["get_all", "get", "new", "delete", "update"],
@@ -77,7 +87,8 @@ Model = Union[tuple(DB_API_BODY_TEMPLATE.values())]
 
 def set_stored_project_uid_and_pipeline_uid_to_factory_payload(payload: dict):
     """
-    Sets project_uid and pipeline_uid values in payload from those stored in auth handler.
+    Sets project_uid and pipeline_uid values in payload from those stored in auth handler, unless they
+    were passed explicitly (e.g. by requests deferred past a switch of the active pipeline).
 
     Args:
         payload (dict): API request payload.
@@ -85,8 +96,10 @@ def set_stored_project_uid_and_pipeline_uid_to_factory_payload(payload: dict):
     # This approach might not be safe if API validation becomes strict (not all calls take both
     # project_uid and pipeline_uid as parameters)
     # TODO: Think about a better implementation (due to the point above)
-    payload['project_uid'] = aet.project_uid
-    payload['pipeline_uid'] = aet.active_pipeline_uid
+    if payload.get('project_uid') is None:
+        payload['project_uid'] = aet.project_uid
+    if payload.get('pipeline_uid') is None:
+        payload['pipeline_uid'] = aet.active_pipeline_uid
 
 
 def remove_none_values_from_payload(payload: dict) -> dict:
@@ -95,12 +108,85 @@ def remove_none_values_from_payload(payload: dict) -> dict:
     return payload
 
 
-def get_all_factory(resource_name: str):
+def get_model_attribute_names_without_uid(model: Model) -> list[str]:
+    # list of pydantic attributes
+    model_attribute_names = list(vars(model()).keys())
+    # remove the uid attribute – see VariableModel and APIVariable
+    return [v for v in model_attribute_names if v != "uid"]
+
+
+def make_factory_payload(
+    model: Model, model_attribute_names_without_uid: list[str], args: tuple, kwargs: dict
+) -> dict:
+    """Build a "POST/PUT <resource>" request payload from args and kwargs of a factory function."""
+    payload = {
+        param: arg for param, arg in zip(model_attribute_names_without_uid, args)
+    }
+    payload.update(kwargs)
+    set_stored_project_uid_and_pipeline_uid_to_factory_payload(payload)
+    if issubclass(model, APIVariable) and payload.get("pipeline_job_uid") is None:
+        payload["pipeline_job_uid"] = aet.active_pipeline_job_uid
+
+    return payload
+
+
+def enable_response_cache(maxsize: int = 1024, ttl: float = 5.0) -> None:
+    """
+    Cache responses of hot GET requests (variables, initial variables, nodes and node definitions).
+    Cached responses of a resource are invalidated by any new_*/update_*/delete_* request of the resource.
+
+    Args:
+        maxsize (int): Maximum number of cached responses, least recently used are evicted first
+        ttl (float): Time (in seconds) after which a cached response expires
+    """
+    response_cache.enable(maxsize=maxsize, ttl=ttl)
+
+
+def disable_response_cache() -> None:
+    response_cache.disable()
+
+
+def cached_get(resource_name: str, url: str) -> Response:
+    """GET request served from the response cache, keyed by url and active project and pipeline."""
+    key = (url, aet.project_uid, aet.active_pipeline_uid)
+    return response_cache.get_or_fetch(resource_name, key, lambda: http_client.get(url))
+
+
+def invalidates_cached_responses(resource_name: str):
+    """
+    Decorator of functions (or coroutine functions) modifying a resource - drops its cached responses
+    after the request is sent.
+    """
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    response_cache.invalidate(resource_name)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                response_cache.invalidate(resource_name)
+
+        return wrapper
+
+    return decorator
+
+
+def get_all_factory(resource_name: str, get_http_client: Callable[[], Any] = get_http_client):
     """
     Factory creating a "GET all <resources>" request function.
 
     Args:
         resource_name (str): Name of resources to GET (e.g. nodes, edges, scripts etc.)
+        get_http_client (() -> HttpClient): Getter of the client sending the request
 
     Returns:
         (() -> Response): "GET all <resources>" request calling function
@@ -108,67 +194,67 @@ def get_all_factory(resource_name: str):
     resource_url = f"{SERVER}:{str(PORT)}/api/v1/{resource_name}"
 
     def get_all() -> Response:
-        response = http_client.get(resource_url)
+        response = get_http_client().get(resource_url)
         return response
 
     get_all.__name__ = f"get_all_{resource_name}"
     return get_all
 
 
-def get_factory(resource_name: str):
+def get_factory(resource_name: str, get_http_client: Callable[[], Any] = get_http_client):
     """
     Factory creating a "GET <resource>" request function.
 
     Args:
         resource_name (str): Name of a resource to GET (e.g. node, edge, script etc.)
+        get_http_client (() -> HttpClient): Getter of the client sending the request
 
     Returns:
         ((resource_uid: str) -> Response): "GET <resource>" request calling function
     """  
     def get(resource_uid: str):
         resource_url = f"{BASE_API}/{resource_name}/{resource_uid}"
-        response = http_client.get(resource_url)
+        response = get_http_client().get(resource_url)
         return response
 
     get.__name__ = f"get_{resource_name}_by_uid"
     return get
 
 
-def delete_factory(resource_name: str):
+def delete_factory(resource_name: str, get_http_client: Callable[[], Any] = get_http_client):
     """
     Factory creating a "DELETE <resource>" request function.
 
     Args:
         resource_name (str): Name of a resource to DELETE (e.g. node, edge, script etc.)
+        get_http_client (() -> HttpClient): Getter of the client sending the request
 
     Returns:
         ((resource_uid: str) -> Response): "DELETE <resource>" request calling function
     """  
     def delete(resource_uid: str):
         resource_url = f"{BASE_API}/{resource_name}/{resource_uid}"
-        response = http_client.delete(resource_url)
+        response = get_http_client().delete(resource_url)
         return response
 
     delete.__name__ = f"delete_{resource_name}_by_uid"
     return delete
 
 
-def new_factory(resource_name: str, model: Model):
+def new_factory(resource_name: str, model: Model, get_http_client: Callable[[], Any] = get_http_client):
     """
     Factory creating a "POST <resource>" request function.
 
     Args:
         resource_name (str): Name of a resource to POST (e.g. node, edge, script etc.)
         model (Model): API model of the resource (e.g. "node -> APINode", "edge -> APIEdge" etc.)
+        get_http_client (() -> HttpClient): Getter of the client sending the request
 
     Returns:
         ((..., model_attr_names_wo_uid: Any = model_attr_names_wo_uid) -> Response): "POST
             <resource>" request calling function
     """
-    # list of pydantic attributes
-    model_attribute_names = list(vars(model()).keys())
-    # remove the uid attribute – see VariableModel and APIVariable
-    model_attribute_names_without_uid = [v for v in model_attribute_names if v != "uid"]
+    model_attribute_names_without_uid = get_model_attribute_names_without_uid(model)
     # the new function (eg new_database) will expect same args as what the attributes are (without uid)
     params = [
         Parameter(name, Parameter.POSITIONAL_OR_KEYWORD)
@@ -180,16 +266,10 @@ def new_factory(resource_name: str, model: Model):
         model_attribute_names_without_uid=model_attribute_names_without_uid,
         **kwargs,
     ):
-        payload = {
-            param: arg for param, arg in zip(model_attribute_names_without_uid, args)
-        }
-        payload.update(kwargs)
-        set_stored_project_uid_and_pipeline_uid_to_factory_payload(payload)
-        if issubclass(model, APIVariable):
-            payload["pipeline_job_uid"] = aet.active_pipeline_job_uid
+        payload = make_factory_payload(model, model_attribute_names_without_uid, args, kwargs)
 
         resource_url = f"{BASE_API}/{resource_name}"
-        response = http_client.post(resource_url, json=payload)
+        response = get_http_client().post(resource_url, json=payload)
 
         return response
 
@@ -199,22 +279,20 @@ def new_factory(resource_name: str, model: Model):
     return new
 
 
-def update_factory(resource_name: str, model: Model):
+def update_factory(resource_name: str, model: Model, get_http_client: Callable[[], Any] = get_http_client):
     """
     Factory creating a "PUT <resource>" request function.
 
     Args:
         resource_name (str): Name of a resource to PUT (e.g. node, edge, script etc.)
         model (Model): API model of the resource (e.g. "node -> APINode", "edge -> APIEdge" etc.)
+        get_http_client (() -> HttpClient): Getter of the client sending the request
 
     Returns:
         ((..., model_attr_names_wo_uid: Any = model_attr_names_wo_uid) -> Response): "PUT
             <resource>" request calling function
     """
-    # list of pydantic class attributes
-    model_attribute_names = list(vars(model()).keys())
-    # remove the uid attribute – see VariableModel and APIVariable
-    model_attribute_names_without_uid = [v for v in model_attribute_names if v != "uid"]
+    model_attribute_names_without_uid = get_model_attribute_names_without_uid(model)
     params = [
         Parameter(name, Parameter.POSITIONAL_OR_KEYWORD)
         for name in model_attribute_names_without_uid
@@ -226,16 +304,10 @@ def update_factory(resource_name: str, model: Model):
         model_attribute_names_without_uid=model_attribute_names_without_uid,
         **kwargs,
     ):
-        payload = {
-            param: arg for param, arg in zip(model_attribute_names_without_uid, args)
-        }
-        payload.update(kwargs)
-        set_stored_project_uid_and_pipeline_uid_to_factory_payload(payload)
-        if issubclass(model, APIVariable):
-            payload["pipeline_job_uid"] = aet.active_pipeline_job_uid
+        payload = make_factory_payload(model, model_attribute_names_without_uid, args, kwargs)
 
         resource_url = f"{BASE_API}/{resource_name}/{uid}"
-        response = http_client.put(resource_url, json=payload)
+        response = get_http_client().put(resource_url, json=payload)
 
         return response
 
@@ -247,31 +319,64 @@ def update_factory(resource_name: str, model: Model):
     return update
 
 
-for resource_name, actions in RESOURCES.items():
-    resource_name_singular = resource_name[:-1]
-    for action in actions:
-        function_name = None
-        if action == 'get_all':
-            fn = get_all_factory(resource_name)
-            function_name = f'{action}_{resource_name}'
-        elif action == 'get':
-            fn = get_factory(resource_name_singular)
-            function_name = f'{action}_{resource_name_singular}_by_uid'
-        elif action == 'new':
-            model = DB_API_BODY_TEMPLATE[resource_name]
-            fn = new_factory(resource_name, model)
-            function_name = f'{action}_{resource_name_singular}'
-        elif action == 'delete':
-            fn = delete_factory(resource_name_singular)
-            function_name = f'{action}_{resource_name_singular}_by_uid'
-        elif action == 'update':
-            model = DB_API_BODY_TEMPLATE[resource_name]
-            fn = update_factory(resource_name_singular, model)
-            function_name = f'{action}_{resource_name_singular}_by_uid'
-        else:
-            raise Exception('Unknown action')
-
-        globals()[function_name] = fn
+def as_coroutine_function(func: Callable):
+    """Coroutine function awaiting the awaitable returned by func (e.g. a request of AsyncHttpClient)."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await func(*args, **kwargs)
+
+    return wrapper
+
+
+def make_resource_request_functions(
+    get_http_client: Callable[[], Any] = get_http_client, is_async: bool = False
+) -> dict[str, Callable]:
+    """
+    Request functions of RESOURCES by their names (e.g. get_all_nodes, new_variable, delete_edge_by_uid).
+
+    Args:
+        get_http_client (() -> HttpClient | AsyncHttpClient): Getter of the client sending the requests
+        is_async (bool): Make coroutine functions, the client must be an AsyncHttpClient
+
+    Returns:
+        (dict[str, Callable]): Request functions by their names
+    """
+    functions = {}
+    for resource_name, actions in RESOURCES.items():
+        resource_name_singular = resource_name[:-1]
+        for action in actions:
+            function_name = None
+            if action == 'get_all':
+                fn = get_all_factory(resource_name, get_http_client)
+                function_name = f'{action}_{resource_name}'
+            elif action == 'get':
+                fn = get_factory(resource_name_singular, get_http_client)
+                function_name = f'{action}_{resource_name_singular}_by_uid'
+            elif action == 'new':
+                model = DB_API_BODY_TEMPLATE[resource_name]
+                fn = new_factory(resource_name, model, get_http_client)
+                function_name = f'{action}_{resource_name_singular}'
+            elif action == 'delete':
+                fn = delete_factory(resource_name_singular, get_http_client)
+                function_name = f'{action}_{resource_name_singular}_by_uid'
+            elif action == 'update':
+                model = DB_API_BODY_TEMPLATE[resource_name]
+                fn = update_factory(resource_name_singular, model, get_http_client)
+                function_name = f'{action}_{resource_name_singular}_by_uid'
+            else:
+                raise Exception('Unknown action')
+
+            if is_async:
+                fn = as_coroutine_function(fn)
+            if action in ('new', 'delete', 'update'):
+                fn = invalidates_cached_responses(resource_name)(fn)
+
+            functions[function_name] = fn
+
+    return functions
+
+
+globals().update(make_resource_request_functions())
 
 
 def get_project_uid() -> Optional[str]:
@@ -283,6 +388,7 @@ def get_project_uid() -> Optional[str]:
 ############### Nodes #################
 
 
+@invalidates_cached_responses('nodes')
 def new_node(pos: list[int, int], typ: str, params_dict: Optional[dict] = None, fields: Optional[list] = None, visible: Optional[bool] = True) -> Response:
     project_uid = aet.project_uid
     pipeline_uid = aet.active_pipeline_uid
@@ -345,7 +451,7 @@ def export_node_code(node_uid: str) -> Response:
 def get_node_by_uid(node_uid: str) -> Response:
     url = f'{BASE_API}/nodes/{node_uid}'
 
-    response = http_client.get(url)
+    response = cached_get('nodes', url)
     flog.info(f'GET Node response: {response.text}')
     
     return response
@@ -353,11 +459,12 @@ def get_node_by_uid(node_uid: str) -> Response:
 
 def get_all_nodes() -> Response:
     url = f'{BASE_API}/nodes'
-    response = http_client.get(url)
+    response = cached_get('nodes', url)
     flog.debug(f'GET all Nodes response: {response.text}')
 
     return response
     
+@invalidates_cached_responses('nodes')
 def delete_node_by_uid(node_uid: str) -> Response:
     url = f'{BASE_API}/nodes/{node_uid}'
     response = http_client.delete(url)
@@ -366,6 +473,7 @@ def delete_node_by_uid(node_uid: str) -> Response:
     return response
     
 
+@invalidates_cached_responses('nodes')
 def delete_all_nodes() -> Response:
     pipeline_uid = aet.active_pipeline_uid
     url = f'{BASE_API}/pipelines/{pipeline_uid}/nodes'
@@ -374,6 +482,7 @@ def delete_all_nodes() -> Response:
     return response
 
 
+@invalidates_cached_responses('nodes')
 def move_node_by_uid(node_uid: str, new_pos: list[int, int]) -> Response:
     payload = {
         "new_pos": new_pos,
@@ -386,6 +495,7 @@ def move_node_by_uid(node_uid: str, new_pos: list[int, int]) -> Response:
     flog.info(f'Move Node response: {response.text}')
     return response
 
+@invalidates_cached_responses('nodes')
 def node_breakpoint_status(node_uid: str, breakpoint_status) -> Response:
     payload = {
         "uid": node_uid,
@@ -398,6 +508,7 @@ def node_breakpoint_status(node_uid: str, breakpoint_status) -> Response:
     flog.info(f'Node breakpoint status: {response.text}')
     return response
 
+@invalidates_cached_responses('nodes')
 def node_disabled_status(node_uid: str, disabled_status) -> Response:
     payload = {
         "uid": node_uid,
@@ -416,6 +527,7 @@ def update_node_params_by_node_detail_form(node_detail_form) -> Response:
     update_node_by_uid(node_uid, params=node_params)
 
 
+@invalidates_cached_responses('nodes')
 def update_node_by_uid(
     node_uid: str,
     pos: Optional[list[int, int]] = None,
@@ -459,6 +571,7 @@ def update_node_by_uid(
 
 ####### SPECIAL NODE - ITEM DETAIL FORM NODE BUTTON FUNCTIONS #########
 
+@invalidates_cached_responses('nodes')
 def node_button_click(node_uid: str, button_name: str) -> Response:
     
     payload = {
@@ -568,7 +681,7 @@ def get_variable_by_name(variable_name: str) -> Response:
     pipeline_job_uid = aet.active_pipeline_job_uid
     url = f'{BASE_API}/variables?name={variable_name}&pipeline_job_uid={pipeline_job_uid}'
 
-    response = http_client.get(url)
+    response = cached_get('variables', url)
     response.raise_for_status()
     flog.info(f'GET Variable by name response: {response.text}')
 
@@ -576,6 +689,7 @@ def get_variable_by_name(variable_name: str) -> Response:
 
     
 
+@invalidates_cached_responses('variables')
 def delete_variable_by_uid(variable_uid: str) -> Response:
     url = f'{BASE_API}/variables/{variable_uid}'
 
@@ -586,6 +700,7 @@ def delete_variable_by_uid(variable_uid: str) -> Response:
     return response
 
 
+@invalidates_cached_responses('variables')
 def delete_all_variables() -> Response:
     pipeline_uid = aet.active_pipeline_uid
     url = f'{BASE_API}/pipelines/{pipeline_uid}/variables'
@@ -594,10 +709,15 @@ def delete_all_variables() -> Response:
     return response
 
 
-def update_variable_by_uid(variable_uid: str, name: str, value: Any, is_result: bool = None, type = None, size: Optional[int] = None) -> Response:
-    project_uid = aet.project_uid
-    pipeline_uid = aet.active_pipeline_uid
-    pipeline_job_uid = aet.active_pipeline_job_uid
+@invalidates_cached_responses('variables')
+def update_variable_by_uid(
+    variable_uid: str, name: str, value: Any, is_result: bool = None, type = None, size: Optional[int] = None,
+    project_uid: Optional[str] = None, pipeline_uid: Optional[str] = None, pipeline_job_uid: Optional[str] = None
+) -> Response:
+    """Entity uids default to the active ones."""
+    project_uid = project_uid or aet.project_uid
+    pipeline_uid = pipeline_uid or aet.active_pipeline_uid
+    pipeline_job_uid = pipeline_job_uid or aet.active_pipeline_job_uid
 
     if type is None:
         for std_type in [str,int,list,dict,float,bool]:
@@ -642,7 +762,7 @@ def cancel_prototype_job(uid: str) -> Response:
     return response
 
 def consume_execution_stream(job_uid: str) -> Generator[dict, None, None]:
-    """Run in a separate thread as this is a blocking operation."""
+    """Run in a separate thread as this is a blocking operation. Dropped connections are resumed."""
     url = f'{BASE_API}/jobs/{job_uid}/execution_stream'
     yield from http_client.sse_stream("GET", url, as_dict=True)
 
@@ -660,17 +780,19 @@ def get_initial_variable_by_name(uid: str) -> Response:
     pipeline_uid = aet.active_pipeline_uid
     url = f'{BASE_API}/initial_variables?name={uid}&pipeline_uid={pipeline_uid}'
 
-    response = http_client.get(url)
+    response = cached_get('initial_variables', url)
     response.raise_for_status()
     return response
 
 
+@invalidates_cached_responses('initial_variables')
 def delete_initial_variable_by_uid(uid: str) -> Response:
     response = http_client.delete(f'{BASE_API}/initial_variables/{uid}')
     response.raise_for_status()
     return response
 
 
+@invalidates_cached_responses('initial_variables')
 def delete_all_initial_variables() -> Response:
     pipeline_uid = aet.active_pipeline_uid
     response = http_client.delete(f'{BASE_API}/pipelines/{pipeline_uid}/initial_variables')
@@ -678,12 +800,15 @@ def delete_all_initial_variables() -> Response:
     return response
 
 
+@invalidates_cached_responses('initial_variables')
 def update_initial_variable_by_uid(
-    variable_uid: str, name: str, value: Any, is_result: bool, type=None, size: Optional[int] = None
+    variable_uid: str, name: str, value: Any, is_result: bool, type=None, size: Optional[int] = None,
+    project_uid: Optional[str] = None, pipeline_uid: Optional[str] = None, pipeline_job_uid: Optional[str] = None
 ) -> Response:
-    project_uid = aet.project_uid
-    pipeline_uid = aet.active_pipeline_uid
-    pipeline_job_uid = aet.active_pipeline_job_uid
+    """Entity uids default to the active ones."""
+    project_uid = project_uid or aet.project_uid
+    pipeline_uid = pipeline_uid or aet.active_pipeline_uid
+    pipeline_job_uid = pipeline_job_uid or aet.active_pipeline_job_uid
 
     if type is None:
         for std_type in [str, int, list, dict, float, bool]:
@@ -986,7 +1111,7 @@ def confirm_selected_node_prediction(node_uid: str, is_used_for_autopilot: bool
 
 def get_form_dict_list_templates() -> Response:
     url = f'{BASE_API}/node_defs'
-    response = http_client.get(url)
+    response = cached_get('node_defs', url)
     flog.debug(f'GET form dict list templates: {response.text}')
 
     return response
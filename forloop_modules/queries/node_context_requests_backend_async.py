@@ -0,0 +1,138 @@
+#### GLC, GOM dependencies forbidden !!!
+"""
+Asynchronous counterpart of node_context_requests_backend - all functions are coroutines with
+response-like return value, so independent requests can be awaited concurrently, e.g.:
+
+    import forloop_modules.queries.node_context_requests_backend_async as ncrb_async
+
+    nodes_response, edges_response = await asyncio.gather(
+        ncrb_async.get_all_nodes(), ncrb_async.get_all_edges()
+    )
+
+The shared AsyncHttpClient is bound to the event loop it is first used in - use it from a single
+long-lived loop and call `await aclose()` at its end.
+"""
+
+import importlib.util
+
+import httpx
+from httpx import Response
+
+import forloop_modules.flog as flog
+from forloop_modules.globals.active_entity_tracker import aet
+from forloop_modules.queries.node_context_requests_backend import BASE_API, make_resource_request_functions
+from forloop_modules.utils.http_client import AsyncHttpClient
+
+# HTTP/2 multiplexes concurrent requests over a single connection, it requires the optional 'h2' package
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+timeout = httpx.Timeout(connect=10.0, read=30.0, write=10.0, pool=5.0)
+limits = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30.0)
+http_client = AsyncHttpClient(timeout=timeout, limits=limits, http2=HTTP2_ENABLED)
+
+
+async def aclose() -> None:
+    """Close all pooled connections of the shared client."""
+    await http_client.aclose()
+
+
+def get_http_client() -> AsyncHttpClient:
+    """The shared client, looked up on every request so that it can be replaced (e.g. in tests)."""
+    return http_client
+
+
+# Async counterparts of the RESOURCES request functions of the synchronous module
+globals().update(make_resource_request_functions(get_http_client, is_async=True))
+
+
+############### Nodes #################
+
+
+async def get_node_by_uid(node_uid: str) -> Response:
+    url = f'{BASE_API}/nodes/{node_uid}'
+
+    response = await http_client.get(url)
+    flog.info(lambda: f'GET Node response: {response.text}')
+
+    return response
+
+
+async def get_all_nodes() -> Response:
+    url = f'{BASE_API}/nodes'
+    response = await http_client.get(url)
+    flog.debug(lambda: f'GET all Nodes response: {response.text}')
+
+    return response
+
+
+############### Edges #################
+
+
+async def get_edges_by_node_uid(node_uid: str) -> Response:
+    url = f'{BASE_API}/nodes/{node_uid}/edges'
+    response = await http_client.get(url)
+    flog.debug(lambda: f'GET Edges by Node Uid response: {response.text}')
+
+    return response
+
+
+### LAST ACTIVE DF
+
+
+async def get_last_active_dataframe_node_uid() -> Response:
+    url = f'{BASE_API}/last_active_dataframe_node_uid?project_uid={aet.project_uid}'
+    response = await http_client.get(url)
+    flog.debug(lambda: f'GET Last active DF node_uid response: {response.text}')
+
+    return response
+
+
+########### Variables ###############
+
+
+async def get_variable_by_name(variable_name: str) -> Response:
+    pipeline_job_uid = aet.active_pipeline_job_uid
+    url = f'{BASE_API}/variables?name={variable_name}&pipeline_job_uid={pipeline_job_uid}'
+
+    response = await http_client.get(url)
+    response.raise_for_status()
+    flog.info(lambda: f'GET Variable by name response: {response.text}')
+
+    return response
+
+
+async def get_job_variables() -> Response:
+    job_uid = aet.active_pipeline_job_uid
+    url = f'{BASE_API}/jobs/{job_uid}/variables'
+    response = await http_client.get(url)
+    response.raise_for_status()
+    return response
+
+
+async def get_initial_variable_by_name(uid: str) -> Response:
+    pipeline_uid = aet.active_pipeline_uid
+    url = f'{BASE_API}/initial_variables?name={uid}&pipeline_uid={pipeline_uid}'
+
+    response = await http_client.get(url)
+    response.raise_for_status()
+    return response
+
+
+########### Scripts ###############
+
+
+async def get_last_active_script() -> Response:
+    url = f'{BASE_API}/last_active_script?project_uid={aet.project_uid}'
+
+    response = await http_client.get(url)
+    flog.info(lambda: f'GET Last active Script response: {response.text}')
+
+    return response
+
+
+async def get_form_dict_list_templates() -> Response:
+    url = f'{BASE_API}/node_defs'
+    response = await http_client.get(url)
+    flog.debug(lambda: f'GET form dict list templates: {response.text}')
+
+    return response
@@ -17,6 +17,9 @@ class RedisConfig:
     VARIABLE_KEY: str = "pipeline_job:{pipeline_job_uid}:variable:{variable_name}"
     INITIAL_VARIABLE_KEY: str = "pipeline:{pipeline_uid}:initial_variable:{variable_name}"
     
+    # Counter incremented on every write of a Redis-stored variable value, validates locally cached values
+    VARIABLE_VERSION_KEY_TEMPLATE: str = "{variable_redis_name}:version"
+
     # This key stores a bool value signaling variable changes to streaming endpoints
     VARS_CHANGED_KEY: str = "pipeline_job:{pipeline_job_uid}:vars_changed"
 
@@ -139,3 +139,6 @@ def get_variable_redis_name(name: str, pipeline_job_uid: str) -> str:
 
 def get_initial_variable_redis_name(name: str, pipeline_uid: str) -> str:
     return redis_config.INITIAL_VARIABLE_KEY.format(pipeline_uid=pipeline_uid, variable_name=name)
+
+def get_variable_version_redis_name(variable_redis_name: str) -> str:
+    return redis_config.VARIABLE_VERSION_KEY_TEMPLATE.format(variable_redis_name=variable_redis_name)
@@ -0,0 +1,212 @@
+"""
+Waiting for results written by other processes (docrawl) to Redis keys or files.
+
+Waits are woken by notifications - Redis keyspace notifications of the awaited key, inotify events of
+the awaited file's directory (Linux) - and fall back to polling with exponential backoff, so a result
+is picked up within milliseconds without busy looping. Keyspace notifications must be enabled on the
+Redis server (notify-keyspace-events, e.g. "KA"), otherwise the backoff polling is the only mechanism.
+
+Every wait is recorded into wait_metrics (wait time histogram, number of timeouts and the mechanism
+which detected the result) per kind of wait.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Literal, Optional, Union
+
+import forloop_modules.flog as flog
+from forloop_modules.utils.http_resilience import LatencyHistogram
+
+INITIAL_POLL_DELAY = 0.005  # seconds
+MAX_POLL_DELAY = 0.25  # seconds
+
+WaitMechanism = Literal["immediate", "notification", "poll", "timeout"]
+
+_INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+
+
+@dataclass
+class WaitKindMetrics:
+    wait_time: LatencyHistogram = field(default_factory=LatencyHistogram)
+    mechanisms: dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "wait_time": self.wait_time.to_dict(),
+            "mechanisms": dict(self.mechanisms),
+            "timeouts": self.mechanisms.get("timeout", 0),
+        }
+
+
+class WaitMetrics:
+    """Thread-safe wait time metrics per kind of wait (e.g. "redis", "file")."""
+
+    def __init__(self):
+        self._kinds: dict[str, WaitKindMetrics] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, wait_time: float, mechanism: WaitMechanism) -> None:
+        with self._lock:
+            metrics = self._kinds.setdefault(kind, WaitKindMetrics())
+            metrics.wait_time.observe(wait_time)
+            metrics.mechanisms[mechanism] = metrics.mechanisms.get(mechanism, 0) + 1
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            return {kind: metrics.to_dict() for kind, metrics in self._kinds.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._kinds = {}
+
+
+wait_metrics = WaitMetrics()
+
+
+class BackoffDelays:
+    """Poll delays growing exponentially from initial_delay up to max_delay, cut to the remaining time."""
+
+    def __init__(self, timeout: float, initial_delay: float = INITIAL_POLL_DELAY, max_delay: float = MAX_POLL_DELAY):
+        self.deadline = time.monotonic() + timeout
+        self.delay = initial_delay
+        self.max_delay = max_delay
+
+    def next(self) -> Optional[float]:
+        """Next delay or None when the timeout has passed."""
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        delay = min(self.delay, remaining)
+        self.delay = min(self.delay * 2, self.max_delay)
+        return delay
+
+
+def _wait_until(
+    kind: str,
+    check: Callable[[], Any],
+    wait_for_notification: Callable[[float], bool],
+    timeout: float,
+) -> Optional[Any]:
+    """
+    Return the first truthy result of check() or None on timeout. Between the checks wait_for_notification
+    (delay) blocks at most for the backoff delay and returns whether it was woken by a notification.
+    """
+    start = time.monotonic()
+    result = check()
+    mechanism = "immediate"
+
+    backoff = BackoffDelays(timeout)
+    while not result:
+        delay = backoff.next()
+        if delay is None:
+            mechanism = "timeout"
+            break
+        is_notified = wait_for_notification(delay)
+        result = check()
+        mechanism = "notification" if is_notified else "poll"
+
+    wait_time = time.monotonic() - start
+    wait_metrics.record(kind, wait_time, mechanism)
+    flog.debug(lambda: f"Wait for {kind} finished after {wait_time:.3f}s ({mechanism})")
+    return result or None
+
+
+def wait_for_redis_key(kv_redis, key: str, timeout: float) -> Optional[Any]:
+    """
+    Wait until the Redis key has a truthy value and return it, None on timeout. Works with keepvariable's
+    dummy server too (polling only).
+    """
+    redis_client = getattr(kv_redis, "redis", None)
+    pubsub = None
+    if redis_client is not None:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            # Subscribed before the first check, so a value set in between is not missed
+            pubsub.subscribe(f"__keyspace@{getattr(kv_redis, 'db', 0)}__:{key}")
+        except Exception as e:
+            flog.warning(f"Keyspace notifications of {key} unavailable, polling: {e}")
+            pubsub = None
+
+    def wait_for_notification(delay: float) -> bool:
+        if pubsub is None:
+            time.sleep(delay)
+            return False
+        return pubsub.get_message(timeout=delay) is not None
+
+    try:
+        return _wait_until("redis", lambda: kv_redis.get(key), wait_for_notification, timeout)
+    finally:
+        if pubsub is not None:
+            pubsub.close()
+
+
+class InotifyWatcher:
+    """Minimal inotify watch of files written (closed or moved) into a directory, Linux only."""
+
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), _IN_CLOSE_WRITE | _IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch of {directory} failed")
+
+    def wait(self, timeout: float) -> set[str]:
+        """Names of files written within the timeout (empty when none was)."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        names = set()
+        buffer = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset + _INOTIFY_EVENT_HEADER.size <= len(buffer):
+            _, _, _, name_length = _INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _INOTIFY_EVENT_HEADER.size
+            names.add(os.fsdecode(buffer[offset:offset + name_length].rstrip(b"\0")))
+            offset += name_length
+        return names
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _create_inotify_watcher(directory: Path) -> Optional[InotifyWatcher]:
+    if not sys.platform.startswith("linux") or not directory.is_dir():
+        return None
+    try:
+        return InotifyWatcher(directory)
+    except (OSError, AttributeError) as e:  # AttributeError - libc without inotify functions
+        flog.debug(lambda: f"inotify watch of {directory} unavailable, polling: {e}")
+        return None
+
+
+def wait_for_file(path: Union[str, Path], timeout: float) -> bool:
+    """Wait until the file exists, return False on timeout."""
+    path = Path(path)
+    watcher = _create_inotify_watcher(path.parent.absolute())
+
+    def wait_for_notification(delay: float) -> bool:
+        if watcher is None:
+            time.sleep(delay)
+            return False
+        return path.name in watcher.wait(delay)
+
+    try:
+        return bool(_wait_until("file", path.is_file, wait_for_notification, timeout))
+    finally:
+        if watcher is not None:
+            watcher.close()
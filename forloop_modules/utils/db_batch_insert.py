@@ -0,0 +1,120 @@
+"""
+Batched inserts (and upserts) of DataFrames into SQL tables.
+
+Rows are sent by executemany() of one parameterized INSERT statement per batch - the statement is
+prepared once and drivers send the batch in bulk (pymysql rewrites it into multi-row INSERTs, psycopg2
+pages it by execute_batch, pyodbc uses fast_executemany). Every batch is committed on its own, a failed
+batch is rolled back and retried with backoff; a batch failing repeatedly is recorded in the summary
+and the insert continues with the next one. Autocommit of the connection is turned off during the insert,
+so a batch is written as a whole or not at all.
+"""
+
+import time
+from collections.abc import Generator
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+
+import forloop_modules.flog as flog
+from forloop_modules.utils.db_table_copy import CopyDialect, explicit_transactions
+
+DEFAULT_INSERT_BATCH_SIZE = 5_000
+DEFAULT_INSERT_MAX_RETRIES = 2
+DEFAULT_INSERT_RETRY_DELAY = 0.5  # seconds, doubled with every retry
+
+
+@dataclass
+class BatchInsertSummary:
+    rows_written: int = 0
+    rows_failed: int = 0
+    batches: int = 0
+    failed_batches: int = 0
+    retries: int = 0
+    elapsed: float = 0.0
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_written / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "retries": self.retries,
+            "elapsed": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "errors": self.errors,
+        }
+
+
+def iter_df_row_batches(df: pd.DataFrame, batch_size: int) -> Generator[list[tuple], None, None]:
+    """Yield rows of the DataFrame as tuples of Python values (NaN/NaT as None), batch_size rows at a time."""
+    for start in range(0, len(df), batch_size):
+        batch_df = df.iloc[start:start + batch_size].astype(object)
+        batch_df = batch_df.where(batch_df.notna(), None)
+        yield list(batch_df.itertuples(index=False, name=None))
+
+
+def _insert_batch(connection, cursor, dialect: CopyDialect, query: str, table_name: str, rows: list[tuple],
+                  summary: BatchInsertSummary, max_retries: int, retry_delay: float) -> None:
+    for attempt in range(max_retries + 1):
+        try:
+            dialect.executemany(cursor, query, rows)
+            connection.commit()
+            summary.rows_written += len(rows)
+            return
+        except Exception as e:
+            connection.rollback()
+            if attempt < max_retries:
+                summary.retries += 1
+                delay = retry_delay * 2 ** attempt
+                flog.warning(f"{table_name}: batch {summary.batches} failed ({e}), retrying in {delay}s")
+                time.sleep(delay)
+            else:
+                summary.rows_failed += len(rows)
+                summary.failed_batches += 1
+                summary.errors.append(f"Batch {summary.batches}: {e.__class__.__name__}: {e}")
+                flog.error(f"{table_name}: batch {summary.batches} of {len(rows)} rows failed - {e}")
+
+
+def insert_df_in_batches(
+    connection,
+    dialect: CopyDialect,
+    table_name: str,
+    df: pd.DataFrame,
+    batch_size: int = DEFAULT_INSERT_BATCH_SIZE,
+    conflict_columns: Optional[list[str]] = None,
+    max_retries: int = DEFAULT_INSERT_MAX_RETRIES,
+    retry_delay: float = DEFAULT_INSERT_RETRY_DELAY,
+) -> BatchInsertSummary:
+    """
+    Insert the DataFrame into the table over an open DB-API connection, columns are matched by name.
+
+    :param conflict_columns: Unique key columns - rows with an existing key are updated (upsert)
+    :type conflict_columns: Optional[list[str]]
+    :param max_retries: Number of retries of a failed batch
+    :type max_retries: int
+    :return: Numbers of written and failed rows and batches, errors of failed batches
+    :rtype: BatchInsertSummary
+    """
+    summary = BatchInsertSummary()
+    start = time.perf_counter()
+    query = dialect.build_insert_query(table_name, [str(column) for column in df.columns], conflict_columns)
+
+    with explicit_transactions(connection):
+        cursor = connection.cursor()
+        try:
+            for rows in iter_df_row_batches(df, batch_size):
+                summary.batches += 1
+                _insert_batch(connection, cursor, dialect, query, table_name, rows, summary, max_retries, retry_delay)
+        finally:
+            cursor.close()
+
+    summary.elapsed = time.perf_counter() - start
+    flog.info(f"{table_name}: {summary.rows_written} rows written, {summary.rows_failed} failed in "
+              f"{summary.elapsed:.2f}s ({summary.rows_per_second:,.0f} rows/s)")
+    return summary
@@ -0,0 +1,183 @@
+"""
+Streaming SELECT into DataFrame chunks.
+
+Rows are fetched in chunks of chunk_size - through server-side cursors for MySQL (SSCursor) and
+PostgreSQL (named cursor), fetchmany for SQL Server (pyodbc fetches from the driver lazily), cursor
+batches for MongoDB and result pages for BigQuery - and each chunk is converted to a DataFrame right
+away, so the whole result set never exists as a list of Python row objects. The chunks can be spilled
+to a Parquet file, in which case only a single chunk is held in memory at once.
+
+All functions must be called (and generators consumed) within an open DB connection.
+"""
+
+import uuid
+from collections.abc import Generator, Iterable
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import dbhydra.dbhydra_core as dh
+import pandas as pd
+
+import forloop_modules.flog as flog
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def _open_streaming_cursor(db_instance) -> Any:
+    connection = db_instance.connection
+    if isinstance(db_instance, dh.MysqlDb):
+        import pymysql.cursors
+
+        return connection.cursor(pymysql.cursors.SSCursor)
+    elif isinstance(db_instance, dh.PostgresDb):
+        # Named cursors are server-side in psycopg2, fetchmany() fetches the rows from the server. WITH HOLD
+        # is needed on autocommit connections (as dbhydra opens them), the cursor is closed by the caller
+        return connection.cursor(name=f"forloop_stream_{uuid.uuid4().hex}", withhold=True)
+    else:
+        return connection.cursor()
+
+
+def iter_cursor_chunks(cursor, query: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Generator[pd.DataFrame, None, None]:
+    """
+    Execute the query on a DB-API cursor and yield the result in DataFrames of at most chunk_size rows.
+    An empty result yields a single empty DataFrame with the selected columns.
+    """
+    cursor.execute(query)
+    columns = None
+    is_empty = True
+
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if columns is None:  # Named psycopg2 cursors have description only after the first fetch
+            columns = [column_description[0] for column_description in cursor.description or []]
+        if not rows:
+            break
+
+        is_empty = False
+        yield pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+
+    if is_empty:
+        yield pd.DataFrame(columns=columns)
+
+
+def _iter_mongo_chunks(db_table, query: dict, columns: Optional[Union[dict, str]], chunk_size: int):
+    projection = None if not columns or columns == "*" else columns
+    cursor = db_table.collection.find(query, projection).batch_size(chunk_size)
+
+    def to_df(documents: list) -> pd.DataFrame:
+        return pd.DataFrame(documents).drop(columns=["_id"], errors="ignore")
+
+    documents = []
+    is_empty = True
+    for document in cursor:
+        documents.append(document)
+        if len(documents) == chunk_size:
+            is_empty = False
+            yield to_df(documents)
+            documents = []
+
+    if documents or is_empty:
+        yield to_df(documents)
+
+
+def _iter_bigquery_chunks(db_instance, query: str, chunk_size: int):
+    rows = db_instance.client.query(query).result(page_size=chunk_size)
+
+    is_empty = True
+    for df in rows.to_dataframe_iterable():
+        is_empty = False
+        yield df
+
+    if is_empty:  # No result pages
+        yield pd.DataFrame(columns=[schema_field.name for schema_field in rows.schema])
+
+
+def iter_select_chunks(
+    db_instance,
+    db_table,
+    query: Union[str, dict],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    columns: Optional[Union[dict, str]] = None,
+) -> Generator[pd.DataFrame, None, None]:
+    """
+    Yield the result of a SELECT query (a filter dict for MongoDB) in DataFrames of at most chunk_size rows.
+
+    :param columns: MongoDB projection of selected columns (ignored for SQL databases)
+    :type columns: Optional[Union[dict, str]]
+    """
+    if isinstance(db_instance, dh.MongoDb):
+        db_table.update_collection()
+        yield from _iter_mongo_chunks(db_table, query, columns, chunk_size)
+    elif isinstance(db_instance, dh.BigQueryDb):
+        yield from _iter_bigquery_chunks(db_instance, query, chunk_size)
+    else:
+        cursor = _open_streaming_cursor(db_instance)
+        try:
+            yield from iter_cursor_chunks(cursor, query, chunk_size)
+        finally:
+            cursor.close()
+
+
+def concat_chunks(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def select_to_df(
+    db_instance,
+    db_table,
+    query: Union[str, dict],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    columns: Optional[Union[dict, str]] = None,
+) -> pd.DataFrame:
+    """Select the whole result into one DataFrame, fetched in chunks (see iter_select_chunks)."""
+    return concat_chunks(iter_select_chunks(db_instance, db_table, query, chunk_size, columns))
+
+
+def write_chunks_to_parquet(chunks: Iterable[pd.DataFrame], path: Union[str, Path]) -> dict:
+    """
+    Write DataFrame chunks into a single Parquet file, holding only one chunk in memory at a time.
+
+    :return: number of written rows and chunks
+    :rtype: dict
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    stats = {"rows": 0, "chunks": 0, "path": str(path)}
+
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(path, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+            stats["rows"] += len(chunk)
+            stats["chunks"] += 1
+    finally:
+        if writer is not None:
+            writer.close()
+
+    flog.info(f"{stats['rows']} rows in {stats['chunks']} chunks written to {path}")
+    return stats
+
+
+def select_to_parquet(
+    db_instance,
+    db_table,
+    query: Union[str, dict],
+    path: Union[str, Path],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    columns: Optional[Union[dict, str]] = None,
+) -> dict:
+    """Stream the result of a SELECT query into a Parquet file, see write_chunks_to_parquet."""
+    return write_chunks_to_parquet(iter_select_chunks(db_instance, db_table, query, chunk_size, columns), path)
@@ -0,0 +1,501 @@
+"""
+Chunked, parallel and resumable copying of table data between SQL databases.
+
+Tables are read in chunks by keyset pagination (WHERE key > last key ORDER BY key LIMIT chunk_size),
+so every chunk is an index range scan no matter how deep into the table it is, and written by the
+fastest path of the destination dialect - multi-row INSERT statements, COPY FROM STDIN (PostgreSQL),
+LOAD DATA LOCAL INFILE (MySQL, needs local_infile enabled on both sides) or fast_executemany (SQL
+Server). Every table is copied on its own pair of connections, up to max_workers tables at once.
+
+After each committed chunk the last copied key of the table is saved as a checkpoint, a failed copy
+started again with the same checkpoints continues where it stopped. Tables without the key column
+are copied by a single streamed SELECT and can only be restarted from the beginning.
+
+Connections are created by factories - callables returning a context manager which yields a DB-API
+connection - so the copying works with any driver, e.g. sqlite3 in tests.
+"""
+
+import io
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Generator, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal, Optional
+
+import forloop_modules.flog as flog
+
+DEFAULT_COPY_CHUNK_SIZE = 10_000
+DEFAULT_COPY_WORKERS = 4
+TABLE_COPY_CHECKPOINT_KEY_PREFIX = "table_copy_checkpoint"
+
+BulkLoadMethod = Literal["auto", "insert", "native"]
+ConnectionFactory = Callable[[], AbstractContextManager]
+
+
+class CopyDialect:
+    """SQL of bulk reads and writes for a dialect, the base class works with qmark drivers (sqlite3)."""
+
+    placeholder = "?"
+    max_parameters = 999  # Maximum number of parameters of one statement
+
+    def quote(self, identifier: str) -> str:
+        return '"' + identifier.replace('"', '""') + '"'
+
+    def build_insert_query(self, table_name: str, columns: list[str],
+                           conflict_columns: Optional[list[str]] = None) -> str:
+        """
+        Single-row INSERT for executemany(). With conflict_columns rows colliding on them (unique key) are
+        updated instead - upsert.
+        """
+        query = (
+            f"INSERT INTO {self.quote(table_name)} ({', '.join(self.quote(column) for column in columns)}) "
+            f"VALUES ({', '.join([self.placeholder] * len(columns))})"
+        )
+        if not conflict_columns:
+            return query
+
+        query += f" ON CONFLICT ({', '.join(self.quote(column) for column in conflict_columns)})"
+        updated_columns = [column for column in columns if column not in conflict_columns]
+        if not updated_columns:
+            return query + " DO NOTHING"
+        return query + " DO UPDATE SET " + ", ".join(
+            f"{self.quote(column)} = excluded.{self.quote(column)}" for column in updated_columns
+        )
+
+    def executemany(self, cursor, query: str, rows: list[tuple]) -> None:
+        cursor.executemany(query, rows)
+
+    def build_select_query(self, table_name: str, columns: list[str], key_column: Optional[str],
+                           has_start_key: bool, chunk_size: int) -> str:
+        query = f"SELECT {', '.join(self.quote(column) for column in columns)} FROM {self.quote(table_name)}"
+        if key_column is None:
+            return query
+        if has_start_key:
+            query += f" WHERE {self.quote(key_column)} > {self.placeholder}"
+        return query + f" ORDER BY {self.quote(key_column)} LIMIT {chunk_size}"
+
+    def build_delete_query(self, table_name: str, key_column: Optional[str] = None) -> str:
+        """Delete all rows, or the rows after the given key if key_column is set."""
+        query = f"DELETE FROM {self.quote(table_name)}"
+        if key_column is not None:
+            query += f" WHERE {self.quote(key_column)} > {self.placeholder}"
+        return query
+
+    def insert_rows(self, connection, table_name: str, columns: list[str], rows: list[tuple],
+                    bulk_load: BulkLoadMethod = "auto") -> None:
+        """Insert rows by multi-row INSERT statements with as many rows as the parameter limit allows."""
+        row_placeholders = "(" + ", ".join([self.placeholder] * len(columns)) + ")"
+        rows_per_statement = max(1, self.max_parameters // len(columns))
+        query_start = (
+            f"INSERT INTO {self.quote(table_name)} ({', '.join(self.quote(column) for column in columns)}) VALUES "
+        )
+
+        cursor = connection.cursor()
+        try:
+            for i in range(0, len(rows), rows_per_statement):
+                statement_rows = rows[i:i + rows_per_statement]
+                query = query_start + ", ".join([row_placeholders] * len(statement_rows))
+                cursor.execute(query, [value for row in statement_rows for value in row])
+        finally:
+            cursor.close()
+
+
+class MysqlCopyDialect(CopyDialect):
+    placeholder = "%s"
+    max_parameters = 65_535
+
+    def quote(self, identifier: str) -> str:
+        return "`" + identifier.replace("`", "``") + "`"
+
+    def build_insert_query(self, table_name, columns, conflict_columns=None):
+        # pymysql rewrites executemany() of this INSERT into multi-row INSERT statements
+        query = super().build_insert_query(table_name, columns)
+        if not conflict_columns:
+            return query
+
+        updated_columns = [column for column in columns if column not in conflict_columns] or conflict_columns[:1]
+        return query + " ON DUPLICATE KEY UPDATE " + ", ".join(
+            f"{self.quote(column)} = VALUES({self.quote(column)})" for column in updated_columns
+        )
+
+    def insert_rows(self, connection, table_name, columns, rows, bulk_load="auto"):
+        if bulk_load != "native":  # LOAD DATA LOCAL INFILE is disabled by default on servers and clients
+            return super().insert_rows(connection, table_name, columns, rows, bulk_load)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8", newline="", delete=False) as file:
+            file.write(format_csv_rows(rows, null="NULL"))
+        try:
+            query = (
+                f"LOAD DATA LOCAL INFILE '{Path(file.name).as_posix()}' INTO TABLE {self.quote(table_name)} "
+                "CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' ENCLOSED BY '\"' ESCAPED BY '' "
+                f"LINES TERMINATED BY '\\n' ({', '.join(self.quote(column) for column in columns)})"
+            )
+            cursor = connection.cursor()
+            try:
+                cursor.execute(query)
+            finally:
+                cursor.close()
+        finally:
+            Path(file.name).unlink(missing_ok=True)
+
+
+class PostgresCopyDialect(CopyDialect):
+    placeholder = "%s"
+    max_parameters = 65_535
+
+    def executemany(self, cursor, query, rows):
+        # psycopg2's executemany() makes a round trip per row, execute_batch() sends them in pages
+        from psycopg2.extras import execute_batch
+
+        execute_batch(cursor, query, rows, page_size=1000)
+
+    def insert_rows(self, connection, table_name, columns, rows, bulk_load="auto"):
+        if bulk_load == "insert":
+            return super().insert_rows(connection, table_name, columns, rows, bulk_load)
+
+        query = (
+            f"COPY {self.quote(table_name)} ({', '.join(self.quote(column) for column in columns)}) "
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+        cursor = connection.cursor()
+        try:
+            cursor.copy_expert(query, io.StringIO(format_csv_rows(rows, null="", to_string=format_postgres_copy_value)))
+        finally:
+            cursor.close()
+
+
+class SqlServerCopyDialect(CopyDialect):
+    max_parameters = 2_100
+
+    def quote(self, identifier: str) -> str:
+        return "[" + identifier.replace("]", "]]") + "]"
+
+    def build_select_query(self, table_name, columns, key_column, has_start_key, chunk_size):
+        if key_column is None:
+            return super().build_select_query(table_name, columns, key_column, has_start_key, chunk_size)
+
+        query = (
+            f"SELECT TOP {chunk_size} {', '.join(self.quote(column) for column in columns)} "
+            f"FROM {self.quote(table_name)}"
+        )
+        if has_start_key:
+            query += f" WHERE {self.quote(key_column)} > {self.placeholder}"
+        return query + f" ORDER BY {self.quote(key_column)}"
+
+    def build_insert_query(self, table_name, columns, conflict_columns=None):
+        if not conflict_columns:
+            return super().build_insert_query(table_name, columns)
+
+        source_columns = ", ".join(f"{self.placeholder} AS {self.quote(column)}" for column in columns)
+        condition = " AND ".join(
+            f"target.{self.quote(column)} = source.{self.quote(column)}" for column in conflict_columns
+        )
+        query = (
+            f"MERGE INTO {self.quote(table_name)} AS target USING (SELECT {source_columns}) AS source ON {condition}"
+        )
+        updated_columns = [column for column in columns if column not in conflict_columns]
+        if updated_columns:
+            query += " WHEN MATCHED THEN UPDATE SET " + ", ".join(
+                f"target.{self.quote(column)} = source.{self.quote(column)}" for column in updated_columns
+            )
+        return query + (
+            f" WHEN NOT MATCHED THEN INSERT ({', '.join(self.quote(column) for column in columns)})"
+            f" VALUES ({', '.join(f'source.{self.quote(column)}' for column in columns)});"
+        )
+
+    def executemany(self, cursor, query, rows):
+        cursor.fast_executemany = True  # pyodbc sends all rows in one parameter array
+        cursor.executemany(query, rows)
+
+    def insert_rows(self, connection, table_name, columns, rows, bulk_load="auto"):
+        if bulk_load == "insert":
+            return super().insert_rows(connection, table_name, columns, rows, bulk_load)
+
+        cursor = connection.cursor()
+        try:
+            self.executemany(cursor, self.build_insert_query(table_name, columns), rows)
+        finally:
+            cursor.close()
+
+
+COPY_DIALECTS = {
+    "MySQL": MysqlCopyDialect(),
+    "PostgreSQL": PostgresCopyDialect(),
+    "SQL Server": SqlServerCopyDialect(),
+}
+
+
+@contextmanager
+def explicit_transactions(connection) -> Generator[Any, None, None]:
+    """
+    Turn autocommit of the connection off for the duration of the block, so that commit() and rollback()
+    control what is written - dbhydra connects to remote PostgreSQL in autocommit mode, where every
+    statement (e.g. every execute_batch page) is committed on its own.
+    """
+    autocommit = getattr(connection, "autocommit", None)
+    if callable(autocommit):  # pymysql: autocommit(value) and get_autocommit()
+        was_autocommit = connection.get_autocommit()
+        set_autocommit = connection.autocommit
+    else:  # psycopg2, pyodbc: autocommit attribute (sqlite3 has none or a non-bool one, left as it is)
+        was_autocommit = autocommit is True
+
+        def set_autocommit(value: bool) -> None:
+            connection.autocommit = value
+
+    if not was_autocommit:
+        yield connection
+        return
+
+    set_autocommit(False)
+    try:
+        yield connection
+    finally:
+        set_autocommit(True)
+
+
+def get_copy_dialect(dialect_name: Optional[str]) -> CopyDialect:
+    return COPY_DIALECTS.get(dialect_name, CopyDialect())
+
+
+def format_postgres_copy_value(value) -> str:
+    """Text of a value as read by Postgres COPY (bytea in the hex format, booleans as t/f)."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\x" + bytes(value).hex()
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value)
+
+
+def format_csv_rows(rows: Iterable[tuple], null: str, to_string: Callable[[Any], str] = str) -> str:
+    """Format rows as CSV with every value quoted and NULLs written as the unquoted null string."""
+    def format_value(value) -> str:
+        if value is None:
+            return null
+        return '"' + to_string(value).replace('"', '""') + '"'
+
+    return "".join(",".join(format_value(value) for value in row) + "\n" for row in rows)
+
+
+class _MemoryCheckpointStorage:
+    def __init__(self):
+        self.storage = {}
+
+    def get(self, key: str):
+        return self.storage.get(key)
+
+    def set(self, key: str, value) -> None:
+        self.storage[key] = value
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.storage.pop(key, None)
+
+
+def get_database_identity(db_details: dict) -> str:
+    """Identity of a database (dialect, server, port and database name) from dbhydra's db_details."""
+    return "/".join(str(db_details.get(field, "")) for field in ("DIALECT", "DB_SERVER", "DB_PORT", "DB_DATABASE"))
+
+
+class TableCopyCheckpoints:
+    """
+    Progress of copied tables of one migration between the origin and the destination database - checkpoints
+    of a migration with the same name between other databases are not used. The storage needs get/set/delete
+    methods, e.g. kv_redis for checkpoints surviving the process, by default checkpoints are kept in memory.
+
+    :param origin: Identity of the origin database, see get_database_identity
+    :type origin: str
+    :param destination: Identity of the destination database
+    :type destination: str
+    """
+
+    def __init__(self, migration_name: str, storage=None, origin: str = "", destination: str = ""):
+        self.migration_name = migration_name
+        self.origin = origin
+        self.destination = destination
+        self.storage = storage if storage is not None else _MemoryCheckpointStorage()
+        self._lock = threading.Lock()
+
+    def _get_key(self, table_name: str) -> str:
+        return (
+            f"{TABLE_COPY_CHECKPOINT_KEY_PREFIX}:{self.migration_name}:{self.origin}->{self.destination}:{table_name}"
+        )
+
+    def get(self, table_name: str) -> Optional[dict]:
+        """
+        :return: {"last_key": Any, "rows_copied": int, "is_finished": bool} or None if the copy has not started
+        :rtype: Optional[dict]
+        """
+        with self._lock:
+            checkpoint = self.storage.get(self._get_key(table_name))
+        return checkpoint if isinstance(checkpoint, dict) else None
+
+    def save(self, table_name: str, last_key: Any, rows_copied: int, is_finished: bool = False) -> None:
+        checkpoint = {"last_key": last_key, "rows_copied": rows_copied, "is_finished": is_finished}
+        with self._lock:
+            self.storage.set(self._get_key(table_name), checkpoint)
+
+    def clear(self, table_names: Iterable[str]) -> None:
+        keys = [self._get_key(table_name) for table_name in table_names]
+        if keys:
+            with self._lock:
+                self.storage.delete(*keys)
+
+
+@dataclass
+class TableCopyResult:
+    table_name: str
+    status: Literal["copied", "resumed", "skipped", "failed"]
+    rows_copied: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_copied / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class TableCopier:
+    """
+    Copy tables from the origin to the destination database, replacing the data in the destination.
+
+    Usage:
+        copier = TableCopier(connect_origin, connect_destination, get_copy_dialect("MySQL"),
+                             get_copy_dialect("PostgreSQL"), checkpoints=TableCopyCheckpoints("migration-1"))
+        results = copier.copy_tables({"users": ["id", "name"], "orders": ["id", "user_id", "price"]})
+    """
+
+    def __init__(
+        self,
+        connect_origin: ConnectionFactory,
+        connect_destination: ConnectionFactory,
+        origin_dialect: CopyDialect,
+        destination_dialect: CopyDialect,
+        chunk_size: int = DEFAULT_COPY_CHUNK_SIZE,
+        max_workers: int = DEFAULT_COPY_WORKERS,
+        bulk_load: BulkLoadMethod = "auto",
+        checkpoints: Optional[TableCopyCheckpoints] = None,
+        key_column: str = "id",
+    ):
+        """
+        :param bulk_load: "insert" = multi-row INSERT, "native" = COPY/LOAD DATA/fast_executemany of the destination
+            dialect, "auto" = native where it needs no server configuration (all but MySQL)
+        :type bulk_load: BulkLoadMethod
+        :param key_column: Unique, indexed column used for keyset pagination and checkpoints
+        :type key_column: str
+        """
+        self.connect_origin = connect_origin
+        self.connect_destination = connect_destination
+        self.origin_dialect = origin_dialect
+        self.destination_dialect = destination_dialect
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.bulk_load = bulk_load
+        self.checkpoints = checkpoints if checkpoints is not None else TableCopyCheckpoints("")
+        self.key_column = key_column
+
+    def copy_tables(self, tables: dict[str, list[str]]) -> list[TableCopyResult]:
+        """
+        Copy tables in parallel, checkpoints are cleared when all the tables were copied successfully.
+
+        :param tables: Columns of the copied tables by table name
+        :type tables: dict[str, list[str]]
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers), thread_name_prefix="TableCopy") as executor:
+            results = list(executor.map(lambda item: self.copy_table(*item), tables.items()))
+        elapsed = time.perf_counter() - start
+
+        rows_copied = sum(result.rows_copied for result in results if result.status != "skipped")
+        failed_tables = [result.table_name for result in results if result.status == "failed"]
+        flog.info(f"{len(tables) - len(failed_tables)}/{len(tables)} tables, {rows_copied} rows copied in "
+                  f"{elapsed:.1f}s ({rows_copied / elapsed if elapsed > 0 else 0:,.0f} rows/s)", self)
+
+        if failed_tables:
+            flog.error(f"Copying of tables {', '.join(failed_tables)} failed, run the copy again to resume it", self)
+        else:
+            self.checkpoints.clear(tables.keys())
+
+        return results
+
+    def copy_table(self, table_name: str, columns: list[str]) -> TableCopyResult:
+        checkpoint = self.checkpoints.get(table_name)
+        if checkpoint is not None and checkpoint.get("is_finished"):
+            flog.info(f"{table_name}: already copied, skipped", self)
+            return TableCopyResult(table_name, "skipped", rows_copied=checkpoint.get("rows_copied", 0))
+
+        key_column = self.key_column if self.key_column in columns else None
+        last_key = checkpoint.get("last_key") if checkpoint is not None and key_column is not None else None
+        rows_copied = checkpoint.get("rows_copied", 0) if last_key is not None else 0
+        status = "resumed" if last_key is not None else "copied"
+
+        start = time.perf_counter()
+        try:
+            with self.connect_origin() as origin_connection, self.connect_destination() as destination_connection:
+                self._delete_destination_rows(destination_connection, table_name, key_column, last_key)
+
+                for rows in self._iter_origin_chunks(origin_connection, table_name, columns, key_column, last_key):
+                    self.destination_dialect.insert_rows(
+                        destination_connection, table_name, columns, rows, self.bulk_load
+                    )
+                    destination_connection.commit()
+                    rows_copied += len(rows)
+                    if key_column is not None:
+                        last_key = rows[-1][columns.index(key_column)]
+                        self.checkpoints.save(table_name, last_key, rows_copied)
+                    flog.debug(lambda: f"{table_name}: {rows_copied} rows copied")
+
+            self.checkpoints.save(table_name, last_key, rows_copied, is_finished=True)
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            flog.error(f"{table_name}: copying failed after {rows_copied} rows - {e.__class__.__name__}: {e}", self)
+            return TableCopyResult(table_name, "failed", rows_copied, elapsed, error=str(e))
+
+        result = TableCopyResult(table_name, status, rows_copied, time.perf_counter() - start)
+        flog.info(f"{table_name}: {result.rows_copied} rows {result.status} in {result.elapsed:.1f}s "
+                  f"({result.rows_per_second:,.0f} rows/s)", self)
+        return result
+
+    def _delete_destination_rows(self, connection, table_name: str, key_column: Optional[str], last_key: Any) -> None:
+        """Delete all rows, when resuming only rows inserted after the checkpoint was saved."""
+        cursor = connection.cursor()
+        try:
+            if last_key is None:
+                cursor.execute(self.destination_dialect.build_delete_query(table_name))
+            else:
+                cursor.execute(self.destination_dialect.build_delete_query(table_name, key_column), (last_key,))
+            connection.commit()
+        finally:
+            cursor.close()
+
+    def _iter_origin_chunks(self, connection, table_name: str, columns: list[str], key_column: Optional[str],
+                            last_key: Any) -> Generator[list[tuple], None, None]:
+        cursor = connection.cursor()
+        try:
+            if key_column is None:
+                cursor.execute(self.origin_dialect.build_select_query(table_name, columns, None, False, self.chunk_size))
+                while rows := cursor.fetchmany(self.chunk_size):
+                    yield [tuple(row) for row in rows]
+                return
+
+            key_index = columns.index(key_column)
+            while True:
+                query = self.origin_dialect.build_select_query(
+                    table_name, columns, key_column, last_key is not None, self.chunk_size
+                )
+                if last_key is None:
+                    cursor.execute(query)
+                else:
+                    cursor.execute(query, (last_key,))
+                rows = [tuple(row) for row in cursor.fetchall()]
+                if not rows:
+                    return
+                yield rows
+                if len(rows) < self.chunk_size:
+                    return
+                last_key = rows[-1][key_index]
+        finally:
+            cursor.close()
@@ -151,6 +151,10 @@ JSON_SERIALIZABLE_TYPES_AS_STRINGS = [typ.__name__ for typ in JSON_SERIALIZABLE_
 REDIS_STORED_TYPES = [pd.DataFrame, datetime.datetime]
 REDIS_STORED_TYPES_AS_STRINGS = [typ.__name__ for typ in REDIS_STORED_TYPES] + ["function", "class"]
 
+# Columnar binary formats a DataFrame Variable value can be transferred in (besides the default JSON),
+# the serialized value is tagged by its format under the "transport_format" key
+BINARY_DATAFRAME_TRANSPORT_FORMATS = ["arrow_ipc", "parquet"]
+
 # Regex used for validating URLs across the whole app. To be kept synchronized with it's frontend
 # counterpart.
 # 1. Protocol Handling: Matches URLs with optional http or https protocols.
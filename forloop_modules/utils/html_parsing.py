@@ -0,0 +1,276 @@
+"""
+Parsing of page sources and searching for elements in them with a selectable parser backend.
+
+Backends:
+    - "html.parser" - BeautifulSoup with Python's html.parser, elements are bs4 Tags
+    - "lxml" - lxml.html (C parser), searched by XPaths (CSS selectors need the cssselect package)
+    - "selectolax" - selectolax's Lexbor parser (optional package), searched by CSS selectors
+
+Parsed documents are kept in a bounded LRU cache keyed by the backend and a hash of the page source, so
+several searches in the same page (e.g. multiple FindPageElements nodes) parse it only once. Selectors -
+XPaths and CSS selectors, both given explicitly or built from tag, class and attributes - are compiled
+once and reused; values of attributes are passed to the compiled XPaths as variables.
+"""
+
+import functools
+import hashlib
+import threading
+from typing import Any, Literal, Optional, Union
+
+from bs4 import BeautifulSoup
+from cachetools import LRUCache
+import lxml.etree
+import lxml.html
+
+import forloop_modules.flog as flog
+
+ParserBackend = Literal["html.parser", "lxml", "selectolax"]
+PARSER_BACKENDS = ("html.parser", "lxml", "selectolax")
+DEFAULT_PARSER_BACKEND = "html.parser"  # Get "-" stores bs4 Tags, as it did before the faster backends
+
+DEFAULT_DOCUMENT_CACHE_SIZE = 16  # Parsed documents of large pages take tens of MB each
+
+
+def is_xpath(selector: str) -> bool:
+    """XPaths start with a path step (e.g. "//div", "./a") or a parenthesized expression, anything else is CSS."""
+    return selector.lstrip().startswith(("/", "./", "(", ".."))
+
+
+def _load_selectolax_parser():
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+    except ImportError as e:
+        raise ImportError("Parser backend 'selectolax' requires the selectolax package (pip install selectolax)") from e
+    return LexborHTMLParser
+
+
+def page_source_to_html(page_source: Any) -> str:
+    """HTML of a page source, which may also be an element found earlier (bs4 Tag, lxml or selectolax node)."""
+    if isinstance(page_source, str):
+        return page_source
+    elif isinstance(page_source, lxml.etree._Element):
+        return lxml.html.tostring(page_source, encoding="unicode")
+    elif hasattr(page_source, "html") and not callable(page_source.html):  # selectolax node
+        return page_source.html or ""
+    return str(page_source)
+
+
+def parse_document(page_source: str, backend: ParserBackend = DEFAULT_PARSER_BACKEND) -> Any:
+    """Parse the page source with the backend (without caching)."""
+    if backend == "html.parser":
+        return BeautifulSoup(page_source, "html.parser")
+    elif backend == "lxml":
+        return lxml.html.document_fromstring(page_source) if page_source.strip() else lxml.html.Element("html")
+    elif backend == "selectolax":
+        return _load_selectolax_parser()(page_source)
+    raise ValueError(f"Unknown parser backend '{backend}', choose from {PARSER_BACKENDS}")
+
+
+class ParsedDocumentCache:
+    """
+    LRU cache (cachetools.LRUCache) of parsed documents keyed by the backend and a BLAKE2 hash of the
+    page source. Cached documents are shared and must not be modified.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_DOCUMENT_CACHE_SIZE):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _make_key(page_source: str, backend: ParserBackend) -> tuple[str, bytes]:
+        return backend, hashlib.blake2b(page_source.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def get_or_parse(self, page_source: str, backend: ParserBackend = DEFAULT_PARSER_BACKEND) -> Any:
+        key = self._make_key(page_source, backend)
+        with self._lock:
+            document = self._cache.get(key)
+            if document is not None:
+                self.hits += 1
+                return document
+            self.misses += 1
+
+        document = parse_document(page_source, backend)
+        with self._lock:
+            self._cache[key] = document
+        return document
+
+    def resize(self, maxsize: int) -> None:
+        with self._lock:
+            self._cache = LRUCache(maxsize=maxsize)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            requests_count = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / requests_count if requests_count else 0.0,
+            }
+
+
+document_cache = ParsedDocumentCache()
+
+
+@functools.lru_cache(maxsize=256)
+def compile_xpath(xpath: str) -> lxml.etree.XPath:
+    return lxml.etree.XPath(xpath)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_css_selector(selector: str) -> lxml.etree.XPath:
+    """Translate the CSS selector into a compiled XPath (lxml backend)."""
+    try:
+        from lxml.cssselect import CSSSelector
+    except ImportError as e:
+        raise ImportError("CSS selectors with parser backend 'lxml' require the cssselect package") from e
+    return CSSSelector(selector, translator="html")
+
+
+def _xpath_attribute_test(attribute: str, test: Union[str, bool]) -> str:
+    """Predicate of the attribute - its presence (True/False) or equality to the value of variable $test."""
+    if test is True:
+        return f"@{attribute}"
+    elif test is False:
+        return f"not(@{attribute})"
+    elif attribute == "class":
+        # As in BeautifulSoup - one of the classes or the whole attribute value matches
+        return f"contains(concat(' ', normalize-space(@class), ' '), concat(' ', ${test}, ' ')) or @class=${test}"
+    return f"@{attribute}=${test}"
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_lookup_xpath(tag: Optional[str], attribute_tests: tuple[tuple[str, Union[str, bool]], ...]) -> lxml.etree.XPath:
+    """XPath of elements with the tag and attributes, see _xpath_attribute_test for attribute_tests."""
+    predicates = "".join(f"[{_xpath_attribute_test(name, test)}]" for name, test in attribute_tests)
+    return lxml.etree.XPath(f"descendant-or-self::{tag or '*'}{predicates}")
+
+
+def _css_string(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def build_css_selector(tag: str, attributes: dict[str, Union[str, bool]]) -> str:
+    """CSS selector of elements with the tag and attributes (selectolax backend)."""
+    selector = tag or "*"
+    for name, value in attributes.items():
+        if value is True:
+            selector += f"[{name}]"
+        elif value is False:
+            selector = f"{selector}:not([{name}])"
+        elif name == "class" and " " not in value.strip():
+            selector += f"[class~={_css_string(value)}]"
+        else:
+            selector += f"[{name}={_css_string(value)}]"
+    return selector
+
+
+def _find_lxml(document, tag: str, attributes: dict, selector: Optional[str]) -> list:
+    if selector:
+        compiled_selector = compile_xpath(selector) if is_xpath(selector) else compile_css_selector(selector)
+        results = compiled_selector(document)
+        return results if isinstance(results, list) else [results]
+
+    attribute_tests, variables = [], {}
+    for i, (name, value) in enumerate(attributes.items()):
+        if isinstance(value, bool):
+            attribute_tests.append((name, value))
+        else:
+            attribute_tests.append((name, f"v{i}"))
+            variables[f"v{i}"] = str(value)
+    return _compile_lookup_xpath(tag, tuple(attribute_tests))(document, **variables)
+
+
+def find_elements(
+    document,
+    tag: Optional[str] = None,
+    attributes: Optional[dict] = None,
+    selector: Optional[str] = None,
+    find_all: bool = True,
+    backend: ParserBackend = DEFAULT_PARSER_BACKEND,
+) -> list:
+    """
+    Search the parsed document for elements with the tag and attributes, or matching the selector (XPath
+    or CSS selector, takes precedence over tag and attributes).
+
+    :param find_all: Whether to return all matching elements, or only the first one
+    :type find_all: bool
+    :return: Found elements of the backend's type (XPath selectors may return strings as well)
+    :rtype: list
+    """
+    attributes = attributes or {}
+    limit = None if find_all else 1
+
+    if backend == "html.parser":
+        if selector:
+            if is_xpath(selector):
+                raise ValueError("XPath selectors are not supported by parser backend 'html.parser'")
+            return document.select(selector, limit=limit)
+        return document.find_all(tag or True, attrs=attributes, limit=limit)
+    elif backend == "lxml":
+        return _find_lxml(document, tag, attributes, selector)[:limit]
+    elif backend == "selectolax":
+        if selector and is_xpath(selector):
+            raise ValueError("XPath selectors are not supported by parser backend 'selectolax'")
+        css_selector = selector or build_css_selector(tag, attributes)
+        if find_all:
+            return document.css(css_selector)
+        element = document.css_first(css_selector)
+        return [element] if element is not None else []
+    raise ValueError(f"Unknown parser backend '{backend}', choose from {PARSER_BACKENDS}")
+
+
+def get_element_data(element, get: str, backend: ParserBackend = DEFAULT_PARSER_BACKEND) -> Any:
+    """
+    Text ("text") or attribute value of the element, the element itself for "-". lxml and selectolax
+    elements are returned as their HTML (they can't be stored in variables), usable as a page source.
+    """
+    if not hasattr(element, "tag"):  # Result of an XPath selecting text or attributes
+        return str(element)
+    elif get == "-":
+        return element if backend == "html.parser" else page_source_to_html(element)
+    elif get == "text":
+        if backend == "lxml":
+            return element.text_content()
+        elif backend == "selectolax":
+            return element.text()
+        return element.text
+    elif backend == "selectolax":
+        return element.attributes.get(get)
+    return element.get(get)
+
+
+def find_page_elements_data(
+    page_source: Any,
+    tag: Optional[str] = None,
+    attributes: Optional[dict] = None,
+    get: str = "text",
+    find_all: bool = True,
+    selector: Optional[str] = None,
+    backend: ParserBackend = DEFAULT_PARSER_BACKEND,
+    use_cache: bool = True,
+) -> Union[list, Any]:
+    """
+    Find elements in the page source and extract data from them (see find_elements and get_element_data).
+
+    :return: List of data of all found elements, or data of the first one (None if not found) if not find_all
+    """
+    html = page_source_to_html(page_source)
+    document = document_cache.get_or_parse(html, backend) if use_cache else parse_document(html, backend)
+    elements = find_elements(document, tag, attributes, selector, find_all, backend)
+    flog.debug(lambda: f"{len(elements)} elements found by {selector or (tag, attributes)} ({backend})")
+
+    elements_data = [get_element_data(element, get, backend) for element in elements]
+    if not find_all:
+        return elements_data[0] if elements_data else None
+    return elements_data
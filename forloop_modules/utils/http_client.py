@@ -1,21 +1,92 @@
-import json
-from collections.abc import Generator
-from typing import Literal, Optional
+from typing import Optional
 import forloop_modules.flog as flog
 import httpx
 
 from forloop_modules.globals.active_entity_tracker import aet
+from forloop_modules.utils.http_resilience import (
+    CircuitBreakerRegistry,
+    RequestMetrics,
+    RetryPolicy,
+    async_send_with_retries,
+    send_with_retries,
+)
+from forloop_modules.utils.sse_parser import AsyncSSEParser, SSEParser
+
+# Connection failures mean the request never reached the server, so even non-idempotent ones can be retried
+RETRYABLE_HTTPX_ERRORS = (httpx.TransportError,)
+CONNECT_HTTPX_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def get_global_headers(headers: Optional[dict[str, str]] = None) -> dict[str, str]:
+    """Headers sent with every request, updated with request specific headers."""
+    headers = headers or {}
+    global_headers = {
+        # "Authorization": f"Bearer {aet.get_access_token()}",
+        "User-Email": aet.user_email or "",
+    }
+    global_headers.update(headers)
+    return global_headers
+
+
+class _ResilientClientMixin:
+    """Retry policy, per-host circuit breakers and request metrics shared by HttpClient and AsyncHttpClient."""
+
+    def _init_resilience(
+        self,
+        retry_policy: Optional[RetryPolicy],
+        circuit_breaker_failure_threshold: Optional[int],
+        circuit_breaker_recovery_timeout: float,
+    ) -> None:
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breakers = None
+        if circuit_breaker_failure_threshold is not None:
+            self.circuit_breakers = CircuitBreakerRegistry(
+                circuit_breaker_failure_threshold, circuit_breaker_recovery_timeout
+            )
+        self.metrics = RequestMetrics()
+
+    def _get_retry_kwargs(self, url: str) -> dict:
+        """Keyword arguments of (async_)send_with_retries for a request to the url."""
+        circuit_breaker = self.circuit_breakers.get(httpx.URL(url).host) if self.circuit_breakers is not None else None
+        return {
+            "retry_policy": self.retry_policy,
+            "circuit_breaker": circuit_breaker,
+            "metrics": self.metrics,
+            "retryable_errors": RETRYABLE_HTTPX_ERRORS,
+            "connect_errors": CONNECT_HTTPX_ERRORS,
+        }
+
+    def get_metrics(self) -> dict[str, dict]:
+        """Latency histograms, status code counts, errors and retries per endpoint."""
+        return self.metrics.get_metrics()
 
+    def get_circuit_breaker_states(self) -> dict[str, str]:
+        return self.circuit_breakers.get_states() if self.circuit_breakers is not None else {}
 
-class HttpClient(httpx.Client):
+
+class HttpClient(_ResilientClientMixin, httpx.Client):
     """
     HTTPX client providing all the typical features like TCP connection pooling, while
     also setting all necessary headers dynamically for each request. It accepts all
     HTTPX arguments.
+
+    Failed requests are retried according to the retry policy (pass `RetryPolicy(max_retries=0)`
+    to disable retries) and latencies of all requests are collected per endpoint, see `get_metrics()`.
+    Hosts failing repeatedly can be cut off by a per-host circuit breaker - it's opt-in, enabled by
+    passing `circuit_breaker_failure_threshold`, and raises `CircuitBreakerOpenError` instead of sending
+    requests while open.
     """
 
-    def __init__(self, *args, **httpx_kwargs):
+    def __init__(
+        self,
+        *args,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker_failure_threshold: Optional[int] = None,
+        circuit_breaker_recovery_timeout: float = 30.0,
+        **httpx_kwargs,
+    ):
         super().__init__(*args, **httpx_kwargs)
+        self._init_resilience(retry_policy, circuit_breaker_failure_threshold, circuit_breaker_recovery_timeout)
         self._sse_parser = SSEParser(httpx_client=self)
         self.sse_stream = self._sse_parser.stream
 
@@ -27,14 +98,14 @@ class HttpClient(httpx.Client):
         headers: Optional[dict[str, str]] = None,
         **kwargs,
     ) -> httpx.Response:
-        headers = headers or {}
-        global_headers = {
-            # "Authorization": f"Bearer {aet.get_access_token()}",
-            "User-Email": aet.user_email or "",
-        }
-        global_headers.update(headers)
+        global_headers = get_global_headers(headers)
         flog.info(method+" request: "+url,self)
-        response = super().request(method, url, headers=global_headers, **kwargs)
+        response = send_with_retries(
+            lambda: super(HttpClient, self).request(method, url, headers=global_headers, **kwargs),
+            method,
+            url,
+            **self._get_retry_kwargs(url),
+        )
         response.ok = response.is_success  # Cross compatibility with requests
         # response.raise_for_status()
         return response
@@ -52,55 +123,53 @@ class HttpClient(httpx.Client):
         return self._request(url, "DELETE", **kwargs)
 
 
-class SSEParser:
+class AsyncHttpClient(_ResilientClientMixin, httpx.AsyncClient):
     """
-    Collect and parse messages from a Server-Sent Event stream. This class augments the HTTPX with
-    parsing logic for SSE streams - it collects yielded lines from a SSE and parses it as a
-    dictionary.
+    Asynchronous counterpart of HttpClient - shares TCP connections (and HTTP/2 streams if enabled)
+    between concurrently awaited requests. It accepts all HTTPX arguments and the same retry and
+    circuit breaker arguments as HttpClient.
     """
 
-    def __init__(self, httpx_client: httpx.Client):
-        self.client = httpx_client
+    def __init__(
+        self,
+        *args,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker_failure_threshold: Optional[int] = None,
+        circuit_breaker_recovery_timeout: float = 30.0,
+        **httpx_kwargs,
+    ):
+        super().__init__(*args, **httpx_kwargs)
+        self._init_resilience(retry_policy, circuit_breaker_failure_threshold, circuit_breaker_recovery_timeout)
+        self._sse_parser = AsyncSSEParser(httpx_client=self)
+        self.sse_stream = self._sse_parser.stream
 
-    def stream(
+    async def _request(
         self,
-        method: Literal["GET", "POST"],
         url: str,
-        as_dict: bool = True,
-        httpx_kwargs: Optional[dict] = None,
-    ) -> Generator[dict, None, None]:
-        httpx_kwargs = httpx_kwargs or {}
-
-        with self.client.stream(method, url, **httpx_kwargs) as response:
-            response.raise_for_status()
-            yield from self._get_messages(response.iter_lines(), as_dict=as_dict)
-
-    def _get_messages(
-        self, lines_iter: Generator[str, None, None], as_dict: bool
-    ) -> Generator[dict, None, None]:
-        message = {}
-        for line in lines_iter:
-            if message and line == "":  # Yield when reached the end of the message
-                yield message
-                message = {}
-                continue
-            elif not message and line == "":  # Ignore consecutive empty lines
-                continue
-
-            parsed_line = self._parse_line(line, as_dict)
-            message.update(parsed_line)
-
-    def _parse_line(self, line: str, as_dict: bool) -> dict:
-        line_type, message_string = line.split(":", 1)
-
-        if line_type not in ["id", "data", "event", "retry"]:
-            raise AttributeError(f"SSE line type '{line_type}' not recognized", line)
-
-        if line_type == "data" and as_dict:
-            try:
-                message = json.loads(message_string)
-            except json.JSONDecodeError:
-                message = message_string
-            return {line_type: message}
-        else:
-            return {line_type: message_string}
+        method: str,
+        *,
+        headers: Optional[dict[str, str]] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        global_headers = get_global_headers(headers)
+        flog.info(method+" request: "+url,self)
+        response = await async_send_with_retries(
+            lambda: super(AsyncHttpClient, self).request(method, url, headers=global_headers, **kwargs),
+            method,
+            url,
+            **self._get_retry_kwargs(url),
+        )
+        response.ok = response.is_success  # Cross compatibility with requests
+        return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self._request(url, "GET", **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self._request(url, "POST", **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self._request(url, "PUT", **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self._request(url, "DELETE", **kwargs)
@@ -0,0 +1,393 @@
+"""
+Retries with exponential backoff, per-host circuit breaking and latency metrics for HTTP requests.
+
+The building blocks are independent of the HTTP library - HttpClient plugs them in through
+send_with_retries() (AsyncHttpClient through async_send_with_retries()), which only expects the response
+object to have a `status_code` attribute.
+"""
+
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any, Literal, Optional
+from urllib.parse import urlsplit
+
+import forloop_modules.flog as flog
+from forloop_modules.errors.errors import CircuitBreakerOpenError
+
+# Methods which can be repeated without changing the result on the server
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+# Upper bounds (in seconds) of latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+# Path segments replaced by a placeholder when grouping metrics per endpoint (uids, numeric ids)
+_ID_SEGMENT_REGEX = re.compile(r"^([0-9]+|[0-9a-fA-F]{8,}|[0-9a-fA-F-]{32,36})$")
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Configuration of request retries. Requests failing on a retryable status code are repeated only
+    for idempotent methods, requests which failed to connect (never reached the server) are repeated
+    for all methods.
+    """
+    max_retries: int = 3
+    backoff_factor: float = 0.5  # Backoff before n-th retry is up to backoff_factor * 2**n seconds
+    max_backoff: float = 10.0
+    jitter: bool = True
+    retryable_status_codes: frozenset = RETRYABLE_STATUS_CODES
+    retryable_methods: frozenset = IDEMPOTENT_METHODS
+
+    def should_retry_response(self, method: str, status_code: int, attempt: int) -> bool:
+        return (
+            attempt < self.max_retries
+            and method.upper() in self.retryable_methods
+            and status_code in self.retryable_status_codes
+        )
+
+    def should_retry_error(self, method: str, attempt: int, is_connect_error: bool) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        return is_connect_error or method.upper() in self.retryable_methods
+
+    def get_backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Backoff before retry number `attempt` (starting from 0), "full jitter" variant."""
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+
+        backoff = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        return random.uniform(0, backoff) if self.jitter else backoff
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a single host. After `failure_threshold` consecutive failures the circuit opens
+    and requests are rejected right away for `recovery_timeout` seconds, then a single trial request
+    is let through (half-open state) - its success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self.state: Literal["closed", "open", "half_open"] = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """Let another trial request through - the trial request ended with neither a success nor a failure."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"  # opened_at is kept, so recovery_timeout has already elapsed
+
+
+class CircuitBreakerRegistry:
+    """Lazily created circuit breakers, one per host."""
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._circuit_breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            if host not in self._circuit_breakers:
+                self._circuit_breakers[host] = CircuitBreaker(self.failure_threshold, self.recovery_timeout)
+            return self._circuit_breakers[host]
+
+    def get_states(self) -> dict[str, str]:
+        with self._lock:
+            return {host: breaker.state for host, breaker in self._circuit_breakers.items()}
+
+
+@dataclass
+class LatencyHistogram:
+    """Request latencies (in seconds) counted into LATENCY_BUCKETS."""
+    bucket_counts: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    count: int = 0
+    total: float = 0.0
+    min: float = math.inf
+    max: float = 0.0
+
+    def observe(self, latency: float) -> None:
+        for i, upper_bound in enumerate(LATENCY_BUCKETS):
+            if latency <= upper_bound:
+                self.bucket_counts[i] += 1
+                break
+        self.count += 1
+        self.total += latency
+        self.min = min(self.min, latency)
+        self.max = max(self.max, latency)
+
+    def get_percentile(self, percentile: float) -> float:
+        """Upper bound of the bucket containing the given percentile (0-100) of latencies."""
+        if not self.count:
+            return 0.0
+
+        threshold = self.count * percentile / 100
+        cumulative_count = 0
+        for upper_bound, bucket_count in zip(LATENCY_BUCKETS, self.bucket_counts):
+            cumulative_count += bucket_count
+            if cumulative_count >= threshold:
+                return min(upper_bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.get_percentile(50),
+            "p95": self.get_percentile(95),
+            "p99": self.get_percentile(99),
+            "buckets": dict(zip([str(bound) for bound in LATENCY_BUCKETS], self.bucket_counts)),
+        }
+
+
+@dataclass
+class EndpointMetrics:
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    status_codes: dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+    retries: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "latency": self.latency.to_dict(),
+            "status_codes": dict(self.status_codes),
+            "errors": self.errors,
+            "retries": self.retries,
+        }
+
+
+class RequestMetrics:
+    """Thread-safe per-endpoint request metrics, endpoints are grouped by method and path template."""
+
+    def __init__(self):
+        self._endpoints: dict[str, EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_endpoint_key(method: str, url: str) -> str:
+        path = urlsplit(str(url)).path
+        segments = ["{id}" if _ID_SEGMENT_REGEX.match(segment) else segment for segment in path.split("/")]
+        return f"{method.upper()} {'/'.join(segments)}"
+
+    def _get_endpoint(self, method: str, url: str) -> EndpointMetrics:
+        key = self.get_endpoint_key(method, url)
+        if key not in self._endpoints:
+            self._endpoints[key] = EndpointMetrics()
+        return self._endpoints[key]
+
+    def record_response(self, method: str, url: str, status_code: int, latency: float) -> None:
+        with self._lock:
+            endpoint = self._get_endpoint(method, url)
+            endpoint.latency.observe(latency)
+            endpoint.status_codes[status_code] = endpoint.status_codes.get(status_code, 0) + 1
+
+    def record_error(self, method: str, url: str, latency: float) -> None:
+        with self._lock:
+            endpoint = self._get_endpoint(method, url)
+            endpoint.latency.observe(latency)
+            endpoint.errors += 1
+
+    def record_retry(self, method: str, url: str) -> None:
+        with self._lock:
+            self._get_endpoint(method, url).retries += 1
+
+    def get_metrics(self) -> dict[str, dict]:
+        """Snapshot of metrics of all endpoints as plain dictionaries."""
+        with self._lock:
+            return {key: endpoint.to_dict() for key, endpoint in self._endpoints.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+def _get_retry_after(response: Any) -> Optional[float]:
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _RequestAttempts:
+    """Bookkeeping of attempts of one request shared by send_with_retries and async_send_with_retries."""
+
+    def __init__(
+        self,
+        method: str,
+        url: str,
+        retry_policy: RetryPolicy,
+        circuit_breaker: Optional[CircuitBreaker],
+        metrics: Optional[RequestMetrics],
+        connect_errors: tuple,
+    ):
+        self.method = method
+        self.url = url
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.metrics = metrics
+        self.connect_errors = connect_errors
+        self.attempt = 0
+
+    def check_circuit_breaker(self) -> None:
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow_request():
+            raise CircuitBreakerOpenError(f"Circuit breaker for '{self.url}' is open, request was not sent")
+
+    def on_error(self, error: BaseException, latency: float) -> Optional[float]:
+        """Record a raised retryable error, return backoff before the retry or None if it's not retried."""
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_failure()
+        if self.metrics is not None:
+            self.metrics.record_error(self.method, self.url, latency)
+
+        is_connect_error = isinstance(error, self.connect_errors)
+        if not self.retry_policy.should_retry_error(self.method, self.attempt, is_connect_error):
+            return None
+        return self.retry_policy.get_backoff(self.attempt)
+
+    def on_unexpected_error(self) -> None:
+        # Not a failure of the host (e.g. an invalid request), the half-open circuit mustn't get stuck
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.release_trial()
+
+    def on_response(self, response: Any, latency: float) -> Optional[float]:
+        """Record a response, return backoff before the retry or None if it's not retried."""
+        status_code = response.status_code
+        if self.circuit_breaker is not None and status_code >= 500:
+            self.circuit_breaker.record_failure()
+        elif self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+        if self.metrics is not None:
+            self.metrics.record_response(self.method, self.url, status_code, latency)
+
+        if not self.retry_policy.should_retry_response(self.method, status_code, self.attempt):
+            return None
+        return self.retry_policy.get_backoff(self.attempt, retry_after=_get_retry_after(response))
+
+    def on_retry(self, backoff: float) -> None:
+        if self.metrics is not None:
+            self.metrics.record_retry(self.method, self.url)
+        flog.warning(
+            lambda: f"{self.method} request to {self.url} failed (attempt {self.attempt + 1}), retrying in {backoff:.2f}s"
+        )
+        self.attempt += 1
+
+
+def send_with_retries(
+    send: Callable[[], Any],
+    method: str,
+    url: str,
+    retry_policy: RetryPolicy,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+    metrics: Optional[RequestMetrics] = None,
+    retryable_errors: tuple = (OSError,),
+    connect_errors: tuple = (ConnectionError,),
+    sleep: Callable[[float], None] = time.sleep,
+) -> Any:
+    """
+    Call `send` (sending one HTTP request and returning its response) until it succeeds or the retry
+    policy gives up. Responses with status code >= 500 and raised `retryable_errors` count as
+    failures of the host's circuit breaker (if given).
+
+    :raises CircuitBreakerOpenError: when the host's circuit is open
+    """
+    attempts = _RequestAttempts(method, url, retry_policy, circuit_breaker, metrics, connect_errors)
+    while True:
+        attempts.check_circuit_breaker()
+        start = time.perf_counter()
+        try:
+            response = send()
+        except retryable_errors as e:
+            backoff = attempts.on_error(e, time.perf_counter() - start)
+            if backoff is None:
+                raise
+        except BaseException:
+            attempts.on_unexpected_error()
+            raise
+        else:
+            backoff = attempts.on_response(response, time.perf_counter() - start)
+            if backoff is None:
+                return response
+            close = getattr(response, "close", None)
+            if close is not None:
+                close()
+
+        attempts.on_retry(backoff)
+        sleep(backoff)
+
+
+async def async_send_with_retries(
+    send: Callable[[], Awaitable[Any]],
+    method: str,
+    url: str,
+    retry_policy: RetryPolicy,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+    metrics: Optional[RequestMetrics] = None,
+    retryable_errors: tuple = (OSError,),
+    connect_errors: tuple = (ConnectionError,),
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+) -> Any:
+    """
+    Asynchronous counterpart of send_with_retries - `send` and `sleep` return awaitables.
+
+    :raises CircuitBreakerOpenError: when the host's circuit is open
+    """
+    attempts = _RequestAttempts(method, url, retry_policy, circuit_breaker, metrics, connect_errors)
+    while True:
+        attempts.check_circuit_breaker()
+        start = time.perf_counter()
+        try:
+            response = await send()
+        except retryable_errors as e:
+            backoff = attempts.on_error(e, time.perf_counter() - start)
+            if backoff is None:
+                raise
+        except BaseException:
+            attempts.on_unexpected_error()
+            raise
+        else:
+            backoff = attempts.on_response(response, time.perf_counter() - start)
+            if backoff is None:
+                return response
+            aclose = getattr(response, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+        attempts.on_retry(backoff)
+        await sleep(backoff)
@@ -0,0 +1,353 @@
+"""
+Concurrent download of images into files.
+
+Images are fetched by an asynchronous HTTPX client with bounded concurrency and an optional per-host
+rate limit, response bodies are streamed to disk chunk by chunk (never held in memory as a whole).
+Each image is first written into a partial ".part" file (named after the target and a hash of the URL),
+which is renamed to the target file once complete - an interrupted download (failed request or killed
+process) is resumed from the partial file by a Range request when the server supports it. With
+skip_existing, images whose target file exists already are not downloaded again. Failed requests are
+retried according to the RetryPolicy.
+
+Duplicates are downloaded only once - repeated URLs are fetched a single time and images with the same
+content (SHA-256) are stored as hard links of the first file.
+"""
+
+import asyncio
+import glob
+import hashlib
+import mimetypes
+import os
+import shutil
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal, Optional, Union
+from urllib.parse import urlsplit
+
+import httpx
+
+import forloop_modules.flog as flog
+from forloop_modules.utils.http_resilience import RetryPolicy
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DEFAULT_DOWNLOAD_TIMEOUT = 30.0  # seconds
+PARTIAL_FILE_SUFFIX = ".part"
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:50.0) Gecko/20100101 Firefox/50.0'
+
+ImageDownloadStatus = Literal["downloaded", "resumed", "duplicate", "skipped", "failed"]
+
+
+@dataclass
+class ImageDownloadResult:
+    url: str
+    path: Optional[Path] = None
+    status: ImageDownloadStatus = "failed"
+    bytes_downloaded: int = 0
+    content_hash: Optional[str] = None
+    duplicate_of: Optional[Path] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ImageDownloadReport:
+    results: list[ImageDownloadResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def _count(self, *statuses: ImageDownloadStatus) -> int:
+        return sum(1 for result in self.results if result.status in statuses)
+
+    @property
+    def bytes_downloaded(self) -> int:
+        return sum(result.bytes_downloaded for result in self.results)
+
+    @property
+    def bytes_written(self) -> int:
+        """Bytes of stored files, duplicates (hard links) and skipped files excluded."""
+        return sum(result.path.stat().st_size for result in self.results
+                   if result.status in ("downloaded", "resumed") and result.path.exists())
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_downloaded / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def paths(self) -> list[Path]:
+        return [result.path for result in self.results if result.path is not None]
+
+    def to_dict(self) -> dict:
+        return {
+            "images": len(self.results),
+            "downloaded": self._count("downloaded", "resumed"),
+            "resumed": self._count("resumed"),
+            "duplicates": self._count("duplicate"),
+            "skipped": self._count("skipped"),
+            "failed": self._count("failed"),
+            "bytes_downloaded": self.bytes_downloaded,
+            "bytes_written": self.bytes_written,
+            "elapsed": round(self.elapsed, 3),
+            "bytes_per_second": round(self.bytes_per_second, 1),
+            "images_per_second": round(len(self.results) / self.elapsed, 1) if self.elapsed > 0 else 0.0,
+            "errors": {result.url: result.error for result in self.results if result.error},
+        }
+
+
+class HostRateLimiter:
+    """Spaces requests to each host at least 1 / requests_per_second apart (no limit if None)."""
+
+    def __init__(self, requests_per_second: Optional[float] = None):
+        self.interval = 1 / requests_per_second if requests_per_second else 0.0
+        self._next_slots: dict[str, float] = {}
+
+    async def acquire(self, host: str) -> None:
+        if not self.interval:
+            return
+        # Slots are reserved without awaiting in between, which makes it safe within one event loop
+        now = time.monotonic()
+        slot = max(now, self._next_slots.get(host, now))
+        self._next_slots[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def get_image_extension(url: str, content_type: Optional[str] = None) -> str:
+    """Extension (with the dot) from the URL path, or guessed from the content type, "" if unknown."""
+    suffix = Path(urlsplit(url).path).suffix.lower()
+    if suffix and len(suffix) <= 6:
+        return suffix
+    if content_type:
+        return mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+    return ""
+
+
+def get_partial_path(path_stem: Path, url: str) -> Path:
+    """Partial file of the image, specific to the URL so that a different image is never resumed from it."""
+    url_hash = hashlib.sha1(url.encode()).hexdigest()[:12]
+    return path_stem.with_name(f"{path_stem.name}.{url_hash}{PARTIAL_FILE_SUFFIX}")
+
+
+def _find_completed_file(path_stem: Path) -> Optional[Path]:
+    if not path_stem.parent.is_dir():
+        return None
+    for path in path_stem.parent.glob(f"{glob.escape(path_stem.name)}.*"):
+        if path.suffix != PARTIAL_FILE_SUFFIX and path.stem == path_stem.name:
+            return path
+    return None
+
+
+def _hash_file(path: Path, content_hash) -> None:
+    with path.open(mode="rb") as file:
+        for chunk in iter(lambda: file.read(DEFAULT_DOWNLOAD_CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+
+
+def _link_or_copy(source: Path, destination: Path) -> None:
+    destination.unlink(missing_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError:  # File systems without hard links
+        shutil.copyfile(source, destination)
+
+
+class _RetryableStatusError(Exception):
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+class ImageDownloader:
+    """
+    Downloads images concurrently, see the module docstring.
+
+    :param max_concurrency: Maximum number of images downloaded at once
+    :type max_concurrency: int
+    :param requests_per_second_per_host: Rate limit of requests to each host (unlimited if None)
+    :type requests_per_second_per_host: Optional[float]
+    :param skip_existing: Whether to skip images whose target file exists (with any extension)
+    :type skip_existing: bool
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        requests_per_second_per_host: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        timeout: float = DEFAULT_DOWNLOAD_TIMEOUT,
+        chunk_size: int = DEFAULT_DOWNLOAD_CHUNK_SIZE,
+        headers: Optional[dict[str, str]] = None,
+        skip_existing: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.requests_per_second_per_host = requests_per_second_per_host
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.headers = {"User-Agent": USER_AGENT, **(headers or {})}
+        self.skip_existing = skip_existing
+        self.transport = transport
+
+    def download(self, images: Iterable[tuple[str, Union[str, Path]]]) -> ImageDownloadReport:
+        """
+        Download images into files, blocking until all are done.
+
+        :param images: Pairs of image URL and target path without extension (added from the URL or content type)
+        :type images: Iterable[tuple[str, Union[str, Path]]]
+        :rtype: ImageDownloadReport
+        """
+        coroutine = self.download_async(images)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+
+        # Called from a running event loop (which can't be blocked by asyncio.run) - run in a new thread
+        reports = []
+        thread = threading.Thread(target=lambda: reports.append(asyncio.run(coroutine)))
+        thread.start()
+        thread.join()
+        return reports[0]
+
+    async def download_async(self, images: Iterable[tuple[str, Union[str, Path]]]) -> ImageDownloadReport:
+        start = time.perf_counter()
+        images = [(url, Path(path_stem)) for url, path_stem in images]
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        rate_limiter = HostRateLimiter(self.requests_per_second_per_host)
+        paths_by_hash: dict[str, Path] = {}
+        first_downloads: dict[str, asyncio.Task] = {}
+
+        async with httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.max_concurrency),
+            transport=self.transport,
+        ) as client:
+
+            async def download_image(url: str, path_stem: Path) -> ImageDownloadResult:
+                async with semaphore:
+                    result = await self._download_image(client, rate_limiter, url, path_stem)
+                if result.content_hash and result.status in ("downloaded", "resumed"):
+                    self._deduplicate(result, paths_by_hash)
+                return result
+
+            async def copy_repeated_image(url: str, path_stem: Path) -> ImageDownloadResult:
+                first_result = await first_downloads[url]
+                if first_result.path is None or first_result.status == "failed":
+                    return ImageDownloadResult(url, status="failed", error=first_result.error)
+                path = path_stem.with_name(path_stem.name + first_result.path.suffix)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                _link_or_copy(first_result.path, path)
+                return ImageDownloadResult(url, path, "duplicate", duplicate_of=first_result.path)
+
+            tasks = []
+            for url, path_stem in images:
+                if url in first_downloads:
+                    tasks.append(asyncio.create_task(copy_repeated_image(url, path_stem)))
+                else:
+                    first_downloads[url] = asyncio.create_task(download_image(url, path_stem))
+                    tasks.append(first_downloads[url])
+            results = await asyncio.gather(*tasks)
+
+        report = ImageDownloadReport(list(results), time.perf_counter() - start)
+        stats = report.to_dict()
+        flog.info(f"{stats['downloaded']} images downloaded ({stats['duplicates']} duplicates, {stats['skipped']} "
+                  f"skipped, {stats['failed']} failed), {stats['bytes_downloaded'] / 1024 / 1024:.2f} MiB in "
+                  f"{stats['elapsed']}s ({stats['bytes_per_second'] / 1024 / 1024:.2f} MiB/s)")
+        return report
+
+    @staticmethod
+    def _deduplicate(result: ImageDownloadResult, paths_by_hash: dict[str, Path]) -> None:
+        original_path = paths_by_hash.setdefault(result.content_hash, result.path)
+        if original_path != result.path:
+            _link_or_copy(original_path, result.path)
+            result.status = "duplicate"
+            result.duplicate_of = original_path
+
+    async def _download_image(
+        self, client: httpx.AsyncClient, rate_limiter: HostRateLimiter, url: str, path_stem: Path
+    ) -> ImageDownloadResult:
+        if self.skip_existing:
+            completed_path = _find_completed_file(path_stem)
+            if completed_path is not None:
+                return ImageDownloadResult(url, completed_path, "skipped")
+
+        path_stem.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = get_partial_path(path_stem, url)
+        result = ImageDownloadResult(url)
+        host = urlsplit(url).hostname or ""
+
+        attempt = 0
+        while True:
+            await rate_limiter.acquire(host)
+            try:
+                content_type = await self._stream_to_partial_file(client, url, partial_path, result)
+                break
+            except (httpx.TransportError, _RetryableStatusError) as e:
+                retry_after = None
+                if isinstance(e, _RetryableStatusError):
+                    can_retry = self.retry_policy.should_retry_response("GET", e.response.status_code, attempt)
+                    retry_after = e.response.headers.get("Retry-After")
+                else:
+                    can_retry = self.retry_policy.should_retry_error("GET", attempt, isinstance(e, httpx.ConnectError))
+                if not can_retry:
+                    result.error = f"{e.__class__.__name__}: {e}"
+                    break
+                backoff = self.retry_policy.get_backoff(
+                    attempt, float(retry_after) if retry_after and retry_after.isdigit() else None
+                )
+                flog.warning(f"Download of {url} failed ({e}), retrying in {backoff:.2f}s")
+                await asyncio.sleep(backoff)
+                attempt += 1
+            except httpx.HTTPError as e:
+                result.error = f"{e.__class__.__name__}: {e}"
+                break
+
+        if result.error is not None:
+            result.status = "failed"
+            flog.warning(f"Download of {url} failed: {result.error}")
+            return result
+
+        result.path = path_stem.with_name(path_stem.name + get_image_extension(url, content_type))
+        os.replace(partial_path, result.path)
+        return result
+
+    async def _stream_to_partial_file(
+        self, client: httpx.AsyncClient, url: str, partial_path: Path, result: ImageDownloadResult
+    ) -> Optional[str]:
+        """Download (the rest of) the image into the partial file, return its content type."""
+        offset = partial_path.stat().st_size if partial_path.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 416 and offset:
+                is_range_invalid = True
+            else:
+                is_range_invalid = False
+                if response.status_code in self.retry_policy.retryable_status_codes:
+                    raise _RetryableStatusError(response)
+                response.raise_for_status()
+
+                content_hash = hashlib.sha256()
+                is_resumed = response.status_code == 206 and offset > 0
+                if is_resumed:
+                    _hash_file(partial_path, content_hash)
+                result.status = "resumed" if is_resumed else "downloaded"
+
+                with partial_path.open(mode="ab" if is_resumed else "wb") as file:
+                    async for chunk in response.aiter_bytes(self.chunk_size):
+                        file.write(chunk)
+                        content_hash.update(chunk)
+                        result.bytes_downloaded += len(chunk)
+                result.content_hash = content_hash.hexdigest()
+
+        if is_range_invalid:
+            # The partial file isn't a prefix of the (changed) image anymore - download it from the start
+            partial_path.unlink()
+            return await self._stream_to_partial_file(client, url, partial_path, result)
+        return response.headers.get("Content-Type")
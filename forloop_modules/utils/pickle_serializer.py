@@ -1,52 +1,353 @@
 """Helper file which solves all serialization/conversion between objects, values of variables and pickle files"""
 
+from collections.abc import MutableMapping
 from pathlib import Path
-from contextlib import suppress
-import shutil
+from typing import Any, Iterator, Optional, Union
 
+import hashlib
+import json
 import os
 import pickle
+import struct
 import sys
+import threading
+import weakref
 
 import bs4.element
 import forloop_modules.flog as flog
 
 
+PICKLE_PROTOCOL = 5
+MANIFEST_FILE_NAME = "manifest.json"
+BLOB_FOLDER_NAME = "blobs"
+BLOB_SUFFIX = ".blob"
+LEGACY_PICKLE_SUFFIX = ".pickle"
 
-def save_data_dict_to_pickle_folder(data_dict, folder, clean_existing_folder=True):
-    """data_dict ... key=variable_name, value=data
-    e.g. key=df1, value=object of type pd.DataFrame()
-    """
-    if clean_existing_folder:
-        with suppress(FileNotFoundError):
-            shutil.rmtree(folder, ignore_errors=True) #recursive variant of os.rmdir(pickle_folder)
+# Blob layout: number of out-of-band buffers (N), lengths of the main pickle and N buffers, then the data
+_BLOB_COUNT_FORMAT = "<Q"
+_BLOB_LENGTH_FORMAT = "<Q"
 
-    os.makedirs(folder, exist_ok=True) #create folder if doesnt exist
 
-    for k, v in data_dict.items():
-        # FIXME Ilya: serialization of BS objects hits recursion limit. Custom serializer is probably needed
-        if type(v) == bs4.element.Tag:
-            sys.setrecursionlimit(8000)
+def _raw_view(buffer: pickle.PickleBuffer) -> memoryview:
+    try:
+        return buffer.raw()
+    except BufferError:  # Non-contiguous buffers have to be copied
+        return memoryview(memoryview(buffer).tobytes())
 
-        print("datadict",k,v)
-        with Path(folder, k+".pickle").open(mode='wb') as pickle_file:
-            pickle.dump(v, pickle_file) #to serialize DF
 
+def dump_to_blob(value: Any) -> tuple[str, bytes, list[memoryview]]:
+    """
+    Pickle a value with protocol 5, keeping NumPy/pandas data in out-of-band buffers, so large arrays
+    are hashed and written straight from their memory without being copied into the pickle stream.
+
+    :return: content hash, main pickle stream and out-of-band buffers
+    :rtype: tuple[str, bytes, list[memoryview]]
+    """
+    buffers = []
+    previous_recursion_limit = sys.getrecursionlimit()
+    # FIXME Ilya: serialization of BS objects hits recursion limit. Custom serializer is probably needed
+    if type(value) == bs4.element.Tag:
+        sys.setrecursionlimit(8000)
+    try:
+        data = pickle.dumps(value, protocol=PICKLE_PROTOCOL, buffer_callback=buffers.append)
+    finally:
         # Set back default recursion limit
-        sys.setrecursionlimit(1000)
+        sys.setrecursionlimit(previous_recursion_limit)
+
+    views = [_raw_view(buffer) for buffer in buffers]
+
+    content_hash = hashlib.sha256(data)
+    for view in views:
+        content_hash.update(view)
+
+    return content_hash.hexdigest(), data, views
+
+
+def write_blob(path: Path, data: bytes, views: list[memoryview]) -> int:
+    """Atomically write a blob created by dump_to_blob, return number of bytes written."""
+    lengths = [len(data)] + [view.nbytes for view in views]
+    header = struct.pack(_BLOB_COUNT_FORMAT, len(views))
+    header += b"".join(struct.pack(_BLOB_LENGTH_FORMAT, length) for length in lengths)
+
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open(mode="wb") as blob_file:
+        blob_file.write(header)
+        blob_file.write(data)
+        for view in views:
+            blob_file.write(view)
+    os.replace(tmp_path, path)
+
+    return len(header) + sum(lengths)
+
+
+def read_blob(path: Path) -> Any:
+    """Load a value from a blob - out-of-band buffers are passed to pickle as views of the read data."""
+    with path.open(mode="rb") as blob_file:
+        content = bytearray(os.fstat(blob_file.fileno()).st_size)
+        blob_file.readinto(content)
+
+    view = memoryview(content)
+    count_size = struct.calcsize(_BLOB_COUNT_FORMAT)
+    length_size = struct.calcsize(_BLOB_LENGTH_FORMAT)
+    (n_buffers,) = struct.unpack_from(_BLOB_COUNT_FORMAT, view, 0)
+
+    offset = count_size + (n_buffers + 1) * length_size
+    parts = []
+    for i in range(n_buffers + 1):
+        (length,) = struct.unpack_from(_BLOB_LENGTH_FORMAT, view, count_size + i * length_size)
+        parts.append(view[offset:offset + length])
+        offset += length
+
+    return pickle.loads(parts[0], buffers=parts[1:])
+
+
+class _ObjectHashes:
+    """
+    Content hashes of objects saved to or loaded from stores in this process, keyed by object identity -
+    an object that is still the same one isn't pickled again just to compute its hash. Only objects
+    supporting weak references (DataFrames, arrays, ...) are tracked, entries disappear with the objects.
+    """
+
+    def __init__(self):
+        self._hashes: dict[int, tuple[weakref.ref, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, value: Any) -> Optional[str]:
+        with self._lock:
+            entry = self._hashes.get(id(value))
+        if entry is not None and entry[0]() is value:
+            return entry[1]
+        return None
+
+    def set(self, value: Any, content_hash: str) -> None:
+        key = id(value)
+        try:
+            reference = weakref.ref(value, lambda _: self._remove(key))
+        except TypeError:  # Builtins like dict, list or str
+            return
+        with self._lock:
+            self._hashes[key] = (reference, content_hash)
+
+    def _remove(self, key: int) -> None:
+        with self._lock:
+            entry = self._hashes.get(key)
+            if entry is not None and entry[0]() is None:
+                del self._hashes[key]
+
+
+_object_hashes = _ObjectHashes()
+
+
+class LazyPickleDict(MutableMapping):
+    """
+    Dictionary of variables stored in a PickleVariableStore, each value is unpickled on its first access.
+    It's a MutableMapping, not a dict subclass - use to_dict() where a real dict is needed.
+    """
+
+    def __init__(self, store: "PickleVariableStore", manifest_variables: dict):
+        self._store = store
+        self._variables = dict(manifest_variables)  # Manifest entries - content hash and type name
+        self._loaded = {}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._loaded:
+            content_hash = self._variables[name]["hash"]
+            value = read_blob(self._store.get_blob_path(content_hash))
+            _object_hashes.set(value, content_hash)
+            self._loaded[name] = value
+        return self._loaded[name]
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        self._variables.setdefault(name, None)
+        self._loaded[name] = value
+
+    def __delitem__(self, name: str) -> None:
+        del self._variables[name]
+        self._loaded.pop(name, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._variables)
+
+    def __len__(self) -> int:
+        return len(self._variables)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._loaded
+
+    def get_stored_variable(self, name: str) -> Optional[dict]:
+        """Manifest entry of a variable which wasn't loaded (so is unchanged), None otherwise."""
+        return None if name in self._loaded else self._variables.get(name)
+
+    def to_dict(self) -> dict:
+        """Load all variables into a plain dict."""
+        return {name: self[name] for name in self}
+
+
+class PickleVariableStore:
+    """
+    Content-addressed and deduplicated storage of variables in a folder:
+    - folder/manifest.json maps variable names to hashes of their pickled content
+    - folder/blobs/<hash>.blob holds the pickled content (with protocol 5 out-of-band buffers)
+
+    Saves are incremental - only blobs of variables with changed content are written, identical values
+    of different variables share one blob. Variables of a LazyPickleDict which were never accessed are
+    saved by their stored hashes. With skip_unchanged_objects=True, objects saved to or loaded from a store
+    earlier in the process aren't pickled again to be hashed either (see _ObjectHashes) - only for callers
+    guaranteeing the values weren't modified in place since.
+
+    Legacy <variable_name>.pickle files in the folder are moved into the store by the first save.
+    """
+
+    def __init__(self, folder: Union[str, Path]):
+        self.folder = Path(folder)
+        self.blob_folder = self.folder / BLOB_FOLDER_NAME
+        self.manifest_path = self.folder / MANIFEST_FILE_NAME
+
+    @property
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    def read_manifest(self) -> dict:
+        if not self.exists:
+            return {"variables": {}}
+
+        with self.manifest_path.open(mode="r") as manifest_file:
+            return json.load(manifest_file)
+
+    def write_manifest(self, manifest: dict) -> None:
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with tmp_path.open(mode="w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def get_blob_path(self, content_hash: str) -> Path:
+        return self.blob_folder / f"{content_hash}{BLOB_SUFFIX}"
+
+    def get_legacy_pickle_paths(self) -> list[Path]:
+        return sorted(self.folder.glob(f"*{LEGACY_PICKLE_SUFFIX}")) if self.folder.is_dir() else []
+
+    def _get_unchanged_variable(self, data_dict: dict, name: str, skip_unchanged_objects: bool) -> Optional[dict]:
+        """Manifest entry of a variable known to be unchanged without pickling it, None otherwise."""
+        if isinstance(data_dict, LazyPickleDict) and not data_dict.is_loaded(name):
+            return data_dict.get_stored_variable(name)
+        if not skip_unchanged_objects:
+            return None
+
+        value = data_dict[name]
+        content_hash = _object_hashes.get(value)
+        return {"hash": content_hash, "type": type(value).__name__} if content_hash is not None else None
+
+    def save(self, data_dict: dict, prune: bool = False, skip_unchanged_objects: bool = False) -> dict:
+        """
+        Save variables to the store.
+
+        :param data_dict: key=variable_name, value=data
+        :type data_dict: dict
+        :param prune: Remove variables (and their unreferenced blobs) not present in data_dict
+        :type prune: bool
+        :param skip_unchanged_objects: Reuse hashes of objects saved or loaded earlier instead of pickling them,
+            the objects must not have been modified in place since
+        :type skip_unchanged_objects: bool
+        :return: save statistics - number of variables, written and skipped blobs and written bytes
+        :rtype: dict
+        """
+        os.makedirs(self.blob_folder, exist_ok=True)
+        manifest = self.read_manifest()
+        variables = {} if prune else manifest["variables"]
+
+        legacy_paths = self.get_legacy_pickle_paths()
+        if legacy_paths and not prune:  # Variables of a legacy folder are kept, moved into the store
+            legacy_data_dict = {
+                path.name[:-len(LEGACY_PICKLE_SUFFIX)]: _read_legacy_pickle(path) for path in legacy_paths
+            }
+            data_dict = {**legacy_data_dict, **data_dict}
+
+        stats = {"variables": len(data_dict), "written_blobs": 0, "skipped_blobs": 0, "written_bytes": 0}
+
+        for name in data_dict:
+            variable = self._get_unchanged_variable(data_dict, name, skip_unchanged_objects)
+            if variable is not None and self.get_blob_path(variable["hash"]).exists():
+                variables[name] = variable
+                stats["skipped_blobs"] += 1
+                continue
+
+            value = data_dict[name]
+            content_hash, data, views = dump_to_blob(value)
+            blob_path = self.get_blob_path(content_hash)
+
+            if not blob_path.exists():
+                stats["written_bytes"] += write_blob(blob_path, data, views)
+                stats["written_blobs"] += 1
+                flog.debug(lambda: f"Pickle store: variable '{name}' written to blob {content_hash}")
+
+            _object_hashes.set(value, content_hash)
+            variables[name] = {"hash": content_hash, "type": type(value).__name__}
+
+        manifest["variables"] = variables
+        self.write_manifest(manifest)
+
+        for legacy_path in legacy_paths:
+            legacy_path.unlink(missing_ok=True)
+
+        if prune:
+            self.remove_unreferenced_blobs(manifest)
+
+        return stats
+
+    def remove_unreferenced_blobs(self, manifest: Optional[dict] = None) -> None:
+        manifest = manifest or self.read_manifest()
+        referenced_hashes = {variable["hash"] for variable in manifest["variables"].values()}
+
+        for blob_path in self.blob_folder.glob(f"*{BLOB_SUFFIX}"):
+            if blob_path.stem not in referenced_hashes:
+                blob_path.unlink(missing_ok=True)
+
+    def load_variable(self, name: str) -> Any:
+        variable = self.read_manifest()["variables"][name]
+        return read_blob(self.get_blob_path(variable["hash"]))
+
+    def load(self) -> LazyPickleDict:
+        return LazyPickleDict(self, self.read_manifest()["variables"])
+
+
+def _read_legacy_pickle(path: Path) -> Any:
+    with path.open(mode='rb') as pickle_file:
+        return pickle.load(pickle_file)
+
+
+def save_data_dict_to_pickle_folder(data_dict, folder, clean_existing_folder=True, skip_unchanged_objects=False):
+    """data_dict ... key=variable_name, value=data
+    e.g. key=df1, value=object of type pd.DataFrame()
+
+    Variables are saved incrementally into a PickleVariableStore, clean_existing_folder removes
+    variables which are not present in data_dict. skip_unchanged_objects=True skips pickling of values
+    saved or loaded earlier - only for values which weren't modified in place since.
+    """
+    return PickleVariableStore(folder).save(
+        data_dict, prune=clean_existing_folder, skip_unchanged_objects=skip_unchanged_objects
+    )
+
+
+def load_data_dict_from_pickle_folder(folder, lazy=False):
+    """
+    Load variables from a PickleVariableStore, or from legacy <variable_name>.pickle files. With lazy=True
+    a store is loaded as a LazyPickleDict mapping (not a dict) unpickling each value on its first access.
+    """
+    store = PickleVariableStore(folder)
+    if store.exists:
+        data_dict = store.load()
+        return data_dict if lazy else data_dict.to_dict()
 
-def load_data_dict_from_pickle_folder(folder):
-    
     data_dict={}
-    
+
     for root, dirs, files in os.walk(folder):
         for file in files:
             try:
-                with open(folder+"\\"+file, 'rb') as pickle_file:
+                with Path(root, file).open(mode='rb') as pickle_file:
                     object_name=file.split(".pickle")[0]
                     data_dict[object_name]=pickle.load(pickle_file)
             except FileNotFoundError:
-                flog.warning("Pickle file was not processed",file)
+                flog.warning(f"Pickle file was not processed: {file}")
 
     return(data_dict)
 
@@ -59,14 +360,6 @@ def save_pickle_data(filename, json_dict):
 
     data_dict=json_dict["pickle_data"]
     save_data_dict_to_pickle_folder(data_dict, pickle_folder)
-    # with suppress(FileNotFoundError):
-    #     shutil.rmtree(pickle_folder, ignore_errors=True) #recursive variant of os.rmdir(pickle_folder)
-
-    # os.makedirs(pickle_folder, exist_ok=True) #create folder if doesnt exist
-
-    # for pipeline_filename, pipeline_data in json_dict["pickle_data"].items():
-    #     with Path(pickle_folder, pipeline_data, ".pickle").open(mode='wb') as pickle_file:
-    #         pickle.dump(pipeline_data, pickle_file) #to serialize DF
 
     json_dict.pop("pickle_data")
 
@@ -74,27 +367,17 @@ def save_pickle_data(filename, json_dict):
 
 
 
-def read_pickle_data(filename,json_dict):
-    """enriches json_dict for pickle data"""
+def read_pickle_data(filename,json_dict,lazy=False):
+    """
+    enriches json_dict for pickle data - with lazy=True json_dict["pickle_data"] is a LazyPickleDict
+    mapping (values are unpickled on first access) instead of a dict
+    """
     pipeline_folder="/".join(filename.split("/")[0:-1])
     pipeline_name=filename.split("/")[-1].split(".flpl")[0]
-    pickle_folder=pipeline_folder+"//"+pipeline_name
+    pickle_folder=Path(pipeline_folder, pipeline_name)
 
-    data_dict=load_data_dict_from_pickle_folder(pickle_folder)
+    data_dict=load_data_dict_from_pickle_folder(pickle_folder, lazy=lazy)
 
     json_dict["pickle_data"]=data_dict
 
-    
-    
-    # for root, dirs, files in os.walk(pickle_folder):
-    #     for file in files:
-    #         try:
-    #             with open(pickle_folder+"\\"+file, 'rb') as pickle_file:
-    #                 object_name=file.split(".pickle")[0]
-    #                 json_dict["pickle_data"][object_name]=pickle.load(pickle_file)
-    #         except FileNotFoundError:
-    #             flog.warning("Pickle file was not processed",file)
-
     return(json_dict)
-
-
@@ -0,0 +1,117 @@
+"""
+Opt-in read-through cache of HTTP GET responses, grouped by API resource so that all cached responses
+of a resource can be invalidated at once when the resource is modified.
+
+Every invalidation bumps a generation counter of the resource, a response fetched concurrently with an
+invalidation (started before it) is returned but not cached, as it may predate the modification.
+"""
+
+import threading
+from collections.abc import Callable, Hashable
+from typing import Any, Optional
+
+from cachetools import TTLCache
+
+import forloop_modules.flog as flog
+
+
+class ResponseCache:
+    """
+    Read-through cache with TTL expiration and LRU eviction (cachetools.TTLCache), disabled until
+    enable() is called. Only successful responses are cached.
+    """
+
+    def __init__(self):
+        self._cache: Optional[TTLCache] = None
+        self._lock = threading.RLock()
+        self._generation = 0  # Bumped by invalidations of all resources
+        self._resource_generations: dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def is_enabled(self) -> bool:
+        return self._cache is not None
+
+    def enable(self, maxsize: int = 1024, ttl: float = 5.0) -> None:
+        """
+        :param maxsize: Maximum number of cached responses, least recently used ones are evicted first
+        :type maxsize: int
+        :param ttl: Time (in seconds) after which a cached response expires
+        :type ttl: float
+        """
+        with self._lock:
+            self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        flog.info(f"Response cache enabled (maxsize={maxsize}, ttl={ttl}s)")
+
+    def disable(self) -> None:
+        with self._lock:
+            self._cache = None
+
+    def get_or_fetch(self, resource_name: str, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        Return a cached response of the resource stored under the key, or fetch and cache it.
+
+        :param fetch: Function sending the request, called on a cache miss (or always when disabled)
+        :type fetch: Callable[[], Any]
+        """
+        if not self.is_enabled:
+            return fetch()
+
+        cache_key = (resource_name, key)
+        with self._lock:
+            if self._cache is not None and cache_key in self._cache:
+                self.hits += 1
+                return self._cache[cache_key]
+            self.misses += 1
+            generation = self._get_generation(resource_name)
+
+        response = fetch()
+
+        if getattr(response, "is_success", False):
+            with self._lock:
+                if self._cache is not None and self._get_generation(resource_name) == generation:
+                    self._cache[cache_key] = response
+
+        return response
+
+    def invalidate(self, resource_name: Optional[str] = None) -> None:
+        """Drop cached responses of the resource (of all resources if resource_name is None)."""
+        with self._lock:
+            if resource_name is None:
+                self._generation += 1
+            else:
+                self._resource_generations[resource_name] = self._resource_generations.get(resource_name, 0) + 1
+
+            if not self._cache:
+                return
+
+            if resource_name is None:
+                self._cache.clear()
+            else:
+                for cache_key in [cache_key for cache_key in self._cache if cache_key[0] == resource_name]:
+                    self._cache.pop(cache_key, None)
+            self.invalidations += 1
+
+    def _get_generation(self, resource_name: str) -> tuple[int, int]:
+        return self._generation, self._resource_generations.get(resource_name, 0)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            requests_count = self.hits + self.misses
+            return {
+                "enabled": self.is_enabled,
+                "size": len(self._cache) if self._cache is not None else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / requests_count if requests_count else 0.0,
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
@@ -0,0 +1,282 @@
+"""
+Cached environments with dependencies of executed scripts.
+
+Modules imported by a script and missing in the current interpreter are installed - in one batched pip
+call - into an environment directory keyed by a hash of the set of missing modules (and the Python
+version and platform). The environment is a pip --target directory put in front of PYTHONPATH of the
+script's process, so the script sees the packages of the current interpreter plus the installed ones,
+and the current interpreter is never modified. Later runs of scripts with the same missing modules
+reuse the environment without calling pip. Environments are kept in a per-user cache directory accessible
+only by its owner, as any package planted into it would be imported by the scripts. Downloaded wheels are kept in a pip cache shared by the
+environments, so rebuilding an evicted environment doesn't download the packages again.
+
+At most max_environments environments are kept, the least recently used ones are removed - except those
+used within eviction_grace_period, which may still be on the path of a running script. Environments are
+built in a staging directory and renamed into place (and evicted ones renamed away before removal), so
+concurrent builds of the same environment (even by several processes) never expose a half-installed one.
+Builds of different environments run concurrently, cache hits don't wait for them.
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import sysconfig
+import tempfile
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+
+import forloop_modules.flog as flog
+
+
+
+def get_user_cache_dir() -> Path:
+    """Per-user cache directory of forloop (XDG_CACHE_HOME on POSIX, LOCALAPPDATA on Windows)."""
+    if sys.platform == "win32":
+        cache_dir = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    else:
+        cache_dir = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_dir) / "forloop"
+
+
+DEFAULT_ENVIRONMENTS_DIR = get_user_cache_dir() / "script_environments"
+DEFAULT_MAX_ENVIRONMENTS = 8
+DEFAULT_EVICTION_GRACE_PERIOD = 3600  # seconds
+
+READY_MARKER_FILE = "environment.json"  # Written after renaming into place, its mtime is the time of the last use
+EVICTED_DIR_PREFIX = ".evicted-"
+PIP_CACHE_DIR = "pip-cache"
+
+# Distribution names of commonly used modules whose import name differs
+PIP_PACKAGE_NAMES = {
+    "PIL": "Pillow",
+    "bs4": "beautifulsoup4",
+    "cv2": "opencv-python",
+    "dateutil": "python-dateutil",
+    "sklearn": "scikit-learn",
+    "yaml": "PyYAML",
+}
+
+
+def is_module_installed(module_name: str) -> bool:
+    """Whether the module can be imported by the current interpreter."""
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ValueError, ImportError):
+        return False
+
+
+def get_pip_package_name(module_name: str) -> str:
+    return PIP_PACKAGE_NAMES.get(module_name, module_name)
+
+
+def get_environment_key(module_names: Iterable[str]) -> str:
+    """Hash of the set of modules, the Python version and the platform."""
+    key_parts = [f"{sys.version_info.major}.{sys.version_info.minor}", sysconfig.get_platform(), *sorted(set(module_names))]
+    return hashlib.sha256("\n".join(key_parts).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class ScriptEnvironment:
+    """Environment of a script's process, without path if no packages had to be installed."""
+
+    key: Optional[str] = None
+    path: Optional[Path] = None
+    packages: list[str] = field(default_factory=list)
+
+    @property
+    def site_packages_path(self) -> Optional[Path]:
+        return self.path / "site-packages" if self.path is not None else None
+
+    @property
+    def sys_path(self) -> list[Path]:
+        """Paths to put in front of sys.path of the script's process (instead of PYTHONPATH)."""
+        return [self.site_packages_path] if self.path is not None else []
+
+    def get_process_env(self, base_env: Optional[dict] = None) -> dict:
+        """Environment variables of the script's process - base_env (os.environ by default) with the packages added."""
+        env = dict(os.environ if base_env is None else base_env)
+        if self.path is not None:
+            python_paths = [str(self.site_packages_path), env.get("PYTHONPATH", "")]
+            env["PYTHONPATH"] = os.pathsep.join(path for path in python_paths if path)
+        return env
+
+
+@dataclass
+class ScriptEnvironmentStats:
+    hits: int = 0
+    builds: int = 0
+    evictions: int = 0
+    build_time: float = 0.0  # seconds
+
+    def to_dict(self) -> dict:
+        return {"hits": self.hits, "builds": self.builds, "evictions": self.evictions, "build_time": self.build_time}
+
+
+class ScriptEnvironmentCache:
+    """
+    LRU cache of script environments in a local directory (see module docstring).
+
+    :param root_dir: Directory of the environments and of the shared pip cache
+    :type root_dir: Union[str, Path]
+    :param max_environments: Maximum number of kept environments
+    :type max_environments: int
+    :param eviction_grace_period: Seconds since the last use during which an environment is not evicted
+    :type eviction_grace_period: float
+    """
+
+    def __init__(
+        self,
+        root_dir: Union[str, Path] = DEFAULT_ENVIRONMENTS_DIR,
+        max_environments: int = DEFAULT_MAX_ENVIRONMENTS,
+        eviction_grace_period: float = DEFAULT_EVICTION_GRACE_PERIOD,
+    ):
+        self.root_dir = Path(root_dir)
+        self.max_environments = max_environments
+        self.eviction_grace_period = eviction_grace_period
+        self.stats = ScriptEnvironmentStats()
+        self._lock = threading.Lock()  # Guards stats, eviction and _key_locks
+        self._key_locks: dict[str, threading.Lock] = {}
+
+    def get_environment(self, module_names: Iterable[str]) -> ScriptEnvironment:
+        """
+        Environment providing the modules - the current interpreter's one if all of them are installed,
+        otherwise a cached environment with the missing ones, built if needed.
+
+        :raises RuntimeError: pip failed to install the missing modules
+        """
+        missing_modules = sorted({module_name for module_name in module_names if not is_module_installed(module_name)})
+        if not missing_modules:
+            return ScriptEnvironment()
+
+        key = get_environment_key(missing_modules)
+        packages = [get_pip_package_name(module_name) for module_name in missing_modules]
+        environment = ScriptEnvironment(key, self.root_dir / key, packages)
+
+        self._ensure_root_dir()
+        # One build of the environment at a time within the process, other processes are handled by renaming
+        with self._get_key_lock(key):
+            if self._is_ready(environment):
+                self._touch(environment)
+                with self._lock:
+                    self.stats.hits += 1
+                flog.debug(lambda: f"Script environment {key} reused for {packages}")
+                return environment
+
+            self._build(environment)
+
+        with self._lock:
+            self._evict(keep_key=key)
+        return environment
+
+    def _get_key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _ensure_root_dir(self) -> None:
+        """
+        Create the root directory accessible only by the current user, refuse to use one owned by another
+        user (who could plant packages into the environments).
+
+        :raises PermissionError: The root directory is owned by another user (or is a symlink)
+        """
+        self.root_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if os.name != "posix":
+            return
+
+        root_dir_stat = self.root_dir.lstat()
+        if self.root_dir.is_symlink() or root_dir_stat.st_uid != os.getuid():
+            raise PermissionError(f"Script environments directory {self.root_dir} is not owned by the current user")
+        if root_dir_stat.st_mode & 0o077:
+            self.root_dir.chmod(0o700)
+
+    def _is_ready(self, environment: ScriptEnvironment) -> bool:
+        return (environment.path / READY_MARKER_FILE).is_file()
+
+    def _touch(self, environment: ScriptEnvironment) -> None:
+        os.utime(environment.path / READY_MARKER_FILE)
+
+    def _build(self, environment: ScriptEnvironment) -> None:
+        staging_path = Path(tempfile.mkdtemp(prefix=f".{environment.key}-", dir=self.root_dir))
+        start = time.perf_counter()
+        try:
+            command = [
+                sys.executable, "-m", "pip", "install", "--disable-pip-version-check", "--no-input",
+                "--target", str(staging_path / "site-packages"),
+                "--cache-dir", str(self.root_dir / PIP_CACHE_DIR),
+                *environment.packages,
+            ]
+            completed_process = subprocess.run(command, capture_output=True, text=True)
+            if completed_process.returncode != 0:
+                raise RuntimeError(f"pip install of {environment.packages} failed: {completed_process.stderr.strip()[-2000:]}")
+
+            try:
+                staging_path.rename(environment.path)
+            except OSError:
+                # Built concurrently by another process (renamed directories are complete, the marker may
+                # not be written yet), or a stale directory left by an older version
+                if not self._is_ready(environment) and self._is_stale(environment.path):
+                    self._remove(environment.path)
+                    staging_path.rename(environment.path)
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+        metadata = {"packages": environment.packages, "python": sys.version, "created": time.time()}
+        (environment.path / READY_MARKER_FILE).write_text(json.dumps(metadata))
+
+        build_time = time.perf_counter() - start
+        with self._lock:
+            self.stats.builds += 1
+            self.stats.build_time += build_time
+        flog.info(f"Script environment {environment.key} with {environment.packages} built in {build_time:.1f}s", self)
+
+    def _is_stale(self, path: Path) -> bool:
+        return time.time() - path.stat().st_mtime > self.eviction_grace_period
+
+    def _remove(self, path: Path) -> None:
+        """Rename the directory away first, so it's never seen half-removed under its name."""
+        evicted_path = Path(tempfile.mkdtemp(prefix=EVICTED_DIR_PREFIX, dir=self.root_dir))
+        try:
+            path.rename(evicted_path / path.name)
+        finally:
+            shutil.rmtree(evicted_path, ignore_errors=True)
+
+    def _evict(self, keep_key: Optional[str] = None) -> None:
+        environments = []
+        for path in self.root_dir.iterdir():
+            marker_path = path / READY_MARKER_FILE
+            if path.name != keep_key and marker_path.is_file():
+                environments.append((marker_path.stat().st_mtime, path))
+
+        excess_count = len(environments) + (keep_key is not None) - self.max_environments
+        for last_used, path in sorted(environments)[:max(excess_count, 0)]:
+            if time.time() - last_used < self.eviction_grace_period:
+                break  # Possibly used by a running script, and so are the more recently used ones
+            try:
+                self._remove(path)
+            except OSError:  # Evicted concurrently by another process
+                continue
+            self.stats.evictions += 1
+            flog.debug(lambda: f"Script environment {path.name} evicted")
+
+    def clear(self) -> None:
+        """Remove all environments, the pip cache is kept."""
+        with self._lock:
+            if self.root_dir.is_dir():
+                for path in self.root_dir.iterdir():
+                    if path.name != PIP_CACHE_DIR:
+                        shutil.rmtree(path, ignore_errors=True)
+
+    def get_stats(self) -> dict:
+        environments_count = sum(1 for path in self.root_dir.glob(f"*/{READY_MARKER_FILE}")) if self.root_dir.is_dir() else 0
+        return {**self.stats.to_dict(), "environments": environments_count, "max_environments": self.max_environments}
+
+
+script_environment_cache = ScriptEnvironmentCache()
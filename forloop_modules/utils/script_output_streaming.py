@@ -0,0 +1,208 @@
+"""
+Streaming of output (stdout/stderr) of executed scripts into result variables.
+
+Both pipes of the script's process are read concurrently by reader threads, so a script filling one
+pipe while the other is being read can't deadlock. Read lines are queued and appended by a flusher
+thread into an in-memory OutputRingBuffer per stream, which is flushed (its whole text, as result
+variables can't be appended to) every flush_interval seconds, or sooner when flush_size characters are
+pending - instead of a read-modify-write of the result variable per printed line.
+
+Lines starting with one of special_line_prefixes (e.g. input prompt markers) are not stored, they are
+passed to on_special_line after the output preceding them is flushed. All callbacks are called from
+one thread at a time.
+"""
+
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import IO, Optional
+
+import forloop_modules.flog as flog
+
+OUTPUT_STREAMS = ("stdout", "stderr")
+
+DEFAULT_FLUSH_INTERVAL = 0.5  # seconds
+DEFAULT_FLUSH_SIZE = 1024 * 1024  # characters, each flush stores the whole output
+DEFAULT_MAX_OUTPUT_CHARS = 10 * 1024 * 1024  # per stream, older output is dropped
+
+
+class OutputRingBuffer:
+    """
+    Text appended in chunks, bounded to max_chars - the oldest chunks are dropped (and counted) when
+    it overflows, the text then starts with a note about the truncation.
+    """
+
+    def __init__(self, max_chars: int = DEFAULT_MAX_OUTPUT_CHARS):
+        self.max_chars = max_chars
+        self.truncated_chars = 0
+        self.is_changed = False
+        self._chunks: deque[str] = deque()
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, text: str) -> None:
+        if not text:
+            return
+        self._chunks.append(text)
+        self._length += len(text)
+        self.is_changed = True
+
+        while self._length > self.max_chars:
+            chunk = self._chunks.popleft()
+            overflow = self._length - self.max_chars
+            if len(chunk) > overflow:  # Keep the tail of the chunk
+                self._chunks.appendleft(chunk[overflow:])
+                chunk = chunk[:overflow]
+            self._length -= len(chunk)
+            self.truncated_chars += len(chunk)
+
+    def getvalue(self) -> str:
+        if len(self._chunks) > 1:  # Joined once, later calls join only newly appended chunks
+            joined_text = "".join(self._chunks)
+            self._chunks.clear()
+            self._chunks.append(joined_text)
+
+        text = self._chunks[0] if self._chunks else ""
+        if self.truncated_chars:
+            return f"[... {self.truncated_chars} characters truncated ...]\n{text}"
+        return text
+
+
+@dataclass
+class OutputStreamStats:
+    lines: dict[str, int] = field(default_factory=lambda: dict.fromkeys(OUTPUT_STREAMS, 0))
+    chars: dict[str, int] = field(default_factory=lambda: dict.fromkeys(OUTPUT_STREAMS, 0))
+    flushes: int = 0
+    special_lines: int = 0
+
+    def to_dict(self) -> dict:
+        return {"lines": dict(self.lines), "chars": dict(self.chars), "flushes": self.flushes, "special_lines": self.special_lines}
+
+
+class OutputStreamer:
+    """
+    Collects output lines fed from any thread (see module docstring), used as a context manager - the
+    flusher thread runs inside the with block, pending output is flushed on exit.
+
+    :param on_flush: Called with the stream name and its whole (bounded) text when it changed
+    :type on_flush: Callable[[str, str], None]
+    :param on_special_line: Called with the stream name and lines starting with special_line_prefixes
+    :type on_special_line: Optional[Callable[[str, str], None]]
+    :param flush_interval: Maximum delay of flushing new output in seconds
+    :type flush_interval: float
+    :param flush_size: Number of pending characters which triggers a flush before the interval passes
+    :type flush_size: int
+    """
+
+    def __init__(
+        self,
+        on_flush: Callable[[str, str], None],
+        on_special_line: Optional[Callable[[str, str], None]] = None,
+        special_line_prefixes: Iterable[str] = (),
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+        max_output_chars: int = DEFAULT_MAX_OUTPUT_CHARS,
+    ):
+        self.on_flush = on_flush
+        self.on_special_line = on_special_line
+        self.special_line_prefixes = tuple(special_line_prefixes)
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+
+        self.buffers = {stream: OutputRingBuffer(max_output_chars) for stream in OUTPUT_STREAMS}
+        self.stats = OutputStreamStats()
+
+        self._lines: deque[tuple[str, str]] = deque()  # Appended by readers, popped by the flusher
+        self._pending_chars = 0  # Fed, not processed yet
+        self._unflushed_chars = 0  # Processed, not flushed yet
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._flusher_thread: Optional[threading.Thread] = None
+        self._callback_lock = threading.Lock()
+
+    def __enter__(self) -> "OutputStreamer":
+        self._stop_event.clear()
+        self._flusher_thread = threading.Thread(target=self._flush_loop, name="script-output-flusher", daemon=True)
+        self._flusher_thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._stop_event.set()
+        self._wake_event.set()
+        self._flusher_thread.join()
+        self._flusher_thread = None
+        self.process_lines()
+        self.flush()
+        flog.debug(lambda: f"Script output streamed: {self.stats.to_dict()}")
+
+    def feed(self, stream: str, line: str) -> None:
+        """Queue an output line (or any chunk of text) of the stream, thread-safe."""
+        self._lines.append((stream, line))
+        self._pending_chars += len(line)  # Approximate with concurrent feeders, triggers flushes only
+        if self._pending_chars >= self.flush_size or line.startswith(self.special_line_prefixes):
+            self._wake_event.set()
+
+    def read_pipe(self, stream: str, pipe: IO[str]) -> None:
+        """Feed lines of the pipe until it's closed."""
+        for line in iter(pipe.readline, ""):
+            self.feed(stream, line)
+
+    def read_process_output(self, process) -> None:
+        """Read stdout and stderr pipes (text mode) of the process concurrently until both are closed."""
+        readers = [
+            threading.Thread(target=self.read_pipe, args=(stream, pipe), name=f"script-{stream}-reader", daemon=True)
+            for stream, pipe in (("stdout", process.stdout), ("stderr", process.stderr))
+            if pipe is not None
+        ]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+
+    def process_lines(self) -> None:
+        """Append queued lines to the buffers, handle special lines."""
+        with self._callback_lock:
+            while self._lines:
+                stream, line = self._lines.popleft()
+                self._pending_chars -= len(line)
+
+                if self.special_line_prefixes and line.startswith(self.special_line_prefixes):
+                    self.stats.special_lines += 1
+                    self._flush_buffers()  # Output preceding e.g. an input prompt is shown first
+                    if self.on_special_line is not None:
+                        self.on_special_line(stream, line)
+                    continue
+
+                self.buffers[stream].append(line)
+                self._unflushed_chars += len(line)
+                self.stats.lines[stream] += 1
+                self.stats.chars[stream] += len(line)
+
+    def flush(self) -> None:
+        with self._callback_lock:
+            self._flush_buffers()
+
+    def _flush_buffers(self) -> None:
+        self._unflushed_chars = 0
+        for stream, buffer in self.buffers.items():
+            if buffer.is_changed:
+                self.on_flush(stream, buffer.getvalue())
+                buffer.is_changed = False
+                self.stats.flushes += 1
+
+    def _flush_loop(self) -> None:
+        next_flush_time = time.monotonic() + self.flush_interval
+        while not self._stop_event.is_set():
+            self._wake_event.wait(timeout=max(next_flush_time - time.monotonic(), 0))
+            self._wake_event.clear()
+            try:
+                self.process_lines()
+                if time.monotonic() >= next_flush_time or self._unflushed_chars >= self.flush_size:
+                    self.flush()
+                    next_flush_time = time.monotonic() + self.flush_interval
+            except Exception as e:
+                flog.warning(f"Flushing of script output failed: {e}")
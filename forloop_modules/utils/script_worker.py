@@ -0,0 +1,220 @@
+"""
+Worker process of the script worker pool (see script_worker_pool), run as a standalone script and
+therefore importing only the standard library.
+
+The worker imports the preloaded (heavy) modules once and then serves requests read as JSON lines from
+stdin. Every script runs in a child forked from the worker, so it starts with the modules already
+imported, but can't leak state (globals, patched modules, memory) into later runs. The child runs in a
+new session with stdin from /dev/null, optional resource limits (address space, CPU time) and a
+wall-clock timeout - an isolation of runs from each other, not a security sandbox.
+
+Protocol (JSON lines, the worker writes to the original stdout, its fd 1 is redirected to stderr so
+that stray prints of preloaded modules can't corrupt it):
+    - worker: {"type": "ready", "pid": ..., "preloaded": [...], "failed_preloads": {module: error}}
+    - request: {"type": "run", "script": ..., "sys_path": [...], "cwd": ..., "timeout": ...,
+      "max_memory_bytes": ..., "max_cpu_seconds": ...}
+    - worker, repeatedly: {"type": "output", "stream": "stdout" | "stderr", "lines": [...]}
+    - worker: {"type": "done", "exit_code": ..., "is_timed_out": ..., "duration": ..., "peak_memory": ...,
+      "worker_memory": ...}
+    - request: {"type": "exit"}, or closed stdin, stops the worker
+
+Usage: python script_worker.py [--preload module1,module2]
+"""
+
+import builtins
+import codecs
+import importlib
+import json
+import os
+import resource
+import selectors
+import signal
+import sys
+import time
+import traceback
+
+OUTPUT_CHUNK_SIZE = 64 * 1024
+MAX_PARTIAL_LINE = 64 * 1024  # Longer output without a newline is sent as it is
+WORKER_DIR = os.path.dirname(os.path.abspath(__file__))  # sys.path[0] of the worker, not of the scripts
+
+
+def get_memory_usage() -> int:
+    """Current resident memory of the process in bytes (peak resident memory where /proc isn't available)."""
+    try:
+        with open("/proc/self/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak_memory if sys.platform == "darwin" else peak_memory * 1024
+
+
+def preload_modules(module_names: list[str]) -> tuple[list[str], dict[str, str]]:
+    preloaded, failed_preloads = [], {}
+    for module_name in module_names:
+        try:
+            importlib.import_module(module_name)
+            preloaded.append(module_name)
+        except Exception as e:
+            failed_preloads[module_name] = repr(e)
+    return preloaded, failed_preloads
+
+
+def _exit_code_of_system_exit(e: SystemExit) -> int:
+    # As the interpreter does - None is success, other objects are printed
+    if e.code is None:
+        return 0
+    elif isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def _run_in_child(request: dict, stdout_fd: int, stderr_fd: int, protocol_fd: int) -> None:
+    """Body of the forked child, never returns."""
+    exit_code = 1
+    try:
+        os.close(protocol_fd)
+        os.setsid()
+        devnull_fd = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull_fd, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+
+        if request.get("max_memory_bytes"):
+            resource.setrlimit(resource.RLIMIT_AS, (request["max_memory_bytes"], request["max_memory_bytes"]))
+        if request.get("max_cpu_seconds"):
+            resource.setrlimit(resource.RLIMIT_CPU, (request["max_cpu_seconds"], request["max_cpu_seconds"]))
+        if request.get("cwd"):
+            os.chdir(request["cwd"])
+        # As with python -c, the working directory (instead of the worker's directory) comes first on sys.path
+        sys.path[:] = [path for path in sys.path if os.path.abspath(path or ".") != WORKER_DIR]
+        sys.path[:0] = [*(request.get("sys_path") or []), ""]
+        sys.argv = ["-c"]
+
+        namespace = {"__name__": "__main__", "__builtins__": builtins}
+        try:
+            exec(compile(request["script"], "<string>", "exec"), namespace)
+            exit_code = 0
+        except SystemExit as e:
+            exit_code = _exit_code_of_system_exit(e)
+        except BaseException:
+            traceback.print_exc()
+    except BaseException:
+        traceback.print_exc()  # Failed preparation of the run
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+class _LineSplitter:
+    """Splits decoded output into lines (with line ends), holding back an unfinished line."""
+
+    def __init__(self):
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.partial_line = ""
+
+    def feed(self, data: bytes, is_final: bool = False) -> list[str]:
+        text = self.partial_line + self.decoder.decode(data, final=is_final)
+        lines = text.splitlines(keepends=True)
+        if lines and not lines[-1].endswith(("\n", "\r")) and not is_final and len(lines[-1]) < MAX_PARTIAL_LINE:
+            self.partial_line = lines.pop()
+        else:
+            self.partial_line = ""
+        return lines
+
+
+class ScriptWorker:
+    def __init__(self, protocol_output):
+        self.protocol_output = protocol_output
+
+    def send(self, message: dict) -> None:
+        self.protocol_output.write(json.dumps(message) + "\n")
+        self.protocol_output.flush()
+
+    def run_script(self, request: dict) -> None:
+        start = time.monotonic()
+        stdout_read_fd, stdout_write_fd = os.pipe()
+        stderr_read_fd, stderr_write_fd = os.pipe()
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(stdout_read_fd)
+            os.close(stderr_read_fd)
+            _run_in_child(request, stdout_write_fd, stderr_write_fd, self.protocol_output.fileno())
+        os.close(stdout_write_fd)
+        os.close(stderr_write_fd)
+
+        is_timed_out = self._relay_output(
+            {stdout_read_fd: "stdout", stderr_read_fd: "stderr"}, pid, request.get("timeout"), start
+        )
+        _, status, rusage = os.wait4(pid, 0)
+        peak_memory = rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+
+        self.send({
+            "type": "done",
+            "exit_code": os.waitstatus_to_exitcode(status),
+            "is_timed_out": is_timed_out,
+            "duration": time.monotonic() - start,
+            "peak_memory": peak_memory,
+            "worker_memory": get_memory_usage(),
+        })
+
+    def _relay_output(self, streams: dict[int, str], pid: int, timeout, start: float) -> bool:
+        """Send output of the child until it closes its pipes, return whether it was killed on timeout."""
+        splitters = {fd: _LineSplitter() for fd in streams}
+        is_timed_out = False
+        with selectors.DefaultSelector() as selector:
+            for fd in streams:
+                selector.register(fd, selectors.EVENT_READ)
+
+            while selector.get_map():
+                remaining = None if timeout is None else timeout - (time.monotonic() - start)
+                if remaining is not None and remaining <= 0 and not is_timed_out:
+                    is_timed_out = True
+                    try:
+                        os.killpg(pid, signal.SIGKILL)  # The child and its subprocesses
+                    except ProcessLookupError:
+                        pass
+
+                events = selector.select(None if remaining is None or is_timed_out else remaining)
+                for key, _ in events:
+                    data = os.read(key.fd, OUTPUT_CHUNK_SIZE)
+                    if not data:
+                        selector.unregister(key.fd)
+                        os.close(key.fd)
+                    lines = splitters[key.fd].feed(data, is_final=not data)
+                    if lines:
+                        self.send({"type": "output", "stream": streams[key.fd], "lines": lines})
+        return is_timed_out
+
+    def serve(self, requests) -> None:
+        for request_line in requests:
+            request = json.loads(request_line)
+            if request.get("type") == "exit":
+                break
+            elif request.get("type") == "run":
+                self.run_script(request)
+
+
+def main(argv: list[str]) -> None:
+    module_names = []
+    if "--preload" in argv:
+        module_names = [name for name in argv[argv.index("--preload") + 1].split(",") if name]
+
+    # The original stdout is the protocol channel, anything else printed goes to stderr
+    protocol_output = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+
+    preloaded, failed_preloads = preload_modules(module_names)
+    worker = ScriptWorker(protocol_output)
+    worker.send({"type": "ready", "pid": os.getpid(), "preloaded": preloaded, "failed_preloads": failed_preloads})
+    worker.serve(sys.stdin)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
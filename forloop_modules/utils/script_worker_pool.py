@@ -0,0 +1,325 @@
+"""
+Pool of warm worker processes executing Python scripts.
+
+Starting a fresh interpreter per script (python -c script) pays the interpreter start-up plus imports
+of heavy libraries (pandas, numpy) on every run. Pool workers (see script_worker) import preload_modules
+once when started - ahead of the first script - and run every script in a child forked from themselves,
+so a script starts in milliseconds with the libraries already imported, isolated from other runs.
+
+A worker is recycled (stopped and replaced in the background) after max_runs_per_worker runs, when its
+resident memory exceeds max_worker_memory_bytes, or when it fails. Workers use os.fork, the pool is
+available on POSIX systems only (see is_worker_pool_supported).
+"""
+
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+import forloop_modules.flog as flog
+from forloop_modules.errors.errors import ScriptWorkerError
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_PRELOAD_MODULES = ("numpy", "pandas")
+DEFAULT_MAX_RUNS_PER_WORKER = 100
+DEFAULT_MAX_WORKER_MEMORY_BYTES = 1024 * 1024 * 1024
+WORKER_START_TIMEOUT = 60  # seconds
+
+SCRIPT_WORKER_PATH = Path(__file__).with_name("script_worker.py")
+
+
+def is_worker_pool_supported() -> bool:
+    return hasattr(os, "fork") and sys.platform != "win32"
+
+
+@dataclass
+class ScriptRunResult:
+    exit_code: int
+    is_timed_out: bool
+    duration: float  # seconds, from the fork of the script's process
+    peak_memory: int  # bytes, peak resident memory of the script's process
+    worker_pid: int
+
+
+@dataclass
+class ScriptWorkerPoolStats:
+    runs: int = 0
+    workers_started: int = 0
+    recycled_by_runs: int = 0
+    recycled_by_memory: int = 0
+    failed_workers: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "workers_started": self.workers_started,
+            "recycled_by_runs": self.recycled_by_runs,
+            "recycled_by_memory": self.recycled_by_memory,
+            "failed_workers": self.failed_workers,
+        }
+
+
+class ScriptWorkerProcess:
+    """Parent side of one worker process and its JSON lines protocol (see script_worker)."""
+
+    def __init__(self, preload_modules: Iterable[str], python_executable: str = sys.executable):
+        self.process = subprocess.Popen(
+            [python_executable, "-u", str(SCRIPT_WORKER_PATH), "--preload", ",".join(preload_modules)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        self.runs_count = 0
+        self.memory = 0
+        self.ready_message: Optional[dict] = None
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read_message(self) -> dict:
+        line = self.process.stdout.readline()
+        if not line:
+            raise ScriptWorkerError(f"Script worker {self.pid} exited with code {self.process.poll()}")
+        return json.loads(line)
+
+    def wait_until_ready(self) -> dict:
+        """Wait for the worker to import the preloaded modules, return its ready message."""
+        self.ready_message = self._read_message()
+        if self.ready_message.get("type") != "ready":
+            raise ScriptWorkerError(f"Unexpected first message of script worker {self.pid}: {self.ready_message}")
+        if self.ready_message["failed_preloads"]:
+            flog.warning(f"Script worker {self.pid} failed to preload {self.ready_message['failed_preloads']}")
+        return self.ready_message
+
+    def run(self, request: dict, on_output: Optional[Callable[[str, str], None]] = None) -> dict:
+        """Send the run request, pass output lines to on_output(stream, line), return the done message."""
+        try:
+            self.process.stdin.write(json.dumps({"type": "run", **request}) + "\n")
+            self.process.stdin.flush()
+        except OSError as e:
+            raise ScriptWorkerError(f"Script worker {self.pid} is not accepting requests: {e}") from e
+
+        while True:
+            message = self._read_message()
+            if message["type"] == "output":
+                if on_output is not None:
+                    for line in message["lines"]:
+                        on_output(message["stream"], line)
+            elif message["type"] == "done":
+                self.runs_count += 1
+                self.memory = message["worker_memory"]
+                return message
+            else:
+                raise ScriptWorkerError(f"Unexpected message of script worker {self.pid}: {message}")
+
+    def stop(self, timeout: float = 5) -> None:
+        try:
+            self.process.stdin.write(json.dumps({"type": "exit"}) + "\n")
+            self.process.stdin.close()
+            self.process.wait(timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        finally:
+            self.process.stdout.close()
+
+
+class ScriptWorkerPool:
+    """
+    Pool of warm script workers (see module docstring), started by start() or on the first run.
+
+    :param size: Number of worker processes, i.e. of concurrently running scripts
+    :type size: int
+    :param preload_modules: Modules imported by workers before they accept scripts
+    :type preload_modules: Iterable[str]
+    :param max_runs_per_worker: Number of runs after which a worker is replaced
+    :type max_runs_per_worker: int
+    :param max_worker_memory_bytes: Resident memory of a worker above which it's replaced
+    :type max_worker_memory_bytes: int
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        preload_modules: Iterable[str] = DEFAULT_PRELOAD_MODULES,
+        max_runs_per_worker: int = DEFAULT_MAX_RUNS_PER_WORKER,
+        max_worker_memory_bytes: int = DEFAULT_MAX_WORKER_MEMORY_BYTES,
+        python_executable: str = sys.executable,
+    ):
+        self.size = size
+        self.preload_modules = tuple(preload_modules)
+        self.max_runs_per_worker = max_runs_per_worker
+        self.max_worker_memory_bytes = max_worker_memory_bytes
+        self.python_executable = python_executable
+        self.stats = ScriptWorkerPoolStats()
+
+        self._idle_workers: queue.Queue[ScriptWorkerProcess] = queue.Queue()
+        self._workers: set[ScriptWorkerProcess] = set()
+        self._lock = threading.Lock()
+        self._is_started = False
+        self._is_closed = False
+
+    def __enter__(self) -> "ScriptWorkerPool":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Start all workers and wait until they are ready."""
+        with self._lock:
+            if self._is_started:
+                return
+            if not is_worker_pool_supported():
+                raise ScriptWorkerError("Script worker pool requires os.fork (POSIX systems)")
+            self._is_started = True
+            self._is_closed = False
+            workers = [self._spawn_worker() for _ in range(self.size)]
+
+        for worker in workers:  # Started concurrently, preloading in parallel
+            self._make_ready(worker)
+
+    def _spawn_worker(self) -> ScriptWorkerProcess:
+        worker = ScriptWorkerProcess(self.preload_modules, self.python_executable)
+        self._workers.add(worker)
+        self.stats.workers_started += 1
+        return worker
+
+    def _make_ready(self, worker: ScriptWorkerProcess) -> None:
+        try:
+            worker.wait_until_ready()
+        except Exception as e:
+            flog.error(f"Script worker {worker.pid} failed to start: {e}", self)
+            self.stats.failed_workers += 1
+            self._discard_worker(worker)
+            return
+        self._idle_workers.put(worker)
+
+    def _discard_worker(self, worker: ScriptWorkerProcess) -> None:
+        with self._lock:
+            self._workers.discard(worker)
+        worker.stop()
+
+    def _replace_worker(self, worker: ScriptWorkerProcess) -> None:
+        """Stop the worker and start its replacement in the background."""
+        self._discard_worker(worker)
+        with self._lock:
+            if self._is_closed:
+                return
+            new_worker = self._spawn_worker()
+        threading.Thread(target=self._make_ready, args=(new_worker,), name="script-worker-start", daemon=True).start()
+
+    def _acquire_worker(self) -> ScriptWorkerProcess:
+        while True:
+            with self._lock:
+                if not self._workers:
+                    raise ScriptWorkerError("No script workers are running")
+            try:
+                worker = self._idle_workers.get(timeout=WORKER_START_TIMEOUT)
+            except queue.Empty:
+                raise ScriptWorkerError(f"No script worker became available within {WORKER_START_TIMEOUT}s")
+            if worker.is_alive():
+                return worker
+            self.stats.failed_workers += 1
+            self._replace_worker(worker)
+
+    def run(
+        self,
+        script_text: str,
+        on_output: Optional[Callable[[str, str], None]] = None,
+        sys_path: Iterable[Union[str, Path]] = (),
+        cwd: Optional[Union[str, Path]] = None,
+        timeout: Optional[float] = None,
+        max_memory_bytes: Optional[int] = None,
+        max_cpu_seconds: Optional[int] = None,
+    ) -> ScriptRunResult:
+        """
+        Run the script in a warm worker, blocks until a worker is idle and the script finishes.
+
+        :param on_output: Called with "stdout"/"stderr" and each output line as the script prints it
+        :type on_output: Optional[Callable[[str, str], None]]
+        :param sys_path: Paths put in front of sys.path of the script (e.g. of a script environment)
+        :type sys_path: Iterable[Union[str, Path]]
+        :param timeout: Wall-clock time limit in seconds, the script is killed when exceeded
+        :type timeout: Optional[float]
+        :param max_memory_bytes: Address space limit of the script's process
+        :type max_memory_bytes: Optional[int]
+        :raises ScriptWorkerError: The worker failed (the script's own errors are in its exit code and stderr)
+        """
+        self.start()
+        request = {
+            "script": script_text,
+            "sys_path": [str(path) for path in sys_path],
+            "cwd": str(cwd) if cwd is not None else os.getcwd(),
+            "timeout": timeout,
+            "max_memory_bytes": max_memory_bytes,
+            "max_cpu_seconds": max_cpu_seconds,
+        }
+
+        worker = self._acquire_worker()
+        try:
+            done_message = worker.run(request, on_output)
+        except Exception:
+            self.stats.failed_workers += 1
+            self._replace_worker(worker)
+            raise
+
+        self.stats.runs += 1
+        if worker.runs_count >= self.max_runs_per_worker:
+            self.stats.recycled_by_runs += 1
+            self._replace_worker(worker)
+        elif worker.memory > self.max_worker_memory_bytes:
+            self.stats.recycled_by_memory += 1
+            flog.info(f"Script worker {worker.pid} recycled, its memory {worker.memory} B exceeds the limit", self)
+            self._replace_worker(worker)
+        else:
+            self._idle_workers.put(worker)
+
+        return ScriptRunResult(
+            exit_code=done_message["exit_code"],
+            is_timed_out=done_message["is_timed_out"],
+            duration=done_message["duration"],
+            peak_memory=done_message["peak_memory"],
+            worker_pid=worker.pid,
+        )
+
+    def close(self) -> None:
+        """Stop all workers, a later run starts them again."""
+        with self._lock:
+            self._is_closed = True
+            self._is_started = False
+            workers, self._workers = self._workers, set()
+        self._idle_workers = queue.Queue()
+        for worker in workers:
+            worker.stop()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            workers_count = len(self._workers)
+        return {**self.stats.to_dict(), "workers": workers_count, "idle_workers": self._idle_workers.qsize()}
+
+
+_script_worker_pool: Optional[ScriptWorkerPool] = None
+_script_worker_pool_lock = threading.Lock()
+
+
+def get_script_worker_pool() -> ScriptWorkerPool:
+    """Shared pool of the process, its workers are started on the first run."""
+    global _script_worker_pool
+    with _script_worker_pool_lock:
+        if _script_worker_pool is None:
+            _script_worker_pool = ScriptWorkerPool()
+        return _script_worker_pool
@@ -1,55 +1,334 @@
+"""
+Server-Sent Events streaming on top of HTTPX clients.
+
+Lines are decoded according to the SSE specification (multi-line data, comments, unknown fields are
+ignored), dropped connections are resumed automatically - after the delay requested by the server's
+"retry:" field and with the Last-Event-ID header of the last received event. A stream closed by the
+server (or responding with 204 No Content) is not reconnected. After DEFAULT_MAX_RECONNECT_ATTEMPTS
+reconnections in a row without receiving a message the connection error is raised.
+
+Messages are dictionaries with "data" key and optional "event" and "id" keys. Unlike the earlier
+parser, the "retry:" field is not passed on as a message key (it only sets the reconnection delay), and
+one space following the field's colon is removed as the specification requires, so e.g. "data: abc"
+gives "abc" instead of " abc".
+
+With max_queue_size > 0 the messages are read ahead into a bounded queue, so short bursts of a slow
+consumer do not stall the connection, while a persistently slow consumer blocks the reading and the
+server is throttled by TCP flow control instead of messages piling up in memory.
+"""
+
+import asyncio
 import json
-from collections.abc import Generator
-from typing import Literal, Optional
+import queue
+import threading
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Generator, Iterable, Iterator
+from typing import Any, Literal, Optional
 
 import httpx
 
+import forloop_modules.flog as flog
+
+DEFAULT_RETRY_DELAY = 3.0  # Reconnection delay in seconds until the server sends a "retry:" field
+DEFAULT_MAX_RECONNECT_ATTEMPTS = 5
+
+# Errors of a dropped connection, the stream is resumed by reconnecting
+RECONNECT_ERRORS = (httpx.TransportError,)
+
+_QUEUE_END = object()
+
+
+class _ProducerError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class SSEDecoder:
+    """
+    Incremental decoder of SSE lines (without line endings) into message dictionaries with "data" key
+    and optional "event" and "id" keys. It keeps the last event id and the reconnection time requested
+    by the server across reconnections.
+    """
+
+    def __init__(self, as_dict: bool = True):
+        self.as_dict = as_dict
+        self.last_event_id: Optional[str] = None
+        self.retry: Optional[int] = None  # milliseconds
+
+        self._data_lines: list[str] = []
+        self._event: Optional[str] = None
+
+    def reset_message(self) -> None:
+        """Discard a partially received message, e.g. when the connection was dropped."""
+        self._data_lines = []
+        self._event = None
+
+    def get_retry_delay(self, default: float = DEFAULT_RETRY_DELAY) -> float:
+        return self.retry / 1000 if self.retry is not None else default
+
+    def decode(self, lines: Iterable[str]) -> Generator[dict, None, None]:
+        for line in lines:
+            message = self.feed_line(line)
+            if message is not None:
+                yield message
+
+    def feed_line(self, line: str) -> Optional[dict]:
+        """Process one line, return a message when the line completes it."""
+        if not line:
+            return self._dispatch()
+        if line.startswith(":"):  # Comment, e.g. keep-alive ping
+            return None
+
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+
+        if field == "data":
+            self._data_lines.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            if "\0" not in value:
+                self.last_event_id = value
+        elif field == "retry":
+            if value.isdigit():
+                self.retry = int(value)
+        else:
+            flog.debug(lambda: f"SSE field '{field}' not recognized, line ignored: {line}")
+
+        return None
+
+    def _dispatch(self) -> Optional[dict]:
+        if not self._data_lines:  # Messages without data are not dispatched
+            self._event = None
+            return None
+
+        message = {"data": self._parse_data("\n".join(self._data_lines))}
+        if self._event:
+            message["event"] = self._event
+        if self.last_event_id is not None:
+            message["id"] = self.last_event_id
+
+        self.reset_message()
+        return message
+
+    def _parse_data(self, data: str) -> Any:
+        if not self.as_dict:
+            return data
+        try:
+            return json.loads(data)
+        except json.JSONDecodeError:
+            return data
+
+
+def _get_stream_headers(decoder: SSEDecoder, headers: Optional[dict] = None) -> dict:
+    stream_headers = {"Accept": "text/event-stream", "Cache-Control": "no-cache"}
+    stream_headers.update(headers or {})
+    if decoder.last_event_id:
+        stream_headers["Last-Event-ID"] = decoder.last_event_id
+    return stream_headers
+
+
+def iter_with_bounded_queue(messages: Iterator, max_queue_size: int) -> Generator[Any, None, None]:
+    """
+    Read messages ahead in a background thread into a queue of at most max_queue_size items. The
+    reading thread is blocked while the queue is full.
+    """
+    message_queue = queue.Queue(maxsize=max_queue_size)
+    stop_event = threading.Event()
+
+    def put(item) -> bool:
+        while not stop_event.is_set():
+            try:
+                message_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for message in messages:
+                if not put(message):
+                    return
+            put(_QUEUE_END)
+        except Exception as e:
+            put(_ProducerError(e))
+        finally:
+            close = getattr(messages, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, name="SSEReader", daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = message_queue.get()
+            if item is _QUEUE_END:
+                return
+            if isinstance(item, _ProducerError):
+                raise item.error
+            yield item
+    finally:
+        stop_event.set()
+
+
+async def aiter_with_bounded_queue(messages: AsyncIterator, max_queue_size: int) -> AsyncGenerator[Any, None]:
+    """Asynchronous counterpart of iter_with_bounded_queue, messages are read ahead in a task."""
+    message_queue = asyncio.Queue(maxsize=max_queue_size)
+
+    async def produce():
+        try:
+            async for message in messages:
+                await message_queue.put(message)
+            await message_queue.put(_QUEUE_END)
+        except Exception as e:
+            await message_queue.put(_ProducerError(e))
+
+    producer = asyncio.create_task(produce())
+
+    try:
+        while True:
+            item = await message_queue.get()
+            if item is _QUEUE_END:
+                return
+            if isinstance(item, _ProducerError):
+                raise item.error
+            yield item
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+        aclose = getattr(messages, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
 
 class SSEParser:
     """
     Collect and parse messages from a Server-Sent Event stream. This class augments the HTTPX with
-    parsing logic for SSE streams - it collects yielded lines from a SSE and parses it as a
-    dictionary.
+    parsing logic for SSE streams - it collects yielded lines from a SSE and parses them as
+    dictionaries, reconnecting when the connection is dropped.
     """
 
-    def __init__(self, httpx_client: httpx.Client):
+    def __init__(
+        self,
+        httpx_client: httpx.Client,
+        reconnect: bool = True,
+        max_reconnect_attempts: Optional[int] = DEFAULT_MAX_RECONNECT_ATTEMPTS,
+        default_retry_delay: float = DEFAULT_RETRY_DELAY,
+        max_queue_size: int = 0,
+    ):
+        """
+        :param reconnect: Resume the stream when the connection is dropped
+        :type reconnect: bool
+        :param max_reconnect_attempts: Maximum number of reconnections without receiving a message (None = unlimited)
+        :type max_reconnect_attempts: Optional[int]
+        :param max_queue_size: Number of messages read ahead in a background thread (0 = no read ahead)
+        :type max_queue_size: int
+        """
         self.client = httpx_client
+        self.reconnect = reconnect
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self.default_retry_delay = default_retry_delay
+        self.max_queue_size = max_queue_size
 
     def stream(
-        self, method: Literal['GET', 'POST'], url: str, as_dict: bool = True,
-        httpx_kwargs: Optional[dict] = None
+        self,
+        method: Literal["GET", "POST"],
+        url: str,
+        as_dict: bool = True,
+        httpx_kwargs: Optional[dict] = None,
     ) -> Generator[dict, None, None]:
-        httpx_kwargs = httpx_kwargs or {}
+        messages = self._stream_messages(method, url, as_dict, httpx_kwargs or {})
+        if self.max_queue_size > 0:
+            yield from iter_with_bounded_queue(messages, self.max_queue_size)
+        else:
+            yield from messages
 
-        with self.client.stream(method, url, **httpx_kwargs) as response:
-            response.raise_for_status()
-            yield self._get_messages(response.iter_lines(), as_dict=as_dict)
+    def _can_reconnect(self, failed_attempts: int) -> bool:
+        if not self.reconnect:
+            return False
+        return self.max_reconnect_attempts is None or failed_attempts < self.max_reconnect_attempts
+
+    def _stream_messages(
+        self, method: str, url: str, as_dict: bool, httpx_kwargs: dict
+    ) -> Generator[dict, None, None]:
+        httpx_kwargs = dict(httpx_kwargs)
+        headers = httpx_kwargs.pop("headers", None)
+        decoder = SSEDecoder(as_dict=as_dict)
+        failed_attempts = 0
+
+        while True:
+            try:
+                stream_headers = _get_stream_headers(decoder, headers)
+                with self.client.stream(method, url, headers=stream_headers, **httpx_kwargs) as response:
+                    if response.status_code == 204:  # Server requests not to reconnect
+                        return
+                    response.raise_for_status()
+                    for message in decoder.decode(response.iter_lines()):
+                        failed_attempts = 0
+                        yield message
+                return
+            except RECONNECT_ERRORS as e:
+                if not self._can_reconnect(failed_attempts):
+                    raise
+                failed_attempts += 1
+                delay = decoder.get_retry_delay(self.default_retry_delay)
+                flog.warning(f"SSE stream {url} dropped ({e!r}), reconnecting in {delay}s", self)
+                decoder.reset_message()
+                time.sleep(delay)
 
-    def _get_messages(self, lines_iter: Generator[str, None, None],
-                      as_dict: bool) -> Generator[dict, None, None]:
-        message = {}
-        for line in lines_iter:
-            if message and line == "":  # Yield when reached the end of the message
-                yield message
-                message = {}
-                continue
-            elif not message and line == "":  # Ignore consecutive empty lines
-                continue
 
-            parsed_line = self._parse_line(line, as_dict)
-            message.update(parsed_line)
+class AsyncSSEParser(SSEParser):
+    """Asynchronous counterpart of SSEParser working with httpx.AsyncClient."""
 
-    def _parse_line(self, line: str, as_dict: bool) -> dict:
-        line_type, message_string = line.split(':', 1)
+    def __init__(self, httpx_client: httpx.AsyncClient, **kwargs):
+        super().__init__(httpx_client, **kwargs)
 
-        if line_type not in ['id', 'data', 'event', 'retry']:
-            raise AttributeError(f'SSE line type {line_type} not recognized', line)
+    async def stream(
+        self,
+        method: Literal["GET", "POST"],
+        url: str,
+        as_dict: bool = True,
+        httpx_kwargs: Optional[dict] = None,
+    ) -> AsyncGenerator[dict, None]:
+        messages = self._stream_messages(method, url, as_dict, httpx_kwargs or {})
+        if self.max_queue_size > 0:
+            messages = aiter_with_bounded_queue(messages, self.max_queue_size)
 
-        if line_type == 'data' and as_dict:
+        async for message in messages:
+            yield message
+
+    async def _stream_messages(
+        self, method: str, url: str, as_dict: bool, httpx_kwargs: dict
+    ) -> AsyncGenerator[dict, None]:
+        httpx_kwargs = dict(httpx_kwargs)
+        headers = httpx_kwargs.pop("headers", None)
+        decoder = SSEDecoder(as_dict=as_dict)
+        failed_attempts = 0
+
+        while True:
             try:
-                message = json.loads(message_string)
-            except json.JSONDecodeError:
-                message = message_string
-            return {line_type: message}
-        else:
-            return {line_type: message_string}
+                stream_headers = _get_stream_headers(decoder, headers)
+                async with self.client.stream(method, url, headers=stream_headers, **httpx_kwargs) as response:
+                    if response.status_code == 204:
+                        return
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        message = decoder.feed_line(line)
+                        if message is not None:
+                            failed_attempts = 0
+                            yield message
+                return
+            except RECONNECT_ERRORS as e:
+                if not self._can_reconnect(failed_attempts):
+                    raise
+                failed_attempts += 1
+                delay = decoder.get_retry_delay(self.default_retry_delay)
+                flog.warning(f"SSE stream {url} dropped ({e!r}), reconnecting in {delay}s", self)
+                decoder.reset_message()
+                await asyncio.sleep(delay)
@@ -19,4 +19,5 @@ REDIS_CONFIG_HOST = None
 REDIS_CONFIG_USERNAME = None
 REDIS_CONFIG_PASSWORD = None
 
-E2B_API_KEY = None # Used for E2B connection in RunPythonScriptHandler
\ No newline at end of file
+E2B_API_KEY = None # Used for E2B connection in RunPythonScriptHandler
+USE_SCRIPT_WORKER_POOL = False # RunPythonScriptHandler runs scripts in warm pre-forked workers (POSIX only), see script_worker_pool
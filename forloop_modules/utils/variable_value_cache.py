@@ -0,0 +1,192 @@
+"""
+In-process cache of deserialized values of Redis-stored variables (DataFrames, arrays, ...).
+
+Every write of a value increments its version counter in Redis (see bump_value_version, the key of the
+counter is redis_config.VARIABLE_VERSION_KEY_TEMPLATE), cached values are stamped with the version they
+were read or written with. A read fetches only the (small) version counter and returns the cached value
+while the versions match, so repeated reads of a large DataFrame avoid transferring and deserializing it. Values written in this process are cached right away
+(write-through). Writers bypassing the version counter are not detected - variable values have to be
+written via LocalVariableHandler.
+
+Callers get copies of cached values and the cache keeps a copy of written ones (see copy_value), so a
+caller modifying a value in place doesn't change what later reads in the process get.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+import forloop_modules.flog as flog
+
+DEFAULT_VALUE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def estimate_value_size(value: Any) -> int:
+    """Memory taken by the value in bytes (deep for DataFrames, shallow for other objects)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    elif isinstance(value, np.ndarray):
+        return value.nbytes
+    return sys.getsizeof(value)
+
+
+def _is_copy_on_write_enabled() -> bool:
+    return int(pd.__version__.split(".")[0]) >= 3 or pd.options.mode.copy_on_write is True  # Not "warn"
+
+
+def copy_value(value: Any) -> Any:
+    """
+    Copy of a value going into or out of the cache. DataFrames and Series are copied shallowly under pandas'
+    copy-on-write (data is copied on the first modification only), deeply otherwise. Other Redis-stored
+    values (datetimes, functions, classes) are immutable and returned as they are.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=not _is_copy_on_write_enabled())
+    elif isinstance(value, np.ndarray):
+        return value.copy()
+    return value
+
+
+def get_value_version(kv_redis, version_redis_name: str) -> Optional[int]:
+    """Current version of a value, None if it was never versioned."""
+    version = kv_redis.get(version_redis_name)
+    return int(version) if version is not None else None
+
+
+def bump_value_version(kv_redis, version_redis_name: str) -> int:
+    """
+    Increment the version of a value (after the value was written), return the new version. A new counter
+    in Redis starts at the current time in nanoseconds, so a value deleted together with its counter
+    doesn't get a version again that a reader in another process may still have cached.
+    """
+    redis_client = getattr(kv_redis, "redis", None)
+    if redis_client is not None:
+        redis_client.set(version_redis_name, time.time_ns(), nx=True)
+        return int(redis_client.incr(version_redis_name))
+
+    # keepvariable's dummy server lives in this process only, no concurrent writers
+    version = (kv_redis.get(version_redis_name) or 0) + 1
+    kv_redis.set(version_redis_name, version)
+    return version
+
+
+@dataclass
+class CachedValue:
+    value: Any
+    version: int
+    size: int
+
+
+@dataclass
+class ValueCacheStats:
+    hits: int = 0
+    misses: int = 0
+    bytes_saved: int = 0  # Bytes of values served from the cache instead of Redis
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        requests_count = self.hits + self.misses
+        return self.hits / requests_count if requests_count else 0.0
+
+
+class VariableValueCache:
+    """
+    Version-stamped LRU cache of values keyed by their Redis names, bounded by the total estimated size
+    of the values (see module docstring).
+
+    :param max_bytes: Maximum total size of cached values, least recently used ones are evicted first
+    :type max_bytes: int
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_VALUE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.stats = ValueCacheStats()
+        self._values: OrderedDict[str, CachedValue] = OrderedDict()
+        self._size = 0
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, redis_name: str, version: Optional[int]) -> tuple[bool, Any]:
+        """Return (True, value) if the value is cached with the version, (False, None) otherwise."""
+        with self._lock:
+            cached_value = self._values.get(redis_name)
+            if cached_value is None or version is None or cached_value.version != version:
+                self.stats.misses += 1
+                return False, None
+
+            self._values.move_to_end(redis_name)
+            self.stats.hits += 1
+            self.stats.bytes_saved += cached_value.size
+            return True, copy_value(cached_value.value)
+
+    def put(self, redis_name: str, value: Any, version: Optional[int]) -> None:
+        """Cache the value with its version, values without a version or larger than max_bytes aren't cached."""
+        with self._lock:
+            self._remove(redis_name)
+            if version is None:
+                return
+
+            size = estimate_value_size(value)
+            if size > self.max_bytes:
+                flog.debug(lambda: f"Value of {redis_name} ({size} B) exceeds the cache size, not cached")
+                return
+
+            self._values[redis_name] = CachedValue(copy_value(value), version, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted_value = self._values.popitem(last=False)
+                self._size -= evicted_value.size
+                self.stats.evictions += 1
+
+    def get_or_load(self, redis_name: str, version: Optional[int], load: Callable[[], Any]) -> Any:
+        """Return (a copy of) the cached value of the version, or load and cache it."""
+        is_cached, value = self.get(redis_name, version)
+        if not is_cached:
+            value = load()
+            self.put(redis_name, value, version)
+        return value
+
+    def invalidate(self, redis_name: Optional[str] = None) -> None:
+        """Drop the cached value (all values if redis_name is None)."""
+        with self._lock:
+            if redis_name is None:
+                self._values.clear()
+                self._size = 0
+            else:
+                self._remove(redis_name)
+            self.stats.invalidations += 1
+
+    def _remove(self, redis_name: str) -> None:
+        cached_value = self._values.pop(redis_name, None)
+        if cached_value is not None:
+            self._size -= cached_value.size
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "values": len(self._values),
+                "size": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.stats.hits,
+                "misses": self.stats.misses,
+                "hit_ratio": self.stats.hit_ratio,
+                "bytes_saved": self.stats.bytes_saved,
+                "evictions": self.stats.evictions,
+                "invalidations": self.stats.invalidations,
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = ValueCacheStats()
@@ -1,11 +1,18 @@
+import base64
 import inspect
 import datetime
-from typing import Any
+from typing import Any, Literal
 
 import numpy as np
 import pandas as pd
 
-from forloop_modules.utils.definitions import JSON_SERIALIZABLE_TYPES, REDIS_STORED_TYPES
+from forloop_modules.utils.definitions import (
+    BINARY_DATAFRAME_TRANSPORT_FORMATS,
+    JSON_SERIALIZABLE_TYPES,
+    REDIS_STORED_TYPES,
+)
+
+DataFrameTransportFormat = Literal["json", "arrow_ipc", "parquet"]
 
 
 def is_value_serializable(value) -> bool:
@@ -25,7 +32,9 @@ def is_list_of_strings(var) -> bool:
     return isinstance(var, list) and all(isinstance(v, str) for v in var)
 
 
-def serialize_if_dataframe_to_api(variable_series: pd.Series) -> Any:
+def serialize_if_dataframe_to_api(
+    variable_series: pd.Series, transport_format: DataFrameTransportFormat = "json"
+) -> Any:
     """
     Cast a DF into a dict format used by the API if the input Variable/Result is of type 'DataFrame'
     This functions is to be used only with pd.DataFrame.apply() method, hence the input is a
@@ -33,28 +42,147 @@ def serialize_if_dataframe_to_api(variable_series: pd.Series) -> Any:
 
     :param variable_series: pd.Series holding a Variable
     :type variable_series: pd.Series
+    :param transport_format: "json" or one of the binary formats ("arrow_ipc", "parquet")
+    :type transport_format: DataFrameTransportFormat
     :return: modified pd.Series holding a Variable
     :rtype: Any
     """
     if variable_series['type'] == 'DataFrame':
-        variable_series["value"] = serialize_dataframe_to_api(variable_series["value"])
+        variable_series["value"] = serialize_dataframe_to_api(
+            variable_series["value"], transport_format=transport_format
+        )
     return variable_series
 
 
-def serialize_dataframe_to_api(variable_value_df: pd.DataFrame) -> dict:
+def serialize_dataframe_to_api(
+    variable_value_df: pd.DataFrame, transport_format: DataFrameTransportFormat = "json"
+) -> dict:
     """
     Serialize a DF into the dict format used by API.
 
     :param variable_value_df: a Variable's value attribute as a DataFrame
     :type variable_value_df: pd.DataFrame
+    :param transport_format: "json" or one of the binary formats ("arrow_ipc", "parquet")
+    :type transport_format: DataFrameTransportFormat
     :return: Variable's value serialized as a dict
     :rtype: dict
     """
+    if transport_format in BINARY_DATAFRAME_TRANSPORT_FORMATS:
+        return serialize_dataframe_to_binary(variable_value_df, transport_format, preserve_index=False)
+
     df = variable_value_df.copy()
     df = df.replace(np.nan, None)
     return {"columns": list(df.columns), "values": df.values.tolist()}
 
 
+def parse_dataframe_from_api(variable_value: dict) -> pd.DataFrame:
+    """
+    Parse a DF from any dict format produced by serialize_dataframe_to_api - the format is
+    recognized by the "transport_format" tag.
+
+    :param variable_value: a Variable's value attribute as a dict
+    :type variable_value: dict
+    :return: Variable's value as a DataFrame
+    :rtype: pd.DataFrame
+    """
+    if is_binary_serialized_dataframe(variable_value):
+        return parse_dataframe_from_binary(variable_value)
+
+    return pd.DataFrame(variable_value["values"], columns=variable_value["columns"])
+
+
+def is_binary_serialized_dataframe(value: Any) -> bool:
+    return (
+        isinstance(value, dict)
+        and value.get("transport_format") in BINARY_DATAFRAME_TRANSPORT_FORMATS
+    )
+
+
+def serialize_dataframe_to_binary(
+    df: pd.DataFrame,
+    transport_format: DataFrameTransportFormat = "arrow_ipc",
+    compression: str = "zstd",
+    preserve_index: bool = True,
+) -> dict:
+    """
+    Serialize a DF into a compressed columnar binary payload (Arrow IPC stream or Parquet), encoded
+    as base64 so it can be sent within a JSON body. Columns are encoded without any intermediate
+    copies of the frame or Python objects per cell.
+
+    :param df: DataFrame to serialize
+    :type df: pd.DataFrame
+    :param transport_format: "arrow_ipc" or "parquet"
+    :type transport_format: DataFrameTransportFormat
+    :param compression: Compression codec supported by pyarrow (e.g. "zstd", "lz4")
+    :type compression: str
+    :param preserve_index: Store the DF index alongside the columns
+    :type preserve_index: bool
+    :return: dict holding the payload tagged with its transport format (and original column labels if
+        Arrow can't store them)
+    :rtype: dict
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if transport_format not in BINARY_DATAFRAME_TRANSPORT_FORMATS:
+        raise ValueError(f"DataFrame transport format '{transport_format}' is not supported.")
+
+    # Arrow restores column labels of one type (e.g. ints, timestamps, tuples of MultiIndex), labels of
+    # mixed types would become strings - they are sent alongside and restored by the parser
+    column_labels = None
+    if not isinstance(df.columns, pd.MultiIndex) and df.columns.dtype == object and not all(isinstance(col, str) for col in df.columns):
+        column_labels = df.columns.tolist()
+        df = df.set_axis([str(position) for position in range(len(column_labels))], axis="columns")
+    table = pa.Table.from_pandas(df, preserve_index=None if preserve_index else False)
+
+    sink = pa.BufferOutputStream()
+    if transport_format == "arrow_ipc":
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink, compression=compression)
+
+    payload = {
+        "transport_format": transport_format,
+        "compression": compression,
+        "data": base64.b64encode(sink.getvalue()).decode("ascii"),
+        "attrs": df.attrs,
+    }
+    if column_labels is not None:
+        payload["column_labels"] = column_labels
+    return payload
+
+
+def parse_dataframe_from_binary(variable_value: dict) -> pd.DataFrame:
+    """
+    Parse a DF from a dict created by serialize_dataframe_to_binary.
+
+    :param variable_value: dict holding the payload tagged with its transport format
+    :type variable_value: dict
+    :return: parsed DataFrame
+    :rtype: pd.DataFrame
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    transport_format = variable_value["transport_format"]
+    buffer = pa.py_buffer(base64.b64decode(variable_value["data"]))
+
+    if transport_format == "arrow_ipc":
+        table = pa.ipc.open_stream(buffer).read_all()
+    elif transport_format == "parquet":
+        table = pq.read_table(pa.BufferReader(buffer))
+    else:
+        raise ValueError(f"DataFrame transport format '{transport_format}' is not supported.")
+
+    df = table.to_pandas()
+    if variable_value.get("column_labels") is not None:
+        df.columns = pd.Index(variable_value["column_labels"], dtype=object)
+    df.attrs = variable_value.get("attrs") or {}
+    return df
+
+
 def parse_if_dataframe_from_db(variable_series: pd.Series) -> Any:
     """
     Parse a DF from a dict format used in the DB if the input Variable/Result is of type 'DataFrame'
@@ -68,13 +196,18 @@ def parse_if_dataframe_from_db(variable_series: pd.Series) -> Any:
     """
     if variable_series['type'] == 'DataFrame':
         df_dict = variable_series["value"]
-        df = pd.DataFrame(df_dict["data"], index=df_dict["index"], columns=df_dict["columns"])
-        df.attrs = df_dict["attrs"]
+        if is_binary_serialized_dataframe(df_dict):
+            df = parse_dataframe_from_binary(df_dict)
+        else:
+            df = pd.DataFrame(df_dict["data"], index=df_dict["index"], columns=df_dict["columns"])
+            df.attrs = df_dict["attrs"]
         variable_series["value"] = df
     return variable_series
 
 
-def serialize_if_dataframe_to_db(variable_series: pd.Series) -> Any:
+def serialize_if_dataframe_to_db(
+    variable_series: pd.Series, transport_format: DataFrameTransportFormat = "json"
+) -> Any:
     """
     Cast a DF into a dict format used in the DB if the input Variable/Result is of type 'DataFrame'.
     This functions is to be used only with pd.DataFrame.apply() method, hence the input is a
@@ -82,13 +215,18 @@ def serialize_if_dataframe_to_db(variable_series: pd.Series) -> Any:
 
     :param variable_series: pd.Series holding a Variable
     :type variable_series: pd.Series
+    :param transport_format: "json" or one of the binary formats ("arrow_ipc", "parquet")
+    :type transport_format: DataFrameTransportFormat
     :return: modified pd.Series holding a Variable
     :rtype: Any
     """
     if variable_series['type'] == 'DataFrame':
         df = variable_series["value"]
-        df_dict = df.to_dict(orient="split")
-        df_dict["attrs"] = df.attrs
+        if transport_format in BINARY_DATAFRAME_TRANSPORT_FORMATS:
+            df_dict = serialize_dataframe_to_binary(df, transport_format)
+        else:
+            df_dict = df.to_dict(orient="split")
+            df_dict["attrs"] = df.attrs
         variable_series["value"] = df_dict
     return variable_series
 
@@ -0,0 +1,116 @@
+"""
+In-process evaluation of XPaths against a snapshot of a page source.
+
+Instead of a docrawl round trip (and a text file) per XPath, the page source is fetched once and all
+XPaths are evaluated on its lxml tree. Values follow docrawl's extraction rules - links ("a" tags)
+yield their absolute href, other elements their text nodes, stripped and without empty ones, and an
+XPath matching nothing yields ["None"].
+"""
+
+from typing import Optional, Union
+from urllib.parse import urljoin
+
+import lxml.etree
+import lxml.html
+
+import forloop_modules.flog as flog
+
+NO_DATA = ["None"]  # docrawl's result of an XPath without matches
+
+XPathItem = Union[str, list[str]]  # XPath or a group of XPaths of one column
+
+
+def prepare_xpath_for_extraction(xpath: str) -> str:
+    """Select href of links and text of other elements, as docrawl's extraction does."""
+    last_step = xpath.split('/')[-1]
+    if last_step == 'a' or last_step.startswith('a['):
+        return xpath + '/@href'
+    elif not xpath.endswith('/text()') and '@' not in last_step:
+        return xpath + '/text()'
+    return xpath
+
+
+def parse_page_source(page_source: str) -> lxml.etree._Element:
+    return lxml.html.fromstring(page_source)
+
+
+def _to_text(result) -> str:
+    if isinstance(result, lxml.etree._Element):
+        return result.text_content()
+    return str(result)
+
+
+def evaluate_xpath(tree: lxml.etree._Element, xpath: str, base_url: Optional[str] = None) -> list[str]:
+    """
+    Extracted values of the XPath (see module docstring).
+
+    :raises lxml.etree.XPathError: invalid XPath
+    """
+    prepared_xpath = prepare_xpath_for_extraction(xpath)
+    results = tree.xpath(prepared_xpath)
+    if not isinstance(results, list):  # Functions like count() return a single value
+        results = [results]
+
+    values = [_to_text(result).strip() for result in results]
+    if prepared_xpath.endswith('/@href') and base_url:
+        values = [urljoin(base_url, value) for value in values]
+
+    values = [value for value in values if value]
+    return values or list(NO_DATA)
+
+
+def extract_xpaths(
+    tree: lxml.etree._Element, xpath_items: list[XPathItem], base_url: Optional[str] = None
+) -> list[Optional[Union[str, list[str]]]]:
+    """
+    Evaluate all XPaths on the tree, results are aligned with xpath_items - a single value as a string,
+    multiple values as a list, values of a group of XPaths joined by newlines into one string, None for
+    an invalid XPath.
+    """
+    results = []
+    for xpath_item in xpath_items:
+        xpaths = xpath_item if isinstance(xpath_item, list) else [xpath_item]
+        try:
+            values = [value for xpath in xpaths for value in evaluate_xpath(tree, xpath, base_url)]
+        except lxml.etree.XPathError as e:
+            flog.warning(f"Invalid XPath {xpath_item}: {e}")
+            results.append(None)
+            continue
+
+        if isinstance(xpath_item, list):
+            results.append("\n".join(values))
+        else:
+            results.append(values[0] if len(values) == 1 else values)
+
+    return results
+
+
+def count_xpath_matches(tree: lxml.etree._Element, xpaths: list[str]) -> list[int]:
+    """Numbers of elements matched by each XPath, all evaluated on the same parsed tree, 0 for an invalid XPath."""
+    match_counts = []
+    for xpath in xpaths:
+        try:
+            results = tree.xpath(xpath)
+        except lxml.etree.XPathError as e:
+            flog.warning(f"Invalid XPath {xpath}: {e}")
+            results = []
+        match_counts.append(len(results) if isinstance(results, list) else 1)
+    return match_counts
+
+
+def extract_image_urls(tree: lxml.etree._Element, xpath: str, base_url: Optional[str] = None) -> list[str]:
+    """
+    Absolute URLs of images matched by the XPath - "data-src" (lazy loaded images) or "src" attributes of
+    the elements, or the matched attribute values themselves. Elements without a URL are dropped.
+
+    :raises lxml.etree.XPathError: invalid XPath
+    """
+    urls = []
+    for result in tree.xpath(xpath):
+        if isinstance(result, lxml.etree._Element):
+            url = result.get('data-src') or result.get('src')
+        else:
+            url = str(result)
+        if url and url.strip():
+            urls.append(urljoin(base_url, url.strip()) if base_url else url.strip())
+    return urls
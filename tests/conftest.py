@@ -0,0 +1,43 @@
+import importlib
+
+import pytest
+
+SERVER_CONFIG = "SERVER=http://localhost\nPORT=8000\n"
+
+
+class DictKvRedis:
+    """keepvariable's dummy server interface (get/set/delete, no Redis client), counting gets"""
+
+    def __init__(self):
+        self.storage = {}
+        self.n_gets = 0
+
+    def get(self, key):
+        self.n_gets += 1
+        return self.storage.get(key)
+
+    def set(self, key, value, additional_params=None):
+        self.storage[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.storage.pop(key, None)
+
+
+@pytest.fixture
+def kv_redis():
+    return DictKvRedis()
+
+
+@pytest.fixture
+def import_with_server_config(tmp_path, monkeypatch):
+    """
+    importlib.import_module run in a working directory with the server config, which
+    node_context_requests_backend (and all modules importing it) reads on import.
+    """
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    for config_file_name in ("server_config.ini", "server_config_remote.ini"):
+        (config_dir / config_file_name).write_text(SERVER_CONFIG)
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module
@@ -0,0 +1,45 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from forloop_modules.utils.completion_wait import wait_for_file, wait_for_redis_key, wait_metrics
+
+
+def run_later(delay, function):
+    timer = threading.Timer(delay, function)
+    timer.start()
+    return timer
+
+
+@pytest.fixture(autouse=True)
+def reset_wait_metrics():
+    wait_metrics.reset()
+
+
+def test_file_written_later_is_detected_quickly(tmp_path):
+    path = tmp_path / "extracted.txt"
+    run_later(0.2, lambda: path.write_text("data"))
+
+    start = time.monotonic()
+    assert wait_for_file(path, timeout=5)
+    assert time.monotonic() - start < 1
+
+    metrics = wait_metrics.get_metrics()["file"]
+    assert metrics["wait_time"]["count"] == 1
+    expected_mechanism = "notification" if sys.platform.startswith("linux") else "poll"
+    assert metrics["mechanisms"] == {expected_mechanism: 1}
+
+
+def test_wait_for_file_times_out(tmp_path):
+    assert not wait_for_file(tmp_path / "missing.txt", timeout=0.2)
+    assert wait_metrics.get_metrics()["file"]["timeouts"] == 1
+
+
+def test_redis_key_is_polled_with_backoff(kv_redis):
+    run_later(0.3, lambda: kv_redis.storage.update(key=["data"]))
+
+    assert wait_for_redis_key(kv_redis, "key", timeout=5) == ["data"]
+    assert kv_redis.n_gets < 20  # Not a busy loop
+    assert wait_metrics.get_metrics()["redis"]["mechanisms"] == {"poll": 1}
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from forloop_modules.utils.various import parse_dataframe_from_binary, serialize_dataframe_to_binary
+
+
+def _round_trip(df, transport_format):
+    payload = json.loads(json.dumps(serialize_dataframe_to_binary(df, transport_format)))  # Sent within a JSON body
+    return parse_dataframe_from_binary(payload)
+
+
+@pytest.mark.parametrize("transport_format", ["arrow_ipc", "parquet"])
+def test_dataframe_round_trip(transport_format):
+    df = pd.DataFrame(
+        {"name": ["a", "b", None], "price": [1.5, None, 3.0], "count": [1, 2, 3], "created": pd.to_datetime(["2024-01-01"] * 3)},
+        index=pd.Index([10, 20, 30], name="id"),
+    )
+    df.attrs = {"source": "shop"}
+
+    parsed_df = _round_trip(df, transport_format)
+
+    pd.testing.assert_frame_equal(parsed_df, df)
+    assert parsed_df.attrs == {"source": "shop"}
+
+
+@pytest.mark.parametrize("transport_format", ["arrow_ipc", "parquet"])
+@pytest.mark.parametrize("columns", [[1, 2, 3], [1.5, "a", None], pd.MultiIndex.from_tuples([("a", 1), ("a", 2), ("b", 1)])])
+def test_column_labels_are_restored(transport_format, columns):
+    df = pd.DataFrame([[1, 2, 3], [4, 5, 6]], columns=columns)
+
+    parsed_df = _round_trip(df, transport_format)
+
+    assert parsed_df.columns.tolist() == df.columns.tolist()
+    assert parsed_df.values.tolist() == df.values.tolist()
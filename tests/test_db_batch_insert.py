@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from forloop_modules.utils.db_batch_insert import insert_df_in_batches
+from forloop_modules.utils.db_table_copy import CopyDialect
+
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT UNIQUE, price REAL)")
+    yield connection
+    connection.close()
+
+
+def test_rows_are_inserted_in_batches_and_upserted(connection):
+    df = pd.DataFrame({"name": [f"product_{i}" for i in range(7)], "price": [1.5, None, 3, 4, 5, 6, 7]})
+
+    summary = insert_df_in_batches(connection, CopyDialect(), "products", df, batch_size=3)
+
+    assert (summary.rows_written, summary.rows_failed, summary.batches) == (7, 0, 3)
+    assert connection.execute("SELECT price FROM products WHERE name = 'product_1'").fetchone() == (None,)
+
+    updates = pd.DataFrame({"name": ["product_0", "product_9"], "price": [10.0, 90.0]})
+    insert_df_in_batches(connection, CopyDialect(), "products", updates, conflict_columns=["name"])
+
+    assert connection.execute("SELECT COUNT(*) FROM products").fetchone() == (8,)
+    assert connection.execute("SELECT price FROM products WHERE name = 'product_0'").fetchone() == (10.0,)
+
+
+def test_failed_batch_is_retried_and_reported(connection):
+    df = pd.DataFrame({"name": ["a", "b", "a", "c"], "price": [1, 2, 3, 4]})  # Second batch violates UNIQUE
+
+    summary = insert_df_in_batches(connection, CopyDialect(), "products", df, batch_size=2, max_retries=1,
+                                   retry_delay=0)
+
+    assert (summary.rows_written, summary.rows_failed, summary.failed_batches, summary.retries) == (2, 2, 1, 1)
+    assert "IntegrityError" in summary.errors[0]
+    assert connection.execute("SELECT name FROM products ORDER BY name").fetchall() == [("a",), ("b",)]
+
+
+class AutocommitConnection:
+    """sqlite3 connection with psycopg2-like autocommit attribute, records its value at every commit"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.autocommit = True
+        self.autocommit_at_commits = []
+
+    def cursor(self):
+        return self.connection.cursor()
+
+    def commit(self):
+        self.autocommit_at_commits.append(self.autocommit)
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+
+def test_batches_run_in_transactions_on_autocommit_connections(connection):
+    autocommit_connection = AutocommitConnection(connection)
+    df = pd.DataFrame({"name": ["a", "b", "c"], "price": [1, 2, 3]})
+
+    insert_df_in_batches(autocommit_connection, CopyDialect(), "products", df, batch_size=2)
+
+    assert autocommit_connection.autocommit_at_commits == [False, False]
+    assert autocommit_connection.autocommit is True  # Restored
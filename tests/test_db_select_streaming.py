@@ -0,0 +1,81 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("dbhydra")
+
+from forloop_modules.utils.db_select_streaming import _iter_bigquery_chunks, concat_chunks, iter_cursor_chunks
+
+
+@pytest.fixture
+def cursor():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE users (id INTEGER, name TEXT)")
+    connection.executemany("INSERT INTO users VALUES (?, ?)", [(i, f"user_{i}") for i in range(10)])
+    yield connection.cursor()
+    connection.close()
+
+
+def test_rows_are_yielded_in_chunks_in_query_column_order(cursor):
+    chunks = list(iter_cursor_chunks(cursor, "SELECT name, id FROM users ORDER BY id", chunk_size=4))
+
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    df = concat_chunks(chunks)
+    assert list(df.columns) == ["name", "id"]
+    assert df["id"].tolist() == list(range(10))
+
+
+def test_empty_result_keeps_columns(cursor):
+    chunks = list(iter_cursor_chunks(cursor, "SELECT id, name FROM users WHERE id < 0", chunk_size=4))
+
+    assert len(chunks) == 1
+    assert chunks[0].empty
+    assert list(chunks[0].columns) == ["id", "name"]
+
+
+def test_empty_bigquery_result_keeps_columns():
+    rows = SimpleNamespace(
+        schema=[SimpleNamespace(name="id"), SimpleNamespace(name="name")], to_dataframe_iterable=lambda: iter([])
+    )
+    db_instance = SimpleNamespace(client=SimpleNamespace(
+        query=lambda query: SimpleNamespace(result=lambda page_size: rows)
+    ))
+
+    df = concat_chunks(_iter_bigquery_chunks(db_instance, "SELECT id, name FROM users", chunk_size=4))
+
+    assert df.empty
+    assert list(df.columns) == ["id", "name"]
+
+
+class NamedCursorConnection:
+    """psycopg2-like autocommit connection over sqlite3, named cursors must be declared WITH HOLD"""
+
+    autocommit = True
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursors = []
+
+    def cursor(self, name=None, withhold=False):
+        if name is not None and self.autocommit and not withhold:
+            raise RuntimeError("can't use a named cursor outside of transactions")
+        cursor = self.connection.cursor()
+        self.cursors.append(cursor)
+        return cursor
+
+
+def test_postgres_select_streams_through_named_cursor(cursor):
+    import dbhydra.dbhydra_core as dh
+
+    from forloop_modules.utils.db_select_streaming import select_to_df
+
+    db_instance = object.__new__(dh.PostgresDb)
+    db_instance.connection = NamedCursorConnection(cursor.connection)
+
+    df = select_to_df(db_instance, None, "SELECT id FROM users ORDER BY id", chunk_size=3)
+
+    assert df["id"].tolist() == list(range(10))
+    with pytest.raises(sqlite3.ProgrammingError):  # Closed after the stream
+        db_instance.connection.cursors[0].execute("SELECT 1")
@@ -0,0 +1,101 @@
+import time
+from contextlib import contextmanager
+
+import pytest
+
+for module_name in ("rsa", "pydantic", "dbhydra", "keepvariable"):
+    pytest.importorskip(module_name)
+
+from forloop_modules.globals import db_session_manager as db_session_manager_module
+from forloop_modules.globals.db_session_manager import DbSession, DbSessionPool
+
+
+class FakeCursor:
+    def __init__(self, db_instance):
+        self.db_instance = db_instance
+
+    def execute(self, query):
+        if not self.db_instance.is_alive:
+            raise ConnectionError("Lost connection to server")
+
+    def fetchall(self):
+        return [(1,)]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeDbInstance:
+    def __init__(self):
+        self.is_alive = True
+        self.connects = 0
+        self.connection = None
+        self.cursor = FakeCursor(self)
+
+    @contextmanager
+    def connect_to_db(self):
+        self.connects += 1
+        self.connection = FakeConnection()
+        yield
+
+
+class FakeDbConnection:
+    database = "shop"
+    db_details = {"DIALECT": "MySQL"}
+
+    def __init__(self):
+        self.db_instance = FakeDbInstance()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = DbSessionPool({"uid": "db-1", "database_name": "shop", "dialect": "MySQL"}, size=2)
+
+    def create_session():
+        db_session = DbSession(FakeDbConnection(), pool=pool)
+        db_session.open()
+        return db_session
+
+    monkeypatch.setattr(pool, "_create_session", create_session)
+    return pool
+
+
+def test_released_session_is_reused_with_its_transaction_ended(pool):
+    db_session = pool.acquire()
+    with db_session.connect_to_db():
+        pass
+    pool.release(db_session)
+
+    assert db_session.db_instance.connection.rollbacks == 1
+    assert pool.acquire() is db_session
+    assert (pool.n_sessions, db_session.db_instance.connects) == (1, 1)
+
+
+def test_idle_unhealthy_session_is_reconnected(pool):
+    db_session = pool.acquire()
+    pool.release(db_session)
+    db_session.db_instance.is_alive = False
+    db_session.last_used_at = time.monotonic() - db_session_manager_module.HEALTH_CHECK_INTERVAL - 1
+
+    db_session = pool.acquire()
+    with db_session.connect_to_db():
+        pass
+
+    assert db_session.db_instance.connects == 2
+
+
+def test_sessions_idle_for_too_long_are_closed(pool):
+    sessions = [pool.acquire(), pool.acquire()]
+    for db_session in sessions:
+        pool.release(db_session)
+    sessions[0].last_used_at = time.monotonic() - 60
+
+    pool.close_idle_sessions(max_idle_time=30)
+
+    assert (pool.n_sessions, pool.idle_sessions) == (1, [sessions[1]])
+    assert not sessions[0].is_open and sessions[1].is_open
@@ -0,0 +1,120 @@
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from forloop_modules.utils.db_table_copy import (
+    CopyDialect,
+    TableCopier,
+    TableCopyCheckpoints,
+    format_csv_rows,
+    format_postgres_copy_value,
+)
+
+COLUMNS = ["id", "name"]
+
+
+def create_db(path, tables: dict):
+    connection = sqlite3.connect(path)
+    for table_name, rows in tables.items():
+        connection.execute(f"CREATE TABLE {table_name} (id INTEGER PRIMARY KEY, name TEXT)")
+        connection.executemany(f"INSERT INTO {table_name} VALUES (?, ?)", rows)
+    connection.commit()
+    connection.close()
+
+
+def create_connection_factory(path):
+    @contextmanager
+    def connect():
+        connection = sqlite3.connect(path, check_same_thread=False)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    return connect
+
+
+def select_all(path, table_name):
+    connection = sqlite3.connect(path)
+    rows = connection.execute(f"SELECT id, name FROM {table_name} ORDER BY id").fetchall()
+    connection.close()
+    return rows
+
+
+@pytest.fixture
+def databases(tmp_path):
+    origin, destination = tmp_path / "origin.sqlite", tmp_path / "destination.sqlite"
+    users = [(i, f"user_{i}") for i in range(25)]
+    orders = [(i, None if i % 3 else f"order_{i}") for i in range(1, 8)]
+    create_db(origin, {"users": users, "orders": orders})
+    create_db(destination, {"users": [(100, "stale")], "orders": []})
+    return origin, destination
+
+
+def create_copier(origin, destination, checkpoints):
+    return TableCopier(create_connection_factory(origin), create_connection_factory(destination), CopyDialect(),
+                       CopyDialect(), chunk_size=10, max_workers=2, checkpoints=checkpoints)
+
+
+def test_tables_are_copied_in_chunks_and_parallel(databases):
+    origin, destination = databases
+    checkpoints = TableCopyCheckpoints("migration-1")
+
+    results = create_copier(origin, destination, checkpoints).copy_tables({"users": COLUMNS, "orders": COLUMNS})
+
+    assert {result.table_name: (result.status, result.rows_copied) for result in results} == {
+        "users": ("copied", 25), "orders": ("copied", 7)
+    }
+    assert select_all(destination, "users") == select_all(origin, "users")
+    assert select_all(destination, "orders") == select_all(origin, "orders")
+    assert checkpoints.get("users") is None  # Cleared after a successful copy
+
+
+def test_copy_is_resumed_from_checkpoint(databases):
+    origin, destination = databases
+    checkpoints = TableCopyCheckpoints("migration-1")
+    # Previous run committed ids 0-9, saved the checkpoint and failed after committing ids 10-11
+    connection = sqlite3.connect(destination)
+    connection.execute("DELETE FROM users")
+    connection.executemany("INSERT INTO users VALUES (?, ?)", [(i, f"user_{i}") for i in range(12)])
+    connection.commit()
+    connection.close()
+    checkpoints.save("users", last_key=9, rows_copied=10)
+    checkpoints.save("orders", last_key=7, rows_copied=7, is_finished=True)
+
+    results = create_copier(origin, destination, checkpoints).copy_tables({"users": COLUMNS, "orders": COLUMNS})
+
+    assert {result.table_name: (result.status, result.rows_copied) for result in results} == {
+        "users": ("resumed", 25), "orders": ("skipped", 7)
+    }
+    assert select_all(destination, "users") == select_all(origin, "users")
+
+
+def test_failed_table_keeps_checkpoints(databases):
+    origin, destination = databases
+    checkpoints = TableCopyCheckpoints("migration-1")
+
+    results = create_copier(origin, destination, checkpoints).copy_tables({"users": COLUMNS, "missing": COLUMNS})
+
+    statuses = {result.table_name: result.status for result in results}
+    assert statuses == {"users": "copied", "missing": "failed"}
+    assert checkpoints.get("users")["is_finished"]
+
+
+def test_checkpoints_are_scoped_to_origin_and_destination():
+    storage = TableCopyCheckpoints("migration-1").storage
+    checkpoints = TableCopyCheckpoints("migration-1", storage, origin="MySQL/a:3306/shop", destination="PostgreSQL/b:5432/shop")
+    checkpoints.save("users", last_key=9, rows_copied=10, is_finished=True)
+
+    other_checkpoints = TableCopyCheckpoints("migration-1", storage, origin="MySQL/c:3306/crm", destination="PostgreSQL/b:5432/shop")
+    assert other_checkpoints.get("users") is None
+    assert TableCopyCheckpoints("migration-1", storage, checkpoints.origin, checkpoints.destination).get("users")["rows_copied"] == 10
+
+
+def test_postgres_copy_rows_use_bytea_hex_and_boolean_literals():
+    rows = [(1, b"\x00\xff", True, None), (2, memoryview(b'"'), False, 'say "hi"')]
+
+    csv_text = format_csv_rows(rows, null="", to_string=format_postgres_copy_value)
+
+    assert csv_text == '"1","\\x00ff","t",\n"2","\\x22","f","say ""hi"""\n'
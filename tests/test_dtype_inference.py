@@ -0,0 +1,74 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from forloop_modules.function_handlers.auxilliary.data_types_validation import (
+    infer_and_convert_dtypes,
+    infer_column,
+    validate_input_data_types,
+)
+
+
+def test_columns_are_converted_by_inferred_kind():
+    df = pd.DataFrame({
+        "integers_with_nulls": [1.0, np.nan, 3.0, 4.0],
+        "floats": [1.5, 2.0, np.nan, 1.0],
+        "numeric_strings": ["1 000", "2", None, "-4"],
+        "texts": ["a", None, "None", "b"],
+        "created_date": ["2020-01-02", None, "2021-03-04", "2021-03-05"],
+        "update_date": [1, 2, 3, 4],
+        "empty": [None] * 4,
+        "flags": [True, False, True, False],
+    }, index=[0, 0, 1, 1])
+
+    converted, kinds = infer_and_convert_dtypes(df, sample_size=2)
+
+    assert kinds == {
+        "integers_with_nulls": "integer",
+        "floats": "float",
+        "numeric_strings": "integer",
+        "texts": "text",
+        "created_date": "datetime",
+        "update_date": "integer",
+        "empty": "empty",
+        "flags": "unchanged",
+    }
+    assert converted["integers_with_nulls"].dtype == "Int64"
+    assert converted["floats"].dtype == "Float64"
+    assert converted["numeric_strings"].tolist() == [1000, 2, pd.NA, -4]
+    assert converted["texts"].isna().tolist() == [False, True, True, False]
+    assert converted["created_date"].tolist()[2:] == ["2021-03-04", "2021-03-05"]
+    assert converted["update_date"].tolist() == [1, 2, 3, 4]
+    assert converted["empty"].dtype == object
+    assert converted["flags"].dtype == bool
+    assert list(converted.index) == [0, 0, 1, 1]
+
+
+def test_column_is_converted_only_if_all_values_convert():
+    # The sample (first and last value) is numeric, the whole column is not
+    series = pd.Series(["1", "x", "y", "2"], name="codes")
+
+    kind, converted = infer_column(series, sample_size=2)
+
+    assert kind == "text"
+    assert converted is None
+
+
+def test_datetime_columns_are_kept():
+    df = pd.DataFrame({"timestamp": pd.to_datetime(["2020-01-01", None])})
+
+    assert pd.api.types.is_datetime64_any_dtype(validate_input_data_types(df)["timestamp"])
+
+
+def test_pyarrow_backend_and_categoricals():
+    df = pd.DataFrame({"count": [1, 2, None], "city": ["Prague", "Brno", "Prague"]})
+
+    converted, _ = infer_and_convert_dtypes(df, dtype_backend="pyarrow")
+    assert str(converted["count"].dtype) == "int64[pyarrow]"
+    assert str(converted["city"].dtype) == "string[pyarrow]"
+
+    converted, kinds = infer_and_convert_dtypes(df, categorical_max_unique_ratio=0.7)
+    assert kinds["city"] == "categorical"
+    assert converted["city"].dtype == "category"
@@ -0,0 +1,67 @@
+import io
+
+import forloop_modules.flog as flog
+
+
+class DebugLoggedClass:
+    def log_debug(self, message, **kwargs):
+        flog.debug(message, **kwargs)
+
+
+class DebugLoggedChildClass(DebugLoggedClass):
+    pass
+
+
+def test_lazy_message_is_not_rendered_when_level_disabled(monkeypatch):
+    monkeypatch.setattr(flog, "OUTPUT", io.StringIO())
+    calls = []
+
+    def message():
+        calls.append(1)
+        return "expensive message"
+
+    DebugLoggedClass().log_debug(message)
+    assert calls == []
+
+    flog.FLOG_CONFIG["DebugLoggedClass"] = flog.FlogLevel.DEBUG
+    try:
+        DebugLoggedClass().log_debug(message)
+        DebugLoggedClass().log_debug("value = %s", args=(42,))
+    finally:
+        flog.FLOG_CONFIG.pop("DebugLoggedClass")
+
+    assert calls == [1]
+    output = flog.OUTPUT.getvalue()
+    assert "DebugLoggedClass: expensive message" in output
+    assert "value = 42" in output
+
+
+def test_is_enabled_for_follows_config_changes():
+    instance = DebugLoggedChildClass()
+    assert not flog.is_enabled_for(flog.FlogLevel.DEBUG, instance)
+    assert flog.is_enabled_for(flog.FlogLevel.ERROR, instance)
+
+    # Parent class config is used when the class itself is not configured
+    flog.FLOG_CONFIG["DebugLoggedClass"] = flog.FlogLevel.DEBUG
+    try:
+        assert flog.is_enabled_for(flog.FlogLevel.DEBUG, instance)
+        assert flog.is_enabled_for(flog.FlogLevel.DEBUG, DebugLoggedChildClass)
+    finally:
+        flog.FLOG_CONFIG.pop("DebugLoggedClass")
+
+    assert not flog.is_enabled_for(flog.FlogLevel.DEBUG, instance)
+
+
+def test_async_output_sink_writes_all_messages_in_order():
+    stream = io.StringIO()
+    sink = flog.AsyncOutputSink(stream, max_queue_size=100, overflow_policy="block", batch_size=8)
+
+    for i in range(500):
+        sink.write(f"message {i}\n")
+    sink.flush()
+
+    assert stream.getvalue() == "".join(f"message {i}\n" for i in range(500))
+
+    sink.close()
+    sink.write("after close\n")
+    assert stream.getvalue().endswith("after close\n")
@@ -0,0 +1,64 @@
+import importlib.util
+
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("cachetools")
+pytest.importorskip("lxml")
+
+from forloop_modules.utils.html_parsing import ParsedDocumentCache, find_page_elements_data
+
+PAGE_SOURCE = """
+<html><body>
+  <div class="product card" data-id="1"><a href="/item/1">First "quoted"</a><span class="price">10</span></div>
+  <div class="product" data-id="2"><a href="/item/2">Second</a><span class="price old">20</span></div>
+  <div class="products-header">Header</div>
+</body></html>
+"""
+
+
+def _backends():
+    backends = ["html.parser", "lxml"]
+    if importlib.util.find_spec("selectolax"):
+        backends.append("selectolax")
+    return backends
+
+
+@pytest.mark.parametrize("backend", _backends())
+def test_backends_find_same_data(backend):
+    def find(*args, **kwargs):
+        return find_page_elements_data(PAGE_SOURCE, *args, backend=backend, **kwargs)
+
+    assert find("div", {"class": "product"}, get="data-id") == ["1", "2"]
+    assert find("span", {"class": "price old"}, get="text") == ["20"]
+    assert find("a", {"href": "/item/1"}, get="text", find_all=False) == 'First "quoted"'
+    assert find("table", find_all=False) is None
+
+    if backend == "lxml":
+        pytest.importorskip("cssselect")
+    assert find(selector="div.product > a", get="href") == ["/item/1", "/item/2"]
+
+
+def test_xpath_selector_and_element_chaining():
+    first_product = find_page_elements_data(PAGE_SOURCE, selector="//div[@data-id]", get="-", find_all=False, backend="lxml")
+
+    assert find_page_elements_data(first_product, "span", get="text", backend="lxml") == ["10"]
+    assert find_page_elements_data(PAGE_SOURCE, selector="//span[@class='price']/text()", backend="lxml") == ["10"]
+
+
+def test_default_backend_stores_bs4_elements():
+    from bs4 import Tag
+
+    first_product = find_page_elements_data(PAGE_SOURCE, "div", {"class": "product"}, get="-", find_all=False)
+
+    assert isinstance(first_product, Tag) and first_product["data-id"] == "1"
+
+
+def test_parsed_documents_are_cached_by_page_source():
+    cache = ParsedDocumentCache(maxsize=1)
+
+    document = cache.get_or_parse(PAGE_SOURCE, "lxml")
+    assert cache.get_or_parse(PAGE_SOURCE, "lxml") is document
+    cache.get_or_parse(PAGE_SOURCE + " ", "lxml")
+    assert cache.get_or_parse(PAGE_SOURCE, "lxml") is not document
+    assert cache.get_stats()["hits"] == 1
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from forloop_modules.errors.errors import CircuitBreakerOpenError
+from forloop_modules.utils.http_resilience import RetryPolicy
+
+
+@pytest.fixture
+def http_client_module(import_with_server_config):
+    return import_with_server_config("forloop_modules.utils.http_client")
+
+
+@pytest.fixture
+def create_client(http_client_module):
+    def create_client(status_codes: list[int], requests: list, client_class=None, **kwargs):
+        """Client responding with queued status codes (200 when the queue is empty)"""
+        def handle(request):
+            requests.append((request.method, request.url.path))
+            return httpx.Response(status_codes.pop(0) if status_codes else 200)
+
+        client_class = client_class or http_client_module.HttpClient
+        kwargs = {"retry_policy": RetryPolicy(max_retries=0), **kwargs}
+        return client_class(transport=httpx.MockTransport(handle), **kwargs)
+
+    return create_client
+
+
+def test_failing_endpoint_does_not_cut_off_host_by_default(create_client):
+    requests = []
+    client = create_client([500] * 10, requests)
+
+    status_codes = [client.get("http://api.local/api/v1/nodes/1").status_code for _ in range(10)]
+    response = client.get("http://api.local/api/v1/pipelines")
+
+    assert status_codes == [500] * 10
+    assert response.status_code == 200 and response.ok
+    assert len(requests) == 11
+    assert client.get_circuit_breaker_states() == {}
+
+
+def test_opt_in_circuit_breaker_cuts_off_failing_host(create_client):
+    requests = []
+    client = create_client([500, 500], requests, circuit_breaker_failure_threshold=2)
+
+    for _ in range(2):
+        client.post("http://api.local/api/v1/nodes")
+    with pytest.raises(CircuitBreakerOpenError):
+        client.get("http://api.local/api/v1/pipelines")
+
+    assert len(requests) == 2
+    assert client.get_circuit_breaker_states() == {"api.local": "open"}
+    assert client.get_metrics()["POST /api/v1/nodes"]["status_codes"] == {500: 2}
+
+
+def test_async_client_retries_and_collects_metrics(create_client, http_client_module):
+    requests = []
+    client = create_client(
+        [503, 200], requests, client_class=http_client_module.AsyncHttpClient,
+        retry_policy=RetryPolicy(max_retries=1, jitter=False, backoff_factor=0),
+    )
+
+    response = asyncio.run(client.get("http://api.local/api/v1/nodes/1"))
+
+    assert response.status_code == 200 and response.ok
+    assert len(requests) == 2
+    assert client.get_metrics()["GET /api/v1/nodes/{id}"]["retries"] == 1
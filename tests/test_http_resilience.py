@@ -0,0 +1,136 @@
+import http.client
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from forloop_modules.errors.errors import CircuitBreakerOpenError
+from forloop_modules.utils.http_resilience import (
+    CircuitBreaker,
+    RequestMetrics,
+    RetryPolicy,
+    send_with_retries,
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Responds with queued status codes (200 when the queue is empty)."""
+    status_codes = []
+    requests = []
+
+    def _respond(self):
+        self.requests.append((self.command, self.path))
+        status_code = self.status_codes.pop(0) if self.status_codes else 200
+        self.send_response(status_code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = do_POST = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubHandler.status_codes = []
+    StubHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_send(server, method, path):
+    def send():
+        connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+        try:
+            connection.request(method, path)
+            response = connection.getresponse()
+            response.read()
+            return SimpleNamespace(status_code=response.status, headers=dict(response.getheaders()))
+        finally:
+            connection.close()
+
+    return send
+
+
+def test_idempotent_request_is_retried_until_success(stub_server):
+    StubHandler.status_codes = [503, 502, 200]
+    metrics = RequestMetrics()
+    sleeps = []
+
+    response = send_with_retries(
+        make_send(stub_server, "GET", "/api/v1/nodes/123"),
+        "GET",
+        "http://stub/api/v1/nodes/123",
+        retry_policy=RetryPolicy(max_retries=3, backoff_factor=0.1),
+        circuit_breaker=CircuitBreaker(),
+        metrics=metrics,
+        sleep=sleeps.append,
+    )
+
+    assert response.status_code == 200
+    assert len(StubHandler.requests) == 3
+    assert len(sleeps) == 2 and all(0 <= backoff <= 0.2 for backoff in sleeps)
+
+    endpoint_metrics = metrics.get_metrics()["GET /api/v1/nodes/{id}"]
+    assert endpoint_metrics["retries"] == 2
+    assert endpoint_metrics["status_codes"] == {503: 1, 502: 1, 200: 1}
+    assert endpoint_metrics["latency"]["count"] == 3
+
+
+def test_non_idempotent_request_is_not_retried_on_error_status(stub_server):
+    StubHandler.status_codes = [503]
+
+    response = send_with_retries(
+        make_send(stub_server, "POST", "/api/v1/nodes"),
+        "POST",
+        "http://stub/api/v1/nodes",
+        retry_policy=RetryPolicy(max_retries=3),
+        circuit_breaker=CircuitBreaker(),
+        sleep=lambda _: None,
+    )
+
+    assert response.status_code == 503
+    assert len(StubHandler.requests) == 1
+
+
+def test_circuit_breaker_opens_after_consecutive_failures(stub_server):
+    StubHandler.status_codes = [500, 500]
+    circuit_breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    send = make_send(stub_server, "GET", "/")
+
+    for _ in range(2):
+        send_with_retries(send, "GET", "http://stub/", RetryPolicy(max_retries=0), circuit_breaker)
+
+    assert circuit_breaker.state == "open"
+    with pytest.raises(CircuitBreakerOpenError):
+        send_with_retries(send, "GET", "http://stub/", RetryPolicy(max_retries=0), circuit_breaker)
+    assert len(StubHandler.requests) == 2
+
+    circuit_breaker.recovery_timeout = 0
+    response = send_with_retries(send, "GET", "http://stub/", RetryPolicy(max_retries=0), circuit_breaker)
+    assert response.status_code == 200
+    assert circuit_breaker.state == "closed"
+
+
+def test_half_open_circuit_lets_trial_through_after_non_retryable_error():
+    circuit_breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    circuit_breaker.record_failure()
+
+    def send_invalid_request():
+        raise ValueError("invalid URL")
+
+    with pytest.raises(ValueError):
+        send_with_retries(send_invalid_request, "GET", "http://stub/", RetryPolicy(max_retries=0), circuit_breaker)
+    assert circuit_breaker.state == "open"
+
+    response = send_with_retries(
+        lambda: SimpleNamespace(status_code=200), "GET", "http://stub/", RetryPolicy(max_retries=0), circuit_breaker
+    )
+    assert response.status_code == 200
+    assert circuit_breaker.state == "closed"
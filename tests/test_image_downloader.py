@@ -0,0 +1,67 @@
+import pytest
+
+httpx = pytest.importorskip("httpx")
+if not hasattr(httpx, "MockTransport"):
+    pytest.skip("httpx is not installed", allow_module_level=True)
+
+from forloop_modules.utils.http_resilience import RetryPolicy
+from forloop_modules.utils.image_downloader import ImageDownloader, get_partial_path
+
+IMAGES = {
+    "/a.png": b"a" * 1000,
+    "/b": b"b" * 500,
+    "/copy-of-a.png": b"a" * 1000,
+}
+
+
+def create_transport(requests_log: list, failures: dict = None):
+    failures = failures or {}
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests_log.append((request.url.path, request.headers.get("Range")))
+        if failures.get(request.url.path, 0) > 0:
+            failures[request.url.path] -= 1
+            return httpx.Response(503)
+
+        content = IMAGES[request.url.path]
+        headers = {"Content-Type": "image/jpeg"}
+        if request.headers.get("Range"):
+            offset = int(request.headers["Range"].removeprefix("bytes=").removesuffix("-"))
+            return httpx.Response(206, content=content[offset:], headers=headers)
+        return httpx.Response(200, content=content, headers=headers)
+
+    return httpx.MockTransport(handle)
+
+
+def test_images_are_downloaded_once_and_deduplicated(tmp_path):
+    requests_log = []
+    downloader = ImageDownloader(
+        retry_policy=RetryPolicy(backoff_factor=0), transport=create_transport(requests_log, {"/b": 1})
+    )
+
+    report = downloader.download([
+        ("https://shop.com/a.png", tmp_path / "img_0"),
+        ("https://shop.com/b", tmp_path / "img_1"),
+        ("https://shop.com/copy-of-a.png", tmp_path / "img_2"),
+        ("https://shop.com/a.png", tmp_path / "img_3"),
+    ])
+
+    assert [result.status for result in report.results] == ["downloaded", "downloaded", "duplicate", "duplicate"]
+    assert [path.name for path in report.paths] == ["img_0.png", "img_1.jpg", "img_2.png", "img_3.png"]
+    assert all(path.read_bytes() == IMAGES["/a.png"] for path in [report.paths[0], report.paths[2], report.paths[3]])
+    assert sorted(requests_log).count(("/a.png", None)) == 1
+    assert report.to_dict()["bytes_written"] == 1500
+
+
+def test_partial_download_is_resumed(tmp_path):
+    url = "https://shop.com/a.png"
+    get_partial_path(tmp_path / "img", url).write_bytes(IMAGES["/a.png"][:400])
+    requests_log = []
+
+    report = ImageDownloader(transport=create_transport(requests_log)).download([(url, tmp_path / "img")])
+
+    assert report.results[0].status == "resumed"
+    assert report.results[0].bytes_downloaded == 600
+    assert requests_log == [("/a.png", "bytes=400-")]
+    assert (tmp_path / "img.png").read_bytes() == IMAGES["/a.png"]
+    assert list(tmp_path.iterdir()) == [tmp_path / "img.png"]
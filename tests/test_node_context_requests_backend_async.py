@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("pydantic")
+
+from forloop_modules.queries.db_model_templates import APINode, APIVariable
+
+
+@pytest.fixture
+def ncrb(import_with_server_config):
+    return import_with_server_config("forloop_modules.queries.node_context_requests_backend")
+
+
+@pytest.fixture
+def ncrb_async(import_with_server_config):
+    return import_with_server_config("forloop_modules.queries.node_context_requests_backend_async")
+
+
+@pytest.fixture
+def active_entities(monkeypatch, ncrb):
+    aet = ncrb.aet
+    monkeypatch.setattr(aet, "project_uid", "project-1")
+    monkeypatch.setattr(aet, "active_pipeline_uid", "pipeline-1")
+    monkeypatch.setattr(aet, "active_pipeline_job_uid", "job-1")
+
+
+@pytest.fixture
+def requests(monkeypatch, active_entities, ncrb_async):
+    """Requests sent by ncrb_async, answered by a mocked transport echoing the request body"""
+    requests = []
+
+    def handle(request):
+        requests.append(request)
+        body = json.loads(request.content) if request.content else {}
+        return httpx.Response(200, json={"uid": "uid-1", **body})
+
+    monkeypatch.setattr(ncrb_async, "http_client", ncrb_async.AsyncHttpClient(transport=httpx.MockTransport(handle)))
+    return requests
+
+
+def test_get_requests_are_awaited_concurrently(requests, ncrb_async):
+    async def get_nodes_and_edges():
+        return await asyncio.gather(ncrb_async.get_all_nodes(), ncrb_async.get_edges_by_node_uid("node-1"))
+
+    nodes_response, edges_response = asyncio.run(get_nodes_and_edges())
+
+    assert nodes_response.ok and edges_response.json()["uid"] == "uid-1"
+    assert sorted((request.method, request.url.path) for request in requests) == [
+        ("GET", "/api/v1/nodes"),
+        ("GET", "/api/v1/nodes/node-1/edges"),
+    ]
+
+
+def test_new_factory_posts_payload(requests, ncrb_async):
+    response = asyncio.run(ncrb_async.new_variable("a", 1, is_result=True))
+
+    assert response.json()["uid"] == "uid-1"
+    assert (requests[0].method, requests[0].url.path) == ("POST", "/api/v1/variables")
+    assert json.loads(requests[0].content) == {
+        "name": "a", "value": 1, "is_result": True,
+        "project_uid": "project-1", "pipeline_uid": "pipeline-1", "pipeline_job_uid": "job-1",
+    }
+
+
+def test_make_factory_payload(active_entities, ncrb):
+    node_payload = ncrb.make_factory_payload(APINode, ["pos", "typ"], ([0, 0],), {"params": {"a": 1}})
+    variable_payload = ncrb.make_factory_payload(APIVariable, ["name", "value"], ("a", 1), {})
+
+    assert node_payload == {"pos": [0, 0], "params": {"a": 1}, "project_uid": "project-1", "pipeline_uid": "pipeline-1"}
+    assert variable_payload == {
+        "name": "a", "value": 1, "project_uid": "project-1", "pipeline_uid": "pipeline-1", "pipeline_job_uid": "job-1"
+    }
+
+
+def test_modifications_invalidate_cached_responses(requests, monkeypatch, ncrb, ncrb_async):
+    invalidated_resources = []
+    monkeypatch.setattr(ncrb.response_cache, "invalidate", invalidated_resources.append)
+
+    asyncio.run(ncrb_async.new_variable("a", 1))
+    asyncio.run(ncrb_async.delete_variable_by_uid("uid-1"))
+
+    assert invalidated_resources == ["variables", "variables"]
@@ -0,0 +1,85 @@
+import pickle
+
+import pytest
+
+pytest.importorskip("bs4")
+pd = pytest.importorskip("pandas")
+
+from forloop_modules.utils import pickle_serializer
+from forloop_modules.utils.pickle_serializer import (
+    LazyPickleDict,
+    PickleVariableStore,
+    load_data_dict_from_pickle_folder,
+    save_data_dict_to_pickle_folder,
+)
+
+
+@pytest.fixture
+def dump_counter(monkeypatch):
+    dumped_values = []
+    dump_to_blob = pickle_serializer.dump_to_blob
+
+    def counting_dump_to_blob(value):
+        dumped_values.append(value)
+        return dump_to_blob(value)
+
+    monkeypatch.setattr(pickle_serializer, "dump_to_blob", counting_dump_to_blob)
+    return dumped_values
+
+
+def test_variables_round_trip_lazily(tmp_path):
+    df = pd.DataFrame({"a": range(100), "b": [str(i) for i in range(100)]})
+    save_data_dict_to_pickle_folder({"df": df, "config": {"x": [1, 2]}, "name": "abc"}, tmp_path)
+
+    assert type(load_data_dict_from_pickle_folder(tmp_path)) is dict
+    data_dict = load_data_dict_from_pickle_folder(tmp_path, lazy=True)
+
+    assert isinstance(data_dict, LazyPickleDict) and not data_dict.is_loaded("df")
+    pd.testing.assert_frame_equal(data_dict["df"], df)
+    assert data_dict.to_dict() == {"df": data_dict["df"], "config": {"x": [1, 2]}, "name": "abc"}
+
+
+def test_unchanged_objects_are_not_pickled_again(tmp_path, dump_counter):
+    df = pd.DataFrame({"a": range(100)})
+    save_data_dict_to_pickle_folder({"df": df, "n": 1}, tmp_path)
+    assert len(dump_counter) == 2
+
+    stats = save_data_dict_to_pickle_folder({"df": df, "n": 2}, tmp_path, skip_unchanged_objects=True)
+    assert (stats["written_blobs"], stats["skipped_blobs"], len(dump_counter)) == (1, 1, 3)
+
+    # Loaded and not accessed variables are saved by their stored hashes
+    data_dict = load_data_dict_from_pickle_folder(tmp_path, lazy=True)
+    data_dict["n"] = 3
+    save_data_dict_to_pickle_folder(data_dict, tmp_path)
+    assert not data_dict.is_loaded("df") and dump_counter[-1] == 3
+
+
+def test_objects_modified_in_place_are_saved_by_default(tmp_path):
+    df = pd.DataFrame({"a": range(100)})
+    save_data_dict_to_pickle_folder({"df": df}, tmp_path)
+
+    df["b"] = df["a"] * 2
+    stats = save_data_dict_to_pickle_folder({"df": df}, tmp_path)
+
+    assert (stats["written_blobs"], stats["skipped_blobs"]) == (1, 0)
+    pd.testing.assert_frame_equal(load_data_dict_from_pickle_folder(tmp_path)["df"], df)
+
+
+def test_prune_removes_variables_and_unreferenced_blobs(tmp_path):
+    save_data_dict_to_pickle_folder({"a": "x" * 1000, "b": "y" * 1000}, tmp_path)
+    save_data_dict_to_pickle_folder({"a": "x" * 1000}, tmp_path, clean_existing_folder=True)
+
+    store = PickleVariableStore(tmp_path)
+    assert list(store.read_manifest()["variables"]) == ["a"]
+    assert len(list(store.blob_folder.iterdir())) == 1
+
+
+def test_legacy_pickle_files_are_moved_into_store(tmp_path):
+    with (tmp_path / "old.pickle").open(mode="wb") as pickle_file:
+        pickle.dump([1, 2, 3], pickle_file)
+    assert load_data_dict_from_pickle_folder(tmp_path) == {"old": [1, 2, 3]}
+
+    save_data_dict_to_pickle_folder({"new": 4}, tmp_path, clean_existing_folder=False)
+
+    assert load_data_dict_from_pickle_folder(tmp_path) == {"old": [1, 2, 3], "new": 4}
+    assert not (tmp_path / "old.pickle").exists()
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("cachetools")
+
+from forloop_modules.utils.response_cache import ResponseCache
+
+
+def make_fetch(calls):
+    def fetch():
+        calls.append(1)
+        return SimpleNamespace(is_success=True, value=len(calls))
+
+    return fetch
+
+
+def test_responses_are_cached_and_invalidated_per_resource():
+    cache = ResponseCache()
+    variable_calls, node_calls = [], []
+
+    assert cache.get_or_fetch("variables", "url", make_fetch(variable_calls)).value == 1
+    assert cache.get_or_fetch("variables", "url", make_fetch(variable_calls)).value == 2
+    assert cache.get_stats()["hits"] == 0  # Disabled cache always fetches
+
+    cache.enable(maxsize=10, ttl=60)
+    cache.get_or_fetch("variables", "url", make_fetch(variable_calls))
+    cache.get_or_fetch("nodes", "url", make_fetch(node_calls))
+    assert cache.get_or_fetch("variables", "url", make_fetch(variable_calls)).value == 3
+    assert len(variable_calls) == 3
+
+    cache.invalidate("variables")
+    cache.get_or_fetch("variables", "url", make_fetch(variable_calls))
+    cache.get_or_fetch("nodes", "url", make_fetch(node_calls))
+    assert len(variable_calls) == 4
+    assert len(node_calls) == 1
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (2, 3, 1)
+
+
+def test_unsuccessful_responses_are_not_cached():
+    cache = ResponseCache()
+    cache.enable()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return SimpleNamespace(is_success=False)
+
+    cache.get_or_fetch("nodes", "url", fetch)
+    cache.get_or_fetch("nodes", "url", fetch)
+    assert len(calls) == 2
+
+
+def test_response_fetched_during_invalidation_is_not_cached():
+    cache = ResponseCache()
+    cache.enable()
+    calls = []
+
+    def fetch_during_update():
+        calls.append(1)
+        cache.invalidate("variables")  # The variable is updated while its old value is being fetched
+        return SimpleNamespace(is_success=True, value="old")
+
+    assert cache.get_or_fetch("variables", "url", fetch_during_update).value == "old"
+    assert cache.get_or_fetch("variables", "url", make_fetch(calls)).value == 2
+    assert cache.get_or_fetch("variables", "url", make_fetch(calls)).value == 2
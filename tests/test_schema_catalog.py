@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import pytest
+
+for module_name in ("pandas", "keepvariable"):
+    pytest.importorskip(module_name)
+
+from forloop_modules.globals import schema_catalog as schema_catalog_module
+from forloop_modules.globals.schema_catalog import SchemaCatalog
+
+DB_DETAILS = {"DIALECT": "MySQL", "DB_SERVER": "db.local", "DB_PORT": 3306, "DB_DATABASE": "shop", "DB_USERNAME": "app"}
+TABLE_DICT = {"users": SimpleNamespace(columns=["id", "name"], types=["int", "varchar(255)"])}
+
+
+@pytest.fixture
+def kv_redis(kv_redis, monkeypatch):
+    """Shared by catalogs standing in for two processes"""
+    monkeypatch.setattr(schema_catalog_module, "kv_redis", kv_redis)
+    return kv_redis
+
+
+def test_schema_is_shared_and_invalidated_across_processes(kv_redis):
+    catalog, other_process_catalog = SchemaCatalog(), SchemaCatalog()
+
+    catalog.put(DB_DETAILS, TABLE_DICT, foreign_keys=[])
+    assert other_process_catalog.get(DB_DETAILS)["tables"]["users"]["columns"] == ["id", "name"]
+
+    catalog.invalidate(DB_DETAILS)  # e.g. after ALTER TABLE
+    assert other_process_catalog.get(DB_DETAILS) is None  # Its in-memory entry is stale
+    assert other_process_catalog.get_version(DB_DETAILS) == catalog.get_version(DB_DETAILS) == 1
+
+
+def test_schema_introspected_before_invalidation_is_not_served(kv_redis):
+    catalog = SchemaCatalog()
+    version = catalog.get_version(DB_DETAILS)
+
+    catalog.invalidate(DB_DETAILS)  # Concurrent DDL during the introspection
+    catalog.put(DB_DETAILS, TABLE_DICT, foreign_keys=[], version=version)
+
+    assert catalog.get(DB_DETAILS) is None
+
+
+def test_schemas_are_cached_per_user(kv_redis):
+    catalog = SchemaCatalog()
+    catalog.put(DB_DETAILS, TABLE_DICT, foreign_keys=[])
+
+    assert catalog.get({**DB_DETAILS, "DB_USERNAME": "readonly"}) is None
+    assert catalog.get(DB_DETAILS) is not None
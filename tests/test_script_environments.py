@@ -0,0 +1,120 @@
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from forloop_modules.utils import script_environments
+from forloop_modules.utils.script_environments import ScriptEnvironmentCache, get_environment_key
+
+
+class FakePip:
+    """Records pip calls, creates the module files in the --target directory"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, command, **kwargs):
+        self.calls.append(command)
+        target_path = Path(command[command.index("--target") + 1])
+        target_path.mkdir(parents=True)
+        for package in command[command.index("--cache-dir") + 2:]:
+            (target_path / f"{package}.py").write_text("VALUE = 42\n")
+        return subprocess.CompletedProcess(command, 0, "", "")
+
+
+def test_environments_are_built_once_per_module_set_and_evicted(tmp_path, monkeypatch):
+    pip = FakePip()
+    monkeypatch.setattr(script_environments.subprocess, "run", pip)
+    cache = ScriptEnvironmentCache(tmp_path, max_environments=1, eviction_grace_period=0)
+
+    assert cache.get_environment(["json", "os"]).path is None  # Nothing to install
+
+    environment = cache.get_environment(["json", "fl_missing_a", "fl_missing_b"])
+    assert environment.key == get_environment_key(["fl_missing_b", "fl_missing_a"])
+    assert len(pip.calls) == 1 and pip.calls[0][-2:] == ["fl_missing_a", "fl_missing_b"]
+    assert (environment.site_packages_path / "fl_missing_a.py").is_file()
+    assert environment.get_process_env({})["PYTHONPATH"] == str(environment.site_packages_path)
+
+    assert cache.get_environment(["fl_missing_b", "fl_missing_a"]).path == environment.path
+    assert len(pip.calls) == 1
+
+    cache.get_environment(["fl_missing_c"])
+    assert len(pip.calls) == 2
+    assert not environment.path.exists()  # Least recently used one evicted
+    assert cache.get_stats()["environments"] == 1
+    assert cache.stats.to_dict()["evictions"] == 1
+
+
+def test_recently_used_environment_is_not_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(script_environments.subprocess, "run", FakePip())
+    cache = ScriptEnvironmentCache(tmp_path, max_environments=1, eviction_grace_period=60)
+
+    environment = cache.get_environment(["fl_missing_a"])
+    cache.get_environment(["fl_missing_b"])
+    assert environment.path.exists()  # Possibly on the path of a running script
+
+    marker_path = environment.path / script_environments.READY_MARKER_FILE
+    os.utime(marker_path, (time.time() - 120, time.time() - 120))
+    cache.get_environment(["fl_missing_c"])
+    assert not environment.path.exists()
+    assert sorted(path.name for path in tmp_path.iterdir() if path.name != script_environments.PIP_CACHE_DIR) == sorted(
+        [get_environment_key(["fl_missing_b"]), get_environment_key(["fl_missing_c"])]
+    )
+
+
+def test_environment_built_concurrently_is_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(script_environments.subprocess, "run", FakePip())
+    cache = ScriptEnvironmentCache(tmp_path)
+    environment_path = tmp_path / get_environment_key(["fl_missing_a"])
+    (environment_path / "site-packages").mkdir(parents=True)  # Renamed by another process, marker not written yet
+    (environment_path / "site-packages" / "fl_missing_a.py").write_text("VALUE = 1\n")
+
+    environment = cache.get_environment(["fl_missing_a"])
+
+    assert (environment.site_packages_path / "fl_missing_a.py").read_text() == "VALUE = 1\n"
+    assert (environment.path / script_environments.READY_MARKER_FILE).is_file()
+    assert [path.name for path in tmp_path.iterdir() if path.name.startswith(".")] == []
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+def test_root_dir_is_accessible_only_by_its_owner(tmp_path, monkeypatch):
+    monkeypatch.setattr(script_environments.subprocess, "run", FakePip())
+    root_dir = tmp_path / "environments"
+    root_dir.mkdir(mode=0o777)
+    root_dir.chmod(0o777)
+
+    ScriptEnvironmentCache(root_dir).get_environment(["fl_missing_a"])
+    assert root_dir.stat().st_mode & 0o777 == 0o700
+
+    monkeypatch.setattr(script_environments.os, "getuid", lambda: root_dir.stat().st_uid + 1)
+    with pytest.raises(PermissionError):
+        ScriptEnvironmentCache(root_dir).get_environment(["fl_missing_a"])
+
+
+def test_cached_environment_is_returned_during_another_build(tmp_path, monkeypatch):
+    pip = FakePip()
+    is_building, can_finish_build = threading.Event(), threading.Event()
+
+    def blocking_pip(command, **kwargs):
+        if "fl_missing_b" in command:
+            is_building.set()
+            can_finish_build.wait(5)
+        return pip(command, **kwargs)
+
+    monkeypatch.setattr(script_environments.subprocess, "run", blocking_pip)
+    cache = ScriptEnvironmentCache(tmp_path)
+    environment = cache.get_environment(["fl_missing_a"])
+    build_thread = threading.Thread(target=cache.get_environment, args=(["fl_missing_b"],))
+    build_thread.start()
+    is_building.wait(5)
+
+    try:
+        assert cache.get_environment(["fl_missing_a"]).path == environment.path
+        assert cache.stats.hits == 1 and cache.stats.builds == 1
+    finally:
+        can_finish_build.set()
+        build_thread.join()
+    assert cache.stats.builds == 2
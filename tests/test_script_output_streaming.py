@@ -0,0 +1,48 @@
+import subprocess
+import sys
+
+from forloop_modules.utils.script_output_streaming import OutputRingBuffer, OutputStreamer
+
+SCRIPT = """
+import sys
+sys.stderr.write(("x" * 99 + "\\n") * 2000)  # Fills the stderr pipe before any stdout
+for i in range(5000):
+    print(f"line {i}")
+print("MARKER:prompt")
+print("done")
+"""
+
+
+def test_ring_buffer_keeps_newest_output():
+    buffer = OutputRingBuffer(max_chars=10)
+    for chunk in ["abcd", "efgh", "ijkl"]:
+        buffer.append(chunk)
+
+    assert len(buffer) == 10
+    assert buffer.getvalue() == "[... 2 characters truncated ...]\ncdefghijkl"
+
+
+def test_both_pipes_are_streamed_with_batched_flushes():
+    flushed, special_lines = {}, []
+    flush_counts = {"stdout": 0, "stderr": 0}
+
+    def on_flush(stream, text):
+        flushed[stream] = text
+        flush_counts[stream] += 1
+
+    process = subprocess.Popen(
+        [sys.executable, "-u", "-c", SCRIPT], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    streamer = OutputStreamer(
+        on_flush, lambda stream, line: special_lines.append(line), special_line_prefixes=["MARKER:"], flush_interval=0.05
+    )
+    with streamer:
+        streamer.read_process_output(process)
+    assert process.wait(timeout=10) == 0
+
+    assert flushed["stdout"].splitlines()[-2:] == ["line 4999", "done"]
+    assert "MARKER:prompt" not in flushed["stdout"]
+    assert special_lines == ["MARKER:prompt\n"]
+    assert len(flushed["stderr"]) == 2000 * 100
+    assert streamer.stats.lines["stdout"] == 5001
+    assert flush_counts["stdout"] < 100
@@ -0,0 +1,48 @@
+import pytest
+
+from forloop_modules.utils.script_worker_pool import ScriptWorkerPool, is_worker_pool_supported
+
+pytestmark = pytest.mark.skipif(not is_worker_pool_supported(), reason="Script workers require os.fork")
+
+
+@pytest.fixture
+def pool():
+    # "json" stands in for heavy libraries preloaded by default
+    with ScriptWorkerPool(size=1, preload_modules=["json", "fl_not_existing_module"], max_runs_per_worker=3) as pool:
+        yield pool
+
+
+def test_scripts_run_isolated_in_warm_workers(pool):
+    output = []
+    on_output = lambda stream, line: output.append((stream, line))
+
+    result = pool.run("import sys\nprint('a')\nprint('b', file=sys.stderr)\nsys.modules['json'].MARK = 1", on_output)
+    assert result.exit_code == 0
+    assert sorted(output) == [("stderr", "b\n"), ("stdout", "a\n")]
+
+    # The second run doesn't see changes of the first one, but the preloaded module is imported already
+    output.clear()
+    result = pool.run("import sys\nprint('json' in sys.modules, hasattr(sys.modules['json'], 'MARK'))\nraise ValueError('x')", on_output)
+    assert result.exit_code == 1
+    assert output[0] == ("stdout", "True False\n")
+    assert output[-1] == ("stderr", "ValueError: x\n")
+
+
+def test_timeouts_and_worker_recycling(pool):
+    result = pool.run("import time\ntime.sleep(30)", timeout=0.5)
+    assert result.is_timed_out and result.exit_code != 0
+
+    worker_pids = {pool.run("pass").worker_pid for _ in range(5)}
+    assert len(worker_pids) == 2  # Replaced after 3 runs
+    assert pool.get_stats()["recycled_by_runs"] == 2
+
+
+def test_scripts_import_from_working_directory_not_worker_directory(pool, tmp_path):
+    (tmp_path / "fl_local_module.py").write_text("VALUE = 42\n")
+    output = []
+
+    script = "import importlib.util, fl_local_module\nprint(fl_local_module.VALUE, importlib.util.find_spec('script_worker'))"
+    result = pool.run(script, lambda stream, line: output.append(line), cwd=tmp_path)
+
+    assert result.exit_code == 0
+    assert output == ["42 None\n"]
@@ -0,0 +1,124 @@
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from forloop_modules.utils.sse_parser import DEFAULT_MAX_RECONNECT_ATTEMPTS, AsyncSSEParser, SSEDecoder, SSEParser
+
+
+class FakeStreamResponse:
+    status_code = 200
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        for line in self.lines:
+            if isinstance(line, Exception):
+                raise line
+            yield line
+
+    async def aiter_lines(self):
+        for line in self.iter_lines():
+            yield line
+
+
+class FakeStreamClient:
+    """Serves one list of lines per connection and records headers of each connection."""
+
+    def __init__(self, *connections):
+        self.connections = list(connections)
+        self.requests_headers = []
+
+    @contextmanager
+    def stream(self, method, url, headers=None, **kwargs):
+        self.requests_headers.append(headers)
+        yield FakeStreamResponse(self.connections.pop(0))
+
+
+class AsyncFakeStreamClient(FakeStreamClient):
+    @asynccontextmanager
+    async def stream(self, method, url, headers=None, **kwargs):
+        self.requests_headers.append(headers)
+        yield FakeStreamResponse(self.connections.pop(0))
+
+
+def test_decoder_follows_sse_specification():
+    decoder = SSEDecoder()
+    lines = [
+        ": keep-alive comment",
+        "retry: 1500",
+        "event: status",
+        "id: 1",
+        'data: {"a":',
+        "data:  1}",
+        "unknown: field is ignored",
+        "",
+        "",
+        "data: plain text",
+        "",
+        "id: 2",
+        "",
+    ]
+
+    messages = list(decoder.decode(lines))
+
+    assert messages == [
+        {"data": {"a": 1}, "event": "status", "id": "1"},
+        {"data": "plain text", "id": "1"},
+    ]
+    assert decoder.last_event_id == "2"
+    assert decoder.get_retry_delay() == 1.5
+
+
+def test_stream_reconnects_with_last_event_id():
+    client = FakeStreamClient(
+        ["retry: 0", "id: 1", "data: 1", "", "id: 2", "data: lost", httpx.ReadError("dropped")],
+        ["id: 2", "data: 2", ""],
+    )
+    parser = SSEParser(client, max_queue_size=1)
+
+    messages = list(parser.stream("GET", "http://test/stream"))
+
+    assert [message["data"] for message in messages] == [1, 2]
+    assert "Last-Event-ID" not in client.requests_headers[0]
+    assert client.requests_headers[1]["Last-Event-ID"] == "2"
+
+
+def test_stream_gives_up_after_max_reconnect_attempts():
+    client = FakeStreamClient(["retry: 0", httpx.ReadError("dropped")], [httpx.ReadError("dropped")])
+    parser = SSEParser(client, max_reconnect_attempts=1)
+
+    with pytest.raises(httpx.ReadError):
+        list(parser.stream("GET", "http://test/stream"))
+
+
+def test_stream_gives_up_by_default_when_server_is_down():
+    dropped_connections = [[httpx.ReadError("dropped")] for _ in range(DEFAULT_MAX_RECONNECT_ATTEMPTS)]
+    client = FakeStreamClient(["retry: 0", httpx.ReadError("dropped")], *dropped_connections)
+    parser = SSEParser(client)
+
+    with pytest.raises(httpx.ReadError):
+        list(parser.stream("GET", "http://test/stream"))
+    assert len(client.requests_headers) == DEFAULT_MAX_RECONNECT_ATTEMPTS + 1
+
+
+def test_async_stream_reconnects_with_last_event_id():
+    client = AsyncFakeStreamClient(
+        ["retry: 0", "id: 1", "data: 1", "", httpx.ReadError("dropped")],
+        ["data: 2", ""],
+    )
+    parser = AsyncSSEParser(client, max_queue_size=1)
+
+    async def consume():
+        return [message async for message in parser.stream("GET", "http://test/stream")]
+
+    messages = asyncio.run(consume())
+
+    assert [message["data"] for message in messages] == [1, 2]
+    assert client.requests_headers[1]["Last-Event-ID"] == "1"
@@ -0,0 +1,82 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from forloop_modules.utils.variable_value_cache import (
+    VariableValueCache,
+    bump_value_version,
+    estimate_value_size,
+    get_value_version,
+)
+
+
+def test_cached_value_is_served_until_version_changes(kv_redis):
+    cache = VariableValueCache()
+    df = pd.DataFrame({"a": range(1000)})
+
+    cache.put("df", df, bump_value_version(kv_redis, "df:version"))
+    is_cached, cached_df = cache.get("df", get_value_version(kv_redis, "df:version"))
+    assert is_cached
+    pd.testing.assert_frame_equal(cached_df, df)
+    assert cache.get("df", None) == (False, None)  # Never versioned values are always loaded
+
+    bump_value_version(kv_redis, "df:version")  # Written by another process
+    assert cache.get_or_load("df", get_value_version(kv_redis, "df:version"), lambda: "reloaded") == "reloaded"
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["bytes_saved"] == estimate_value_size(df)
+
+
+class FakeRedisClient:
+    def __init__(self):
+        self.storage = {}
+
+    def set(self, key, value, nx=False):
+        if not (nx and key in self.storage):
+            self.storage[key] = int(value)
+
+    def incr(self, key):
+        self.storage[key] = self.storage.get(key, 0) + 1
+        return self.storage[key]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.storage.pop(key, None)
+
+
+def test_recreated_version_counter_does_not_repeat_versions(kv_redis):
+    kv_redis.redis = FakeRedisClient()
+
+    first_version = bump_value_version(kv_redis, "df:version")
+    assert bump_value_version(kv_redis, "df:version") == first_version + 1
+
+    kv_redis.redis.delete("df:version")  # Variable deleted, a reader may still cache its value
+    assert bump_value_version(kv_redis, "df:version") > first_version + 1
+
+
+def test_values_modified_in_place_do_not_change_cached_ones():
+    cache = VariableValueCache()
+    df = pd.DataFrame({"a": range(3)})
+
+    cache.put("df", df, version=1)
+    df["b"] = 1  # Written value modified after the write-through
+    _, cached_df = cache.get("df", version=1)
+    cached_df.attrs["name"] = "df"
+    cached_df.loc[0, "a"] = -1
+
+    _, cached_df = cache.get("df", version=1)
+    assert list(cached_df.columns) == ["a"] and cached_df.loc[0, "a"] == 0 and cached_df.attrs == {}
+
+
+def test_least_recently_used_values_are_evicted_by_size():
+    df = pd.DataFrame({"a": range(1000)})
+    cache = VariableValueCache(max_bytes=int(estimate_value_size(df) * 2.5))
+
+    for name in ["df1", "df2", "df3"]:
+        cache.put(name, df, version=1)
+        cache.get("df1", version=1)
+
+    assert [cache.get(name, version=1)[0] for name in ["df1", "df2", "df3"]] == [True, False, True]
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.size <= cache.max_bytes
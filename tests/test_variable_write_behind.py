@@ -0,0 +1,215 @@
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("keepvariable")
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class FakeVariableApi:
+    """Records InitialVariable requests, fails for names in failing_names"""
+
+    def __init__(self, monkeypatch, ncrb):
+        self.requests = []
+        self.pipeline_uids = []
+        self.failing_names = set()
+        self.on_new = None  # Called while a create is being sent
+        monkeypatch.setattr(ncrb, "new_initial_variable", self.new)
+        monkeypatch.setattr(ncrb, "update_initial_variable_by_uid", self.update)
+        monkeypatch.setattr(ncrb, "delete_initial_variable_by_uid", self.delete)
+
+    def _respond(self, uid, name, value, is_result=None, pipeline_uid=None, **kwargs):
+        self.pipeline_uids.append(pipeline_uid)
+        if name in self.failing_names:
+            raise ConnectionError("API is down")
+        return FakeResponse({"uid": uid, "name": name, "value": value, "is_result": is_result, "type": "int"})
+
+    def new(self, **kwargs):
+        self.requests.append(("new", kwargs["name"], kwargs["value"]))
+        if self.on_new is not None:
+            self.on_new()
+        return self._respond(f"uid-{kwargs['name']}", **kwargs)
+
+    def update(self, variable_uid, **kwargs):
+        self.requests.append(("update", kwargs["name"], kwargs["value"]))
+        return self._respond(variable_uid, **kwargs)
+
+    def delete(self, variable_uid):
+        self.requests.append(("delete", variable_uid))
+
+
+@pytest.fixture
+def local_variable_handler_module(import_with_server_config):
+    return import_with_server_config("forloop_modules.globals.local_variable_handler")
+
+
+@pytest.fixture
+def LocalVariableHandler(local_variable_handler_module):
+    return local_variable_handler_module.LocalVariableHandler
+
+
+@pytest.fixture
+def api(monkeypatch, local_variable_handler_module):
+    return FakeVariableApi(monkeypatch, local_variable_handler_module.ncrb)
+
+
+@pytest.fixture
+def handler(monkeypatch, local_variable_handler_module):
+    monkeypatch.setattr(local_variable_handler_module.atexit, "register", lambda function: None)
+    handler = local_variable_handler_module.LocalVariableHandler()
+    handler.enable_write_behind(flush_interval=None)
+    return handler
+
+
+def test_repeated_writes_are_coalesced_into_one_request(handler, api):
+    for value in range(5):
+        handler.new_variable("a", value)
+    handler.new_variable("b", 1)
+
+    assert api.requests == []
+    assert handler.flush_write_behind() == 2
+    assert sorted(api.requests) == [("new", "a", 4), ("new", "b", 1)]
+    assert handler.variables["a"].uid == "uid-a"
+    assert (handler.write_behind_stats.writes, handler.write_behind_stats.collapsed_writes) == (6, 4)
+
+    handler.new_variable("a", 5)
+    handler.flush_write_behind()
+    assert api.requests[-1] == ("update", "a", 5)
+
+
+def test_exit_flush_sends_sequentially(monkeypatch, api, LocalVariableHandler, local_variable_handler_module):
+    registered_functions = []
+    monkeypatch.setattr(local_variable_handler_module.atexit, "register", registered_functions.append)
+
+    class ShutDownExecutor:
+        def __init__(self, *args, **kwargs):
+            raise RuntimeError("cannot schedule new futures after interpreter shutdown")
+
+    handler = LocalVariableHandler()
+    handler.enable_write_behind(flush_interval=None)
+    handler.new_variable("a", 1)
+    handler.new_variable("b", 2)
+
+    monkeypatch.setattr(local_variable_handler_module, "ThreadPoolExecutor", ShutDownExecutor)
+    for function in registered_functions:
+        function()
+
+    assert sorted(api.requests) == [("new", "a", 1), ("new", "b", 2)]
+    assert handler.write_behind_stats.flushed_operations == 2
+
+
+def test_failing_operation_is_dropped_after_max_attempts(handler, api, LocalVariableHandler):
+    api.failing_names.add("a")
+    handler.new_variable("a", 1)
+    handler.new_variable("b", 2)
+
+    assert handler.flush_write_behind() == 1
+    for _ in range(LocalVariableHandler.WRITE_BEHIND_MAX_ATTEMPTS - 1):
+        assert handler.flush_write_behind() == 0
+
+    assert not handler._dirty_operations
+    assert handler.flush_write_behind() == 0
+    assert [request[1] for request in api.requests].count("a") == LocalVariableHandler.WRITE_BEHIND_MAX_ATTEMPTS
+    stats = handler.write_behind_stats
+    assert (stats.failed_operations, stats.dropped_operations) == (LocalVariableHandler.WRITE_BEHIND_MAX_ATTEMPTS, 1)
+
+
+def test_batch_stores_uids_of_successful_writes_when_another_fails(api, LocalVariableHandler):
+    api.failing_names.add("b")
+    handler = LocalVariableHandler()
+
+    with pytest.raises(ConnectionError):
+        with handler.batch():
+            handler.new_variable("a", 1)
+            handler.new_variable("a", 2)
+            handler.new_variable("b", 3)
+
+    assert ("new", "a", 2) in api.requests and ("new", "a", 1) not in api.requests
+    assert handler.variables["a"].uid == "uid-a"
+    assert not handler.is_batching
+
+
+def test_batch_flush_failure_does_not_mask_error_of_block(api, LocalVariableHandler):
+    api.failing_names.add("a")
+    handler = LocalVariableHandler()
+
+    with pytest.raises(KeyError, match="node failed"):
+        with handler.batch():
+            handler.new_variable("a", 1)
+            raise KeyError("node failed")
+
+    assert api.requests == [("new", "a", 1)]
+
+
+def test_deleted_variable_value_and_version_are_removed_from_redis(
+    monkeypatch, api, kv_redis, LocalVariableHandler, local_variable_handler_module
+):
+    monkeypatch.setattr(local_variable_handler_module, "kv_redis", kv_redis)
+    handler = LocalVariableHandler()
+    handler.new_variable("a", 1)
+    redis_name = handler.get_variable_redis_name("a")
+    version_redis_name = local_variable_handler_module.get_variable_version_redis_name(redis_name)
+    kv_redis.storage.update({redis_name: [1, 2], version_redis_name: 3})
+
+    handler.delete_variable("a")
+
+    assert api.requests[-1] == ("delete", "uid-a")
+    assert kv_redis.storage == {}
+
+
+def test_delete_queued_while_create_is_sent_deletes_created_variable(handler, api):
+    handler.new_variable("a", 1)
+    api.on_new = lambda: handler.delete_variable("a")
+
+    handler.flush_write_behind()
+    api.on_new = None
+    handler.flush_write_behind()
+
+    assert api.requests == [("new", "a", 1), ("delete", "uid-a")]
+
+
+def test_operations_are_sent_to_pipeline_active_when_queued(handler, monkeypatch, api, local_variable_handler_module):
+    aet = local_variable_handler_module.aet
+    monkeypatch.setattr(aet, "active_pipeline_uid", "pipeline-1")
+    handler.new_variable("a", 1)
+    monkeypatch.setattr(aet, "active_pipeline_uid", "pipeline-2")
+
+    handler.flush_write_behind()
+
+    assert api.pipeline_uids == ["pipeline-1"]
+
+
+def test_operations_are_requeued_when_flush_raises(handler, monkeypatch, api):
+    handler.new_variable("a", 1)
+    handler.new_variable("b", 2)
+
+    def raise_keyboard_interrupt(calls):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(handler, "_run_concurrently", raise_keyboard_interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        handler.flush_write_behind()
+    handler.new_variable("a", 3)
+    monkeypatch.delattr(handler, "_run_concurrently")
+
+    assert handler.flush_write_behind() == 2
+    assert sorted(api.requests) == [("new", "a", 3), ("new", "b", 2)]
+
+
+def test_calls_not_started_at_interpreter_shutdown_are_run_sequentially(handler, monkeypatch, local_variable_handler_module):
+    class ShuttingDownExecutor(local_variable_handler_module.ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            if getattr(self, "is_submitted", False):
+                raise RuntimeError("cannot schedule new futures after interpreter shutdown")
+            self.is_submitted = True
+            return super().submit(*args, **kwargs)
+
+    monkeypatch.setattr(local_variable_handler_module, "ThreadPoolExecutor", ShuttingDownExecutor)
+
+    assert handler._run_concurrently([lambda: 1, lambda: 2, lambda: 3]) == [1, 2, 3]
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("lxml")
+
+from forloop_modules.utils.xpath_extraction import (
+    count_xpath_matches,
+    extract_image_urls,
+    extract_xpaths,
+    parse_page_source,
+)
+
+PAGE_SOURCE = """
+<html><body>
+  <h1> Products </h1>
+  <ul>
+    <li><a href="/item/1">First</a><span class="price">10 EUR</span></li>
+    <li><a href="https://other.com/item/2">Second</a><span class="price"> </span></li>
+  </ul>
+</body></html>
+"""
+
+
+def test_all_xpaths_are_extracted_from_one_snapshot():
+    tree = parse_page_source(PAGE_SOURCE)
+
+    data = extract_xpaths(
+        tree,
+        ["/html/body/h1", "//li/a", "//li/span", "//table", ["/html/body/h1", "//li[1]/span"], "//li["],
+        base_url="https://shop.com/list",
+    )
+
+    assert data == [
+        "Products",
+        ["https://shop.com/item/1", "https://other.com/item/2"],
+        "10 EUR",
+        "None",  # No matches, as extracted by docrawl
+        "Products\n10 EUR",
+        None,  # Invalid XPath
+    ]
+
+
+def test_match_counts_of_generalized_xpaths():
+    tree = parse_page_source(PAGE_SOURCE)
+
+    assert count_xpath_matches(tree, ["/html/body/ul/li[1]/a", "/html/body/ul/li/a", "//span", "//li["]) == [1, 2, 2, 0]
+
+
+def test_image_urls_prefer_lazy_loaded_source():
+    tree = parse_page_source(
+        '<div><img src="/placeholder.gif" data-src="/img/1.jpg"><img src="img/2.jpg"><img alt="no source"></div>'
+    )
+
+    assert extract_image_urls(tree, "//img", base_url="https://shop.com/list/") == [
+        "https://shop.com/img/1.jpg", "https://shop.com/list/img/2.jpg"
+    ]